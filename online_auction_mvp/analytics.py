@@ -0,0 +1,463 @@
+"""
+Auction analytics for the seller Insights page and marketplace reports.
+
+Bids are bulk-fetched in bid_id order as NumPy columns (integer ids, epoch
+second timestamps, float amounts) and folded into aggregates with
+vectorized groupbys. Only the aggregates are kept, and a refresh only
+fetches bids above the high-water bid_id it has already processed, so
+refreshing after the first load costs as much as the new bids. Bids that
+bid_archive.py moved to archive files are read from those files once.
+With several shards each keeps its own high-water marks, and moving a
+bucket (which renumbers its bids) makes the next refresh start over.
+
+    python analytics.py              marketplace summary and revenue per seller
+"""
+from datetime import datetime, timedelta
+import argparse
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from bid_archive import BID_ARCHIVE_CONFIG
+from db_config import BID_FEED_CONFIG, Error, db_cursor, get_backend, is_sharded, on_shard, refresh_shard_map, shard_ids
+from db_metrics import instrumented, metrics
+from shard_map import SHARD_ID_SPAN, shard_map
+
+ANALYTICS_CONFIG = {
+    'fetch_size': int(os.getenv('ANALYTICS_FETCH_SIZE', 50000)),  # Bids fetched per query
+    'bucket_minutes': int(os.getenv('ANALYTICS_BUCKET_MINUTES', 60)),  # Width of the bid velocity and concurrency buckets
+    'curve_hours': int(os.getenv('ANALYTICS_CURVE_HOURS', 72)),  # Price curves stop here; later bids count in the last hour
+    'refresh_seconds': float(os.getenv('ANALYTICS_REFRESH_SECONDS', 60))  # Reports are at most this stale
+}
+
+BID_FIELDS = ('bid_id', 'item_id', 'buyer_id', 'seller_id', 'bid_amount', 'bid_time')
+
+BIDS_QUERY = """
+SELECT bid_id, item_id, buyer_id, seller_id, bid_amount, bid_time
+FROM bids
+WHERE bid_id > %s {cutoff}
+ORDER BY bid_id
+LIMIT %s
+"""
+
+ITEMS_QUERY = "SELECT item_id, base_price FROM items WHERE item_id > %s ORDER BY item_id LIMIT %s"
+
+SETTLEMENTS_QUERY = "SELECT item_id, seller_id, winner_id, final_price, closed_at FROM settlements WHERE closed_at >= %s"
+
+ARCHIVES_QUERY = "SELECT archive_id, path FROM bid_archives WHERE archive_id > %s ORDER BY archive_id"
+
+# Settlements are re-read this far behind the newest one seen, since a
+# closing batch commits after the closed_at it stamps; repeats are skipped
+SETTLEMENT_LOOKBACK = timedelta(minutes=10)
+
+def _ids(values):
+    # NULL ids (e.g. a deleted user) become 0, which no row uses
+    return np.fromiter((value or 0 for value in values), dtype=np.int64, count=len(values))
+
+def _epoch_seconds(values):
+    # Naive local timestamps are kept as they are; _to_datetime reverses this
+    return np.array(values, dtype='datetime64[s]').astype(np.int64)
+
+def _to_datetime(seconds):
+    return pd.to_datetime(seconds, unit='s')
+
+def fetch_bids(after_id, limit, until=None):
+    """
+    Up to `limit` bids with a bid_id above `after_id`, oldest id first, as a
+    dict of NumPy arrays keyed by BID_FIELDS. `until` leaves out bids placed
+    after it.
+    """
+    cutoff = "AND bid_time <= %s" if until is not None else ""
+    params = (after_id, until, limit) if until is not None else (after_id, limit)
+    with db_cursor(readonly=True) as cursor:
+        cursor.execute(BIDS_QUERY.format(cutoff=cutoff), params)
+        rows = cursor.fetchall()
+    columns = list(zip(*rows)) if rows else [()] * len(BID_FIELDS)
+    return {
+        'bid_id': _ids(columns[0]),
+        'item_id': _ids(columns[1]),
+        'buyer_id': _ids(columns[2]),
+        'seller_id': _ids(columns[3]),
+        'bid_amount': np.array(columns[4], dtype=np.float64),
+        'bid_time': _epoch_seconds(columns[5])
+    }
+
+def read_archived_bids(relative):
+    """
+    Every bid in an archive file, as fetch_bids returns them
+    """
+    frame = pd.read_csv(os.path.join(BID_ARCHIVE_CONFIG['dir'], relative), usecols=list(BID_FIELDS))
+    return {
+        'bid_id': frame['bid_id'].to_numpy(np.int64),
+        'item_id': frame['item_id'].to_numpy(np.int64),
+        'buyer_id': frame['buyer_id'].fillna(0).to_numpy(np.int64),
+        'seller_id': frame['seller_id'].fillna(0).to_numpy(np.int64),
+        'bid_amount': frame['bid_amount'].to_numpy(np.float64),
+        'bid_time': pd.to_datetime(frame['bid_time']).to_numpy().astype('datetime64[s]').astype(np.int64)
+    }
+
+def _select(bids, mask):
+    return {field: values[mask] for field, values in bids.items()}
+
+def _add_unique(known, keys):
+    """
+    Merge `keys` into the sorted unique array `known`; returns the merged
+    array and the keys that were not in it yet
+    """
+    keys = np.unique(keys)
+    positions = np.searchsorted(known, keys)
+    present = positions < len(known)
+    present[present] = known[positions[present]] == keys[present]
+    new = keys[~present]
+    return np.insert(known, positions[~present], new), new
+
+def _combine(frames, how):
+    # Fold per-chunk aggregates into the running ones by index
+    present = [frame for frame in frames if len(frame)]
+    if len(present) < 2:
+        return present[0] if present else frames[0]
+    frames = present
+    combined = pd.concat(frames)
+    return combined.groupby(level=list(range(combined.index.nlevels))).agg(how)
+
+class AuctionAnalytics:
+    """
+    Running aggregates over every bid and settlement seen so far:
+    per item (bids, distinct bidders, first and last bid, high bid), bids
+    per seller and time bucket, the price curve per seller (bids as a
+    multiple of the base price by hours since the item's first bid),
+    distinct active bidders per time bucket, and closed, sold and revenue
+    per seller. Readers get copies; one refresh runs at a time.
+    """
+
+    def __init__(self, fetch_size, bucket_minutes, curve_hours, refresh_seconds):
+        self.fetch_size = fetch_size
+        self.bucket_seconds = bucket_minutes * 60
+        self.curve_hours = curve_hours
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._map_version = None
+        self.reset()
+
+    def reset(self):
+        """
+        Forget everything; the next refresh reloads all bids
+        """
+        with self._lock:
+            self._clear()
+
+    def _clear(self):
+        # High-water marks are per shard: shard -> bid_id, archive_id, item_id, closed_at
+        self._bid_high_water = {}
+        self._archive_high_water = {}
+        self._archive_paths = set()  # a file can be listed on several shards once a bucket moves
+        self._item_high_water = {}
+        self._closed_high_water = {}
+        self._item_ids = np.empty(0, dtype=np.int64)
+        self._base_prices = np.empty(0, dtype=np.float64)
+        self._bidder_pairs = np.empty(0, dtype=np.int64)  # item_id << 32 | buyer_id
+        self._active_keys = np.empty(0, dtype=np.int64)  # bucket << 32 | buyer_id
+        self._settled = np.empty(0, dtype=np.int64)
+        self._items = pd.DataFrame(
+            {'seller_id': [], 'bids': [], 'bidders': [], 'first_bid': [], 'last_bid': [], 'high_bid': []},
+            index=pd.Index([], dtype=np.int64, name='item_id')
+        ).astype({'seller_id': np.int64, 'bids': np.int64, 'bidders': np.int64,
+                  'first_bid': np.int64, 'last_bid': np.int64})
+        self._velocity = pd.Series(dtype=np.int64)  # (seller_id, bucket) -> bids
+        self._active = pd.Series(dtype=np.int64)  # bucket -> distinct bidders
+        self._curve = pd.DataFrame({'bids': [], 'multiple': []})  # (seller_id, hour) -> bids, sum of multiples
+        self._sellers = pd.DataFrame({'closed': [], 'sold': [], 'revenue': []})
+        self.bids_processed = 0
+        self.refreshed_at = None
+        self.last_refresh_seconds = None
+        self._refreshed = float('-inf')
+
+    def refresh(self, force=False):
+        """
+        Fold in the bids and settlements that arrived since the last refresh,
+        unless it ran less than `refresh_seconds` ago
+        """
+        with self._lock:
+            if not force and time.monotonic() - self._refreshed < self.refresh_seconds:
+                return False
+            started = time.perf_counter()
+            if is_sharded():
+                refresh_shard_map()
+                if shard_map.version != self._map_version:
+                    # A moved bucket's bids are renumbered on their new shard; start over rather than count them twice
+                    self._clear()
+                    self._map_version = shard_map.version
+            self._load_items()
+            # On MySQL a bid is numbered before it commits; stay BID_FEED_SETTLE seconds behind so none is skipped
+            settle = BID_FEED_CONFIG['settle'] if get_backend().name == 'mysql' else 0
+            until = datetime.now() - timedelta(seconds=settle) if settle else None
+            high_water = dict(self._bid_high_water)
+            seen = [np.empty(0, dtype=np.int64)]
+            for shard in shard_ids():
+                after_id = high_water.get(shard, 0)
+                while True:
+                    with on_shard(shard):
+                        bids = fetch_bids(after_id, self.fetch_size, until)
+                    if not len(bids['bid_id']):
+                        break
+                    after_id = int(bids['bid_id'][-1])
+                    seen.append(bids['bid_id'])
+                    self._merge_bids(bids)
+                    if len(bids['bid_id']) < self.fetch_size:
+                        break
+                high_water[shard] = after_id
+            # Archive files go last: bids archived while the loop ran are in them, or were seen above
+            archived = pd.Series(self._load_archives(np.concatenate(seen)))
+            for shard, bid_id in archived.groupby(archived // SHARD_ID_SPAN).max().items():
+                high_water[shard] = max(high_water.get(shard, 0), int(bid_id))
+            self._bid_high_water = high_water
+            self._load_settlements()
+            self._refreshed = time.monotonic()
+            self.refreshed_at = datetime.now()
+            self.last_refresh_seconds = time.perf_counter() - started
+            return True
+
+    def _load_items(self):
+        for shard in shard_ids():
+            while True:
+                with on_shard(shard), db_cursor(readonly=True) as cursor:
+                    cursor.execute(ITEMS_QUERY, (self._item_high_water.get(shard, 0), self.fetch_size))
+                    rows = cursor.fetchall()
+                if not rows:
+                    break
+                item_ids, base_prices = zip(*rows)
+                self._add_items(_ids(item_ids), np.array(base_prices, dtype=np.float64))
+                self._item_high_water[shard] = int(item_ids[-1])
+                if len(rows) < self.fetch_size:
+                    break
+
+    def _add_items(self, item_ids, base_prices):
+        # Shards interleave item ids; keep the arrays sorted for searchsorted
+        self._item_ids, new = _add_unique(self._item_ids, item_ids)
+        positions = np.searchsorted(self._item_ids, new)
+        new_prices = base_prices[np.searchsorted(item_ids, new)]
+        self._base_prices = np.insert(self._base_prices, positions - np.arange(len(new)), new_prices)
+
+    def _load_archives(self, seen):
+        """
+        Merge the bids of archive files not read yet that are above the
+        high-water mark and not among the `seen` bid_ids; returns their bid_ids
+        """
+        merged = [np.empty(0, dtype=np.int64)]
+        for shard in shard_ids():
+            with on_shard(shard), db_cursor(readonly=True) as cursor:
+                cursor.execute(ARCHIVES_QUERY, (self._archive_high_water.get(shard, 0),))
+                archives = cursor.fetchall()
+            for archive_id, path in archives:
+                self._archive_high_water[shard] = archive_id
+                if path in self._archive_paths:
+                    continue
+                self._archive_paths.add(path)
+                bids = read_archived_bids(path)
+                # Each bid is checked against the high-water mark of the shard that numbered it
+                high_water = pd.Series(self._bid_high_water, dtype=np.int64).reindex(
+                    bids['bid_id'] // SHARD_ID_SPAN, fill_value=0
+                ).to_numpy()
+                bids = _select(bids, (bids['bid_id'] > high_water) & ~np.isin(bids['bid_id'], seen))
+                self._merge_bids(bids)
+                merged.append(bids['bid_id'])
+        return np.concatenate(merged)
+
+    def _merge_bids(self, bids):
+        if not len(bids['bid_id']):
+            return
+        if not np.isin(bids['item_id'], self._item_ids).all():
+            self._load_items()  # listed after this refresh began
+        frame = pd.DataFrame(bids)
+
+        # Distinct bidders per item and per time bucket, counting only pairs not seen before
+        self._bidder_pairs, new_pairs = _add_unique(self._bidder_pairs, (bids['item_id'] << 32) | bids['buyer_id'])
+        new_bidders = pd.Series(new_pairs >> 32).value_counts()
+        buckets = bids['bid_time'] // self.bucket_seconds
+        self._active_keys, new_active = _add_unique(self._active_keys, (buckets << 32) | bids['buyer_id'])
+        self._active = _combine([self._active, pd.Series(new_active >> 32).value_counts()], 'sum')
+
+        items = frame.groupby('item_id').agg(
+            seller_id=('seller_id', 'max'), bids=('bid_id', 'size'), first_bid=('bid_time', 'min'),
+            last_bid=('bid_time', 'max'), high_bid=('bid_amount', 'max')
+        )
+        items['bidders'] = new_bidders.reindex(items.index, fill_value=0)
+        items = items[self._items.columns]  # the first chunk's frame becomes the running one
+        self._items = _combine([self._items, items], {
+            'seller_id': 'max', 'bids': 'sum', 'bidders': 'sum', 'first_bid': 'min', 'last_bid': 'max', 'high_bid': 'max'
+        })
+
+        frame['bucket'] = buckets
+        self._velocity = _combine([self._velocity, frame.groupby(['seller_id', 'bucket']).size()], 'sum')
+
+        # Price curve: each bid as a multiple of its item's base price, by hours since the item's first bid
+        first_bid = self._items['first_bid'].reindex(bids['item_id']).to_numpy()
+        positions = np.searchsorted(self._item_ids, bids['item_id'])
+        known = positions < len(self._item_ids)
+        known[known] = self._item_ids[positions[known]] == bids['item_id'][known]
+        base_prices = np.where(known, self._base_prices[np.minimum(positions, len(self._item_ids) - 1)], np.nan)
+        curve = pd.DataFrame({
+            'seller_id': bids['seller_id'],
+            'hour': np.minimum((bids['bid_time'] - first_bid) // 3600, self.curve_hours),
+            'multiple': bids['bid_amount'] / base_prices
+        })
+        curve = curve[np.isfinite(curve['multiple'])]
+        curve = curve.groupby(['seller_id', 'hour']).agg(bids=('multiple', 'size'), multiple=('multiple', 'sum'))
+        self._curve = _combine([self._curve, curve], 'sum')
+        self.bids_processed += len(bids['bid_id'])
+
+    def _load_settlements(self):
+        for shard in shard_ids():
+            closed_high_water = self._closed_high_water.get(shard)
+            since = closed_high_water - SETTLEMENT_LOOKBACK if closed_high_water else datetime(1970, 1, 2)
+            with on_shard(shard), db_cursor(readonly=True) as cursor:
+                cursor.execute(SETTLEMENTS_QUERY, (since,))
+                rows = cursor.fetchall()
+            if rows:
+                self._merge_settlements(shard, rows)
+
+    def _merge_settlements(self, shard, rows):
+        item_ids, seller_ids, winner_ids, final_prices, closed_at = zip(*rows)
+        item_ids = _ids(item_ids)
+        self._settled, new_items = _add_unique(self._settled, item_ids)
+        fresh = np.isin(item_ids, new_items)
+        sold = _ids(winner_ids)[fresh] > 0
+        settled = pd.DataFrame({
+            'seller_id': _ids(seller_ids)[fresh],
+            'closed': 1,
+            'sold': sold.astype(np.int64),
+            'revenue': np.where(sold, np.array(final_prices, dtype=np.float64)[fresh], 0.0)
+        })
+        self._sellers = _combine([self._sellers, settled.groupby('seller_id').sum()], 'sum')
+        self._closed_high_water[shard] = max(closed_at)
+
+    def _seller_table(self):
+        sellers = self._sellers.reindex(columns=['closed', 'sold', 'revenue'])
+        bids = self._items.groupby('seller_id').agg(
+            bids=('bids', 'sum'), items_with_bids=('bids', 'size'), avg_bidders=('bidders', 'mean'),
+            peak_bidders=('bidders', 'max')
+        )
+        table = bids.join(sellers, how='outer').fillna(0)
+        table = table.astype({'bids': np.int64, 'items_with_bids': np.int64, 'peak_bidders': np.int64,
+                              'closed': np.int64, 'sold': np.int64})
+        table = table[table.index > 0]
+        table['sell_through'] = np.where(table['closed'] > 0, table['sold'] / table['closed'].where(table['closed'] > 0, 1), np.nan)
+        table['avg_sale_price'] = np.where(table['sold'] > 0, table['revenue'] / table['sold'].where(table['sold'] > 0, 1), np.nan)
+        table.index.name = 'seller_id'
+        return table.sort_values('revenue', ascending=False)
+
+    def _bucket_series(self, counts, name, since):
+        counts = counts[counts.index >= since // self.bucket_seconds].sort_index()
+        return pd.DataFrame({name: counts.to_numpy()}, index=_to_datetime(counts.index.to_numpy() * self.bucket_seconds))
+
+    def _price_curve(self, curve):
+        if not len(curve):
+            return pd.DataFrame({'bids': [], 'avg_multiple': []})
+        curve = curve.groupby(level='hour').sum()
+        return pd.DataFrame({'bids': curve['bids'], 'avg_multiple': curve['multiple'] / curve['bids']})
+
+    def seller_insights(self, seller_id, since):
+        """
+        One seller's reports, with velocity from the epoch second `since`
+        """
+        with self._lock:
+            table = self._seller_table()
+            summary = table.loc[[seller_id]].to_dict('records')[0] if seller_id in table.index else None
+            items = self._items[self._items['seller_id'] == seller_id].copy()
+            velocity = self._velocity.xs(seller_id, level=0) if seller_id in self._velocity.index.get_level_values(0) else pd.Series(dtype=np.int64)
+            curve = self._curve.xs(seller_id, level=0, drop_level=False) if seller_id in self._curve.index.get_level_values(0) else self._curve.iloc[:0]
+            return {
+                'summary': summary,
+                'items': self._readable_items(items),
+                'velocity': self._bucket_series(velocity, 'bids', since),
+                'price_curve': self._price_curve(curve),
+                'bids_processed': self.bids_processed,
+                'refreshed_at': self.refreshed_at
+            }
+
+    def marketplace(self, since):
+        """
+        Marketplace-wide reports and the per-seller table
+        """
+        with self._lock:
+            sellers = self._seller_table()
+            velocity = self._velocity.groupby(level=1).sum() if len(self._velocity) else pd.Series(dtype=np.int64)
+            return {
+                'sellers': sellers,
+                'velocity': self._bucket_series(velocity, 'bids', since),
+                'active_bidders': self._bucket_series(self._active, 'bidders', since),
+                'price_curve': self._price_curve(self._curve),
+                'bids_processed': self.bids_processed,
+                'refreshed_at': self.refreshed_at
+            }
+
+    def _readable_items(self, items):
+        items['first_bid'] = _to_datetime(items['first_bid'].to_numpy())
+        items['last_bid'] = _to_datetime(items['last_bid'].to_numpy())
+        return items.drop(columns='seller_id').sort_values('bids', ascending=False)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'bids_processed': self.bids_processed,
+                'bid_high_water': max(self._bid_high_water.values(), default=0),
+                'items': len(self._items),
+                'last_refresh_seconds': self.last_refresh_seconds
+            }
+
+auction_analytics = AuctionAnalytics(**ANALYTICS_CONFIG)
+metrics.add_collector('analytics', auction_analytics.stats)
+
+def _since(days):
+    return int((datetime.now() - timedelta(days=days) - datetime(1970, 1, 1)).total_seconds())
+
+@instrumented
+def get_seller_insights(seller_id, days=7, refresh=False):
+    """
+    Reports on a seller's auctions; bid velocity covers the last `days`
+    days. `refresh` folds in new bids even if the last refresh was recent.
+    """
+    try:
+        auction_analytics.refresh(force=refresh)
+        return auction_analytics.seller_insights(seller_id, _since(days)), "Insights retrieved successfully"
+    except (Error, OSError) as e:
+        return None, f"Error retrieving insights: {e}"
+
+@instrumented
+def get_marketplace_insights(days=7, refresh=False):
+    """
+    Marketplace-wide reports and revenue per seller
+    """
+    try:
+        auction_analytics.refresh(force=refresh)
+        return auction_analytics.marketplace(_since(days)), "Insights retrieved successfully"
+    except (Error, OSError) as e:
+        return None, f"Error retrieving insights: {e}"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python analytics.py", description="Marketplace auction report")
+    parser.add_argument('--sellers', type=int, default=20, help="sellers listed, highest revenue first")
+    parser.add_argument('--days', type=int, default=7, help="days of bid velocity to show")
+    args = parser.parse_args(argv)
+
+    report, message = get_marketplace_insights(args.days, refresh=True)
+    if report is None:
+        print(message)
+        return 1
+    sellers = report['sellers']
+    print(f"Bids analyzed:   {report['bids_processed']}")
+    print(f"Auctions closed: {int(sellers['closed'].sum())}, sold {int(sellers['sold'].sum())}")
+    print(f"Revenue:         {sellers['revenue'].sum():,.2f}")
+    print(f"Bids in the last {args.days} days: {int(report['velocity']['bids'].sum())}, "
+          f"peak {int(report['active_bidders']['bidders'].max() if len(report['active_bidders']) else 0)} active bidders "
+          f"per {ANALYTICS_CONFIG['bucket_minutes']} minutes")
+    print()
+    print(sellers.head(args.sellers).to_string(float_format=lambda value: f"{value:,.2f}"))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,380 @@
+"""
+Headless JSON API for mobile and partner clients.
+
+    python api.py [--host HOST] [--port PORT]
+
+    POST /api/login                 {"email", "password"} -> {"token", "user"}
+    GET  /api/items                 ?after_id=&limit=, or search with ?q=&min_price=&max_price=&seller=&sort=
+    GET  /api/items/{item_id}       item detail with recent bids
+    GET  /api/items/{item_id}/bids  bid history of an item
+    POST /api/items/{item_id}/bids  {"amount"}, buyers only
+    PUT  /api/items/{item_id}/proxy {"max_amount"}: bid automatically up to it, buyers only
+    GET  /api/me/bids               the caller's bids, newest first; ?after_time=&after_id=&limit=
+    GET  /api/health                pool and admission statistics
+
+Writes are rate-limited per user and per item (write_admission.py); a
+throttled write gets 429 and a busy server 503, both with Retry-After.
+
+Authenticated calls send "Authorization: Bearer <token>". Amounts are
+returned as decimal strings and times in ISO 8601.
+"""
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+import argparse
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import math
+import os
+import secrets
+import sys
+import time
+
+from aiohttp import web
+
+import async_db
+from bid_intake import BID_INTAKE_CONFIG, get_bid_intake
+from db_config import PAGE_SIZE, SEARCH_LIMIT, SEARCH_SORTS, set_proxy_bid
+from db_metrics import metrics
+from write_admission import THROTTLED, write_admission
+
+API_CONFIG = {
+    'host': os.getenv('API_HOST', '127.0.0.1'),
+    'port': int(os.getenv('API_PORT', 8080)),
+    # Signs login tokens; without one, tokens only last as long as the process
+    'secret': os.getenv('API_SECRET') or secrets.token_hex(32),
+    'token_ttl': int(os.getenv('API_TOKEN_TTL', 3600)),
+    'request_timeout': float(os.getenv('API_REQUEST_TIMEOUT', 10)),  # Seconds, including time queued
+    'max_concurrency': int(os.getenv('API_MAX_CONCURRENCY', 64)),  # Requests handled at once...
+    'max_queue': int(os.getenv('API_MAX_QUEUE', 256))  # ...and waiting; beyond that requests get 503
+}
+
+log = logging.getLogger('auction.api')
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+def json_response(data, status=200, headers=None):
+    return web.json_response(data, status=status, headers=headers,
+                             dumps=lambda data: json.dumps(data, default=_json_default))
+
+def json_error(status, message, headers=None):
+    return json_response({'error': message}, status=status, headers=headers)
+
+def _b64(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+def _sign(payload):
+    return _b64(hmac.new(API_CONFIG['secret'].encode('utf-8'), payload.encode('ascii'), hashlib.sha256).digest())
+
+def issue_token(user):
+    """
+    Signed bearer token carrying the user's id, name and role
+    """
+    claims = {'sub': user['user_id'], 'name': user['name'], 'role': user['role'],
+              'exp': int(time.time()) + API_CONFIG['token_ttl']}
+    payload = _b64(json.dumps(claims, separators=(',', ':')).encode('utf-8'))
+    return f"{payload}.{_sign(payload)}"
+
+def read_token(token):
+    """
+    Claims of a valid, unexpired token, else None
+    """
+    payload, _, signature = token.partition('.')
+    if not signature or not hmac.compare_digest(signature, _sign(payload)):
+        return None
+    try:
+        claims = json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+    except ValueError:
+        return None
+    return claims if claims.get('exp', 0) > time.time() else None
+
+def _claims(request):
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    return read_token(token.strip()) if scheme.lower() == 'bearer' else None
+
+class BadRequest(Exception):
+    pass
+
+def _int_param(request, name, default=None, low=None, high=None):
+    value = request.query.get(name)
+    if value in (None, ''):
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise BadRequest(f"{name} must be an integer")
+    if low is not None:
+        value = max(low, value)
+    return min(high, value) if high is not None else value
+
+def _decimal(value, name):
+    if value in (None, ''):
+        return None
+    try:
+        value = Decimal(str(value))
+    except InvalidOperation:
+        raise BadRequest(f"{name} must be a number")
+    if not value.is_finite():
+        raise BadRequest(f"{name} must be a number")
+    return value
+
+async def _json_body(request):
+    try:
+        body = await request.json()
+    except ValueError:
+        raise BadRequest("Request body must be JSON")
+    if not isinstance(body, dict):
+        raise BadRequest("Request body must be a JSON object")
+    return body
+
+class AdmissionControl:
+    """
+    Bounds the requests being served at once. Up to `max_queue` more wait
+    for a slot; beyond that a request is turned away with 503 right away,
+    so a burst cannot pile up unbounded work. Each request, queueing
+    included, gets `timeout` seconds before it is answered with 504.
+    """
+
+    def __init__(self, max_concurrency, max_queue, timeout):
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self.in_flight = 0
+        self.waiting = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    async def handle(self, request, handler):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        if not self._slots.locked():
+            # A free slot is taken at once, without counting as waiting
+            await self._slots.acquire()
+        else:
+            if self.waiting >= self.max_queue:
+                self.rejected += 1
+                return json_error(503, "Server busy, please retry", headers={'Retry-After': '1'})
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.timeout)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                return json_error(503, "Server busy, please retry", headers={'Retry-After': '1'})
+            finally:
+                self.waiting -= 1
+
+        self.in_flight += 1
+        try:
+            return await asyncio.wait_for(handler(request), max(deadline - loop.time(), 0.001))
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            message = "Request timed out"
+            if request.method not in ('GET', 'HEAD'):
+                # A write keeps running in its worker thread after the cancel
+                message += "; it may still have taken effect"
+            return json_error(504, message)
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+
+    def stats(self):
+        return {
+            'in_flight': self.in_flight,
+            'waiting': self.waiting,
+            'rejected': self.rejected,
+            'timed_out': self.timed_out
+        }
+
+def _status_for(message):
+    # Map a data-access message to an HTTP status
+    if message.startswith(THROTTLED):
+        return 429
+    if message.startswith("Error") or "please retry" in message:
+        return 503
+    if message == "Item does not exist":
+        return 404
+    return 409
+
+def _write_error(message, user_id, item_id):
+    # Throttled and turned-away writes say when to come back
+    status = _status_for(message)
+    headers = None
+    if status in (429, 503):
+        headers = {'Retry-After': str(max(1, math.ceil(write_admission.retry_after(user_id, item_id))))}
+    return json_error(status, message, headers=headers)
+
+async def login(request):
+    body = await _json_body(request)
+    email, password = body.get('email'), body.get('password')
+    if not isinstance(email, str) or not isinstance(password, str):
+        raise BadRequest("email and password are required")
+    user, message = await async_db.login_user(email, password)
+    if user is None:
+        if message.startswith("Error"):
+            return json_error(503, message)
+        if message in ("User not found", "Incorrect password"):
+            return json_error(401, "Invalid email or password")
+        return json_error(503, message, headers={'Retry-After': '1'})  # hashing queue full
+    return json_response({'token': issue_token(user), 'user': user})
+
+async def list_items(request):
+    limit = _int_param(request, 'limit', PAGE_SIZE, 1, SEARCH_LIMIT)
+    query = request.query
+    if any(query.get(name) for name in ('q', 'min_price', 'max_price', 'seller', 'sort')):
+        sort = query.get('sort') or 'relevance'
+        if sort not in SEARCH_SORTS:
+            raise BadRequest(f"sort must be one of {', '.join(SEARCH_SORTS)}")
+        items, message = await async_db.search_items(
+            query.get('q', ''), _decimal(query.get('min_price'), 'min_price'), _decimal(query.get('max_price'), 'max_price'),
+            query.get('seller'), sort, limit
+        )
+        next_after_id = None
+    else:
+        items, message = await async_db.view_items_page(_int_param(request, 'after_id', None, 0), limit)
+        next_after_id = items[-1]['item_id'] if len(items) == limit else None
+    if message.startswith("Error"):
+        return json_error(503, message)
+    return json_response({'items': items, 'next_after_id': next_after_id})
+
+def _item_id(request):
+    try:
+        return int(request.match_info['item_id'])
+    except ValueError:
+        raise BadRequest("item_id must be an integer")
+
+async def item_detail(request):
+    item, message = await async_db.get_item_detail(_item_id(request))
+    if item is None:
+        return json_error(_status_for(message), message)
+    return json_response({'item': item})
+
+async def item_bids(request):
+    bids, message = await async_db.get_bids_for_item(_item_id(request))
+    if message.startswith("Error"):
+        return json_error(503, message)
+    return json_response({'bids': bids})
+
+async def place_bid(request):
+    claims = _claims(request)
+    if claims is None:
+        return json_error(401, "Log in first")
+    if claims['role'] != 'buyer':
+        return json_error(403, "Only buyers can place bids")
+    item_id = _item_id(request)
+    amount = _decimal((await _json_body(request)).get('amount'), 'amount')
+    if amount is None or amount <= 0:
+        raise BadRequest("amount must be a positive number")
+
+    if BID_INTAKE_CONFIG['enabled']:
+        # Wait for the group-commit writer without holding a thread
+        future = await asyncio.to_thread(get_bid_intake().submit, item_id, claims['sub'], amount)
+        success, message = await asyncio.wrap_future(future)
+    else:
+        success, message = await async_db.place_bid(item_id, claims['sub'], amount)
+    if not success:
+        return _write_error(message, claims['sub'], item_id)
+    return json_response({'item_id': item_id, 'amount': amount, 'message': message}, status=201)
+
+async def set_proxy(request):
+    claims = _claims(request)
+    if claims is None:
+        return json_error(401, "Log in first")
+    if claims['role'] != 'buyer':
+        return json_error(403, "Only buyers can place bids")
+    item_id = _item_id(request)
+    max_amount = _decimal((await _json_body(request)).get('max_amount'), 'max_amount')
+    if max_amount is None or max_amount <= 0:
+        raise BadRequest("max_amount must be a positive number")
+
+    # Proxy resolution holds the item's row lock; run it on a worker thread
+    success, message = await asyncio.to_thread(set_proxy_bid, item_id, claims['sub'], max_amount)
+    if not success:
+        return _write_error(message, claims['sub'], item_id)
+    return json_response({'item_id': item_id, 'max_amount': max_amount, 'message': message})
+
+async def my_bids(request):
+    claims = _claims(request)
+    if claims is None:
+        return json_error(401, "Log in first")
+    limit = _int_param(request, 'limit', PAGE_SIZE, 1, SEARCH_LIMIT)
+    after_time = request.query.get('after_time')
+    after_id = _int_param(request, 'after_id')
+    if after_time is not None:
+        try:
+            after_time = datetime.fromisoformat(after_time)
+        except ValueError:
+            raise BadRequest("after_time must be an ISO 8601 time")
+        if after_id is None:
+            raise BadRequest("after_id is required with after_time")
+    bids, message = await async_db.get_bids_by_user_page(claims['sub'], after_time, after_id, limit)
+    if message.startswith("Error"):
+        return json_error(503, message)
+    cursor = None
+    if len(bids) == limit:
+        cursor = {'after_time': bids[-1]['bid_time'], 'after_id': bids[-1]['bid_id']}
+    return json_response({'bids': bids, 'next': cursor})
+
+def make_app(config=API_CONFIG):
+    """
+    Build the API application with admission control and request timeouts
+    """
+    admission = AdmissionControl(config['max_concurrency'], config['max_queue'], config['request_timeout'])
+
+    @web.middleware
+    async def handle_errors(request, handler):
+        try:
+            return await handler(request)
+        except BadRequest as e:
+            return json_error(400, str(e))
+
+    @web.middleware
+    async def admit(request, handler):
+        if request.path == '/api/health':
+            return await handler(request)
+        return await admission.handle(request, handler)
+
+    async def health(request):
+        backend = await async_db.get_async_backend()
+        return json_response({'status': 'ok', 'pool': backend.stats(), 'admission': admission.stats(),
+                              'writes': write_admission.stats()})
+
+    async def on_cleanup(app):
+        await async_db.close_async_backend()
+
+    app = web.Application(middlewares=[admit, handle_errors])
+    app['admission'] = admission
+    app.add_routes([
+        web.post('/api/login', login),
+        web.get('/api/items', list_items),
+        web.get('/api/items/{item_id}', item_detail),
+        web.get('/api/items/{item_id}/bids', item_bids),
+        web.post('/api/items/{item_id}/bids', place_bid),
+        web.put('/api/items/{item_id}/proxy', set_proxy),
+        web.get('/api/me/bids', my_bids),
+        web.get('/api/health', health)
+    ])
+    app.on_cleanup.append(on_cleanup)
+    metrics.add_collector('api', admission.stats)
+    return app
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python api.py", description="Serve the auction JSON API")
+    parser.add_argument('--host', default=API_CONFIG['host'])
+    parser.add_argument('--port', type=int, default=API_CONFIG['port'])
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    if not os.getenv('API_SECRET'):
+        log.warning("API_SECRET is not set; login tokens will not survive a restart")
+    web.run_app(make_app(), host=args.host, port=args.port)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
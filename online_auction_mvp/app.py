@@ -1,10 +1,19 @@
 import streamlit as st
 import pandas as pd
+import tempfile
+from datetime import datetime, timedelta
 from db_config import (
-    register_user, login_user, add_item, view_items, get_item_by_id, 
-    place_bid, get_bids_for_item, get_bids_by_user, get_items_by_seller,
-    get_item_bids_by_seller, highest_bids, get_user_by_id
+    register_user, login_user, add_item, place_bid, get_items_by_seller_page, highest_bids, get_high_bids,
+    resync_high_bid_cache, view_items_page, get_bids_by_user_page,
+    get_item_bids_by_seller_page, PAGE_SIZE, EXPORT_DOWNLOAD_MAX_BYTES, export_bids_by_user_csv, export_item_bids_by_seller_csv,
+    bulk_add_items, BULK_INSERT_BATCH_SIZE, lookup_items, get_item_detail, get_seller_summary,
+    session_scope, search_items, SEARCH_LIMIT, auction_closed_reason, get_auction_results, get_won_auctions,
+    get_bids_since, bid_feed_cursor, BID_FEED_CONFIG, ITEM_DETAIL_RECENT_BIDS, set_proxy_bid, get_proxy_bids_by_user, AUCTION_CONFIG
 )
+from analytics import ANALYTICS_CONFIG, get_seller_insights
+from auction_scheduler import start_auction_scheduler
+from bid_intake import BID_INTAKE_CONFIG, place_bid_queued
+from db_metrics import page_timer, start_metrics_server
 
 
 if 'user' not in st.session_state:
@@ -13,6 +22,8 @@ if 'user' not in st.session_state:
 
 
 st.set_page_config(page_title="Online Auction System", page_icon="🔨", layout="wide")
+start_metrics_server()
+start_auction_scheduler()
 st.title("🔨 Online Auction Management System")
 
 def login_page():
@@ -47,6 +58,161 @@ def register_page():
             else:
                 st.error(message)
 
+def paged_rows(key, fetch_page, cursor_of):
+    """
+    Fetch the current page of a keyset-paginated listing and draw Previous/Next controls.
+    `fetch_page(cursor, limit)` returns (rows, msg); `cursor_of(row)` gives the cursor
+    that starts the page after `row`.
+    """
+    stack_key = f"{key}_cursors"
+    if stack_key not in st.session_state:
+        st.session_state[stack_key] = [None]
+    cursors = st.session_state[stack_key]
+
+    # One extra row tells us whether a next page exists
+    rows, msg = fetch_page(cursors[-1], PAGE_SIZE + 1)
+    has_next = len(rows) > PAGE_SIZE
+    rows = rows[:PAGE_SIZE]
+
+    if len(cursors) > 1 or has_next:
+        col1, col2, col3 = st.columns([1, 1, 6])
+        with col1:
+            if st.button("Previous", key=f"{key}_prev", disabled=len(cursors) == 1):
+                cursors.pop()
+                st.rerun()
+        with col2:
+            if st.button("Next", key=f"{key}_next", disabled=not has_next):
+                cursors.append(cursor_of(rows[-1]))
+                st.rerun()
+        with col3:
+            st.caption(f"Page {len(cursors)}")
+    return rows, msg
+
+def export_download(key, label, file_name, export):
+    """
+    On request, stream an export into a temporary file and offer it for download.
+    `export(compress)` returns an iterator of CSV byte chunks.
+    st.download_button keeps the file in memory while serving it, so exports
+    larger than EXPORT_DOWNLOAD_MAX_BYTES are refused instead.
+    """
+    compress = st.checkbox("Compress (gzip)", key=f"{key}_gzip")
+    if st.button("Prepare export", key=f"{key}_prepare"):
+        chunks = export(compress)
+        try:
+            with tempfile.TemporaryFile() as spool:
+                size = 0
+                for chunk in chunks:
+                    size += len(chunk)
+                    if size > EXPORT_DOWNLOAD_MAX_BYTES:
+                        limit = f"{EXPORT_DOWNLOAD_MAX_BYTES / 2 ** 20:.0f} MB"
+                        hint = "" if compress else "; try it compressed"
+                        st.error(f"This export is larger than {limit}, the most that can be downloaded here{hint}")
+                        return
+                    spool.write(chunk)
+                spool.seek(0)
+                st.download_button(
+                    label=label,
+                    data=spool,
+                    file_name=f"{file_name}.gz" if compress else file_name,
+                    mime="application/gzip" if compress else "text/csv",
+                    key=f"{key}_download"
+                )
+        except Exception as e:
+            st.error(f"Export failed: {e}")
+        finally:
+            chunks.close()  # releases the export's cursors if it stopped early
+
+def seed_bid_feed(key, bids, **feed_filter):
+    """
+    Start following bids after `bids` (newest first) unless already following
+    under `key`; `feed_filter` is the item_ids or seller_id the feed polls with
+    """
+    if key not in st.session_state:
+        cursor, msg = bid_feed_cursor(bids, **feed_filter)
+        if msg.startswith("Error"):
+            st.warning(msg)
+        st.session_state[key] = {
+            'cursor': cursor,
+            'bids': list(bids)
+        }
+
+@st.fragment(run_every=BID_FEED_CONFIG['poll_seconds'])
+def live_bids(key, fetch_since, keep, render):
+    """
+    Poll the bid change feed and draw the session's cached bids with any new
+    ones prepended; only this fragment reruns on each poll
+    """
+    # A timed rerun runs just this function, outside main()'s session scope
+    with session_scope(st.session_state):
+        feed = st.session_state[key]
+        new_bids, cursor, msg = fetch_since(feed['cursor'])
+        if cursor is None:
+            # Items moved between shards: reread the page and follow it anew
+            del st.session_state[key]
+            st.rerun()
+        feed['cursor'] = cursor
+        if msg.startswith("Error"):
+            st.warning(msg)
+        # The feed may repeat its newest rows; see get_bids_since
+        seen = {bid['bid_id'] for bid in feed['bids']}
+        fresh = [bid for bid in reversed(new_bids) if bid['bid_id'] not in seen]
+        if fresh:
+            feed['bids'] = (fresh + feed['bids'])[:keep]
+        render(feed['bids'])
+
+def render_item_bids(bids):
+    if bids:
+        df = pd.DataFrame(bids)[['buyer_name', 'bid_amount', 'bid_time']]
+        df = df.rename(columns={'buyer_name': 'Bidder', 'bid_amount': 'Bid Amount', 'bid_time': 'Time'})
+        st.caption("Latest bids")
+        st.dataframe(df)
+
+def render_seller_bids(bids):
+    df = pd.DataFrame(bids)
+    df = df.rename(columns={
+        'item_name': 'Item', 
+        'buyer_name': 'Buyer', 
+        'bid_amount': 'Bid Amount', 
+        'bid_time': 'Time'
+    })
+    st.dataframe(df)
+
+AUCTION_DURATIONS = {
+    "1 hour": timedelta(hours=1),
+    "1 day": timedelta(days=1),
+    "3 days": timedelta(days=3),
+    "7 days": timedelta(days=7),
+    "No end time": None
+}
+
+def auction_end_input(key):
+    """
+    Pick how long an auction runs; returns its end time, or None for no end
+    """
+    duration = st.selectbox("Auction duration", list(AUCTION_DURATIONS), index=3, key=key)
+    if AUCTION_DURATIONS[duration] is None:
+        return None
+    return (datetime.now() + AUCTION_DURATIONS[duration]).replace(microsecond=0)
+
+def iter_uploaded_items(uploaded_file):
+    """
+    Yield item dicts from an uploaded CSV or Excel file without loading it all at once
+    """
+    if uploaded_file.name.lower().endswith('.xlsx'):
+        from openpyxl import load_workbook
+        workbook = load_workbook(uploaded_file, read_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [str(cell).strip() if cell is not None else '' for cell in next(rows, ())]
+            for row in rows:
+                yield dict(zip(header, row))
+        finally:
+            workbook.close()
+    else:
+        for chunk in pd.read_csv(uploaded_file, chunksize=BULK_INSERT_BATCH_SIZE):
+            chunk = chunk.astype(object).where(pd.notna(chunk), None)
+            yield from chunk.to_dict('records')
+
 def logout():
     st.session_state.user = None
     st.session_state.page = 'login'
@@ -57,21 +223,27 @@ def seller_dashboard():
     st.header(f"Seller Dashboard - Welcome, {st.session_state.user['name']}")
     
    
-    seller_pages = ["Home", "Add Item", "View My Items", "My Item Bids"]
-    seller_page = st.sidebar.selectbox("Seller Menu", seller_pages)
+    seller_pages = ["Home", "Add Item", "View My Items", "My Item Bids", "Insights"]
+    seller_page = st.sidebar.selectbox("Seller Menu", seller_pages, key="seller_page")
     
     if seller_page == "Home":
         st.subheader("Seller Overview")
-        items, msg = get_items_by_seller(st.session_state.user['user_id'])
-        st.metric("Total Items Listed", len(items))
-        
-        bids, msg = get_item_bids_by_seller(st.session_state.user['user_id'])
-        st.metric("Total Bids Received", len(bids))
+        summary, msg = get_seller_summary(st.session_state.user['user_id'])
+        if summary:
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Total Items Listed", summary['items_listed'])
+            col2.metric("Total Bids Received", summary['bids_received'])
+            col3.metric("Current High Bids Total", f"${summary['gross_high_bid']:,.2f}")
+            if summary['last_bid_time'] is not None:
+                st.caption(f"Last bid received {summary['last_bid_time']}")
+        else:
+            st.error(msg)
         
+        bids, msg = get_item_bids_by_seller_page(st.session_state.user['user_id'], limit=10)
         if bids:
             df = pd.DataFrame(bids)
             st.subheader("Recent Bids")
-            st.dataframe(df[['item_name', 'buyer_name', 'bid_amount', 'bid_time']].head(10))
+            st.dataframe(df[['item_name', 'buyer_name', 'bid_amount', 'bid_time']])
     
     elif seller_page == "Add Item":
         st.subheader("Add New Item for Auction")
@@ -79,64 +251,168 @@ def seller_dashboard():
             item_name = st.text_input("Item Name")
             description = st.text_area("Description")
             base_price = st.number_input("Base Price", min_value=0.0, format="%.2f")
+            ends_at = auction_end_input("add_item_duration")
             submit_item = st.form_submit_button("Add Item")
             
             if submit_item:
                 if item_name and base_price > 0:
-                    success, message = add_item(item_name, description, base_price, st.session_state.user['user_id'])
+                    success, message = add_item(item_name, description, base_price, st.session_state.user['user_id'], ends_at)
                     if success:
                         st.success(message)
                     else:
                         st.error(message)
                 else:
                     st.error("Please fill in all required fields with valid data.")
+
+        st.subheader("Bulk Upload")
+        st.caption("Upload a CSV or Excel (.xlsx) file with columns item_name, description and base_price.")
+        uploaded_file = st.file_uploader("Items file", type=["csv", "xlsx"])
+        bulk_ends_at = auction_end_input("bulk_duration")
+        if uploaded_file is not None and st.button("Import Items"):
+            try:
+                inserted, errors, message = bulk_add_items(
+                    iter_uploaded_items(uploaded_file), st.session_state.user['user_id'], ends_at=bulk_ends_at
+                )
+            except Exception as e:
+                inserted, errors, message = 0, [], f"Could not read file: {e}"
+            if inserted:
+                st.success(message)
+            else:
+                st.error(message)
+            if errors:
+                st.dataframe(pd.DataFrame(errors, columns=["Row", "Error"]))
     
     elif seller_page == "View My Items":
         st.subheader("Items You Have Listed")
-        items, msg = get_items_by_seller(st.session_state.user['user_id'])
+        items, msg = paged_rows(
+            "my_items",
+            lambda after_id, limit: get_items_by_seller_page(st.session_state.user['user_id'], after_id, limit),
+            lambda item: item['item_id']
+        )
         
         if items:
             df = pd.DataFrame(items)
-            df = df.rename(columns={'item_id': 'ID', 'item_name': 'Item Name', 'description': 'Description', 'base_price': 'Base Price'})
+            high_bids, msg = get_high_bids([item['item_id'] for item in items])
+            df['current_high_bid'] = [
+                high_bids.get(item['item_id'], {}).get('bid_amount') for item in items
+            ]
+            df = df.rename(columns={'item_id': 'ID', 'item_name': 'Item Name', 'description': 'Description', 'base_price': 'Base Price', 'current_high_bid': 'Current High Bid'})
             st.dataframe(df)
         else:
             st.info("You haven't listed any items yet.")
     
     elif seller_page == "My Item Bids":
         st.subheader("Bids on Your Items")
-        bids, msg = get_item_bids_by_seller(st.session_state.user['user_id'])
+        bids, msg = paged_rows(
+            "my_item_bids",
+            lambda after, limit: get_item_bids_by_seller_page(st.session_state.user['user_id'], *(after or (None, None)), limit),
+            lambda bid: (bid['bid_time'], bid['bid_id'])
+        )
         
+        if len(st.session_state["my_item_bids_cursors"]) == 1:
+            # First page: keep it current from the change feed
+            seller_id = st.session_state.user['user_id']
+            feed_key = f"bid_feed_seller_{seller_id}"
+            seed_bid_feed(feed_key, bids, seller_id=seller_id)
+            live_bids(
+                feed_key,
+                lambda cursor: get_bids_since(cursor, seller_id=seller_id),
+                PAGE_SIZE,
+                lambda rows: render_seller_bids(rows) if rows else st.info("No bids have been placed on your items yet.")
+            )
+            bids = st.session_state[feed_key]['bids']
+        elif bids:
+            render_seller_bids(bids)
+
         if bids:
-            df = pd.DataFrame(bids)
-            df = df.rename(columns={
-                'item_name': 'Item', 
-                'buyer_name': 'Buyer', 
-                'bid_amount': 'Bid Amount', 
-                'bid_time': 'Time'
-            })
-            st.dataframe(df)
-            
-           
-            csv = df.to_csv(index=False)
-            st.download_button(
-                label="Download bids as CSV",
-                data=csv,
-                file_name="my_item_bids.csv",
-                mime="text/csv"
+            st.caption("Bids on auctions that closed a while ago are archived and left out of these pages; "
+                       "the CSV download includes them.")
+            export_download(
+                "my_item_bids_export",
+                "Download bids as CSV",
+                "my_item_bids.csv",
+                lambda compress: export_item_bids_by_seller_csv(st.session_state.user['user_id'], compress)
             )
+
+    elif seller_page == "Insights":
+        st.subheader("Auction Insights")
+        days = st.selectbox("Bid activity over the last", [1, 7, 30, 90], index=1, format_func=lambda n: f"{n} day(s)")
+        refresh = st.button("Refresh now")
+        insights, msg = get_seller_insights(st.session_state.user['user_id'], days, refresh)
+        if insights is None:
+            st.error(msg)
+        elif insights['summary'] is None:
+            st.info("Insights appear once your items receive bids or your auctions close.")
         else:
-            st.info("No bids have been placed on your items yet.")
+            summary = insights['summary']
+            col1, col2, col3, col4 = st.columns(4)
+            col1.metric("Bids Received", f"{summary['bids']:,}")
+            col2.metric("Auctions Closed", f"{summary['closed']:,}")
+            col3.metric("Sell-Through", f"{summary['sell_through']:.0%}" if summary['closed'] else "-")
+            col4.metric("Revenue", f"${summary['revenue']:,.2f}")
+            col1, col2, col3, col4 = st.columns(4)
+            col1.metric("Items With Bids", f"{summary['items_with_bids']:,}")
+            col2.metric("Bidders per Auction", f"{summary['avg_bidders']:.1f}")
+            col3.metric("Most Bidders on One Item", f"{summary['peak_bidders']:,}")
+            col4.metric("Average Sale Price", f"${summary['avg_sale_price']:,.2f}" if summary['sold'] else "-")
+            if insights['refreshed_at'] is not None:
+                st.caption(f"Covers {insights['bids_processed']:,} bids across the marketplace, "
+                           f"updated {insights['refreshed_at']:%Y-%m-%d %H:%M:%S}.")
+
+            st.subheader("Bid Velocity")
+            st.caption(f"Bids on your items per {ANALYTICS_CONFIG['bucket_minutes']} minutes.")
+            if len(insights['velocity']):
+                st.bar_chart(insights['velocity'])
+            else:
+                st.info("No bids in this period.")
+
+            st.subheader("Price Curve")
+            st.caption("Average bid as a multiple of the base price, by hours since an item's first bid.")
+            if len(insights['price_curve']):
+                st.line_chart(insights['price_curve']['avg_multiple'])
+
+            items = insights['items']
+            if len(items):
+                st.subheader("Bidding by Item")
+                # Only the items in the table, from the high-bid cache
+                names, msg = get_high_bids(items.index.tolist())
+                items.insert(0, 'item_name', items.index.map({item_id: entry['item_name'] for item_id, entry in names.items()}))
+                items = items.rename(columns={
+                    'item_name': 'Item', 'bids': 'Bids', 'bidders': 'Bidders', 'first_bid': 'First Bid',
+                    'last_bid': 'Last Bid', 'high_bid': 'High Bid'
+                })
+                st.dataframe(items)
 
 def buyer_dashboard():
     st.header(f"Buyer Dashboard - Welcome, {st.session_state.user['name']}")
     
  
     buyer_pages = ["Browse Items", "Place Bid", "My Bids", "Top Bids"]
-    buyer_page = st.sidebar.selectbox("Buyer Menu", buyer_pages)
+    buyer_page = st.sidebar.selectbox("Buyer Menu", buyer_pages, key="buyer_page")
     
     if buyer_page == "Browse Items":
         st.subheader("Items Available for Auction")
-        items, msg = view_items()
+        query = st.text_input("Search items", key="browse_query", placeholder="Name or description")
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            min_price = st.number_input("Min price", min_value=0.0, value=None, format="%.2f", key="browse_min_price")
+        with col2:
+            max_price = st.number_input("Max price", min_value=0.0, value=None, format="%.2f", key="browse_max_price")
+        with col3:
+            seller = st.text_input("Seller", key="browse_seller")
+        with col4:
+            sort_labels = {'relevance': "Relevance", 'newest': "Newest", 'price_asc': "Price: low to high", 'price_desc': "Price: high to low"}
+            sort = st.selectbox("Sort by", list(sort_labels), format_func=sort_labels.get, key="browse_sort")
+
+        filtered = bool(query.strip() or seller.strip()) or min_price is not None or max_price is not None
+        if filtered or sort != 'relevance':
+            # Filtering and ranking happen in the database; only matches come back
+            items, msg = search_items(query, min_price, max_price, seller, sort, SEARCH_LIMIT)
+            if len(items) == SEARCH_LIMIT:
+                st.caption(f"Showing the first {SEARCH_LIMIT} matches; refine the search to narrow them down.")
+            items = [{key: value for key, value in item.items() if key != 'relevance'} for item in items]
+        else:
+            items, msg = paged_rows("browse_items", view_items_page, lambda item: item['item_id'])
         
         if items:
             df = pd.DataFrame(items)
@@ -148,57 +424,106 @@ def buyer_dashboard():
                 'seller_name': 'Seller'
             })
             st.dataframe(df)
+        elif msg.startswith("Error"):
+            st.error(msg)
+        elif filtered:
+            st.info("No items match your search.")
         else:
             st.info("No items available for auction at the moment.")
     
     elif buyer_page == "Place Bid":
         st.subheader("Place a Bid")
-        items, msg = view_items()
+        search = st.text_input("Search items by name", key="place_bid_search")
+        items, msg = lookup_items(search.strip())
         
         if items:
-           
-            item_options = {item['item_name']: item['item_id'] for item in items}
-            selected_item_name = st.selectbox("Select Item", options=list(item_options.keys()))
-            selected_item_id = item_options[selected_item_name]
+            # Keyed by id so items sharing a name stay distinct
+            item_names = {item['item_id']: item['item_name'] for item in items}
+            selected_item_id = st.selectbox(
+                "Select Item",
+                options=list(item_names),
+                format_func=lambda item_id: f"{item_names[item_id]} (#{item_id})"
+            )
             
             
-            item, msg = get_item_by_id(selected_item_id)
+            item, msg = get_item_detail(selected_item_id)
             
             if item:
                 st.write(f"**Item:** {item['item_name']}")
+                st.write(f"**Seller:** {item['seller_name']}")
                 st.write(f"**Description:** {item['description']}")
                 st.write(f"**Base Price:** ${item['base_price']:.2f}")
+                if item['ends_at'] is not None:
+                    st.write(f"**Ends:** {item['ends_at']:%Y-%m-%d %H:%M}")
                 
                 
-                bids, msg = get_bids_for_item(selected_item_id)
-                if bids:
-                    highest_bid = max(bids, key=lambda x: x['bid_amount'])
-                    st.write(f"**Current Highest Bid:** ${highest_bid['bid_amount']:.2f} by {highest_bid['buyer_name']}")
-                    min_bid = highest_bid['bid_amount'] + 0.01
+                if item['current_high_bid'] is not None:
+                    st.write(f"**Current Highest Bid:** ${item['current_high_bid']:.2f} by {item['high_bidder_name']} "
+                             f"({item['bid_count']} bids)")
+                    min_bid = item['current_high_bid'] + 0.01
                 else:
                     min_bid = item['base_price']
                     st.write(f"**Starting Bid:** ${min_bid:.2f}")
                 
-                with st.form("bid_form"):
-                    bid_amount = st.number_input(
-                        "Your Bid Amount", 
-                        min_value=min_bid, 
-                        format="%.2f"
-                    )
-                    submit_bid = st.form_submit_button("Place Bid")
+                feed_key = f"bid_feed_item_{selected_item_id}"
+                seed_bid_feed(feed_key, item['recent_bids'], item_ids=[selected_item_id])
+                live_bids(
+                    feed_key,
+                    lambda cursor, item_id=selected_item_id: get_bids_since(cursor, item_ids=[item_id]),
+                    ITEM_DETAIL_RECENT_BIDS,
+                    render_item_bids
+                )
+                
+                closed_reason = auction_closed_reason(item['status'], item['starts_at'], item['ends_at'], datetime.now())
+                if closed_reason:
+                    st.info(closed_reason)
+                else:
+                    with st.form("bid_form"):
+                        bid_amount = st.number_input(
+                            "Your Bid Amount", 
+                            min_value=min_bid, 
+                            format="%.2f"
+                        )
+                        submit_bid = st.form_submit_button("Place Bid")
                     
-                    if submit_bid:
-                        success, message = place_bid(selected_item_id, st.session_state.user['user_id'], bid_amount)
-                        if success:
-                            st.success(message)
-                        else:
-                            st.error(message)
+                        if submit_bid:
+                            submit = place_bid_queued if BID_INTAKE_CONFIG['enabled'] else place_bid
+                            success, message = submit(selected_item_id, st.session_state.user['user_id'], bid_amount)
+                            if success:
+                                st.success(message)
+                            else:
+                                st.error(message)
+
+                    with st.form("proxy_bid_form"):
+                        st.caption(f"Automatic bidding: we bid for you, ${AUCTION_CONFIG['bid_increment']:.2f} "
+                                   "above any other bidder, up to your maximum.")
+                        max_amount = st.number_input(
+                            "Your Maximum Bid",
+                            min_value=min_bid,
+                            format="%.2f"
+                        )
+                        submit_proxy = st.form_submit_button("Bid Automatically")
+
+                        if submit_proxy:
+                            success, message = set_proxy_bid(selected_item_id, st.session_state.user['user_id'], max_amount)
+                            if success:
+                                st.success(message)
+                            else:
+                                st.error(message)
+            else:
+                st.error(msg)
+        elif search.strip():
+            st.info("No items match your search.")
         else:
             st.info("No items available for bidding at the moment.")
     
     elif buyer_page == "My Bids":
         st.subheader("Your Bidding History")
-        bids, msg = get_bids_by_user(st.session_state.user['user_id'])
+        bids, msg = paged_rows(
+            "my_bids",
+            lambda after, limit: get_bids_by_user_page(st.session_state.user['user_id'], *(after or (None, None)), limit),
+            lambda bid: (bid['bid_time'], bid['bid_id'])
+        )
         
         if bids:
             df = pd.DataFrame(bids)
@@ -209,27 +534,53 @@ def buyer_dashboard():
             })
             st.dataframe(df)
             
-            
-            csv = df.to_csv(index=False)
-            st.download_button(
-                label="Download my bids as CSV",
-                data=csv,
-                file_name="my_bids.csv",
-                mime="text/csv"
+            st.caption("Bids on auctions that closed a while ago are archived and left out of these pages; "
+                       "the CSV download includes them.")
+            export_download(
+                "my_bids_export",
+                "Download my bids as CSV",
+                "my_bids.csv",
+                lambda compress: export_bids_by_user_csv(st.session_state.user['user_id'], compress)
             )
         else:
             st.info("You haven't placed any bids yet.")
+
+        proxies, msg = get_proxy_bids_by_user(st.session_state.user['user_id'])
+        if proxies:
+            st.subheader("Your Automatic Bids")
+            df = pd.DataFrame(proxies)[['item_name', 'max_amount', 'current_high_bid', 'leading', 'status', 'updated_at']]
+            df = df.rename(columns={
+                'item_name': 'Item',
+                'max_amount': 'Maximum',
+                'current_high_bid': 'Current Price',
+                'leading': 'Leading',
+                'status': 'Status',
+                'updated_at': 'Updated'
+            })
+            st.dataframe(df)
+
+        won, msg = get_won_auctions(st.session_state.user['user_id'])
+        if won:
+            st.subheader("Auctions You Won")
+            df = pd.DataFrame(won)[['item_name', 'final_price', 'seller_name', 'closed_at']]
+            df = df.rename(columns={'item_name': 'Item', 'final_price': 'Final Price', 'seller_name': 'Seller', 'closed_at': 'Closed'})
+            st.dataframe(df)
     
     elif buyer_page == "Top Bids":
         st.subheader("Highest Bids Across All Items")
+        st.caption("The current high bid on each item; an auction's winner is settled when it closes.")
+        if st.button("Refresh from database"):
+            success, message = resync_high_bid_cache()
+            if not success:
+                st.error(message)
         top_bids, msg = highest_bids()
         
         if top_bids:
             df = pd.DataFrame(top_bids)
             df = df.rename(columns={
                 'item_name': 'Item', 
-                'buyer_name': 'Winner', 
-                'bid_amount': 'Winning Bid', 
+                'buyer_name': 'Leading Bidder', 
+                'bid_amount': 'Highest Bid', 
                 'bid_time': 'Time'
             })
             st.dataframe(df)
@@ -246,16 +597,30 @@ def buyer_dashboard():
         else:
             st.info("No bids have been placed yet.")
 
+        results, msg = get_auction_results()
+        if results:
+            st.subheader("Recently Closed Auctions")
+            df = pd.DataFrame(results)[['item_name', 'winner_name', 'final_price', 'seller_name', 'closed_at']]
+            df = df.rename(columns={
+                'item_name': 'Item',
+                'winner_name': 'Winner',
+                'final_price': 'Final Price',
+                'seller_name': 'Seller',
+                'closed_at': 'Closed'
+            })
+            st.dataframe(df)
+
 def main():
    
     if st.session_state.user is None:
         st.sidebar.title("Navigation")
         page = st.sidebar.radio("Go to", ["Login", "Register"])
         
-        if page == "Login":
-            login_page()
-        else:
-            register_page()
+        with page_timer(page):
+            if page == "Login":
+                login_page()
+            else:
+                register_page()
     else:
         
         col1, col2 = st.columns([4, 1])
@@ -264,11 +629,14 @@ def main():
                 logout()
         
         
+        # Widget values are already updated in session state at the start of a rerun
         if st.session_state.user['role'] == 'seller':
-            seller_dashboard()
+            with page_timer(f"seller/{st.session_state.get('seller_page', 'Home')}"):
+                seller_dashboard()
         else:  
-            
-            buyer_dashboard()
+            with page_timer(f"buyer/{st.session_state.get('buyer_page', 'Browse Items')}"):
+                buyer_dashboard()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    with session_scope(st.session_state):
+        main()
\ No newline at end of file
@@ -0,0 +1,313 @@
+"""
+Async versions of the data-access functions the JSON API needs.
+
+They share SQL, caches and result shapes with db_config, so a process can
+serve the Streamlit app and the API at once, and return the same
+(result, message) tuples. Connections come from an async pool: aiomysql on
+MySQL, worker-thread-owned connections on SQLite. With several shards each
+has its own pool, and the functions route and fan out like db_config's.
+"""
+from contextlib import asynccontextmanager
+from datetime import datetime
+import asyncio
+import os
+import re
+import time
+
+from db_backends import AsyncMySQLBackend, AsyncSQLiteBackend, Error
+from db_config import (
+    DB_BACKEND, BID_COLUMNS, BID_REJECTION_QUERY, INSERT_BID_QUERY, ITEM_BIDS_QUERY, ITEM_DETAIL_QUERY, ITEM_EXISTS_QUERY,
+    ITEM_DETAIL_RECENT_BIDS, KEYSET_AFTER_BID, LOGIN_QUERY, PAGE_SIZE, SEARCH_SORT_KEYS, SEARCH_SORTS,
+    USER_BIDS_PAGE_QUERY, VIEW_ITEMS_PAGE_QUERY, _bid_committed, _bid_rejection, _by_item_id, _item_detail,
+    _item_missing, _merge_shard_rows, _newest_first, _place_bid_statement, _proxy_contested, _rehash_password,
+    _search_statement, _with_archived, current_shard, get_backend, high_bid_cache, is_sharded, on_shard,
+    place_bid_against_proxies, read_cache, refresh_shard_map, shard_db_config, shard_ids
+)
+from db_metrics import AsyncInstrumentedCursor, instrumented, metrics, record_acquire, record_error
+from password_hashing import HashingBusyError, password_hasher
+from shard_map import shard_map
+from write_admission import WriteRejected, write_admission
+
+ASYNC_DB_CONFIG = {
+    'pool_size': int(os.getenv('ASYNC_DB_POOL_SIZE', 20)),
+    'pool_timeout': float(os.getenv('ASYNC_DB_POOL_TIMEOUT', 10))  # Max seconds a task waits for a free connection
+}
+
+_async_backends = {}
+_async_backend_lock = asyncio.Lock()
+
+async def get_async_backend(shard=None):
+    """
+    Return the process-wide async backend for DB_BACKEND for a shard, by
+    default the one the current task runs on, opening its pool on first use
+    """
+    shard = current_shard() if shard is None else shard
+    backend = _async_backends.get(shard)
+    if backend is None:
+        async with _async_backend_lock:
+            backend = _async_backends.get(shard)
+            if backend is None:
+                if shard not in shard_ids():
+                    raise Error(msg=f"Shard {shard} is not configured")
+                if DB_BACKEND == 'sqlite':
+                    # The sync backend creates and migrates the database file
+                    sync_backend = await asyncio.to_thread(get_backend, shard)
+                    backend = AsyncSQLiteBackend(sync_backend, ASYNC_DB_CONFIG['pool_size'], ASYNC_DB_CONFIG['pool_timeout'])
+                else:
+                    backend = AsyncMySQLBackend(shard_db_config(shard), ASYNC_DB_CONFIG['pool_size'], ASYNC_DB_CONFIG['pool_timeout'])
+                await backend.open()
+                _async_backends[shard] = backend
+                metrics.add_collector(f"async_db_pool_shard_{shard}" if shard else 'async_db_pool', backend.stats)
+    return backend
+
+async def close_async_backend():
+    backends = list(_async_backends.values())
+    _async_backends.clear()
+    for backend in backends:
+        await backend.close()
+
+async def _refresh_shard_map(force=False):
+    # The map is reread with a blocking query, so only leave the loop when it is due
+    if force or shard_map.due():
+        await asyncio.to_thread(refresh_shard_map, force)
+
+async def _on_item_shard(item_id, call, missing):
+    """
+    db_config._on_item_shard for coroutines: await call() on the item's
+    shard, and once more on its new shard if it was just moved
+    """
+    if not is_sharded():
+        return await call()
+    await _refresh_shard_map()
+    shard = shard_map.shard_for(item_id)
+    with on_shard(shard):
+        result = await call()
+    if missing(result):
+        await _refresh_shard_map(force=True)
+        moved_to = shard_map.shard_for(item_id)
+        if moved_to != shard:
+            with on_shard(moved_to):
+                result = await call()
+    return result
+
+async def _gather(call, key=None, reverse=False, limit=None):
+    """
+    db_config._gather for coroutines: await call() on every shard at once
+    and merge the rows
+    """
+    if not is_sharded():
+        return await call()
+    await _refresh_shard_map()
+
+    async def run(shard):
+        with on_shard(shard):
+            return shard, await call()
+
+    return _merge_shard_rows(await asyncio.gather(*(run(shard) for shard in shard_ids())), key, reverse, limit)
+
+@asynccontextmanager
+async def async_db_cursor(dictionary=False, commit=False):
+    """
+    db_cursor for coroutines: borrow a connection from the async pool and
+    yield a cursor whose execute and fetch methods must be awaited.
+    Commits on a clean exit when `commit` is set; otherwise rolls back.
+    """
+    started = time.perf_counter()
+    try:
+        backend = await get_async_backend()
+        async with backend.cursor(dictionary=dictionary, commit=commit) as cursor:
+            record_acquire(time.perf_counter() - started)
+            instrumented_cursor = AsyncInstrumentedCursor(cursor, current_shard() if is_sharded() else None)
+            try:
+                yield instrumented_cursor
+            finally:
+                instrumented_cursor.finish()
+    except Error:
+        record_error()
+        raise
+
+@instrumented
+async def login_user(email, password):
+    """
+    Authenticate user login; same checks and result as db_config.login_user
+    """
+    try:
+        async with async_db_cursor(dictionary=True) as cursor:
+            await cursor.execute(LOGIN_QUERY, (email,))
+            user = await cursor.fetchone()
+
+        if not user:
+            return None, "User not found"
+        stored_hash = user.pop('password')
+        # bcrypt runs in the hasher's process pool; wait for it off the event loop
+        if not await asyncio.to_thread(password_hasher.check_password, password, stored_hash):
+            return None, "Incorrect password"
+
+        if password_hasher.needs_rehash(stored_hash):
+            await asyncio.to_thread(_rehash_password, user['user_id'], password, stored_hash)
+        return user, "Login successful"
+    except HashingBusyError as e:
+        return None, str(e)
+    except Error as e:
+        return None, f"Error during login: {e}"
+
+@instrumented
+async def view_items_page(after_id=None, limit=PAGE_SIZE):
+    """
+    View one page of open items, ordered by ID, starting after `after_id`
+    """
+    async def load():
+        async with async_db_cursor(dictionary=True) as cursor:
+            await cursor.execute(VIEW_ITEMS_PAGE_QUERY, (after_id or 0, limit))
+            return await cursor.fetchall()
+
+    try:
+        items = await read_cache.get_or_load_async(('view_items_page', after_id, limit), ('items',),
+                                                   lambda: _gather(load, key=_by_item_id, limit=limit))
+        return items, "Items retrieved successfully"
+    except Error as e:
+        return [], f"Error retrieving items: {e}"
+
+@instrumented
+async def search_items(query="", min_price=None, max_price=None, seller=None, sort='relevance', limit=PAGE_SIZE):
+    """
+    Search open items; same filters and ranking as db_config.search_items
+    """
+    if sort not in SEARCH_SORTS:
+        return [], f"Error searching items: unknown sort '{sort}'"
+    terms = tuple(re.findall(r"\w+", (query or "").lower()))
+    seller = (seller or "").strip()
+
+    async def load():
+        backend = await get_async_backend()
+        statement, params = _search_statement(backend.name, terms, min_price, max_price, seller, sort, limit)
+        async with async_db_cursor(dictionary=True) as cursor:
+            await cursor.execute(statement, params)
+            return await cursor.fetchall()
+
+    try:
+        key = ('search_items', terms, min_price, max_price, seller, sort, limit)
+        sort_key, reverse = SEARCH_SORT_KEYS[sort]
+        items = await read_cache.get_or_load_async(key, ('items',), lambda: _gather(load, key=sort_key, reverse=reverse, limit=limit))
+        return items, "Items retrieved successfully"
+    except Error as e:
+        return [], f"Error searching items: {e}"
+
+@instrumented
+async def get_item_detail(item_id, recent_bids=ITEM_DETAIL_RECENT_BIDS):
+    """
+    Get an item with its seller, current high bid and bidder, bid count
+    and its `recent_bids` latest bids, in one round trip
+    """
+    async def load():
+        async with async_db_cursor(dictionary=True) as cursor:
+            await cursor.execute(ITEM_DETAIL_QUERY, (item_id, recent_bids, item_id))
+            return _item_detail(await cursor.fetchall())
+
+    try:
+        key = ('item_detail', item_id, recent_bids)
+        item = await read_cache.get_or_load_async(key, ('items', ('item', item_id)),
+                                                  lambda: _on_item_shard(item_id, load, lambda item: item is None))
+        if item is None:
+            return None, "Item does not exist"
+        return item, "Item retrieved successfully"
+    except Error as e:
+        return None, f"Error retrieving item: {e}"
+
+@instrumented
+async def place_bid(item_id, buyer_id, bid_amount):
+    """
+    Place a bid on an item with the same conditional UPDATE as db_config.place_bid,
+    admitted the same way. Bids a proxy bid may answer are settled by the
+    proxy engine on a worker thread.
+    """
+    try:
+        async with write_admission.admit_async(buyer_id, item_id):
+            return await _place_bid(item_id, buyer_id, bid_amount)
+    except WriteRejected as e:
+        return False, str(e)
+
+async def _place_bid(item_id, buyer_id, bid_amount):
+    return await _on_item_shard(item_id, lambda: _place_bid_on_shard(item_id, buyer_id, bid_amount), _item_missing)
+
+async def _place_bid_on_shard(item_id, buyer_id, bid_amount):
+    now = datetime.now()
+    try:
+        async with async_db_cursor(commit=True) as cursor:
+            await cursor.execute(*_place_bid_statement(item_id, buyer_id, bid_amount, now))
+
+            if cursor.rowcount == 0:
+                # Rejected; read the item only to explain why
+                await cursor.execute(BID_REJECTION_QUERY, (item_id,))
+                item = await cursor.fetchone()
+                if not _proxy_contested(item, bid_amount, now):
+                    return False, _bid_rejection(item_id, item, now)
+            else:
+                item = None
+                await cursor.execute(INSERT_BID_QUERY, (item_id, buyer_id, bid_amount))
+
+                buyer_name = high_bid_cache.user_name(buyer_id)
+                if buyer_name is None:
+                    await cursor.execute("SELECT name FROM users WHERE user_id = %s", (buyer_id,))
+                    buyer_name = (await cursor.fetchone())[0]
+
+                cached = high_bid_cache.get(item_id)
+                if cached is not None:
+                    seller_id = cached['seller_id']
+                else:
+                    await cursor.execute("SELECT seller_id FROM items WHERE item_id = %s", (item_id,))
+                    seller_id = (await cursor.fetchone())[0]
+
+        if item is not None:
+            # A proxy bid may answer this one; it needs the item row lock and the engine
+            return await asyncio.to_thread(place_bid_against_proxies, item_id, buyer_id, bid_amount)
+        _bid_committed(item_id, buyer_id, buyer_name, bid_amount, seller_id)
+        return True, "Bid placed successfully"
+    except Error as e:
+        return False, f"Error placing bid: {e}"
+
+@instrumented
+async def get_bids_for_item(item_id):
+    """
+    Get all bids for a specific item, highest first, archived bids included
+    """
+    async def load():
+        async with async_db_cursor(dictionary=True) as cursor:
+            await cursor.execute(ITEM_BIDS_QUERY, (item_id,))
+            bids = await cursor.fetchall()
+            if not bids and is_sharded():
+                await cursor.execute(ITEM_EXISTS_QUERY, (item_id,))
+                if await cursor.fetchone() is None:
+                    return None  # not on this shard; see db_config.get_bids_for_item
+        # Archive files are read with blocking I/O
+        return await asyncio.to_thread(
+            _with_archived, bids, 'item_id', item_id, BID_COLUMNS + ('buyer_name',), lambda bid: bid['bid_amount']
+        )
+
+    try:
+        bids = await _on_item_shard(item_id, load, lambda bids: bids is None)
+        return bids or [], "Bids retrieved successfully"
+    except (Error, OSError) as e:
+        return [], f"Error retrieving bids: {e}"
+
+@instrumented
+async def get_bids_by_user_page(user_id, after_time=None, after_id=None, limit=PAGE_SIZE):
+    """
+    Get one page of a user's bids, newest first; pages work as in
+    db_config.get_bids_by_user_page
+    """
+    async def load():
+        async with async_db_cursor(dictionary=True) as cursor:
+            params = [user_id]
+            keyset = ""
+            if after_time is not None:
+                keyset = KEYSET_AFTER_BID
+                params += [after_time, after_time, after_id]
+            await cursor.execute(USER_BIDS_PAGE_QUERY.format(keyset=keyset), (*params, limit))
+            return await cursor.fetchall()
+
+    try:
+        bids = await _gather(load, key=_newest_first, reverse=True, limit=limit)
+        return bids, "Bids retrieved successfully"
+    except Error as e:
+        return [], f"Error retrieving bids: {e}"
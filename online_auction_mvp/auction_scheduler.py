@@ -0,0 +1,170 @@
+from datetime import datetime, timedelta
+import heapq
+import logging
+import os
+import threading
+import time
+
+from db_config import close_due_auctions, get_upcoming_closings, set_closing_listener
+from db_metrics import metrics
+
+AUCTION_SCHEDULER_CONFIG = {
+    'enabled': os.getenv('AUCTION_SCHEDULER_ENABLED', 'true').lower() in ('1', 'true', 'yes'),
+    'lookahead': float(os.getenv('AUCTION_SCHEDULER_LOOKAHEAD', 300)),  # Seconds of upcoming closings held in memory...
+    'max_tracked': int(os.getenv('AUCTION_SCHEDULER_MAX_TRACKED', 10000)),  # ...up to this many
+    'refresh_interval': float(os.getenv('AUCTION_SCHEDULER_REFRESH', 30))  # Reload them from the database at least this often
+}
+
+log = logging.getLogger('auction.scheduler')
+
+class AuctionScheduler:
+    """
+    Closes auctions when their end time arrives.
+    Upcoming closings are kept in a min-heap of (ends_at, item_id), loaded
+    from a range of idx_items_status_ends_at covering the next `lookahead`
+    seconds, so the items table is never scanned. One background thread
+    sleeps until the earliest closing, then settles everything due in batched
+    transactions. The database decides what is due: heap entries are only
+    wake-up times, so entries made stale by anti-sniping extensions or by
+    other processes cost at most a spurious wake-up.
+    """
+
+    def __init__(self, lookahead, max_tracked, refresh_interval):
+        self.lookahead = timedelta(seconds=lookahead)
+        self.max_tracked = max_tracked
+        self.refresh_interval = refresh_interval
+        self._heap = []
+        self._horizon = None  # closings after this are not loaded yet
+        self._refreshed = float('-inf')
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        self.runs = 0
+        self.closed = 0
+        self.errors = 0
+
+    def start(self):
+        with self._cond:
+            if self._thread is None:
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name="auction-scheduler", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout=None):
+        with self._cond:
+            thread, self._thread = self._thread, None
+            self._stopping = True
+            self._cond.notify()
+        if thread is not None:
+            thread.join(timeout)
+
+    def schedule(self, item_id, ends_at):
+        """
+        Track a closing made in this process (item_id is None for a bulk import)
+        """
+        with self._cond:
+            if self._horizon is not None and ends_at <= self._horizon:
+                heapq.heappush(self._heap, (ends_at, item_id or 0))
+                if self._heap[0][0] == ends_at:
+                    self._cond.notify()
+
+    def run_once(self, now=None):
+        """
+        Settle every auction that is due, then reload upcoming closings.
+        Returns the settlements made.
+        """
+        now = now or datetime.now()
+        with self._cond:
+            while self._heap and self._heap[0][0] <= now:
+                heapq.heappop(self._heap)
+
+        # Also catches closings past the loaded horizon or missed while stopped
+        settled, msg = close_due_auctions(now)
+        if msg.startswith("Error"):
+            self.errors += 1
+            log.warning(msg)
+        self.runs += 1
+        self.closed += len(settled)
+        self._refresh(now)
+        return settled
+
+    def _refresh(self, now):
+        horizon = now + self.lookahead
+        closings, msg = get_upcoming_closings(horizon, self.max_tracked)
+        if msg.startswith("Error"):
+            self.errors += 1
+            log.warning(msg)
+            return
+        if len(closings) == self.max_tracked:
+            # Later closings are loaded once these are done
+            horizon = closings[-1][1]
+        with self._cond:
+            # Due closings were just attempted; any still open failed and wait
+            # for the next refresh. Entries scheduled while the query ran are
+            # kept; the set stops each refresh adding another copy of the rest.
+            heap = {(ends_at, item_id) for item_id, ends_at in closings if ends_at > now}
+            heap.update(entry for entry in self._heap if entry[0] > now)
+            heap = list(heap)
+            heapq.heapify(heap)
+            self._heap = heap
+            self._horizon = horizon
+            self._refreshed = time.monotonic()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopping:
+                    timeout = self.refresh_interval - (time.monotonic() - self._refreshed)
+                    if self._heap:
+                        timeout = min(timeout, (self._heap[0][0] - datetime.now()).total_seconds())
+                    if timeout <= 0:
+                        break
+                    self._cond.wait(timeout)
+                if self._stopping:
+                    return
+            try:
+                self.run_once()
+            except Exception:
+                self.errors += 1
+                log.exception("Auction scheduler run failed")
+                # Do not spin on a persistent failure
+                self._refreshed = time.monotonic()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'tracked': len(self._heap),
+                'runs': self.runs,
+                'closed': self.closed,
+                'errors': self.errors
+            }
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_auction_scheduler():
+    """
+    Return the process-wide auction scheduler, creating it on first use
+    """
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = AuctionScheduler(
+                    AUCTION_SCHEDULER_CONFIG['lookahead'],
+                    AUCTION_SCHEDULER_CONFIG['max_tracked'],
+                    AUCTION_SCHEDULER_CONFIG['refresh_interval']
+                )
+                set_closing_listener(_scheduler.schedule)
+                metrics.add_collector('auction_scheduler', _scheduler.stats)
+    return _scheduler
+
+def start_auction_scheduler():
+    """
+    Start closing auctions in the background unless disabled; safe to call on every rerun
+    """
+    if not AUCTION_SCHEDULER_CONFIG['enabled']:
+        return None
+    scheduler = get_auction_scheduler()
+    scheduler.start()
+    return scheduler
@@ -0,0 +1,9 @@
+"""
+Load generator and benchmarks for the db_config functions.
+
+    python -m benchmarks seed --bids 100000
+    python -m benchmarks run --buyers 16 --duration 30 --json results.json
+
+Run from the online_auction_mvp directory. With DB_BACKEND=sqlite
+everything runs against a local file with no external services.
+"""
@@ -0,0 +1,135 @@
+import argparse
+import json
+import os
+import sys
+
+from benchmarks.driver import MIXES
+
+def mix_arg(value):
+    """
+    A named mix from benchmarks.driver.MIXES, or operation weights as JSON
+    """
+    return MIXES[value] if value in MIXES else json.loads(value)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Auction load generator and benchmarks")
+    parser.add_argument('--sqlite', metavar='PATH', help="run against an embedded SQLite file (sets DB_BACKEND=sqlite)")
+    parser.add_argument('--no-read-cache', action='store_true', help="disable the read cache (READ_CACHE_TTL=0)")
+    parser.add_argument('--no-write-limits', action='store_true',
+                        help="disable per-user and per-item write rate limits (WRITE_USER_RATE=WRITE_ITEM_RATE=0)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    seed = commands.add_parser('seed', help="bulk-generate users, items and bids")
+    seed.add_argument('--buyers', type=int, default=1000)
+    seed.add_argument('--sellers', type=int, default=100)
+    seed.add_argument('--items', type=int, default=10000)
+    seed.add_argument('--bids', type=int, default=100000, help="10^3 to 10^7")
+    seed.add_argument('--skew', type=float, default=1.1, help="Zipf exponent for item popularity")
+    seed.add_argument('--batch-size', type=int, default=5000)
+    seed.add_argument('--days', type=int, default=30, help="spread bid times over this many past days")
+    seed.add_argument('--seed', type=int, default=42)
+    seed.add_argument('--reset', action='store_true', help="DELETE all users, items and bids first")
+
+    run = commands.add_parser('run', help="simulate concurrent buyers and report latencies")
+    run.add_argument('--buyers', type=int, default=8, help="concurrent simulated buyers")
+    run.add_argument('--processes', type=int, default=1, help="spread buyers over this many processes")
+    run.add_argument('--duration', type=float, default=30, help="seconds")
+    run.add_argument('--skew', type=float, default=1.1)
+    run.add_argument('--mix', type=mix_arg,
+                     help='"default", "api" or operation weights as JSON, e.g. \'{"place_bid": 50, "highest_bids": 50}\'')
+    run.add_argument('--bid-path', choices=['direct', 'intake'], default='direct',
+                     help="place_bid directly or through the group-commit intake queue")
+    run.add_argument('--max-items', type=int, help="only bid on the first N items")
+    run.add_argument('--json', metavar='PATH', help="write the report as JSON")
+    run.add_argument('--compare', metavar='PATH', help="baseline JSON report to compare against")
+
+    run_async = commands.add_parser('run-async', help="simulate concurrent buyers as asyncio tasks in one process")
+    run_async.add_argument('--clients', type=int, default=200, help="concurrent simulated buyers")
+    run_async.add_argument('--duration', type=float, default=30, help="seconds")
+    run_async.add_argument('--skew', type=float, default=1.1)
+    run_async.add_argument('--mix', type=mix_arg, help='"api" (default) or operation weights as JSON')
+    run_async.add_argument('--target', choices=['db', 'http'], default='db',
+                           help="call async_db in-process, or the JSON API at --url")
+    run_async.add_argument('--url', default='http://127.0.0.1:8080')
+    run_async.add_argument('--max-items', type=int, help="only bid on the first N items")
+    run_async.add_argument('--json', metavar='PATH', help="write the report as JSON")
+    run_async.add_argument('--compare', metavar='PATH', help="baseline JSON report to compare against")
+
+    compare = commands.add_parser('compare', help="compare two JSON reports")
+    compare.add_argument('baseline')
+    compare.add_argument('current')
+
+    args = parser.parse_args(argv)
+
+    # db_config reads its settings at import time, so set them first
+    if args.sqlite:
+        os.environ['DB_BACKEND'] = 'sqlite'
+        os.environ['SQLITE_PATH'] = args.sqlite
+    if args.no_read_cache:
+        os.environ['READ_CACHE_TTL'] = '0'
+    if args.no_write_limits:
+        os.environ['WRITE_USER_RATE'] = '0'
+        os.environ['WRITE_ITEM_RATE'] = '0'
+
+    from benchmarks import report as reporting
+
+    if args.command == 'seed':
+        from benchmarks.seed import reset_database, seed as run_seed
+        if args.reset:
+            reset_database()
+        summary = run_seed(
+            buyers=args.buyers, sellers=args.sellers, items=args.items, bids=args.bids, skew=args.skew,
+            batch_size=args.batch_size, days=args.days, rng_seed=args.seed
+        )
+        print(json.dumps(summary, indent=2))
+
+    elif args.command == 'run':
+        from benchmarks.driver import run as run_load
+        samples, errors, wall = run_load(
+            buyers=args.buyers, processes=args.processes, duration=args.duration, mix=args.mix,
+            skew=args.skew, bid_path=args.bid_path, max_items=args.max_items
+        )
+        config = {
+            'backend': os.getenv('DB_BACKEND', 'mysql'),
+            'buyers': args.buyers,
+            'processes': args.processes,
+            'skew': args.skew,
+            'bid_path': args.bid_path,
+            'read_cache': not args.no_read_cache,
+            'mix': args.mix,
+            'wall_s': round(wall, 2)
+        }
+        result = reporting.summarize(samples, errors, args.duration, config)
+        baseline = reporting.read_json(args.compare) if args.compare else None
+        print(reporting.format_report(result, baseline))
+        if args.json:
+            reporting.write_json(result, args.json)
+
+    elif args.command == 'run-async':
+        from benchmarks.async_driver import run as run_async_load
+        samples, errors, wall = run_async_load(
+            clients=args.clients, duration=args.duration, mix=args.mix, skew=args.skew,
+            target=args.target, url=args.url, max_items=args.max_items
+        )
+        config = {
+            'backend': os.getenv('DB_BACKEND', 'mysql'),
+            'clients': args.clients,
+            'target': args.target,
+            'skew': args.skew,
+            'read_cache': not args.no_read_cache,
+            'mix': args.mix,
+            'wall_s': round(wall, 2)
+        }
+        result = reporting.summarize(samples, errors, args.duration, config)
+        baseline = reporting.read_json(args.compare) if args.compare else None
+        print(reporting.format_report(result, baseline))
+        if args.json:
+            reporting.write_json(result, args.json)
+
+    elif args.command == 'compare':
+        print(reporting.format_report(reporting.read_json(args.current), reporting.read_json(args.baseline)))
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,194 @@
+"""
+Asyncio driver: simulated buyers as tasks on one event loop, calling the
+async data-access layer in-process or the JSON API over HTTP.
+"""
+import asyncio
+import random
+import time
+
+from benchmarks.driver import API_MIX, load_population
+from benchmarks.seed import pick_ranks, zipf_cum_weights
+
+LOGIN_CONCURRENCY = 8  # simultaneous logins while setting up HTTP clients
+
+class DirectClient:
+    """
+    One buyer calling async_db in this process
+    """
+
+    def __init__(self, buyer_id):
+        self.buyer_id = buyer_id
+        self.after_id = None
+
+    async def login(self):
+        pass
+
+    async def floor(self, item_id):
+        import db_config
+
+        entry, _ = db_config.get_high_bid(item_id)  # in-memory once the cache is loaded
+        return float(entry['bid_amount'] or entry['base_price']) if entry else 1
+
+    async def place_bid(self, item_id, amount):
+        import async_db
+
+        ok, message = await async_db.place_bid(item_id, self.buyer_id, amount)
+        if not ok and message.startswith("Error"):
+            raise RuntimeError(message)
+
+    async def get_item_detail(self, item_id):
+        import async_db
+
+        await async_db.get_item_detail(item_id)
+
+    async def view_items_page(self):
+        import async_db
+
+        rows, _ = await async_db.view_items_page(self.after_id)
+        self.after_id = rows[-1]['item_id'] if rows else None
+
+    async def get_bids_by_user_page(self):
+        import async_db
+
+        await async_db.get_bids_by_user_page(self.buyer_id)
+
+class HttpClient:
+    """
+    One buyer calling the JSON API at `base_url`
+    """
+
+    def __init__(self, session, base_url, email):
+        self.session = session
+        self.base_url = base_url.rstrip('/')
+        self.email = email
+        self.headers = {}
+        self.after_id = None
+
+    async def _request(self, method, path, **kwargs):
+        async with self.session.request(method, self.base_url + path, headers=self.headers, **kwargs) as response:
+            body = await response.json(content_type=None)
+            if response.status >= 500:
+                raise RuntimeError(f"{response.status}: {body.get('error')}")
+            return response.status, body
+
+    async def login(self, attempts=10):
+        # Untimed setup; bcrypt makes logins slow, so ride out 503s from a busy hasher
+        for attempt in range(attempts):
+            try:
+                status, body = await self._request('POST', '/api/login', json={'email': self.email, 'password': 'password'})
+                break
+            except RuntimeError:
+                if attempt == attempts - 1:
+                    raise
+                await asyncio.sleep(1)
+        if status != 200:
+            raise RuntimeError(f"Login failed for {self.email}: {body.get('error')}")
+        self.headers = {'Authorization': f"Bearer {body['token']}"}
+
+    async def floor(self, item_id):
+        _, body = await self._request('GET', f'/api/items/{item_id}')
+        item = body.get('item')
+        return float(item['current_high_bid'] or item['base_price']) if item else 1
+
+    async def place_bid(self, item_id, amount):
+        await self._request('POST', f'/api/items/{item_id}/bids', json={'amount': amount})
+
+    async def get_item_detail(self, item_id):
+        await self._request('GET', f'/api/items/{item_id}')
+
+    async def view_items_page(self):
+        params = {'after_id': self.after_id} if self.after_id else {}
+        _, body = await self._request('GET', '/api/items', params=params)
+        self.after_id = body.get('next_after_id')
+
+    async def get_bids_by_user_page(self):
+        await self._request('GET', '/api/me/bids')
+
+async def _client_loop(worker_id, client, item_ids, mix, skew, deadline, samples, errors):
+    rng = random.Random(worker_id)
+    hot_items = list(item_ids)
+    random.Random(0).shuffle(hot_items)  # same hot set as the sync driver
+    cum_weights = zipf_cum_weights(len(hot_items), skew)
+    operations = list(mix)
+    weights = [mix[name] for name in operations]
+
+    while time.monotonic() < deadline:
+        operation = rng.choices(operations, weights)[0]
+        item_id = hot_items[pick_ranks(rng, cum_weights, 1)[0]]
+        started = time.perf_counter()
+        try:
+            if operation == 'place_bid':
+                floor = await client.floor(item_id)
+                started = time.perf_counter()  # time the write only
+                await client.place_bid(item_id, round(floor + rng.choice((0.5, 1, 2, 5)), 2))
+            elif operation == 'get_item_detail':
+                await client.get_item_detail(item_id)
+            elif operation == 'view_items_page':
+                await client.view_items_page()
+            elif operation == 'get_bids_by_user_page':
+                await client.get_bids_by_user_page()
+            else:
+                raise ValueError(f"{operation} is not supported by the async driver")
+        except Exception as e:
+            errors.append((operation, str(e)))
+            continue
+        samples.append((operation, time.perf_counter() - started))
+
+async def _run(clients, duration, mix, skew, target, url, max_items):
+    buyer_ids, item_ids = await asyncio.to_thread(load_population, max_items)
+    rng = random.Random(0)
+    buyers = [rng.choice(buyer_ids) for _ in range(clients)]
+    samples = []
+    errors = []
+
+    session = None
+    if target == 'http':
+        import aiohttp
+        from db_config import db_cursor
+
+        def emails():
+            with db_cursor() as cursor:
+                placeholders = ", ".join(["%s"] * len(set(buyers)))
+                cursor.execute(f"SELECT user_id, email FROM users WHERE user_id IN ({placeholders})", sorted(set(buyers)))
+                return dict(cursor.fetchall())
+
+        email_of = await asyncio.to_thread(emails)
+        session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=clients))
+        simulated = [HttpClient(session, url, email_of[buyer_id]) for buyer_id in buyers]
+    else:
+        import db_config
+
+        db_config.get_high_bid(item_ids[0])  # load the high-bid cache before timing
+        simulated = [DirectClient(buyer_id) for buyer_id in buyers]
+
+    try:
+        logins = asyncio.Semaphore(LOGIN_CONCURRENCY)
+
+        async def login(client):
+            async with logins:
+                await client.login()
+
+        await asyncio.gather(*(login(client) for client in simulated))
+        started = time.perf_counter()
+        deadline = time.monotonic() + duration
+        await asyncio.gather(*(
+            _client_loop(n, client, item_ids, mix, skew, deadline, samples, errors)
+            for n, client in enumerate(simulated)
+        ))
+        wall = time.perf_counter() - started
+    finally:
+        if session is not None:
+            await session.close()
+        if target != 'http':
+            import async_db
+
+            await async_db.close_async_backend()
+    return samples, errors, wall
+
+def run(clients=200, duration=30, mix=None, skew=1.1, target='db', url='http://127.0.0.1:8080', max_items=None):
+    """
+    Simulate `clients` concurrent buyers as asyncio tasks in this process for
+    `duration` seconds, against async_db ('db') or the JSON API ('http').
+    Returns (samples, errors, wall_seconds) like driver.run.
+    """
+    return asyncio.run(_run(clients, duration, mix or API_MIX, skew, target, url, max_items))
@@ -0,0 +1,135 @@
+"""
+Multi-threaded / multi-process driver simulating buyers bidding and browsing.
+"""
+import multiprocessing
+import random
+import threading
+import time
+
+from benchmarks.seed import pick_ranks, zipf_cum_weights
+
+# Relative frequency of each simulated buyer action
+DEFAULT_MIX = {
+    'place_bid': 30,
+    'get_high_bid': 25,
+    'view_items_page': 20,
+    'highest_bids': 10,
+    'get_bids_by_user_page': 15
+}
+
+# Operations the JSON API also serves, for comparing the sync and async paths
+API_MIX = {
+    'place_bid': 30,
+    'get_item_detail': 25,
+    'view_items_page': 25,
+    'get_bids_by_user_page': 20
+}
+
+MIXES = {'default': DEFAULT_MIX, 'api': API_MIX}
+
+def load_population(max_items=None):
+    """
+    Buyer ids and item ids to drive load against
+    """
+    from db_config import db_cursor
+
+    with db_cursor() as cursor:
+        cursor.execute("SELECT user_id FROM users WHERE role = 'buyer' ORDER BY user_id")
+        buyer_ids = [row[0] for row in cursor.fetchall()]
+        query = "SELECT item_id FROM items ORDER BY item_id"
+        if max_items:
+            query += f" LIMIT {int(max_items)}"
+        cursor.execute(query)
+        item_ids = [row[0] for row in cursor.fetchall()]
+    if not buyer_ids or not item_ids:
+        raise SystemExit("No buyers or items found; run `python -m benchmarks seed` first")
+    return buyer_ids, item_ids
+
+def _buyer_loop(worker_id, buyer_ids, item_ids, mix, skew, duration, bid_path, samples, errors):
+    import db_config
+    from bid_intake import place_bid_queued
+
+    rng = random.Random(worker_id)
+    hot_items = list(item_ids)
+    random.Random(0).shuffle(hot_items)  # same hot set in every worker
+    cum_weights = zipf_cum_weights(len(hot_items), skew)
+    operations = list(mix)
+    weights = [mix[name] for name in operations]
+    submit_bid = place_bid_queued if bid_path == 'intake' else db_config.place_bid
+    buyer_id = rng.choice(buyer_ids)
+    cursors = {}  # keyset cursors so browsing walks forward through pages
+
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        operation = rng.choices(operations, weights)[0]
+        item_id = hot_items[pick_ranks(rng, cum_weights, 1)[0]]
+        started = time.perf_counter()
+        try:
+            if operation == 'place_bid':
+                entry, _ = db_config.get_high_bid(item_id)
+                floor = (entry['bid_amount'] or entry['base_price']) if entry else 1
+                started = time.perf_counter()  # time the write only
+                ok, message = submit_bid(item_id, buyer_id, round(floor + rng.choice((0.5, 1, 2, 5)), 2))
+                if not ok and message.startswith("Error"):
+                    raise RuntimeError(message)
+            elif operation == 'get_high_bid':
+                db_config.get_high_bid(item_id)
+            elif operation == 'get_item_detail':
+                db_config.get_item_detail(item_id)
+            elif operation == 'view_items_page':
+                rows, message = db_config.view_items_page(cursors.get('items'))
+                cursors['items'] = rows[-1]['item_id'] if rows else None
+            elif operation == 'highest_bids':
+                db_config.highest_bids()
+            elif operation == 'get_bids_by_user_page':
+                db_config.get_bids_by_user_page(buyer_id)
+        except Exception as e:
+            errors.append((operation, str(e)))
+            continue
+        samples.append((operation, time.perf_counter() - started))
+
+def _run_threads(worker_offset, threads, buyer_ids, item_ids, mix, skew, duration, bid_path):
+    samples = []
+    errors = []
+    workers = [
+        threading.Thread(
+            target=_buyer_loop,
+            args=(worker_offset + n, buyer_ids, item_ids, mix, skew, duration, bid_path, samples, errors)
+        )
+        for n in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return samples, errors
+
+def _process_entry(args):
+    return _run_threads(*args)
+
+def run(buyers=8, processes=1, duration=30, mix=None, skew=1.1, bid_path='direct', max_items=None):
+    """
+    Simulate `buyers` concurrent buyers for `duration` seconds, split across
+    `processes` OS processes (threads within each).
+    Returns (samples, errors, wall_seconds), where samples are
+    (operation, latency_seconds) pairs.
+    """
+    mix = mix or DEFAULT_MIX
+    buyer_ids, item_ids = load_population(max_items)
+    processes = max(1, min(processes, buyers))
+    per_process = [buyers // processes + (1 if n < buyers % processes else 0) for n in range(processes)]
+
+    started = time.perf_counter()
+    if processes == 1:
+        samples, errors = _run_threads(0, buyers, buyer_ids, item_ids, mix, skew, duration, bid_path)
+    else:
+        jobs = []
+        offset = 0
+        for threads in per_process:
+            jobs.append((offset, threads, buyer_ids, item_ids, mix, skew, duration, bid_path))
+            offset += threads
+        with multiprocessing.get_context('spawn').Pool(processes) as pool:
+            results = pool.map(_process_entry, jobs)
+        samples = [sample for result in results for sample in result[0]]
+        errors = [error for result in results for error in result[1]]
+    return samples, errors, time.perf_counter() - started
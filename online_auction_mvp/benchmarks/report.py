@@ -0,0 +1,94 @@
+"""
+Throughput and latency percentiles per operation, as text or JSON.
+"""
+import json
+import platform
+from collections import defaultdict
+from datetime import datetime
+
+def percentile(sorted_values, fraction):
+    """
+    Nearest-rank percentile of an already sorted list
+    """
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+def summarize(samples, errors, duration, config=None):
+    """
+    Build the report dict from (operation, latency_seconds) samples
+    """
+    latencies = defaultdict(list)
+    for operation, latency in samples:
+        latencies[operation].append(latency)
+    error_counts = defaultdict(int)
+    for operation, _ in errors:
+        error_counts[operation] += 1
+
+    operations = {}
+    for operation in sorted(set(latencies) | set(error_counts)):
+        values = sorted(latencies[operation])
+        operations[operation] = {
+            'count': len(values),
+            'errors': error_counts[operation],
+            'throughput_per_s': len(values) / duration if duration else 0.0,
+            'mean_ms': sum(values) / len(values) * 1000 if values else None,
+            'p50_ms': _ms(percentile(values, 0.50)),
+            'p95_ms': _ms(percentile(values, 0.95)),
+            'p99_ms': _ms(percentile(values, 0.99)),
+            'max_ms': _ms(values[-1] if values else None)
+        }
+
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'config': config or {},
+        'duration_s': duration,
+        'total_ops': len(samples),
+        'total_errors': len(errors),
+        'throughput_per_s': len(samples) / duration if duration else 0.0,
+        'operations': operations,
+        'sample_errors': sorted({message for _, message in errors})[:10]
+    }
+
+def _ms(seconds):
+    return None if seconds is None else seconds * 1000
+
+def format_report(report, baseline=None):
+    """
+    Render a report as a text table, with % change against a baseline report if given
+    """
+    header = f"{'operation':<24}{'count':>9}{'ops/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}"
+    lines = [header, '-' * len(header)]
+    for operation, stats in report['operations'].items():
+        line = (
+            f"{operation:<24}{stats['count']:>9}{stats['throughput_per_s']:>10.1f}"
+            f"{_fmt(stats['p50_ms'])}{_fmt(stats['p95_ms'])}{_fmt(stats['p99_ms'])}{stats['errors']:>8}"
+        )
+        if baseline and operation in baseline.get('operations', {}):
+            before = baseline['operations'][operation]
+            line += f"   p95 {_change(before['p95_ms'], stats['p95_ms'])}, ops/s {_change(before['throughput_per_s'], stats['throughput_per_s'])}"
+        lines.append(line)
+    lines.append('-' * len(header))
+    lines.append(f"total {report['total_ops']} ops in {report['duration_s']:.1f}s "
+                 f"({report['throughput_per_s']:.1f} ops/s), {report['total_errors']} errors")
+    for message in report['sample_errors']:
+        lines.append(f"  error: {message}")
+    return "\n".join(lines)
+
+def _fmt(value):
+    return f"{value:>10.2f}" if value is not None else f"{'-':>10}"
+
+def _change(before, after):
+    if not before or after is None:
+        return "n/a"
+    return f"{(after - before) / before * 100:+.1f}%"
+
+def write_json(report, path):
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+def read_json(path):
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,158 @@
+"""
+Bulk generator for realistic users, items and skewed bid histories.
+"""
+import bisect
+import itertools
+import random
+import time
+from datetime import datetime, timedelta
+
+SEED_EMAIL_DOMAIN = 'bench.example.com'
+
+def zipf_cum_weights(n, skew):
+    """
+    Cumulative Zipf weights over ranks 1..n; higher skew concentrates bids on fewer items
+    """
+    return list(itertools.accumulate(1.0 / rank ** skew for rank in range(1, n + 1)))
+
+def pick_ranks(rng, cum_weights, k):
+    """
+    Draw k 0-based ranks from cumulative weights
+    """
+    total = cum_weights[-1]
+    return [bisect.bisect_left(cum_weights, rng.random() * total) for _ in range(k)]
+
+def _insert_batches(rows, query, batch_size, label, log):
+    from db_config import db_cursor
+
+    inserted = 0
+    started = time.perf_counter()
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            with db_cursor(commit=True) as cursor:
+                cursor.executemany(query, batch)
+            inserted += len(batch)
+            batch = []
+            if log and inserted % (batch_size * 20) == 0:
+                log(f"  {label}: {inserted:,} rows ({inserted / (time.perf_counter() - started):,.0f}/s)")
+    if batch:
+        with db_cursor(commit=True) as cursor:
+            cursor.executemany(query, batch)
+        inserted += len(batch)
+    return inserted
+
+def reset_database():
+    """
+    Delete every bid, item and user. Only for throwaway benchmark databases.
+    """
+    from db_config import db_cursor, high_bid_cache, read_cache
+
+    with db_cursor(commit=True) as cursor:
+        cursor.execute("DELETE FROM seller_stats")
+        cursor.execute("DELETE FROM bid_archive_index")
+        cursor.execute("DELETE FROM bid_archives")
+        cursor.execute("DELETE FROM settlements")
+        cursor.execute("DELETE FROM proxy_bids")
+        cursor.execute("DELETE FROM bids")
+        cursor.execute("DELETE FROM items")
+        cursor.execute("DELETE FROM users")
+    high_bid_cache.invalidate()
+    read_cache.clear()
+
+def seed(buyers=1000, sellers=100, items=10000, bids=100000, skew=1.1,
+         batch_size=5000, days=30, rng_seed=42, log=print):
+    """
+    Generate users, items and bids and bulk-insert them.
+    Item popularity follows a Zipf distribution so a few hot items take most
+    of the bids; each item's bids rise strictly over time, as place_bid would
+    have accepted them, and items.current_high_bid is set to match.
+    Returns a summary dict.
+    """
+    from db_config import db_cursor, resync_high_bid_cache
+    from password_hashing import _hash
+
+    rng = random.Random(rng_seed)
+    started = time.perf_counter()
+    # All seeded users share one cheap hash; the password is 'password'
+    password_hash = _hash('password', 4)
+    run_tag = f"{int(time.time())}{rng.randrange(1000):03d}"
+
+    user_query = "INSERT INTO users (name, email, password, role) VALUES (%s, %s, %s, %s)"
+    users = itertools.chain(
+        ((f"Seller {n}", f"seller-{run_tag}-{n}@{SEED_EMAIL_DOMAIN}", password_hash, 'seller') for n in range(sellers)),
+        ((f"Buyer {n}", f"buyer-{run_tag}-{n}@{SEED_EMAIL_DOMAIN}", password_hash, 'buyer') for n in range(buyers))
+    )
+    _insert_batches(users, user_query, batch_size, 'users', log)
+
+    with db_cursor() as cursor:
+        cursor.execute(
+            "SELECT user_id, role FROM users WHERE email LIKE %s ORDER BY user_id",
+            (f"%-{run_tag}-%@{SEED_EMAIL_DOMAIN}",)
+        )
+        rows = cursor.fetchall()
+    seller_ids = [user_id for user_id, role in rows if role == 'seller']
+    buyer_ids = [user_id for user_id, role in rows if role == 'buyer']
+
+    adjectives = ['Antique', 'Vintage', 'Signed', 'Rare', 'Mint', 'Restored', 'Handmade', 'Limited']
+    nouns = ['Watch', 'Guitar', 'Painting', 'Camera', 'Vase', 'Lamp', 'Chair', 'Coin', 'Poster', 'Bicycle']
+    base_prices = [round(rng.uniform(5, 500), 2) for _ in range(items)]
+    item_query = "INSERT INTO items (item_name, description, base_price, seller_id) VALUES (%s, %s, %s, %s)"
+    item_rows = (
+        (f"{rng.choice(adjectives)} {rng.choice(nouns)} #{run_tag}-{n}",
+         f"Lot {n} generated for benchmarking", base_prices[n], rng.choice(seller_ids))
+        for n in range(items)
+    )
+    _insert_batches(item_rows, item_query, batch_size, 'items', log)
+
+    with db_cursor() as cursor:
+        cursor.execute(
+            "SELECT item_id FROM items WHERE item_name LIKE %s ORDER BY item_id",
+            (f"% #{run_tag}-%",)
+        )
+        item_ids = [row[0] for row in cursor.fetchall()]
+
+    # Shuffle so popularity is not correlated with item_id
+    popularity = list(range(items))
+    rng.shuffle(popularity)
+    cum_weights = zipf_cum_weights(items, skew)
+    prices = list(base_prices)
+    leaders = [None] * items
+    start_time = datetime.now() - timedelta(days=days)
+    step = timedelta(days=days) / max(bids, 1)
+
+    def bid_rows():
+        produced = 0
+        while produced < bids:
+            chunk = min(batch_size, bids - produced)
+            for rank in pick_ranks(rng, cum_weights, chunk):
+                index = popularity[rank]
+                prices[index] = round(prices[index] + rng.choice((0.5, 1, 1, 2, 5, 10)), 2)
+                buyer_id = rng.choice(buyer_ids)
+                leaders[index] = buyer_id
+                yield item_ids[index], buyer_id, prices[index], start_time + step * produced
+                produced += 1
+
+    bid_query = "INSERT INTO bids (item_id, buyer_id, bid_amount, bid_time) VALUES (%s, %s, %s, %s)"
+    _insert_batches(bid_rows(), bid_query, batch_size, 'bids', log)
+
+    high_bids = (
+        (prices[index], leaders[index], item_ids[index])
+        for index in range(items) if leaders[index] is not None
+    )
+    update_query = "UPDATE items SET current_high_bid = %s, current_high_bidder_id = %s WHERE item_id = %s"
+    _insert_batches(high_bids, update_query, batch_size, 'high bids', log)
+    resync_high_bid_cache()
+
+    elapsed = time.perf_counter() - started
+    return {
+        'sellers': len(seller_ids),
+        'buyers': len(buyer_ids),
+        'items': len(item_ids),
+        'bids': bids,
+        'skew': skew,
+        'seconds': round(elapsed, 2),
+        'buyer_ids': [buyer_ids[0], buyer_ids[-1]],
+        'item_ids': [item_ids[0], item_ids[-1]]
+    }
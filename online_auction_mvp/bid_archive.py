@@ -0,0 +1,128 @@
+"""
+Compressed archive of old bid history.
+
+Bids of auctions that settled more than BID_ARCHIVE_AFTER_DAYS ago are
+moved out of the live bids table into gzip-compressed CSV files under
+BID_ARCHIVE_DIR, one file per batch of auctions. bid_archive_index records
+which items, buyers and sellers each file holds, so the full-history
+functions in db_config open only the files they need and merge them with
+the live rows. On MySQL, archiving also maintains the monthly partitions
+of bids: months are added ahead of time, and past months are dropped once
+archiving has emptied them.
+
+    python bid_archive.py run        archive due bids and maintain partitions
+    python bid_archive.py status     archive and partition summary
+    python bid_archive.py restore    move every archived bid back into bids
+"""
+from datetime import datetime
+import argparse
+import csv
+import gzip
+import os
+import secrets
+import sys
+
+BID_ARCHIVE_CONFIG = {
+    'dir': os.getenv('BID_ARCHIVE_DIR', 'bid_archive'),
+    'after_days': float(os.getenv('BID_ARCHIVE_AFTER_DAYS', 30)),  # Archive an auction's bids this long after it settled
+    'batch_size': int(os.getenv('BID_ARCHIVE_BATCH_SIZE', 500)),  # Auctions per archive file and transaction
+    'partition_months_ahead': int(os.getenv('BID_PARTITION_MONTHS_AHEAD', 3))  # MySQL: monthly partitions kept ready
+}
+
+# Columns of an archive file; names are stored so rows read back like the history queries
+ARCHIVE_COLUMNS = ('bid_id', 'item_id', 'item_name', 'buyer_id', 'buyer_name', 'seller_id', 'bid_amount', 'bid_time')
+
+def _full_path(relative):
+    return os.path.join(BID_ARCHIVE_CONFIG['dir'], relative)
+
+def write_archive(rows, now):
+    """
+    Write bid rows (tuples in ARCHIVE_COLUMNS order) to a new archive file
+    and return its path relative to BID_ARCHIVE_DIR. The file only appears
+    under its final name once it is complete and on disk.
+    """
+    relative = os.path.join(f"{now:%Y}", f"{now:%m}", f"bids-{now:%Y%m%d-%H%M%S}-{secrets.token_hex(4)}.csv.gz")
+    path = _full_path(relative)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as raw:
+        with gzip.open(raw, 'wt', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(ARCHIVE_COLUMNS)
+            writer.writerows(rows)
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(temporary, path)
+    return relative
+
+def remove_archive(relative):
+    try:
+        os.remove(_full_path(relative))
+    except FileNotFoundError:
+        pass
+
+def _optional_int(value):
+    return int(value) if value else None
+
+def read_archive(relative, column=None, value=None):
+    """
+    Yield the bids in an archive file as dicts keyed by ARCHIVE_COLUMNS,
+    only those whose `column` equals `value` when a column is given
+    """
+    with gzip.open(_full_path(relative), 'rt', encoding='utf-8', newline='') as f:
+        reader = csv.reader(f)
+        next(reader)
+        position = ARCHIVE_COLUMNS.index(column) if column else None
+        wanted = str(value)
+        for row in reader:
+            if position is not None and row[position] != wanted:
+                continue
+            yield {
+                'bid_id': int(row[0]),
+                'item_id': int(row[1]),
+                'item_name': row[2],
+                'buyer_id': _optional_int(row[3]),
+                'buyer_name': row[4] or None,
+                'seller_id': _optional_int(row[5]),
+                'bid_amount': float(row[6]),
+                'bid_time': datetime.fromisoformat(row[7]) if row[7] else None
+            }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python bid_archive.py", description="Archive old bids to compressed files")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('run', help="archive the bids of auctions settled long enough ago, then maintain partitions")
+    commands.add_parser('status', help="show archived and live bid counts and the bids partitions")
+    commands.add_parser('restore', help="move every archived bid back into the bids table")
+    args = parser.parse_args(argv)
+
+    from db_config import archive_bid_history, bid_archive_status, is_sharded, maintain_bid_partitions, restore_archived_bids
+
+    if args.command == 'run':
+        archived, message = archive_bid_history()
+        print(message)
+        if message.startswith("Error"):
+            return 1
+        changes, message = maintain_bid_partitions()
+        for change in changes:
+            print(f"  {change}")
+        print(message)
+        return 1 if message.startswith("Error") else 0
+    if args.command == 'restore':
+        restored, message = restore_archived_bids()
+        print(message)
+        return 1 if message.startswith("Error") else 0
+
+    status, message = bid_archive_status()
+    if status is None:
+        print(message)
+        return 1
+    print(f"Live bids:     {status['live_bids']}")
+    print(f"Archived bids: {status['archived_bids']} in {status['archives']} file(s) under {BID_ARCHIVE_CONFIG['dir']}")
+    for partition in status['partitions']:
+        shard = f"shard {partition['shard']}  " if is_sharded() else ""
+        print(f"  {shard}{partition['name']:<12} {partition['rows']:>12} rows (estimated)  < {partition['bound']}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,137 @@
+import threading
+
+
+class HighBidCache:
+    """
+    In-process map of item_id -> current high bid.
+    Entries are dicts with item_id, item_name, seller_id, base_price,
+    buyer_id, buyer_name, bid_amount and bid_time; bid fields are None
+    until the item receives its first bid.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._user_names = {}
+        self._loading = 0
+        self._pending = []  # writes applied while a bulk load was in flight
+        self.loaded = False
+
+    def begin_load(self):
+        """
+        Mark the start of a bulk query so writes racing it are replayed by load()
+        """
+        with self._lock:
+            self._loading += 1
+
+    def load(self, rows):
+        """
+        Replace the whole cache with rows from a bulk query started by begin_load()
+        """
+        entries = {row['item_id']: dict(row) for row in rows}
+        with self._lock:
+            self._entries = entries
+            self.loaded = True
+            for entry in entries.values():
+                if entry['buyer_id'] is not None:
+                    self._user_names[entry['buyer_id']] = entry['buyer_name']
+            pending, self._pending = self._pending, []
+            self._loading = max(self._loading - 1, 0)
+            # Replays are idempotent, so re-queueing for a concurrent load is harmless
+            for apply, args in pending:
+                apply(*args)
+
+    def abort_load(self):
+        """
+        Undo begin_load() after a failed bulk query
+        """
+        with self._lock:
+            self._loading = max(self._loading - 1, 0)
+            if not self._loading:
+                self._pending = []
+
+    def put(self, row):
+        """
+        Store a freshly loaded entry for one item
+        """
+        with self._lock:
+            self._entries[row['item_id']] = dict(row)
+            if row['buyer_id'] is not None:
+                self._user_names[row['buyer_id']] = row['buyer_name']
+
+    def get(self, item_id):
+        """
+        Return a copy of the entry for `item_id`, or None if not cached
+        """
+        with self._lock:
+            entry = self._entries.get(item_id)
+            return dict(entry) if entry is not None else None
+
+    def get_many(self, item_ids):
+        """
+        Return {item_id: entry} for the cached ids among `item_ids`
+        """
+        with self._lock:
+            return {
+                item_id: dict(self._entries[item_id])
+                for item_id in item_ids if item_id in self._entries
+            }
+
+    def all(self):
+        """
+        Return copies of every cached entry
+        """
+        with self._lock:
+            return [dict(entry) for entry in self._entries.values()]
+
+    def add_item(self, item_id, item_name, seller_id, base_price):
+        """
+        Register a newly listed item that has no bids yet
+        """
+        with self._lock:
+            self._add_item(item_id, item_name, seller_id, base_price)
+
+    def _add_item(self, item_id, item_name, seller_id, base_price):
+        if self._loading:
+            self._pending.append((self._add_item, (item_id, item_name, seller_id, base_price)))
+        if self.loaded and item_id not in self._entries:
+            self._entries[item_id] = {
+                'item_id': item_id, 'item_name': item_name, 'seller_id': seller_id, 'base_price': base_price,
+                'buyer_id': None, 'buyer_name': None, 'bid_amount': None, 'bid_time': None
+            }
+
+    def record_bid(self, item_id, buyer_id, buyer_name, bid_amount, bid_time):
+        """
+        Apply an accepted bid; returns False if the item is not cached
+        """
+        with self._lock:
+            return self._record_bid(item_id, buyer_id, buyer_name, bid_amount, bid_time)
+
+    def _record_bid(self, item_id, buyer_id, buyer_name, bid_amount, bid_time):
+        if self._loading:
+            self._pending.append((self._record_bid, (item_id, buyer_id, buyer_name, bid_amount, bid_time)))
+        entry = self._entries.get(item_id)
+        if entry is None:
+            return False
+        if entry['bid_amount'] is None or bid_amount > entry['bid_amount']:
+            entry.update(buyer_id=buyer_id, buyer_name=buyer_name, bid_amount=bid_amount, bid_time=bid_time)
+        return True
+
+    def invalidate(self, item_id=None):
+        """
+        Drop one item, or everything when `item_id` is None
+        """
+        with self._lock:
+            if item_id is None:
+                self._entries = {}
+                self.loaded = False
+            else:
+                self._entries.pop(item_id, None)
+
+    def user_name(self, user_id):
+        with self._lock:
+            return self._user_names.get(user_id)
+
+    def remember_user(self, user_id, name):
+        with self._lock:
+            self._user_names[user_id] = name
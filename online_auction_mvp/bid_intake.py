@@ -0,0 +1,305 @@
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from datetime import datetime
+import logging
+import os
+import queue
+import threading
+import time
+
+from db_config import (
+    Error, _place_bid, anti_snipe_clause, auction_closed_reason, db_cursor, get_high_bid, group_by_shard,
+    high_bid_cache, is_sharded, note_session_write, on_shard, place_bid_against_proxies, read_cache
+)
+from db_metrics import instrumented, metrics
+from write_admission import WriteRejected, write_admission
+
+BID_INTAKE_CONFIG = {
+    'enabled': os.getenv('BID_INTAKE_ENABLED', 'false').lower() in ('1', 'true', 'yes'),
+    'batch_size': int(os.getenv('BID_BATCH_SIZE', 100)),  # Commit once this many bids are waiting...
+    'batch_wait_ms': float(os.getenv('BID_BATCH_WAIT_MS', 5)),  # ...or once the oldest has waited this long
+    'max_queue': int(os.getenv('BID_QUEUE_MAX', 10000)),
+    'result_timeout': float(os.getenv('BID_RESULT_TIMEOUT', 10))
+}
+
+log = logging.getLogger('auction.bid_intake')
+
+class BidIntake:
+    """
+    Queue of incoming bids drained by one background writer.
+    Bids are first rate-limited by write admission and checked against the
+    in-memory current price of the item (committed high bid plus any
+    accepted bids still waiting to be written), so hopeless bids are
+    rejected without touching the database. Accepted bids are
+    group-committed, each batch taking one write turn, and each caller's
+    Future resolves to (success, message) only after its batch has
+    committed. Bids a proxy bid may answer are settled one by one after the
+    batch. With several shards a batch is committed shard by shard.
+    """
+
+    def __init__(self, batch_size, batch_wait_ms, max_queue):
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait_ms / 1000
+        self._queue = queue.Queue(max_queue)
+        self._lock = threading.Lock()
+        self._pending = {}  # item_id -> highest accepted bid not yet committed
+        self._thread = None
+        self._stopping = False
+        self.batches = 0
+        self.committed = 0
+        self.errors = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name="bid-intake-writer", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout=None):
+        """
+        Commit everything already queued, then stop the writer
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+            self._stopping = True
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout)
+
+    def submit(self, item_id, buyer_id, bid_amount):
+        """
+        Queue a bid and return a Future for its (success, message) result
+        """
+        future = Future()
+        if self._stopping:
+            future.set_result((False, "Bid intake is shutting down, please retry"))
+            return future
+        try:
+            write_admission.throttle(buyer_id, item_id)
+        except WriteRejected as e:
+            future.set_result((False, str(e)))
+            return future
+
+        entry, msg = get_high_bid(item_id)
+        if entry is None:
+            future.set_result((False, "Item does not exist" if msg.endswith("successfully") else f"Error placing bid: {msg}"))
+            return future
+
+        # Validation and enqueueing happen under one lock so the queue holds
+        # each item's bids in the order they were validated
+        with self._lock:
+            current = self._pending.get(item_id, entry['bid_amount'])
+            if current is not None and bid_amount <= current:
+                future.set_result((False, f"Bid must be higher than current highest bid of {current}"))
+                return future
+            if current is None and bid_amount <= entry['base_price']:
+                future.set_result((False, f"Bid must be higher than base price of {entry['base_price']}"))
+                return future
+            try:
+                self._queue.put_nowait((item_id, buyer_id, bid_amount, future))
+            except queue.Full:
+                future.set_result((False, "Too many bids in flight, please retry"))
+                return future
+            self._pending[item_id] = bid_amount
+
+        if self._thread is None:
+            self.start()
+        return future
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            stop = False
+            deadline = time.monotonic() + self.batch_wait
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    bid = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if bid is None:
+                    stop = True
+                    break
+                batch.append(bid)
+            try:
+                # A batch is one write; it waits its turn instead of being turned away
+                with write_admission.turn(bounded=False):
+                    try:
+                        shards = group_by_shard(batch, item_id=lambda bid: bid[0])
+                    except Error as e:
+                        self._fail(batch, e)
+                        shards = []
+                    for shard, shard_batch in shards:
+                        with on_shard(shard):
+                            self._commit(shard_batch)
+            except Exception as e:
+                # Keep the writer alive; bids already answered keep their result
+                with self._lock:
+                    self.errors += 1
+                log.exception("Bid intake batch failed")
+                self._fail([bid for bid in batch if not bid[3].done()], e)
+            if stop:
+                return
+
+    def _fail(self, batch, error):
+        # Resolve every bid of a batch that could not be written
+        with self._lock:
+            for item_id, _, bid_amount, _ in batch:
+                if self._pending.get(item_id, 0) <= bid_amount:
+                    self._pending.pop(item_id, None)
+        for item_id in {bid[0] for bid in batch}:
+            high_bid_cache.invalidate(item_id)
+        for _, _, _, future in batch:
+            future.set_result((False, f"Error placing bid: {error}"))
+
+    @instrumented(operation='bid_intake_commit')
+    def _commit(self, batch):
+        """
+        Write one batch in a single transaction and resolve its futures
+        """
+        results = []
+        now = datetime.now()
+        extend, extend_params = anti_snipe_clause(now)
+        try:
+            with db_cursor(commit=True) as cursor:
+                # Lock every item in the batch in id order; bids placed through
+                # other processes are re-checked against the locked rows
+                item_ids = sorted({bid[0] for bid in batch})
+                placeholders = ", ".join(["%s"] * len(item_ids))
+                cursor.execute(
+                    f"SELECT item_id, base_price, current_high_bid, seller_id, status, starts_at, ends_at, proxy_max "
+                    f"FROM items WHERE item_id IN ({placeholders}) ORDER BY item_id FOR UPDATE",
+                    item_ids
+                )
+                items = {row[0]: {'base_price': row[1], 'bid': row[2], 'seller_id': row[3], 'buyer_id': None,
+                                  'closed': auction_closed_reason(row[4], row[5], row[6], now), 'proxy_max': row[7]}
+                         for row in cursor.fetchall()}
+
+                accepted = []
+                contested = []  # settled after the batch, in arrival order
+                contested_items = set()
+                moved = []  # not on this shard: placed after the batch wherever the item is now
+                for item_id, buyer_id, bid_amount, future in batch:
+                    item = items.get(item_id)
+                    if item_id in contested_items:
+                        contested.append((item_id, buyer_id, bid_amount, future))
+                    elif item is None and is_sharded():
+                        moved.append((item_id, buyer_id, bid_amount, future))
+                    elif item is None:
+                        results.append((future, (False, "Item does not exist")))
+                    elif item['closed']:
+                        results.append((future, (False, item['closed'])))
+                    elif item['bid'] is not None and bid_amount <= item['bid']:
+                        results.append((future, (False, f"Bid must be higher than current highest bid of {item['bid']}")))
+                    elif bid_amount <= item['base_price']:
+                        results.append((future, (False, f"Bid must be higher than base price of {item['base_price']}")))
+                    elif item['proxy_max'] is not None and bid_amount <= item['proxy_max']:
+                        contested.append((item_id, buyer_id, bid_amount, future))
+                        contested_items.add(item_id)
+                    else:
+                        item['bid'], item['buyer_id'] = bid_amount, buyer_id
+                        accepted.append((item_id, buyer_id, bid_amount))
+                        results.append((future, (True, "Bid placed successfully")))
+
+                if accepted:
+                    # Insert triggers lock each seller's seller_stats row; taking
+                    # them in seller order keeps concurrent batches deadlock-free.
+                    # The sort is stable, so bids on one item keep their order.
+                    accepted.sort(key=lambda bid: items[bid[0]]['seller_id'] or 0)
+                    placeholders = ", ".join(["(%s, %s, %s)"] * len(accepted))
+                    cursor.execute(
+                        f"INSERT INTO bids (item_id, buyer_id, bid_amount) VALUES {placeholders}",
+                        [value for bid in accepted for value in bid]
+                    )
+                    for item_id, item in items.items():
+                        if item['buyer_id'] is not None:
+                            cursor.execute(
+                                f"UPDATE items SET current_high_bid = %s, current_high_bidder_id = %s{extend} WHERE item_id = %s",
+                                (item['bid'], item['buyer_id'], *extend_params, item_id)
+                            )
+
+                    unknown = sorted({bid[1] for bid in accepted if high_bid_cache.user_name(bid[1]) is None})
+                    if unknown:
+                        placeholders = ", ".join(["%s"] * len(unknown))
+                        cursor.execute(f"SELECT user_id, name FROM users WHERE user_id IN ({placeholders})", unknown)
+                        for user_id, name in cursor.fetchall():
+                            high_bid_cache.remember_user(user_id, name)
+        except Error as e:
+            self._fail(batch, e)
+            return
+
+        for item_id, item in items.items():
+            if item['buyer_id'] is not None:
+                buyer_name = high_bid_cache.user_name(item['buyer_id'])
+                if not high_bid_cache.record_bid(item_id, item['buyer_id'], buyer_name, item['bid'], now):
+                    high_bid_cache.invalidate(item_id)
+                read_cache.bump(('item', item_id), ('seller', item['seller_id']))
+        if accepted:
+            read_cache.bump('bids', *{('buyer', bid[1]) for bid in accepted})
+
+        with self._lock:
+            # Drop pending prices that are now committed (or were beaten by
+            # another process); later queued bids keep theirs
+            for item_id, item in items.items():
+                pending = self._pending.get(item_id)
+                if pending is not None and item['bid'] is not None and pending <= item['bid']:
+                    del self._pending[item_id]
+            for item_id in {bid[0] for bid in batch} - items.keys():
+                self._pending.pop(item_id, None)
+            self.batches += 1
+            self.committed += len(accepted)
+
+        for future, result in results:
+            future.set_result(result)
+        for item_id, buyer_id, bid_amount, future in moved:
+            future.set_result(_place_bid(item_id, buyer_id, bid_amount))
+        for item_id, buyer_id, bid_amount, future in contested:
+            future.set_result(place_bid_against_proxies(item_id, buyer_id, bid_amount))
+            with self._lock:
+                if self._pending.get(item_id, 0) <= bid_amount:
+                    self._pending.pop(item_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'queued': self._queue.qsize(),
+                'batches': self.batches,
+                'committed': self.committed,
+                'errors': self.errors,
+                'avg_batch_size': self.committed / self.batches if self.batches else 0.0
+            }
+
+_intake = None
+_intake_lock = threading.Lock()
+
+def get_bid_intake():
+    """
+    Return the process-wide bid intake, creating it on first use
+    """
+    global _intake
+    if _intake is None:
+        with _intake_lock:
+            if _intake is None:
+                _intake = BidIntake(
+                    BID_INTAKE_CONFIG['batch_size'],
+                    BID_INTAKE_CONFIG['batch_wait_ms'],
+                    BID_INTAKE_CONFIG['max_queue']
+                )
+                metrics.add_collector('bid_intake', _intake.stats)
+    return _intake
+
+def place_bid_queued(item_id, buyer_id, bid_amount, timeout=None):
+    """
+    Place a bid through the group-commit intake queue.
+    Blocks until the bid's batch has committed; same return shape as place_bid.
+    """
+    # The writer thread commits outside this session, so record the write here
+    note_session_write()
+    future = get_bid_intake().submit(item_id, buyer_id, bid_amount)
+    try:
+        return future.result(BID_INTAKE_CONFIG['result_timeout'] if timeout is None else timeout)
+    except FutureTimeoutError:
+        return False, "Bid is still being processed; check My Bids shortly"
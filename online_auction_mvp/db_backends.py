@@ -0,0 +1,759 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime
+from decimal import Decimal
+from functools import lru_cache
+import asyncio
+import re
+import sqlite3
+import threading
+import time
+
+try:
+    import mysql.connector
+    from mysql.connector import Error, InterfaceError, OperationalError
+except ImportError:  # SQLite-only installs
+    mysql = None
+
+    class Error(Exception):
+        """
+        Stand-in for mysql.connector.Error with the same constructor and attributes
+        """
+
+        def __init__(self, msg=None, errno=None, values=None, sqlstate=None):
+            super().__init__(msg)
+            self.msg = msg
+            self.errno = errno
+            self.sqlstate = sqlstate
+
+        def __str__(self):
+            return f"{self.errno}: {self.msg}" if self.errno else str(self.msg)
+
+    class InterfaceError(Error):
+        pass
+
+    class OperationalError(Error):
+        pass
+
+try:
+    import aiomysql
+except ImportError:  # only needed by the async API on MySQL
+    aiomysql = None
+
+class PoolTimeoutError(Error):
+    """
+    Raised when no pooled connection becomes free within the max wait
+    """
+
+class ConnectionPool:
+    """
+    Thread-safe, lazily filled pool of MySQL connections
+    """
+
+    def __init__(self, connect, size, timeout, ping_interval):
+        self.size = size
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+        self._connect = connect
+        self._idle = []  # (connection, released_at) pairs, most recently used last
+        self._in_use = 0
+        self._waiting = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._checkouts = 0
+        self._timeouts = 0
+        self._discarded = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def acquire(self):
+        """
+        Check out a healthy connection, waiting at most `timeout` seconds
+        """
+        start = time.monotonic()
+        deadline = start + self.timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise Error(msg="Connection pool is closed")
+                if self._idle:
+                    connection, released_at = self._idle.pop()
+                    break
+                if self._in_use + len(self._idle) < self.size:
+                    # Reserve a slot and open the connection outside the lock
+                    connection, released_at = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeoutError(
+                        msg=f"Database connection failed: no pooled connection available within {self.timeout}s"
+                    )
+                self._waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+            self._in_use += 1
+            waited = time.monotonic() - start
+            self._checkouts += 1
+            self._total_wait += waited
+            self._max_wait = max(self._max_wait, waited)
+
+        try:
+            if connection is not None and time.monotonic() - released_at >= self.ping_interval:
+                if not connection.is_connected():
+                    self._close_quietly(connection)
+                    connection = None
+            if connection is None:
+                connection = self._connect()
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        return connection
+
+    def release(self, connection, discard=False):
+        """
+        Return a connection to the pool, ending any open transaction
+        """
+        if not discard:
+            try:
+                connection.rollback()
+            except Error:
+                discard = True
+        if discard:
+            self._close_quietly(connection)
+        with self._cond:
+            self._in_use -= 1
+            if self._closed and not discard:
+                discard = True
+                self._close_quietly(connection)
+            if not discard:
+                self._idle.append((connection, time.monotonic()))
+            self._cond.notify()
+
+    def _close_quietly(self, connection):
+        with self._cond:
+            self._discarded += 1
+        try:
+            connection.close()
+        except Error:
+            pass
+
+    def close(self):
+        """
+        Close every idle connection; connections in use are closed on release
+        """
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._closed = True
+        for connection, _ in idle:
+            self._close_quietly(connection)
+
+    def stats(self):
+        """
+        Snapshot of pool usage counters
+        """
+        with self._cond:
+            return {
+                'size': self.size,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'waiting': self._waiting,
+                'checkouts': self._checkouts,
+                'timeouts': self._timeouts,
+                'discarded': self._discarded,
+                'total_wait_ms': self._total_wait * 1000,
+                'avg_wait_ms': (self._total_wait / self._checkouts * 1000) if self._checkouts else 0.0,
+                'max_wait_ms': self._max_wait * 1000
+            }
+
+class Replica:
+    """
+    A read replica: its own connection pool plus the latest health-check result
+    """
+
+    def __init__(self, db_config, pool_config):
+        self.name = f"{db_config['host']}:{db_config.get('port', 3306)}"
+        self.db_config = db_config
+        self.pool = ConnectionPool(self.connect, **pool_config)
+        self.healthy = True  # until the first check says otherwise
+        self.lag = None
+        self.reason = None
+        self.checked_at = None
+
+    def connect(self, timeout=None):
+        config = self.db_config if timeout is None else dict(self.db_config, connection_timeout=timeout)
+        return mysql.connector.connect(**config)
+
+    def mark_unhealthy(self, reason):
+        self.healthy = False
+        self.reason = reason
+
+    def status(self):
+        return {
+            'replica': self.name,
+            'healthy': self.healthy,
+            'lag_s': self.lag,
+            'reason': self.reason,
+            'checked_at': self.checked_at
+        }
+
+class MySQLBackend:
+    """
+    MySQL server backend; connections come from a ConnectionPool.
+    Read-only blocks may be served by read replicas, picked round-robin
+    among those whose last health check passed; if none is usable the
+    primary serves the read.
+    """
+    name = 'mysql'
+    explain_prefix = 'EXPLAIN'
+
+    def __init__(self, db_config, pool_config, replica_configs=(), max_lag=5, check_interval=5):
+        if mysql is None:
+            raise ImportError("mysql-connector-python is required for DB_BACKEND=mysql")
+        self.db_config = db_config
+        self.pool = ConnectionPool(self.connect, **pool_config)
+        self.replicas = [Replica(config, pool_config) for config in replica_configs]
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._next_replica = 0
+        self._replica_reads = 0
+        self._fallbacks = 0
+        self._stop = threading.Event()
+        if self.replicas:
+            self.check_replicas()
+            threading.Thread(target=self._check_loop, name="replica-health", daemon=True).start()
+
+    def connect(self):
+        """
+        Open a new connection outside the pool
+        """
+        return mysql.connector.connect(**self.db_config)
+
+    def _pick_replica(self):
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        self._next_replica += 1
+        return healthy[self._next_replica % len(healthy)]
+
+    def _acquire(self, readonly):
+        """
+        Check out a connection, from a replica if `readonly` and one is healthy.
+        Returns (pool, replica or None, connection).
+        """
+        replica = self._pick_replica() if readonly and self.replicas else None
+        if replica is not None:
+            try:
+                connection = replica.pool.acquire()
+                self._replica_reads += 1
+                return replica.pool, replica, connection
+            except PoolTimeoutError:
+                pass  # busy, not broken
+            except Error as e:
+                replica.mark_unhealthy(f"connect failed: {e}")
+        if readonly and self.replicas:
+            self._fallbacks += 1
+        return self.pool, None, self.pool.acquire()
+
+    @contextmanager
+    def cursor(self, dictionary=False, commit=False, readonly=False):
+        pool, replica, connection = self._acquire(readonly and not commit)
+        cursor = None
+        broken = False
+        try:
+            cursor = connection.cursor(dictionary=dictionary)
+            yield cursor
+            if commit:
+                connection.commit()
+        except (InterfaceError, OperationalError) as e:
+            broken = True
+            if replica is not None:
+                replica.mark_unhealthy(f"query failed: {e}")
+            raise
+        finally:
+            if cursor is not None:
+                try:
+                    cursor.close()
+                except Error:
+                    broken = True
+            pool.release(connection, discard=broken)
+
+    def check_replicas(self):
+        """
+        Probe every replica: reachable, replicating, and no more than
+        `max_lag` seconds behind. A server that is not replicating at all
+        (e.g. a second standalone instance in development) counts as current.
+        """
+        for replica in self.replicas:
+            try:
+                connection = replica.connect(timeout=max(1, int(self.check_interval)))
+                try:
+                    cursor = connection.cursor(dictionary=True)
+                    try:
+                        cursor.execute("SHOW REPLICA STATUS")
+                    except Error:
+                        cursor.execute("SHOW SLAVE STATUS")  # before MySQL 8.0.22
+                    status = cursor.fetchone()
+                    cursor.fetchall()
+                    cursor.close()
+                finally:
+                    connection.close()
+            except Error as e:
+                replica.lag = None
+                replica.mark_unhealthy(f"unreachable: {e}")
+                replica.checked_at = time.time()
+                continue
+
+            if status is None:
+                lag, running = 0, True
+            else:
+                lag = status.get('Seconds_Behind_Source', status.get('Seconds_Behind_Master'))
+                running = status.get('Replica_SQL_Running', status.get('Slave_SQL_Running')) == 'Yes'
+            replica.lag = lag
+            replica.checked_at = time.time()
+            if not running or lag is None:
+                replica.mark_unhealthy("replication is not running")
+            elif lag > self.max_lag:
+                replica.mark_unhealthy(f"{lag}s behind the primary")
+            else:
+                replica.healthy, replica.reason = True, None
+
+    def _check_loop(self):
+        while not self._stop.wait(self.check_interval):
+            self.check_replicas()
+
+    def replica_status(self):
+        return [replica.status() for replica in self.replicas]
+
+    def stats(self):
+        stats = dict(self.pool.stats(), backend=self.name)
+        if self.replicas:
+            stats.update(
+                replicas=len(self.replicas),
+                replicas_healthy=sum(replica.healthy for replica in self.replicas),
+                replica_reads=self._replica_reads,
+                replica_fallbacks=self._fallbacks
+            )
+        return stats
+
+    def close(self):
+        self._stop.set()
+        self.pool.close()
+        for replica in self.replicas:
+            replica.pool.close()
+
+# Timestamps travel as 'YYYY-MM-DD HH:MM:SS[.ffffff]' text and come back as
+# datetime for columns declared TIMESTAMP, mirroring mysql.connector
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(' '))
+# DECIMAL columns have numeric affinity in SQLite and hold REAL values anyway
+sqlite3.register_adapter(Decimal, float)
+sqlite3.register_converter('TIMESTAMP', lambda value: datetime.fromisoformat(value.decode()))
+
+@lru_cache(maxsize=512)
+def _sqlite_sql(query):
+    """
+    Translate a MySQL-flavoured statement for SQLite.
+    Cached so each statement maps to the same SQL text every time, which
+    lets sqlite3's per-connection statement cache reuse the prepared form.
+    """
+    query = query.replace('%s', '?')
+    return re.sub(r'\s+FOR\s+UPDATE\b', '', query, flags=re.IGNORECASE)
+
+def _sqlite_error(e):
+    message = str(e)
+    errno = None
+    if isinstance(e, sqlite3.IntegrityError) and 'UNIQUE' in message:
+        errno = 1062  # ER_DUP_ENTRY, so callers can check e.errno either way
+    elif 'duplicate column name' in message:
+        errno = 1060  # ER_DUP_FIELDNAME
+    elif 'already exists' in message:
+        errno = 1050  # ER_TABLE_EXISTS_ERROR
+    elif 'locked' in message or 'busy' in message:
+        errno = 1205  # ER_LOCK_WAIT_TIMEOUT
+    if isinstance(e, sqlite3.OperationalError):
+        return OperationalError(msg=message, errno=errno)
+    return Error(msg=message, errno=errno)
+
+class SQLiteCursor:
+    """
+    Wraps a sqlite3 cursor with the subset of the mysql.connector cursor
+    API used by db_config: %s placeholders, dictionary rows and Error.
+    """
+
+    def __init__(self, cursor, dictionary):
+        self._cursor = cursor
+        if dictionary:
+            cursor.row_factory = lambda c, row: {column[0]: value for column, value in zip(c.description, row)}
+
+    def execute(self, query, params=()):
+        try:
+            self._cursor.execute(_sqlite_sql(query), tuple(params))
+        except sqlite3.Error as e:
+            raise _sqlite_error(e) from e
+
+    def executemany(self, query, seq_of_params):
+        try:
+            self._cursor.executemany(_sqlite_sql(query), seq_of_params)
+        except sqlite3.Error as e:
+            raise _sqlite_error(e) from e
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size):
+        return self._cursor.fetchmany(size)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def close(self):
+        self._cursor.close()
+
+@contextmanager
+def _sqlite_transaction(connection, dictionary=False, commit=False):
+    # A block nested inside another on the same connection joins its transaction
+    owns_transaction = not connection.in_transaction
+    cursor = SQLiteCursor(connection.cursor(), dictionary)
+    try:
+        if owns_transaction:
+            cursor.execute("BEGIN IMMEDIATE" if commit else "BEGIN")
+        yield cursor
+        if owns_transaction:
+            connection.execute("COMMIT" if commit else "ROLLBACK")
+    except sqlite3.Error as e:
+        if owns_transaction and connection.in_transaction:
+            connection.execute("ROLLBACK")
+        raise _sqlite_error(e) from e
+    except BaseException:
+        if owns_transaction and connection.in_transaction:
+            connection.execute("ROLLBACK")
+        raise
+    finally:
+        cursor.close()
+
+class SQLiteBackend:
+    """
+    Embedded backend for single-node deployments, kiosks and load tests.
+    Each thread keeps one long-lived connection to a WAL-mode database, so
+    readers never block each other or the single writer. Write blocks start
+    with BEGIN IMMEDIATE to take the write lock up front.
+    """
+    name = 'sqlite'
+    explain_prefix = 'EXPLAIN QUERY PLAN'
+
+    def __init__(self, path, busy_timeout, cached_statements, schema_path):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = 0
+        with self._lock:
+            connection = self.connect()
+            try:
+                if connection.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'bids'").fetchone():
+                    # Bring an existing database up to date before the current schema is applied
+                    from migrate import upgrade
+                    upgrade(lambda: _sqlite_transaction(connection, commit=True), self.name, log=None)
+                with open(schema_path) as f:
+                    connection.executescript(f.read())
+            finally:
+                connection.close()
+
+    def connect(self):
+        """
+        Open a new, tuned connection outside the per-thread cache
+        """
+        connection = sqlite3.connect(
+            self.path,
+            timeout=self.busy_timeout,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            isolation_level=None,  # transactions are managed explicitly in cursor()
+            check_same_thread=False,
+            cached_statements=self.cached_statements
+        )
+        connection.execute("PRAGMA journal_mode = WAL")
+        connection.execute("PRAGMA synchronous = NORMAL")
+        connection.execute("PRAGMA foreign_keys = ON")
+        return connection
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = self.connect()
+            with self._lock:
+                self._connections += 1
+        return connection
+
+    @contextmanager
+    def cursor(self, dictionary=False, commit=False, readonly=False):
+        with _sqlite_transaction(self._connection(), dictionary, commit) as cursor:
+            yield cursor
+
+    def stats(self):
+        with self._lock:
+            return {'backend': self.name, 'connections': self._connections}
+
+    def close(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+class AsyncCursor:
+    """
+    Awaitable cursor over a blocking one. Every call runs on `executor`,
+    the single thread that owns the cursor's connection.
+    """
+
+    def __init__(self, cursor, executor):
+        self._cursor = cursor
+        self._executor = executor
+
+    async def _call(self, fn, *args):
+        return await asyncio.wrap_future(self._executor.submit(fn, *args))
+
+    async def execute(self, query, params=()):
+        return await self._call(self._cursor.execute, query, params)
+
+    async def executemany(self, query, seq_of_params):
+        return await self._call(self._cursor.executemany, query, seq_of_params)
+
+    async def fetchone(self):
+        return await self._call(self._cursor.fetchone)
+
+    async def fetchmany(self, size):
+        return await self._call(self._cursor.fetchmany, size)
+
+    async def fetchall(self):
+        return await self._call(self._cursor.fetchall)
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    async def close(self):
+        pass  # closed with its transaction
+
+class AsyncSQLiteBackend:
+    """
+    Async access to the SQLite database for the JSON API.
+    sqlite3 calls block, so each of `size` connections is owned by one
+    worker thread that runs its statements while the event loop waits.
+    Tasks wait up to `timeout` seconds for a free connection. Writers
+    still take turns on the database's single write lock.
+    """
+    name = 'sqlite'
+
+    def __init__(self, backend, size, timeout):
+        self.backend = backend  # the SQLiteBackend that created and migrated the database
+        self.size = size
+        self.timeout = timeout
+        self._idle = None
+        self._workers = []
+        self._waiting = 0
+        self._timeouts = 0
+
+    async def open(self):
+        self._idle = asyncio.Queue()
+        for n in range(self.size):
+            executor = ThreadPoolExecutor(1, thread_name_prefix=f"sqlite-async-{n}")
+            connection = await asyncio.wrap_future(executor.submit(self.backend.connect))
+            self._workers.append((connection, executor))
+            self._idle.put_nowait((connection, executor))
+
+    @asynccontextmanager
+    async def cursor(self, dictionary=False, commit=False):
+        self._waiting += 1
+        try:
+            connection, executor = await asyncio.wait_for(self._idle.get(), self.timeout)
+        except asyncio.TimeoutError:
+            self._timeouts += 1
+            raise PoolTimeoutError(
+                msg=f"Database connection failed: no pooled connection available within {self.timeout}s"
+            ) from None
+        finally:
+            self._waiting -= 1
+
+        transaction = _sqlite_transaction(connection, dictionary, commit)
+        exiting = False
+        try:
+            cursor = await asyncio.wrap_future(executor.submit(transaction.__enter__))
+            yield AsyncCursor(cursor, executor)
+            exiting = True
+            await asyncio.wrap_future(executor.submit(transaction.__exit__, None, None, None))
+        except BaseException as e:
+            if not exiting:
+                # Queued behind any statement a cancelled task left running on
+                # this thread, so the next borrower finds no open transaction
+                executor.submit(transaction.__exit__, type(e), e, e.__traceback__)
+            raise
+        finally:
+            self._idle.put_nowait((connection, executor))
+
+    def stats(self):
+        idle = self._idle.qsize() if self._idle is not None else 0
+        return {
+            'backend': self.name,
+            'size': len(self._workers),
+            'in_use': len(self._workers) - idle,
+            'waiting': self._waiting,
+            'timeouts': self._timeouts
+        }
+
+    async def close(self):
+        workers, self._workers = self._workers, []
+        for connection, executor in workers:
+            executor.submit(connection.close)
+            executor.shutdown(wait=False)
+
+def _aiomysql_error(e):
+    # PyMySQL errors carry (errno, message) in args
+    if len(e.args) >= 2 and isinstance(e.args[0], int):
+        errno, message = e.args[0], e.args[1]
+    else:
+        errno, message = None, str(e)
+    if isinstance(e, (aiomysql.OperationalError, aiomysql.InterfaceError)):
+        return OperationalError(msg=message, errno=errno)
+    return Error(msg=message, errno=errno)
+
+class AioMySQLCursor:
+    """
+    Wraps an aiomysql cursor so failures raise db_backends.Error, like the sync backends
+    """
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    async def _call(self, method, *args):
+        try:
+            return await method(*args)
+        except aiomysql.Error as e:
+            raise _aiomysql_error(e) from e
+
+    async def execute(self, query, params=()):
+        return await self._call(self._cursor.execute, query, tuple(params) or None)
+
+    async def executemany(self, query, seq_of_params):
+        return await self._call(self._cursor.executemany, query, seq_of_params)
+
+    async def fetchone(self):
+        return await self._call(self._cursor.fetchone)
+
+    async def fetchmany(self, size):
+        return await self._call(self._cursor.fetchmany, size)
+
+    async def fetchall(self):
+        return await self._call(self._cursor.fetchall)
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    async def close(self):
+        await self._cursor.close()
+
+class AsyncMySQLBackend:
+    """
+    MySQL through an aiomysql pool, so one event loop can keep up to
+    `size` connections busy. Every call goes to the primary; read
+    replicas are only used by the sync backend.
+    """
+    name = 'mysql'
+
+    def __init__(self, db_config, size, timeout):
+        if aiomysql is None:
+            raise ImportError("aiomysql is required for the async API with DB_BACKEND=mysql")
+        self.db_config = db_config
+        self.size = size
+        self.timeout = timeout
+        self.pool = None
+        self._waiting = 0
+        self._timeouts = 0
+
+    async def open(self):
+        self.pool = await aiomysql.create_pool(
+            minsize=1, maxsize=self.size,
+            host=self.db_config['host'], port=self.db_config['port'],
+            user=self.db_config['user'], password=self.db_config['password'],
+            db=self.db_config['database'], autocommit=False
+        )
+
+    @asynccontextmanager
+    async def cursor(self, dictionary=False, commit=False):
+        self._waiting += 1
+        try:
+            connection = await asyncio.wait_for(self.pool.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            self._timeouts += 1
+            raise PoolTimeoutError(
+                msg=f"Database connection failed: no pooled connection available within {self.timeout}s"
+            ) from None
+        except aiomysql.Error as e:
+            raise _aiomysql_error(e) from e
+        finally:
+            self._waiting -= 1
+
+        try:
+            cursor = AioMySQLCursor(await connection.cursor(aiomysql.DictCursor if dictionary else aiomysql.Cursor))
+            try:
+                yield cursor
+                # Ending read-only transactions too keeps the next borrower's snapshot current
+                await cursor._call(connection.commit if commit else connection.rollback)
+            finally:
+                await cursor.close()
+        except BaseException:
+            # A failed or cancelled block may have left a transaction or an
+            # unread result behind, so the connection is not reused
+            connection.close()
+            raise
+        finally:
+            self.pool.release(connection)
+
+    def stats(self):
+        if self.pool is None:
+            return {'backend': self.name}
+        return {
+            'backend': self.name,
+            'size': self.pool.size,
+            'in_use': self.pool.size - self.pool.freesize,
+            'waiting': self._waiting,
+            'timeouts': self._timeouts
+        }
+
+    async def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            await self.pool.wait_closed()
@@ -1,13 +1,32 @@
-import mysql.connector
-from mysql.connector import Error
-import bcrypt
-import pandas as pd
 from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar, copy_context
+from datetime import datetime, timedelta
+import csv
+import heapq
+import io
+import logging
+import re
+import zlib
+from bid_archive import BID_ARCHIVE_CONFIG, read_archive, remove_archive, write_archive
+from bid_cache import HighBidCache
+from proxy_bidding import ProxyEngine, settle
+from read_cache import ReadCache
+from shard_map import SHARD_ID_SPAN, shard_map
+from password_hashing import HashingBusyError, password_hasher
+from write_admission import WriteRejected, write_admission
+from db_backends import Error, MySQLBackend, PoolTimeoutError, SQLiteBackend
+from db_metrics import InstrumentedCursor, instrumented, metrics, record_acquire, record_error, set_explainer
 import os
+import threading
+import time
 
 # Load environment variables
 load_dotenv()
 
+log = logging.getLogger('auction.db')
+
 DB_CONFIG = {
     'host': os.getenv('DB_HOST', 'localhost'),
     'database': os.getenv('DB_NAME', 'auction_db'),
@@ -16,353 +35,2615 @@ DB_CONFIG = {
     'port': int(os.getenv('DB_PORT', 3306))
 }
 
+# Default page size for the keyset-paginated listing functions
+PAGE_SIZE = int(os.getenv('PAGE_SIZE', 50))
+
+# Rows per multi-row INSERT in bulk_add_items
+BULK_INSERT_BATCH_SIZE = int(os.getenv('BULK_INSERT_BATCH_SIZE', 500))
+
+# Rows fetched per round trip when streaming CSV exports
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', 1000))
+
+# Largest export the Streamlit app offers for download; st.download_button
+# holds the whole file in memory while it is being served
+EXPORT_DOWNLOAD_MAX_BYTES = int(os.getenv('EXPORT_DOWNLOAD_MAX_BYTES', 64 * 1024 * 1024))
+
+# Recent bids shown by get_item_detail, and matches returned by lookup_items
+ITEM_DETAIL_RECENT_BIDS = int(os.getenv('ITEM_DETAIL_RECENT_BIDS', 5))
+ITEM_LOOKUP_LIMIT = int(os.getenv('ITEM_LOOKUP_LIMIT', 20))
+
+# Most rows search_items returns to the Browse Items page
+SEARCH_LIMIT = int(os.getenv('SEARCH_LIMIT', 100))
+
+# Bid change feed behind the live bid tables (get_bids_since)
+BID_FEED_CONFIG = {
+    'limit': int(os.getenv('BID_FEED_LIMIT', 200)),  # Most bids returned per call
+    'settle': float(os.getenv('BID_FEED_SETTLE', 2)),  # MySQL: seconds the cursor trails the newest bid
+    'poll_seconds': float(os.getenv('BID_FEED_POLL_SECONDS', 3))  # How often the pages poll the feed
+}
+
+# Closing auctions at their end time; the scheduler itself is configured in auction_scheduler.py
+AUCTION_CONFIG = {
+    'close_batch_size': int(os.getenv('AUCTION_CLOSE_BATCH_SIZE', 1000)),  # Auctions settled per transaction
+    'anti_snipe_window': float(os.getenv('ANTI_SNIPE_WINDOW', 0)),  # Seconds before the end in which a bid extends the auction; 0 disables
+    'anti_snipe_extension': float(os.getenv('ANTI_SNIPE_EXTENSION', 120)),  # Such a bid keeps the auction open this many seconds longer
+    'bid_increment': float(os.getenv('PROXY_BID_INCREMENT', 1))  # Step an automatic bid raises the price by over the runner-up
+}
+
+# Read cache for listing queries; a TTL of 0 disables it
+READ_CACHE_CONFIG = {
+    'ttl': float(os.getenv('READ_CACHE_TTL', 30)),
+    'max_entries': int(os.getenv('READ_CACHE_MAX_ENTRIES', 1024))
+}
+
+# 'mysql' (default) or 'sqlite' for the embedded backend
+DB_BACKEND = os.getenv('DB_BACKEND', 'mysql').lower()
+
+SQLITE_CONFIG = {
+    'path': os.getenv('SQLITE_PATH', 'auction.db'),
+    'busy_timeout': float(os.getenv('SQLITE_BUSY_TIMEOUT', 10)),  # Seconds a writer waits for the write lock
+    'cached_statements': int(os.getenv('SQLITE_CACHED_STATEMENTS', 256)),  # Prepared statements kept per connection
+    'schema_path': os.path.join(os.path.dirname(os.path.abspath(__file__)), 'schema_sqlite.sql')
+}
+
+# Connection pool shared by every function in this module (MySQL backend)
+POOL_CONFIG = {
+    'size': int(os.getenv('DB_POOL_SIZE', 5)),
+    'timeout': float(os.getenv('DB_POOL_TIMEOUT', 10)),  # Max seconds to wait for a free connection
+    'ping_interval': float(os.getenv('DB_POOL_PING_INTERVAL', 30))  # Ping connections idle longer than this on checkout
+}
+
+# Optional read replicas (MySQL backend), as "host[:port],host[:port]".
+# They use the primary's database and credentials unless overridden.
+REPLICA_CONFIG = {
+    'hosts': [host.strip() for host in os.getenv('DB_REPLICA_HOSTS', '').split(',') if host.strip()],
+    'user': os.getenv('DB_REPLICA_USER', DB_CONFIG['user']),
+    'password': os.getenv('DB_REPLICA_PASSWORD', DB_CONFIG['password']),
+    'staleness_window': float(os.getenv('READ_YOUR_WRITES_WINDOW', 5)),  # Seconds a session reads from the primary after it writes
+    'max_lag': float(os.getenv('REPLICA_MAX_LAG', 5)),  # Replicas further behind than this are skipped
+    'check_interval': float(os.getenv('REPLICA_CHECK_INTERVAL', 5))
+}
+
+def _replica_configs():
+    configs = []
+    for host in REPLICA_CONFIG['hosts']:
+        name, _, port = host.partition(':')
+        configs.append(dict(
+            DB_CONFIG, host=name, port=int(port or DB_CONFIG['port']),
+            user=REPLICA_CONFIG['user'], password=REPLICA_CONFIG['password']
+        ))
+    return configs
+
+# More databases for item-id sharding (see shard_map.py), numbered from 1;
+# shard 0 is the database configured above. MySQL shards are
+# "host[:port]/database" and use the primary's credentials.
+SHARD_CONFIG = {
+    'hosts': [host.strip() for host in os.getenv('DB_SHARDS', '').split(',') if host.strip()],
+    'sqlite_paths': [path.strip() for path in os.getenv('SQLITE_SHARDS', '').split(',') if path.strip()],
+    'fanout_workers': int(os.getenv('SHARD_FANOUT_WORKERS', 8))  # Threads querying shards in parallel
+}
+
+def shard_ids():
+    """
+    Every configured shard, the directory (0) first
+    """
+    extra = SHARD_CONFIG['sqlite_paths'] if DB_BACKEND == 'sqlite' else SHARD_CONFIG['hosts']
+    return list(range(1 + len(extra)))
+
+def is_sharded():
+    return len(shard_ids()) > 1
+
+def shard_db_config(shard):
+    """
+    MySQL connection settings of a shard
+    """
+    if shard == 0:
+        return DB_CONFIG
+    host, _, database = SHARD_CONFIG['hosts'][shard - 1].partition('/')
+    name, _, port = host.partition(':')
+    return dict(DB_CONFIG, host=name, port=int(port or DB_CONFIG['port']), database=database or DB_CONFIG['database'])
+
+_backends = {}
+_backend_lock = threading.Lock()
+
+# The shard the current block's queries go to, set by on_shard()
+_shard = ContextVar('db_shard', default=0)
+
+def get_backend(shard=None):
+    """
+    Return the process-wide database backend selected by DB_BACKEND for a
+    shard, by default the one the current block runs on
+    """
+    shard = _shard.get() if shard is None else shard
+    backend = _backends.get(shard)
+    if backend is None:
+        with _backend_lock:
+            backend = _backends.get(shard)
+            if backend is None:
+                if shard not in shard_ids():
+                    raise Error(msg=f"Shard {shard} is not configured")
+                if DB_BACKEND == 'sqlite':
+                    path = SHARD_CONFIG['sqlite_paths'][shard - 1] if shard else SQLITE_CONFIG['path']
+                    backend = SQLiteBackend(**dict(SQLITE_CONFIG, path=path))
+                elif DB_BACKEND == 'mysql':
+                    # Read replicas serve the directory shard only
+                    backend = MySQLBackend(
+                        shard_db_config(shard), POOL_CONFIG, _replica_configs() if shard == 0 else [],
+                        REPLICA_CONFIG['max_lag'], REPLICA_CONFIG['check_interval']
+                    )
+                else:
+                    raise ValueError(f"Unknown DB_BACKEND {DB_BACKEND!r}; expected 'mysql' or 'sqlite'")
+                _backends[shard] = backend
+    return backend
+
+@contextmanager
+def on_shard(shard):
+    """
+    Send the database calls made inside the block to one shard
+    """
+    token = _shard.set(shard)
+    try:
+        yield
+    finally:
+        _shard.reset(token)
+
+def current_shard():
+    return _shard.get()
+
+def pool_stats():
+    """
+    Get usage statistics for the backend's connections
+    """
+    return get_backend().stats()
+
+def shard_stats():
+    """
+    This process's copy of the shard map and the connections of every other shard it has used
+    """
+    pools = {f"shard_{shard}": backend.stats() for shard, backend in sorted(_backends.items()) if shard}
+    return dict(shard_map.stats(), **pools)
+
+def replica_status():
+    """
+    Health, lag and last failure of each read replica
+    """
+    backend = get_backend(0)
+    return backend.replica_status() if hasattr(backend, 'replica_status') else []
+
+# The user session the current thread is serving, set by session_scope()
+_session = ContextVar('db_session', default=None)
+
+@contextmanager
+def session_scope(state):
+    """
+    Attribute the database calls made inside the block to one user session.
+    `state` is a per-session dict (e.g. Streamlit's session_state); for
+    READ_YOUR_WRITES_WINDOW seconds after the session writes, its reads go
+    to the primary and skip the read cache, so it always sees its own writes.
+    """
+    token = _session.set(state)
+    try:
+        yield
+    finally:
+        _session.reset(token)
+
+def note_session_write():
+    """
+    Record that the current session just wrote to the primary
+    """
+    state = _session.get()
+    if state is not None:
+        state['db_last_write'] = time.monotonic()
+
+def reads_own_writes():
+    """
+    True while the current session's reads must come from the primary
+    """
+    state = _session.get()
+    last_write = state.get('db_last_write') if state is not None else None
+    return last_write is not None and time.monotonic() - last_write < REPLICA_CONFIG['staleness_window']
+
+@contextmanager
+def db_cursor(dictionary=False, commit=False, readonly=False):
+    """
+    Borrow a connection from the active backend and yield a cursor on it.
+    Commits on a clean exit when `commit` is set; otherwise the
+    transaction is rolled back when the block exits. `readonly` blocks may
+    be served by a read replica, unless the session wrote recently.
+    """
+    started = time.perf_counter()
+    if commit:
+        note_session_write()
+    try:
+        with get_backend().cursor(dictionary=dictionary, commit=commit,
+                                  readonly=readonly and not reads_own_writes()) as cursor:
+            record_acquire(time.perf_counter() - started)
+            instrumented_cursor = InstrumentedCursor(cursor, current_shard() if is_sharded() else None)
+            try:
+                yield instrumented_cursor
+            finally:
+                instrumented_cursor.finish()
+    except Error:
+        record_error()
+        raise
+
+def _explain(statement, params, shard=None):
+    # Runs outside db_cursor so plan capture is not itself instrumented
+    backend = get_backend(shard)
+    with backend.cursor() as cursor:
+        cursor.execute(f"{backend.explain_prefix} {statement}", params or ())
+        return cursor.fetchall()
+
+set_explainer(_explain)
+metrics.add_collector('db_pool', pool_stats)
+if is_sharded():
+    metrics.add_collector('shards', shard_stats)
+
 def create_connection():
     """
-    Create a connection to the MySQL database
+    Create a standalone connection for the active backend
     """
     try:
-        connection = mysql.connector.connect(**DB_CONFIG)
-        if connection.is_connected():
-            return connection
+        return get_backend().connect()
     except Error as e:
-        print(f"Error while connecting to MySQL: {e}")
+        print(f"Error while connecting to the database: {e}")
         return None
 
+# Results of listing queries, shared by every session in this process.
+# With replicas, results are not cached until a write has had
+# READ_YOUR_WRITES_WINDOW seconds to reach them.
+read_cache = ReadCache(
+    **READ_CACHE_CONFIG,
+    settle=REPLICA_CONFIG['staleness_window'] if REPLICA_CONFIG['hosts'] and DB_BACKEND == 'mysql' else 0
+)
+
+def _read_cached(key, depends_on, load):
+    # Sessions that just wrote bypass cached results that may predate their write
+    return read_cache.get_or_load(key, depends_on, load, fresh=reads_own_writes())
+
+def read_cache_stats():
+    """
+    Get hit/miss counters for the read cache
+    """
+    return read_cache.stats()
+
+metrics.add_collector('read_cache', read_cache_stats)
+
+# Current high bid per item, shared by every session in this process
+high_bid_cache = HighBidCache()
+
+# Proxy bids of the items being bid on through this process
+proxy_engine = ProxyEngine()
+metrics.add_collector('proxy_engine', proxy_engine.stats)
+metrics.add_collector('write_admission', write_admission.stats)
+
+def refresh_shard_map(force=False):
+    """
+    Reread the shard map from the directory once this process's copy is
+    SHARD_MAP_REFRESH seconds old, or at once with `force`. Returns True if
+    the map changed.
+    """
+    if not is_sharded() or not (force or shard_map.due()):
+        return False
+    with shard_map.lock:
+        if not force and not shard_map.due():
+            return False
+        # Always the primary: a lagging replica would undo a move
+        with on_shard(0), db_cursor() as cursor:
+            cursor.execute("SELECT COALESCE(MAX(version), 0) FROM shard_buckets")
+            version = cursor.fetchone()[0]
+            if version == shard_map.version:
+                shard_map.checked()
+                return False
+            cursor.execute("SELECT bucket, shard FROM shard_buckets")
+            shard_map.load(cursor.fetchall(), version)
+    return True
+
+def item_shard(item_id):
+    """
+    The shard that holds an item
+    """
+    refresh_shard_map()
+    return shard_map.shard_for(item_id)
+
+def _item_missing(result):
+    return result[1] == "Item does not exist"
+
+def _on_item_shard(item_id, call, missing):
+    """
+    call() on the shard that holds `item_id`. If `missing(result)` says
+    the item was not there and a fresh copy of the map places it on another
+    shard (it was just moved), call() again there.
+    """
+    if not is_sharded():
+        return call()
+    shard = item_shard(item_id)
+    with on_shard(shard):
+        result = call()
+    if missing(result):
+        refresh_shard_map(force=True)
+        moved_to = shard_map.shard_for(item_id)
+        if moved_to != shard:
+            with on_shard(moved_to):
+                result = call()
+    return result
+
+def group_by_shard(rows, item_id):
+    """
+    [(shard, its rows)] in shard order, for rows whose item is `item_id(row)`;
+    rows keep their order within a shard
+    """
+    if not is_sharded():
+        return [(0, list(rows))]
+    groups = {}
+    for row in rows:
+        groups.setdefault(item_shard(item_id(row)), []).append(row)
+    return sorted(groups.items())
+
+_fan_out_pool = None
+
+def _fan_out(call, shards=None):
+    """
+    [(shard, call())] for every shard (or `shards`), in shard order. Shards
+    are queried in parallel on worker threads that see the caller's session.
+    """
+    global _fan_out_pool
+    if not is_sharded():
+        return [(0, call())]
+    refresh_shard_map()
+    if _fan_out_pool is None:
+        with _backend_lock:
+            if _fan_out_pool is None:
+                _fan_out_pool = ThreadPoolExecutor(SHARD_CONFIG['fanout_workers'], thread_name_prefix='shard-fan-out')
+
+    def run(shard):
+        with on_shard(shard):
+            return call()
+
+    futures = [(shard, _fan_out_pool.submit(copy_context().run, run, shard)) for shard in (shards or shard_ids())]
+    return [(shard, future.result()) for shard, future in futures]
+
+def _owned(shard, rows, item_id=lambda row: row['item_id']):
+    """
+    The rows `shard` returned for items the map places on it. Both shards
+    hold a bucket's rows for a moment while it moves, and an interrupted
+    move can leave stray copies behind.
+    """
+    if not is_sharded():
+        return rows
+    return [row for row in rows if shard_map.shard_for(item_id(row)) == shard]
+
+def _merge_shard_rows(results, key=None, reverse=False, limit=None):
+    """
+    Combine [(shard, rows)] into the rows each shard owns, sorted by `key`
+    and cut to `limit` like the per-shard query
+    """
+    if len(results) == 1:
+        return results[0][1]
+    rows = [row for shard, shard_rows in results for row in _owned(shard, shard_rows)]
+    if key is not None:
+        rows.sort(key=key, reverse=reverse)
+    return rows[:limit] if limit is not None else rows
+
+def _gather(call, key=None, reverse=False, limit=None):
+    # Rows of call() from every shard; see _merge_shard_rows
+    return _merge_shard_rows(_fan_out(call), key, reverse, limit)
+
+def _by_item_id(row):
+    return row['item_id']
+
+HIGH_BID_QUERY = """
+SELECT i.item_id, i.item_name, i.seller_id, i.base_price,
+       i.current_high_bidder_id AS buyer_id, u.name AS buyer_name,
+       i.current_high_bid AS bid_amount, MIN(b.bid_time) AS bid_time
+FROM items i
+LEFT JOIN users u ON u.user_id = i.current_high_bidder_id
+LEFT JOIN bids b ON b.item_id = i.item_id
+    AND b.buyer_id = i.current_high_bidder_id
+    AND b.bid_amount = i.current_high_bid
+{where}
+GROUP BY i.item_id, i.item_name, i.seller_id, i.base_price, i.current_high_bidder_id, u.name, i.current_high_bid
+"""
+
+# Hot queries, kept at module level so `python migrate.py check` can
+# EXPLAIN them; each should be answered by the index named beside it
+ITEM_LOOKUP_QUERY = """
+SELECT item_id, item_name
+FROM items
+WHERE status = 'open' AND item_name LIKE %s ESCAPE '!'
+ORDER BY item_name, item_id
+LIMIT %s
+"""  # idx_items_status_item_name
+
+# One row per recent bid (or a single row with NULL bid columns)
+ITEM_DETAIL_QUERY = """
+SELECT i.item_id, i.item_name, i.description, i.base_price, i.seller_id,
+       i.starts_at, i.ends_at, i.status, s.name AS seller_name, i.current_high_bid, i.current_high_bidder_id,
+       hb.name AS high_bidder_name,
+       (SELECT COUNT(*) FROM bids c WHERE c.item_id = i.item_id) AS bid_count,
+       r.bid_id, r.buyer_id, rb.name AS buyer_name, r.bid_amount, r.bid_time
+FROM items i
+JOIN users s ON s.user_id = i.seller_id
+LEFT JOIN users hb ON hb.user_id = i.current_high_bidder_id
+LEFT JOIN (
+    SELECT bid_id, item_id, buyer_id, bid_amount, bid_time
+    FROM bids
+    WHERE item_id = %s
+    ORDER BY bid_id DESC
+    LIMIT %s
+) r ON r.item_id = i.item_id
+LEFT JOIN users rb ON rb.user_id = r.buyer_id
+WHERE i.item_id = %s
+ORDER BY r.bid_id DESC
+"""  # idx_bids_item_id
+
+ITEM_BIDS_QUERY = """
+SELECT b.*, u.name as buyer_name
+FROM bids b
+JOIN users u ON b.buyer_id = u.user_id
+WHERE b.item_id = %s
+ORDER BY b.bid_amount DESC
+"""  # idx_bids_item_amount
+
+# Whether an item is on the current shard, for a history that came back empty
+ITEM_EXISTS_QUERY = "SELECT 1 FROM items WHERE item_id = %s"
+
+# Keyset condition for the newest-first bid pages
+KEYSET_AFTER_BID = "AND (b.bid_time < %s OR (b.bid_time = %s AND b.bid_id < %s))"
+
+USER_BIDS_PAGE_QUERY = """
+SELECT b.*, i.item_name
+FROM bids b
+JOIN items i ON b.item_id = i.item_id
+WHERE b.buyer_id = %s
+{keyset}
+ORDER BY b.bid_time DESC, b.bid_id DESC
+LIMIT %s
+"""  # idx_bids_buyer_time
+
+SELLER_ITEMS_PAGE_QUERY = """
+SELECT i.item_id, i.item_name, i.description, i.base_price, i.seller_id
+FROM items i
+WHERE i.seller_id = %s AND i.item_id > %s
+ORDER BY i.item_id
+LIMIT %s
+"""  # idx_items_seller_id
+
+# bids.seller_id is copied from the item by a trigger, so a seller's bids
+# come straight off one index in time order
+SELLER_BIDS_PAGE_QUERY = """
+SELECT b.*, i.item_name, u.name as buyer_name
+FROM bids b
+JOIN items i ON b.item_id = i.item_id
+JOIN users u ON b.buyer_id = u.user_id
+WHERE b.seller_id = %s
+{keyset}
+ORDER BY b.bid_time DESC, b.bid_id DESC
+LIMIT %s
+"""  # idx_bids_seller_time
+
+# Bids after a cursor, in bid_id order; filtered by item (idx_bids_item_id)
+# or by seller (idx_bids_seller_id), both of which end with bid_id
+BID_FEED_QUERY = """
+SELECT b.*, i.item_name, u.name AS buyer_name
+FROM bids b
+JOIN items i ON b.item_id = i.item_id
+JOIN users u ON b.buyer_id = u.user_id
+WHERE b.bid_id > %s
+{filter}
+ORDER BY b.bid_id
+LIMIT %s
+"""
+
+# Open auctions ending by a given time, soonest first: the batch closer
+# and the scheduler's look-ahead both read a range of one index
+ENDING_AUCTIONS_QUERY = """
+SELECT item_id, seller_id, current_high_bidder_id, current_high_bid, ends_at
+FROM items
+WHERE status = 'open' AND ends_at <= %s
+ORDER BY ends_at
+LIMIT %s
+"""  # idx_items_status_ends_at
+
+AUCTION_RESULTS_QUERY = """
+SELECT s.item_id, i.item_name, s.final_price, w.name AS winner_name,
+       u.name AS seller_name, s.ends_at, s.closed_at
+FROM settlements s
+JOIN items i ON i.item_id = s.item_id
+JOIN users u ON u.user_id = s.seller_id
+LEFT JOIN users w ON w.user_id = s.winner_id
+{where}
+ORDER BY s.closed_at DESC, s.item_id DESC
+LIMIT %s
+"""
+
+# Bid archive (bid_archive.py): auctions settled before a cutoff whose bids are still live...
+ARCHIVE_DUE_QUERY = """
+SELECT item_id
+FROM settlements
+WHERE archived_at IS NULL AND closed_at < %s
+ORDER BY closed_at
+LIMIT %s
+"""  # idx_settlements_archived_closed
+
+# ...their bids, in ARCHIVE_COLUMNS order...
+ARCHIVE_BIDS_QUERY = """
+SELECT b.bid_id, b.item_id, i.item_name, b.buyer_id, u.name, b.seller_id, b.bid_amount, b.bid_time
+FROM bids b
+JOIN items i ON i.item_id = b.item_id
+LEFT JOIN users u ON u.user_id = b.buyer_id
+WHERE b.item_id IN ({placeholders})
+ORDER BY b.bid_time DESC, b.bid_id DESC
+"""  # Newest first, so exports can merge the files as they read them
+
+# ...and the archive files holding the bids of an item, buyer or seller
+ARCHIVE_FILES_QUERY = """
+SELECT DISTINCT a.archive_id, a.path
+FROM bid_archive_index x
+JOIN bid_archives a ON a.archive_id = x.archive_id
+WHERE x.{column} = %s
+ORDER BY a.archive_id
+"""
+
+# Columns of a bids row, as returned by SELECT b.*
+BID_COLUMNS = ('bid_id', 'item_id', 'buyer_id', 'bid_amount', 'bid_time', 'seller_id')
+
+# Anti-sniping: a late bid moves the end time out, in the same UPDATE that accepts it
+ANTI_SNIPE_SET = ", ends_at = CASE WHEN ends_at < %s THEN %s ELSE ends_at END"
+
+# Statements shared by the functions below and their async versions in async_db
+LOGIN_QUERY = "SELECT user_id, name, email, role, password FROM users WHERE email = %s"
+
+VIEW_ITEMS_PAGE_QUERY = """
+SELECT i.item_id, i.item_name, i.description, i.base_price, u.name as seller_name, i.ends_at
+FROM items i
+JOIN users u ON i.seller_id = u.user_id
+WHERE i.item_id > %s AND i.status = 'open'
+ORDER BY i.item_id
+LIMIT %s
+"""
+
+# Checks the bid and records it as the new high bid in one statement
+PLACE_BID_QUERY = """
+UPDATE items
+SET current_high_bid = %s, current_high_bidder_id = %s{extend}
+WHERE item_id = %s
+  AND status = 'open'
+  AND (starts_at IS NULL OR starts_at <= %s)
+  AND (ends_at IS NULL OR ends_at > %s)
+  AND %s > base_price
+  AND (current_high_bid IS NULL OR %s > current_high_bid)
+  AND (proxy_max IS NULL OR %s > proxy_max)
+"""
+
+BID_REJECTION_QUERY = "SELECT base_price, current_high_bid, status, starts_at, ends_at, proxy_max FROM items WHERE item_id = %s"
+
+INSERT_BID_QUERY = "INSERT INTO bids (item_id, buyer_id, bid_amount) VALUES (%s, %s, %s)"
+
+# Proxy resolution locks the item row, then loads its live proxies if this
+# process has not seen the item's current proxy_version
+PROXY_ITEM_QUERY = """
+SELECT base_price, current_high_bid, current_high_bidder_id, seller_id, status, starts_at, ends_at, proxy_version
+FROM items
+WHERE item_id = %s
+FOR UPDATE
+"""
+
+PROXY_BIDS_QUERY = "SELECT proxy_id, buyer_id, max_amount FROM proxy_bids WHERE item_id = %s AND max_amount > %s"
+
+USER_PROXY_BIDS_QUERY = """
+SELECT p.item_id, i.item_name, p.max_amount, i.current_high_bid,
+       i.current_high_bidder_id = p.buyer_id AS leading, i.status, p.updated_at
+FROM proxy_bids p
+JOIN items i ON p.item_id = i.item_id
+WHERE p.buyer_id = %s
+ORDER BY p.updated_at DESC, p.proxy_id DESC
+LIMIT %s
+"""
+
+# Browse Items search. The text match is backend specific: a FULLTEXT index
+# on MySQL, the items_fts FTS5 table on SQLite.
+SEARCH_QUERY = """
+SELECT i.item_id, i.item_name, i.description, i.base_price, u.name AS seller_name,
+       i.ends_at, {relevance} AS relevance
+FROM {source}
+JOIN users u ON i.seller_id = u.user_id
+WHERE {conditions}
+ORDER BY {order}
+LIMIT %s
+"""
+
+# (relevance expression, FROM clause, match condition); the relevance
+# expression and the match condition each take the search terms
+SEARCH_MATCH = {
+    'mysql': (
+        "MATCH(i.item_name, i.description) AGAINST (%s IN NATURAL LANGUAGE MODE)",
+        "items i",
+        "MATCH(i.item_name, i.description) AGAINST (%s IN BOOLEAN MODE)"
+    ),
+    'sqlite': (
+        "-bm25(items_fts, 10.0, 1.0)",  # name matches weigh ten times description matches
+        "items_fts JOIN items i ON i.item_id = items_fts.rowid",
+        "items_fts MATCH %s"
+    )
+}
+
+SEARCH_SORTS = {
+    'relevance': "relevance DESC, i.item_id DESC",
+    'newest': "i.item_id DESC",
+    'price_asc': "i.base_price, i.item_id",
+    'price_desc': "i.base_price DESC, i.item_id DESC"
+}
+
+# The same orders as (key, reverse), for merging the results of several shards.
+# Each shard scores relevance against its own items, so across shards the
+# ranking is approximate.
+SEARCH_SORT_KEYS = {
+    'relevance': (lambda item: (item['relevance'] or 0, item['item_id']), True),
+    'newest': (lambda item: item['item_id'], True),
+    'price_asc': (lambda item: (item['base_price'], item['item_id']), False),
+    'price_desc': (lambda item: (item['base_price'], item['item_id']), True)
+}
+
+# InnoDB skips words shorter than innodb_ft_min_token_size and its default
+# stopwords, and a required (+) term it skipped matches nothing
+FULLTEXT_MIN_TOKEN_SIZE = 3
+FULLTEXT_STOPWORDS = {
+    'about', 'are', 'com', 'for', 'from', 'how', 'that', 'the', 'this',
+    'was', 'what', 'when', 'where', 'who', 'will', 'with', 'und', 'www'
+}
+
+def _high_bid_row(row):
+    # SQLite returns MIN(bid_time) as text; MySQL already gives a datetime
+    if isinstance(row['bid_time'], str):
+        row['bid_time'] = datetime.fromisoformat(row['bid_time'])
+    return row
+
+def _high_bid_rows():
+    with db_cursor(dictionary=True) as cursor:
+        cursor.execute(HIGH_BID_QUERY.format(where=""))
+        return cursor.fetchall()
+
+def _reload_high_bid_cache():
+    high_bid_cache.begin_load()
+    try:
+        rows = [_high_bid_row(row) for row in _gather(_high_bid_rows)]
+    except Exception:
+        high_bid_cache.abort_load()
+        raise
+    high_bid_cache.load(rows)
+
+def _ensure_high_bid_cache():
+    if not high_bid_cache.loaded:
+        _reload_high_bid_cache()
+
+@instrumented
+def resync_high_bid_cache():
+    """
+    Reload the high-bid cache for every item with one bulk query
+    """
+    try:
+        _reload_high_bid_cache()
+        proxy_engine.clear()
+        read_cache.bump('bids')
+        return True, "High-bid cache synchronized"
+    except Error as e:
+        return False, f"Error synchronizing high-bid cache: {e}"
+
+def _load_high_bid(item_id):
+    def load():
+        with db_cursor(dictionary=True) as cursor:
+            cursor.execute(HIGH_BID_QUERY.format(where="WHERE i.item_id = %s"), (item_id,))
+            return cursor.fetchone()
+
+    row = _on_item_shard(item_id, load, lambda row: row is None)
+    if row is not None:
+        high_bid_cache.put(_high_bid_row(row))
+    return row
+
+@instrumented
+def get_high_bid(item_id):
+    """
+    Get the current high bid entry for an item from the cache
+    """
+    try:
+        _ensure_high_bid_cache()
+        entry = high_bid_cache.get(item_id)
+        if entry is None:
+            entry = _load_high_bid(item_id)
+        return entry, "High bid retrieved successfully"
+    except Error as e:
+        return None, f"Error retrieving high bid: {e}"
+
+@instrumented
+def get_high_bids(item_ids):
+    """
+    Get {item_id: high bid entry} for several items from the cache
+    """
+    try:
+        _ensure_high_bid_cache()
+        entries = high_bid_cache.get_many(item_ids)
+        for item_id in item_ids:
+            if item_id not in entries:
+                entry = _load_high_bid(item_id)
+                if entry is not None:
+                    entries[item_id] = entry
+        return entries, "High bids retrieved successfully"
+    except Error as e:
+        return {}, f"Error retrieving high bids: {e}"
+
+@instrumented
 def register_user(name, email, password, role):
     """
     Register a new user with hashed password
     """
-    connection = create_connection()
-    if connection is None:
-        return False, "Database connection failed"
-    
-    try:
-        cursor = connection.cursor()
-       
-        hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
-        
-        
-        query = "INSERT INTO users (name, email, password, role) VALUES (%s, %s, %s, %s)"
-        cursor.execute(query, (name, email, hashed_password.decode('utf-8'), role))
-        connection.commit()
-        
+    try:
+        hashed_password = password_hasher.hash_password(password)
+
+        with db_cursor(commit=True) as cursor:
+            query = "INSERT INTO users (name, email, password, role) VALUES (%s, %s, %s, %s)"
+            cursor.execute(query, (name, email, hashed_password, role))
+            user_id = cursor.lastrowid
+
+        if is_sharded():
+            try:
+                _copy_users([(user_id, name, email, role)])
+            except Error as e:
+                log.warning("Could not copy user %s to every shard, run `python shard_map.py sync-users`: %s", user_id, e)
         return True, "User registered successfully"
+    except HashingBusyError as e:
+        return False, str(e)
     except Error as e:
         if e.errno == 1062:  
             return False, "Email already exists"
         return False, f"Error registering user: {e}"
-    finally:
-        if connection.is_connected():
-            cursor.close()
-            connection.close()
 
+def _rehash_password(user_id, password, stored_hash):
+    # Best effort: a busy hasher or failed write just leaves the old hash
+    try:
+        new_hash = password_hasher.hash_password(password)
+        with db_cursor(commit=True) as cursor:
+            # Guarded so a concurrent password change is not overwritten
+            query = "UPDATE users SET password = %s WHERE user_id = %s AND password = %s"
+            cursor.execute(query, (new_hash, user_id, stored_hash))
+    except (HashingBusyError, Error) as e:
+        log.warning("Could not rehash password for user %s: %s", user_id, e)
+
+@instrumented
 def login_user(email, password):
     """
-    Authenticate user login
+    Authenticate user login.
+    A hash made with a different work factor than BCRYPT_ROUNDS is
+    replaced after a successful check. The returned user dict never
+    contains the password hash.
     """
-    connection = create_connection()
-    if connection is None:
-        return None, "Database connection failed"
-    
     try:
-        cursor = connection.cursor(dictionary=True)
-        query = "SELECT * FROM users WHERE email = %s"
-        cursor.execute(query, (email,))
-        user = cursor.fetchone()
-        
+        with db_cursor(dictionary=True) as cursor:
+            cursor.execute(LOGIN_QUERY, (email,))
+            user = cursor.fetchone()
+
         if user:
-            
-            if bcrypt.checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
-                return user, "Login successful"
-            else:
+            stored_hash = user.pop('password')
+            if not password_hasher.check_password(password, stored_hash):
                 return None, "Incorrect password"
+
+            if password_hasher.needs_rehash(stored_hash):
+                _rehash_password(user['user_id'], password, stored_hash)
+            return user, "Login successful"
         else:
             return None, "User not found"
+    except HashingBusyError as e:
+        return None, str(e)
     except Error as e:
         return None, f"Error during login: {e}"
-    finally:
-        if connection.is_connected():
-            cursor.close()
-            connection.close()
-
-def add_item(item_name, description, base_price, seller_id):
-    """
-    Add a new item for auction
-    """
-    connection = create_connection()
-    if connection is None:
-        return False, "Database connection failed"
-    
-    try:
-        cursor = connection.cursor()
-        
-        
-        query = "INSERT INTO items (item_name, description, base_price, seller_id) VALUES (%s, %s, %s, %s)"
-        cursor.execute(query, (item_name, description, base_price, seller_id))
-        connection.commit()
-        
+
+_closing_listener = None  # set by auction_scheduler: listener(item_id, ends_at)
+
+def set_closing_listener(listener):
+    global _closing_listener
+    _closing_listener = listener
+
+def _schedule_closing(item_id, ends_at):
+    if ends_at is not None and _closing_listener is not None:
+        _closing_listener(item_id, ends_at)
+
+def validate_schedule(starts_at, ends_at, now=None):
+    """
+    Check an auction's start and end times; returns an error message or None
+    """
+    now = now or datetime.now()
+    if ends_at is not None and ends_at <= now:
+        return "End time must be in the future"
+    if starts_at is not None and ends_at is not None and ends_at <= starts_at:
+        return "End time must be after the start time"
+    return None
+
+def auction_closed_reason(status, starts_at, ends_at, now):
+    """
+    Why an item does not accept bids at `now`, or None if it does
+    """
+    if status == 'closed' or (ends_at is not None and ends_at <= now):
+        return "This auction has ended"
+    if starts_at is not None and starts_at > now:
+        return f"This auction opens at {starts_at:%Y-%m-%d %H:%M}"
+    return None
+
+def anti_snipe_clause(now):
+    """
+    SET fragment and parameters that extend an auction ending soon after `now`,
+    or ("", ()) when anti-sniping is off
+    """
+    window = AUCTION_CONFIG['anti_snipe_window']
+    if not window:
+        return "", ()
+    extension = AUCTION_CONFIG['anti_snipe_extension']
+    # Only ever moves the end later
+    threshold = now + timedelta(seconds=min(window, extension))
+    return ANTI_SNIPE_SET, (threshold, now + timedelta(seconds=extension))
+
+@instrumented
+def add_item(item_name, description, base_price, seller_id, ends_at=None, starts_at=None):
+    """
+    Add a new item for auction, open for bids from `starts_at` (default: now)
+    until `ends_at` (default: no end)
+    """
+    error = validate_schedule(starts_at, ends_at)
+    if error:
+        return False, error
+    try:
+        with write_admission.admit(seller_id):
+            # Sharded ids come from the directory, so the item's shard is known before it is written
+            item_id = _new_item_ids(1)[0] if is_sharded() else None
+            with on_shard(item_shard(item_id) if item_id else 0), db_cursor(commit=True) as cursor:
+                query = """
+                INSERT INTO items (item_id, item_name, description, base_price, seller_id, starts_at, ends_at)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                """
+                cursor.execute(query, (item_id, item_name, description, base_price, seller_id, starts_at, ends_at))
+                item_id = item_id or cursor.lastrowid
+
+        high_bid_cache.add_item(item_id, item_name, seller_id, base_price)
+        read_cache.bump('items', ('seller', seller_id))
+        _schedule_closing(item_id, ends_at)
         return True, "Item added successfully"
+    except WriteRejected as e:
+        return False, str(e)
     except Error as e:
         return False, f"Error adding item: {e}"
-    finally:
-        if connection.is_connected():
-            cursor.close()
-            connection.close()
 
+def validate_item(item_name, description, base_price):
+    """
+    Check one item's fields; returns an error message or None
+    """
+    if not item_name or not str(item_name).strip():
+        return "Item name is required"
+    if len(str(item_name)) > 100:
+        return "Item name must be at most 100 characters"
+    try:
+        base_price = float(base_price)
+    except (TypeError, ValueError):
+        return f"Invalid base price: {base_price!r}"
+    if not base_price > 0:
+        return "Base price must be greater than 0"
+    if description is not None and not isinstance(description, str):
+        return "Description must be text"
+    return None
+
+@instrumented
+def bulk_add_items(items, seller_id, batch_size=BULK_INSERT_BATCH_SIZE, ends_at=None):
+    """
+    Validate and insert many items for one seller in a single transaction,
+    all closing at `ends_at` (default: no end).
+    `items` is any iterable of dicts with item_name, description and
+    base_price; it is consumed batch by batch, so a generator reading a file
+    in chunks never has to be materialized. Invalid rows are skipped and
+    reported as (row_number, message) pairs; if the database rejects a batch
+    the whole import is rolled back. Across shards, each shard's part is
+    committed in turn at the end.
+    Returns (inserted_count, errors, message).
+    """
+    error = validate_schedule(None, ends_at)
+    if error:
+        return 0, [], error
+    errors = []
+    inserted = 0
+
+    def insert_batch(stack, cursors, batch):
+        item_ids = _new_item_ids(len(batch)) if is_sharded() else [None] * len(batch)
+        rows = [(item_id,) + row for item_id, row in zip(item_ids, batch)]
+        for shard, shard_rows in group_by_shard(rows, item_id=lambda row: row[0]):
+            if shard not in cursors:
+                with on_shard(shard):
+                    cursors[shard] = stack.enter_context(db_cursor(commit=True))
+            placeholders = ", ".join(["(%s, %s, %s, %s, %s, %s)"] * len(shard_rows))
+            query = f"INSERT INTO items (item_id, item_name, description, base_price, seller_id, ends_at) VALUES {placeholders}"
+            cursors[shard].execute(query, [value for row in shard_rows for value in row])
+
+    try:
+        # One transaction per shard, opened when the first row for it arrives
+        with write_admission.admit(seller_id), ExitStack() as stack:
+            cursors = {}
+            batch = []
+            for row_number, item in enumerate(items, start=1):
+                item_name = item.get('item_name')
+                description = item.get('description')
+                base_price = item.get('base_price')
+                error = validate_item(item_name, description, base_price)
+                if error:
+                    errors.append((row_number, error))
+                    continue
+                batch.append((str(item_name).strip(), description, float(base_price), seller_id, ends_at))
+                if len(batch) >= batch_size:
+                    insert_batch(stack, cursors, batch)
+                    inserted += len(batch)
+                    batch = []
+            if batch:
+                insert_batch(stack, cursors, batch)
+                inserted += len(batch)
+    except WriteRejected as e:
+        return 0, [], str(e)
+    except Error as e:
+        return 0, errors, f"Error importing items, nothing was added: {e}"
+
+    if inserted:
+        # New ids are not known individually; rewarm on next read
+        high_bid_cache.invalidate()
+        read_cache.bump('items', ('seller', seller_id))
+        # The whole import shares one closing time, so one wake-up covers it
+        _schedule_closing(None, ends_at)
+    return inserted, errors, f"Imported {inserted} items, skipped {len(errors)} invalid rows"
+
+@instrumented
 def view_items():
     """
     View all items available for auction
     """
-    connection = create_connection()
-    if connection is None:
-        return [], "Database connection failed"
-    
-    try:
-        cursor = connection.cursor(dictionary=True)
-        query = """
-        SELECT i.item_id, i.item_name, i.description, i.base_price, u.name as seller_name
-        FROM items i
-        JOIN users u ON i.seller_id = u.user_id
-        ORDER BY i.item_id
-        """
-        cursor.execute(query)
-        items = cursor.fetchall()
+    def load():
+        with db_cursor(dictionary=True, readonly=True) as cursor:
+            query = """
+            SELECT i.item_id, i.item_name, i.description, i.base_price, u.name as seller_name
+            FROM items i
+            JOIN users u ON i.seller_id = u.user_id
+            ORDER BY i.item_id
+            """
+            cursor.execute(query)
+            return cursor.fetchall()
+
+    try:
+        items = _read_cached(('view_items',), ('items',), lambda: _gather(load, key=_by_item_id))
         return items, "Items retrieved successfully"
     except Error as e:
         return [], f"Error retrieving items: {e}"
-    finally:
-        if connection.is_connected():
-            cursor.close()
-            connection.close()
 
+@instrumented
+def view_items_page(after_id=None, limit=PAGE_SIZE):
+    """
+    View one page of open items, ordered by ID, starting after `after_id`
+    """
+    def load():
+        with db_cursor(dictionary=True, readonly=True) as cursor:
+            cursor.execute(VIEW_ITEMS_PAGE_QUERY, (after_id or 0, limit))
+            return cursor.fetchall()
+
+    try:
+        items = _read_cached(('view_items_page', after_id, limit), ('items',),
+                             lambda: _gather(load, key=_by_item_id, limit=limit))
+        return items, "Items retrieved successfully"
+    except Error as e:
+        return [], f"Error retrieving items: {e}"
+
+@instrumented
 def get_item_by_id(item_id):
     """
     Get a specific item by its ID
     """
-    connection = create_connection()
-    if connection is None:
-        return None, "Database connection failed"
-    
-    try:
-        cursor = connection.cursor(dictionary=True)
-        query = """
-        SELECT i.*, u.name as seller_name
-        FROM items i
-        JOIN users u ON i.seller_id = u.user_id
-        WHERE i.item_id = %s
-        """
-        cursor.execute(query, (item_id,))
-        item = cursor.fetchone()
+    def load():
+        with db_cursor(dictionary=True, readonly=True) as cursor:
+            query = """
+            SELECT i.*, u.name as seller_name
+            FROM items i
+            JOIN users u ON i.seller_id = u.user_id
+            WHERE i.item_id = %s
+            """
+            cursor.execute(query, (item_id,))
+            return cursor.fetchone()
+
+    try:
+        item = _on_item_shard(item_id, load, lambda item: item is None)
+        return item, "Item retrieved successfully"
+    except Error as e:
+        return None, f"Error retrieving item: {e}"
+
+def _like_prefix(prefix):
+    # '!' escapes LIKE wildcards the same way on MySQL and SQLite
+    return prefix.replace('!', '!!').replace('%', '!%').replace('_', '!_') + '%'
+
+@instrumented
+def lookup_items(prefix="", limit=ITEM_LOOKUP_LIMIT):
+    """
+    Ids and names of open items whose name starts with `prefix`, for type-ahead selectors
+    """
+    def load():
+        with db_cursor(dictionary=True, readonly=True) as cursor:
+            cursor.execute(ITEM_LOOKUP_QUERY, (_like_prefix(prefix), limit))
+            return cursor.fetchall()
+
+    try:
+        # Shards compare names with their own collation; the merge sorts them as Python strings
+        items = _read_cached(('lookup_items', prefix, limit), ('items',),
+                             lambda: _gather(load, key=lambda item: (item['item_name'], item['item_id']), limit=limit))
+        return items, "Items retrieved successfully"
+    except Error as e:
+        return [], f"Error retrieving items: {e}"
+
+def _search_match(backend_name, terms):
+    """
+    Full-text condition and parameter for `terms`, matching items that
+    contain every term (or a word starting with it); None if no term can be
+    matched through the index
+    """
+    if backend_name == 'sqlite':
+        return SEARCH_MATCH['sqlite'][2], " ".join(f'"{term}"*' for term in terms)
+    terms = [term for term in terms if len(term) >= FULLTEXT_MIN_TOKEN_SIZE and term not in FULLTEXT_STOPWORDS]
+    if not terms:
+        return None
+    return SEARCH_MATCH['mysql'][2], " ".join(f"+{term}*" for term in terms)
+
+def _search_statement(backend_name, terms, min_price, max_price, seller, sort, limit):
+    """
+    SEARCH_QUERY and its parameters for one search
+    """
+    relevance, source, conditions, params = "NULL", "items i", ["i.status = 'open'"], []
+    match = _search_match(backend_name, terms) if terms else None
+    if match is not None:
+        relevance, source = SEARCH_MATCH[backend_name][:2]
+        conditions.append(match[0])
+        params.append(match[1])
+        if backend_name == 'mysql':
+            params.insert(0, " ".join(terms))
+    elif terms:
+        # Only short words or stopwords: fall back to a name prefix search
+        conditions.append("i.item_name LIKE %s ESCAPE '!'")
+        params.append(_like_prefix(" ".join(terms)))
+    if min_price is not None:
+        conditions.append("i.base_price >= %s")
+        params.append(min_price)
+    if max_price is not None:
+        conditions.append("i.base_price <= %s")
+        params.append(max_price)
+    if seller:
+        conditions.append("u.name LIKE %s ESCAPE '!'")
+        params.append(_like_prefix(seller))
+    order = SEARCH_SORTS['newest' if sort == 'relevance' and relevance == "NULL" else sort]
+    statement = SEARCH_QUERY.format(
+        relevance=relevance, source=source, conditions=" AND ".join(conditions), order=order
+    )
+    return statement, params + [limit]
+
+@instrumented
+def search_items(query="", min_price=None, max_price=None, seller=None, sort='relevance', limit=PAGE_SIZE):
+    """
+    Search open items by name and description, optionally filtered by base price
+    range and seller name prefix. `sort` is one of SEARCH_SORTS; relevance
+    ranking applies only when there is a query and otherwise lists newest first.
+    """
+    if sort not in SEARCH_SORTS:
+        return [], f"Error searching items: unknown sort '{sort}'"
+    terms = tuple(re.findall(r"\w+", (query or "").lower()))
+    seller = (seller or "").strip()
+
+    def load():
+        statement, params = _search_statement(get_backend().name, terms, min_price, max_price, seller, sort, limit)
+        with db_cursor(dictionary=True, readonly=True) as cursor:
+            cursor.execute(statement, params)
+            return cursor.fetchall()
+
+    try:
+        key = ('search_items', terms, min_price, max_price, seller, sort, limit)
+        sort_key, reverse = SEARCH_SORT_KEYS[sort]
+        items = _read_cached(key, ('items',), lambda: _gather(load, key=sort_key, reverse=reverse, limit=limit))
+        return items, "Items retrieved successfully"
+    except Error as e:
+        return [], f"Error searching items: {e}"
+
+def _item_detail(rows):
+    # Fold ITEM_DETAIL_QUERY rows into one item with its recent_bids
+    if not rows:
+        return None
+    bid_columns = ('bid_id', 'buyer_id', 'buyer_name', 'bid_amount', 'bid_time')
+    item = {key: value for key, value in rows[0].items() if key not in bid_columns}
+    item['recent_bids'] = [
+        {key: row[key] for key in bid_columns}
+        for row in rows if row['bid_id'] is not None
+    ]
+    return item
+
+@instrumented
+def get_item_detail(item_id, recent_bids=ITEM_DETAIL_RECENT_BIDS):
+    """
+    Get an item with its seller, current high bid and bidder, bid count
+    and its `recent_bids` latest bids, in one round trip
+    """
+    def load():
+        with db_cursor(dictionary=True, readonly=True) as cursor:
+            cursor.execute(ITEM_DETAIL_QUERY, (item_id, recent_bids, item_id))
+            return _item_detail(cursor.fetchall())
+
+    try:
+        item = _read_cached(('item_detail', item_id, recent_bids), ('items', ('item', item_id)),
+                            lambda: _on_item_shard(item_id, load, lambda item: item is None))
+        if item is None:
+            return None, "Item does not exist"
         return item, "Item retrieved successfully"
     except Error as e:
         return None, f"Error retrieving item: {e}"
-    finally:
-        if connection.is_connected():
-            cursor.close()
-            connection.close()
 
+def _place_bid_statement(item_id, buyer_id, bid_amount, now):
+    extend, extend_params = anti_snipe_clause(now)
+    params = (bid_amount, buyer_id, *extend_params, item_id, now, now, bid_amount, bid_amount, bid_amount)
+    return PLACE_BID_QUERY.format(extend=extend), params
+
+def _bid_rejection(item_id, item, now):
+    """
+    Explain a bid the conditional UPDATE refused, given the item's
+    BID_REJECTION_QUERY row (None if it does not exist)
+    """
+    if not item:
+        return "Item does not exist"
+    reason = auction_closed_reason(item[2], item[3], item[4], now)
+    if reason:
+        return reason
+    if item[1] is not None:
+        # Possibly outbid through another process; reload on next read
+        cached = high_bid_cache.get(item_id)
+        if cached is None or cached['bid_amount'] != item[1]:
+            high_bid_cache.invalidate(item_id)
+            read_cache.bump('bids', ('item', item_id))
+        return f"Bid must be higher than current highest bid of {item[1]}"
+    return f"Bid must be higher than base price of {item[0]}"
+
+def _proxy_contested(item, bid_amount, now):
+    """
+    Whether a bid the conditional UPDATE refused is otherwise valid but may
+    be answered by a proxy bid, given the item's BID_REJECTION_QUERY row
+    """
+    return (item is not None and item[5] is not None and bid_amount <= item[5]
+            and bid_amount > (item[1] if item[1] is not None else item[0])
+            and not auction_closed_reason(item[2], item[3], item[4], now))
+
+def _bid_committed(item_id, buyer_id, buyer_name, bid_amount, seller_id):
+    # Bring the caches up to date once a bid's transaction has committed
+    high_bid_cache.remember_user(buyer_id, buyer_name)
+    if not high_bid_cache.record_bid(item_id, buyer_id, buyer_name, bid_amount, datetime.now()):
+        high_bid_cache.invalidate(item_id)
+    read_cache.bump('bids', ('item', item_id), ('buyer', buyer_id), ('seller', seller_id))
+
+@instrumented
 def place_bid(item_id, buyer_id, bid_amount):
     """
-    Place a bid on an item
-    """
-    connection = create_connection()
-    if connection is None:
-        return False, "Database connection failed"
-    
-    try:
-        cursor = connection.cursor()
-        
-       
-        item_query = "SELECT base_price FROM items WHERE item_id = %s"
-        cursor.execute(item_query, (item_id,))
-        item = cursor.fetchone()
-        
-        if not item:
-            return False, "Item does not exist"
-        
-       
-        if bid_amount <= item[0]:
-            return False, f"Bid must be higher than base price of {item[0]}"
-        
-        
-        bid_query = "SELECT MAX(bid_amount) as max_bid FROM bids WHERE item_id = %s"
-        cursor.execute(bid_query, (item_id,))
-        result = cursor.fetchone()
-        max_bid = result[0]
-        
-        if max_bid is not None and bid_amount <= max_bid:
-            return False, f"Bid must be higher than current highest bid of {max_bid}"
-        
-       
-        query = "INSERT INTO bids (item_id, buyer_id, bid_amount) VALUES (%s, %s, %s)"
-        cursor.execute(query, (item_id, buyer_id, bid_amount))
-        connection.commit()
-        
+    Place a bid on an item, once write admission lets it through.
+    The bid is checked and recorded as the item's new high bid by a single
+    conditional UPDATE, whose row lock also serializes concurrent bidders.
+    The same UPDATE applies any anti-sniping extension.
+    """
+    try:
+        with write_admission.admit(buyer_id, item_id):
+            return _place_bid(item_id, buyer_id, bid_amount)
+    except WriteRejected as e:
+        return False, str(e)
+
+def _place_bid(item_id, buyer_id, bid_amount):
+    return _on_item_shard(item_id, lambda: _place_bid_on_shard(item_id, buyer_id, bid_amount), _item_missing)
+
+def _place_bid_on_shard(item_id, buyer_id, bid_amount):
+    now = datetime.now()
+    try:
+        with db_cursor(commit=True) as cursor:
+            cursor.execute(*_place_bid_statement(item_id, buyer_id, bid_amount, now))
+
+            if cursor.rowcount == 0:
+                # Rejected; read the item only to explain why
+                cursor.execute(BID_REJECTION_QUERY, (item_id,))
+                item = cursor.fetchone()
+                if not _proxy_contested(item, bid_amount, now):
+                    return False, _bid_rejection(item_id, item, now)
+            else:
+                item = None
+                cursor.execute(INSERT_BID_QUERY, (item_id, buyer_id, bid_amount))
+
+                buyer_name = high_bid_cache.user_name(buyer_id)
+                if buyer_name is None:
+                    cursor.execute("SELECT name FROM users WHERE user_id = %s", (buyer_id,))
+                    buyer_name = cursor.fetchone()[0]
+
+                cached = high_bid_cache.get(item_id)
+                if cached is not None:
+                    seller_id = cached['seller_id']
+                else:
+                    cursor.execute("SELECT seller_id FROM items WHERE item_id = %s", (item_id,))
+                    seller_id = cursor.fetchone()[0]
+
+        if item is not None:
+            # A proxy bid may answer this one
+            return place_bid_against_proxies(item_id, buyer_id, bid_amount)
+        _bid_committed(item_id, buyer_id, buyer_name, bid_amount, seller_id)
         return True, "Bid placed successfully"
     except Error as e:
         return False, f"Error placing bid: {e}"
-    finally:
-        if connection.is_connected():
-            cursor.close()
-            connection.close()
 
+def _settle_proxies(item_id, buyer_id, bid_amount=None, max_amount=None):
+    """
+    Apply a manual bid (`bid_amount`) or a new proxy maximum (`max_amount`)
+    to an item with the proxy engine, in one transaction: lock the item,
+    settle in memory, then write the resulting bid rows with one INSERT and
+    the new price with one UPDATE. Returns (success, message).
+    """
+    return _on_item_shard(
+        item_id, lambda: _settle_proxies_on_shard(item_id, buyer_id, bid_amount, max_amount), _item_missing
+    )
+
+def _settle_proxies_on_shard(item_id, buyer_id, bid_amount, max_amount):
+    now = datetime.now()
+    amount = round(float(bid_amount if bid_amount is not None else max_amount), 2)
+    changed = False
+    try:
+        with db_cursor(commit=True) as cursor:
+            cursor.execute(PROXY_ITEM_QUERY, (item_id,))
+            item = cursor.fetchone()
+            if item is None:
+                return False, "Item does not exist"
+            base_price, price, leader_id, seller_id, status, starts_at, ends_at, version = item
+            reason = auction_closed_reason(status, starts_at, ends_at, now)
+            if reason:
+                return False, reason
+            label = "Bid" if bid_amount is not None else "Maximum bid"
+            if price is not None and amount <= price:
+                return False, f"{label} must be higher than current highest bid of {price}"
+            if amount <= base_price:
+                return False, f"{label} must be higher than base price of {base_price}"
+
+            proxies = proxy_engine.get(item_id, version)
+            if proxies is None:
+                cursor.execute(PROXY_BIDS_QUERY, (item_id, price if price is not None else base_price))
+                proxies = proxy_engine.load(item_id, version, cursor.fetchall())
+
+            if bid_amount is not None:
+                own = proxies.max_of(buyer_id)
+                if own is not None and own >= amount:
+                    return False, f"Your automatic bid already covers this amount (up to {own})"
+                bid = (buyer_id, amount)
+            else:
+                cursor.execute("SELECT proxy_id FROM proxy_bids WHERE item_id = %s AND buyer_id = %s", (item_id, buyer_id))
+                row = cursor.fetchone()
+                if row is not None:
+                    proxy_id = row[0]
+                    cursor.execute(
+                        "UPDATE proxy_bids SET max_amount = %s, updated_at = %s WHERE proxy_id = %s",
+                        (amount, now, proxy_id)
+                    )
+                else:
+                    cursor.execute(
+                        "INSERT INTO proxy_bids (item_id, buyer_id, max_amount, created_at, updated_at) "
+                        "VALUES (%s, %s, %s, %s, %s)",
+                        (item_id, buyer_id, amount, now, now)
+                    )
+                    proxy_id = cursor.lastrowid
+                changed = True
+                proxies.set(buyer_id, amount, proxy_id)
+                proxies.version = version + 1
+                bid = None
+
+            outcome = settle(proxies, price, leader_id, base_price, AUCTION_CONFIG['bid_increment'], bid)
+            rows = [bid] if bid is not None else []
+            if outcome is not None and outcome != bid:
+                rows.append(outcome)
+            leader_id, price = outcome or (leader_id, price)
+            top = proxies.top(1)
+            proxy_max = top[0][0] if top and top[0][0] > price else None
+
+            extend, extend_params = anti_snipe_clause(now) if rows else ("", ())
+            cursor.execute(
+                f"UPDATE items SET current_high_bid = %s, current_high_bidder_id = %s, proxy_max = %s, "
+                f"proxy_version = %s{extend} WHERE item_id = %s",
+                (price, leader_id, proxy_max, proxies.version, *extend_params, item_id)
+            )
+            if rows:
+                placeholders = ", ".join(["(%s, %s, %s)"] * len(rows))
+                cursor.execute(
+                    f"INSERT INTO bids (item_id, buyer_id, bid_amount) VALUES {placeholders}",
+                    [value for row in rows for value in (item_id, *row)]
+                )
+                leader_name = high_bid_cache.user_name(leader_id)
+                if leader_name is None:
+                    cursor.execute("SELECT name FROM users WHERE user_id = %s", (leader_id,))
+                    leader_name = cursor.fetchone()[0]
+    except Error as e:
+        proxy_engine.drop(item_id)  # may hold changes that were rolled back
+        return False, f"Error placing bid: {e}"
+
+    if rows:
+        read_cache.bump(*{('buyer', row[0]) for row in rows})
+        _bid_committed(item_id, leader_id, leader_name, price, seller_id)
+    if bid_amount is not None:
+        if leader_id == buyer_id:
+            return True, "Bid placed successfully"
+        return True, f"Bid placed, but an automatic bid outbid it; the current highest bid is {price}"
+    if leader_id == buyer_id:
+        return True, f"Automatic bid set up to {amount}; you are the highest bidder at {price}"
+    return True, f"Automatic bid set up to {amount}, but an earlier automatic bid outbids it; the current highest bid is {price}"
+
+@instrumented
+def place_bid_against_proxies(item_id, buyer_id, bid_amount):
+    """
+    Place a manual bid on an item whose proxy bids may answer it; the bid
+    and any automatic reply are written together. place_bid, the bid intake
+    and the async API hand such bids over here, already admitted.
+    """
+    return _settle_proxies(item_id, buyer_id, bid_amount=bid_amount)
+
+@instrumented
+def set_proxy_bid(item_id, buyer_id, max_amount):
+    """
+    Register or change a buyer's proxy (automatic) bid on an item.
+    The system then bids for them, AUCTION_CONFIG['bid_increment'] above
+    the runner-up, up to `max_amount`. Returns (success, message).
+    """
+    if max_amount is None or max_amount <= 0:
+        return False, "Maximum bid must be a positive amount"
+    try:
+        with write_admission.admit(buyer_id, item_id):
+            return _settle_proxies(item_id, buyer_id, max_amount=max_amount)
+    except WriteRejected as e:
+        return False, str(e)
+
+@instrumented
+def get_proxy_bids_by_user(buyer_id, limit=PAGE_SIZE):
+    """
+    A buyer's proxy bids, most recently changed first, with each item's
+    current price and whether the buyer is leading
+    """
+    def load():
+        with db_cursor(dictionary=True, readonly=True) as cursor:
+            cursor.execute(USER_PROXY_BIDS_QUERY, (buyer_id, limit))
+            return cursor.fetchall()
+
+    try:
+        proxies = _gather(load, key=lambda proxy: proxy['updated_at'], reverse=True, limit=limit)
+        for proxy in proxies:
+            proxy['leading'] = bool(proxy['leading'])
+        return proxies, "Automatic bids retrieved successfully"
+    except Error as e:
+        return [], f"Error retrieving automatic bids: {e}"
+
+def _archived_bids(column, value):
+    """
+    Archived bids whose `column` (item_id, buyer_id or seller_id) is `value`,
+    as dicts keyed by ARCHIVE_COLUMNS, from the files the current shard indexes
+    """
+    with db_cursor(readonly=True) as cursor:
+        cursor.execute(ARCHIVE_FILES_QUERY.format(column=column), (value,))
+        paths = [row[1] for row in cursor.fetchall()]
+    # A file written before its items' bucket moved is indexed on both shards
+    return _owned(current_shard(), [bid for path in paths for bid in read_archive(path, column, value)])
+
+def _newest_first(bid):
+    return bid['bid_time'], bid['bid_id']
+
+def _with_archived(bids, column, value, fields, key):
+    """
+    Merge live history rows with the archived bids of the same item, buyer
+    or seller, projected to `fields`, sorted by `key` in descending order.
+    The live rows must be read first: a bid archived in between is then
+    found in both places, and its live row is kept.
+    """
+    live = {bid['bid_id'] for bid in bids}
+    archived = [
+        {field: bid[field] for field in fields}
+        for bid in _archived_bids(column, value) if bid['bid_id'] not in live
+    ]
+    if not archived:
+        return bids
+    return sorted(bids + archived, key=key, reverse=True)
+
+@instrumented
 def get_bids_for_item(item_id):
     """
     Get all bids for a specific item
     """
-    connection = create_connection()
-    if connection is None:
-        return [], "Database connection failed"
-    
-    try:
-        cursor = connection.cursor(dictionary=True)
-        query = """
-        SELECT b.*, u.name as buyer_name
-        FROM bids b
-        JOIN users u ON b.buyer_id = u.user_id
-        WHERE b.item_id = %s
-        ORDER BY b.bid_amount DESC
-        """
-        cursor.execute(query, (item_id,))
-        bids = cursor.fetchall()
-        return bids, "Bids retrieved successfully"
-    except Error as e:
+    def load():
+        with db_cursor(dictionary=True, readonly=True) as cursor:
+            cursor.execute(ITEM_BIDS_QUERY, (item_id,))
+            bids = cursor.fetchall()
+            if not bids and is_sharded():
+                # None sends _on_item_shard to look for a moved item; no bids yet does not
+                cursor.execute(ITEM_EXISTS_QUERY, (item_id,))
+                if cursor.fetchone() is None:
+                    return None
+        return _with_archived(bids, 'item_id', item_id, BID_COLUMNS + ('buyer_name',), lambda bid: bid['bid_amount'])
+
+    try:
+        bids = _on_item_shard(item_id, load, lambda bids: bids is None)
+        return bids or [], "Bids retrieved successfully"
+    except (Error, OSError) as e:
         return [], f"Error retrieving bids: {e}"
-    finally:
-        if connection.is_connected():
-            cursor.close()
-            connection.close()
 
+@instrumented
 def get_bids_by_user(user_id):
     """
     Get all bids placed by a specific user
     """
-    connection = create_connection()
-    if connection is None:
-        return [], "Database connection failed"
-    
-    try:
-        cursor = connection.cursor(dictionary=True)
-        query = """
-        SELECT b.*, i.item_name
-        FROM bids b
-        JOIN items i ON b.item_id = i.item_id
-        WHERE b.buyer_id = %s
-        ORDER BY b.bid_time DESC
-        """
-        cursor.execute(query, (user_id,))
-        bids = cursor.fetchall()
+    def load():
+        with db_cursor(dictionary=True, readonly=True) as cursor:
+            query = """
+            SELECT b.*, i.item_name
+            FROM bids b
+            JOIN items i ON b.item_id = i.item_id
+            WHERE b.buyer_id = %s
+            ORDER BY b.bid_time DESC
+            """
+            cursor.execute(query, (user_id,))
+            bids = cursor.fetchall()
+        return _with_archived(bids, 'buyer_id', user_id, BID_COLUMNS + ('item_name',), _newest_first)
+
+    try:
+        bids = _gather(load, key=_newest_first, reverse=True)
+        return bids, "Bids retrieved successfully"
+    except (Error, OSError) as e:
+        return [], f"Error retrieving bids: {e}"
+
+@instrumented
+def get_bids_by_user_page(user_id, after_time=None, after_id=None, limit=PAGE_SIZE):
+    """
+    Get one page of a user's bids, newest first.
+    Pass the bid_time and bid_id of the last row of the previous page
+    as `after_time`/`after_id` to fetch the next page.
+    """
+    def load():
+        with db_cursor(dictionary=True, readonly=True) as cursor:
+            params = [user_id]
+            keyset = ""
+            if after_time is not None:
+                keyset = KEYSET_AFTER_BID
+                params += [after_time, after_time, after_id]
+            cursor.execute(USER_BIDS_PAGE_QUERY.format(keyset=keyset), (*params, limit))
+            return cursor.fetchall()
+
+    try:
+        bids = _gather(load, key=_newest_first, reverse=True, limit=limit)
         return bids, "Bids retrieved successfully"
     except Error as e:
         return [], f"Error retrieving bids: {e}"
-    finally:
-        if connection.is_connected():
-            cursor.close()
-            connection.close()
 
+@instrumented
 def get_items_by_seller(seller_id):
     """
     Get all items listed by a specific seller
     """
-    connection = create_connection()
-    if connection is None:
-        return [], "Database connection failed"
-    
-    try:
-        cursor = connection.cursor(dictionary=True)
-        query = """
-        SELECT i.item_id, i.item_name, i.description, i.base_price, i.seller_id
-        FROM items i
-        WHERE i.seller_id = %s
-        ORDER BY i.item_id
-        """
-        cursor.execute(query, (seller_id,))
-        items = cursor.fetchall()
+    def load():
+        with db_cursor(dictionary=True, readonly=True) as cursor:
+            query = """
+            SELECT i.item_id, i.item_name, i.description, i.base_price, i.seller_id
+            FROM items i
+            WHERE i.seller_id = %s
+            ORDER BY i.item_id
+            """
+            cursor.execute(query, (seller_id,))
+            return cursor.fetchall()
+
+    try:
+        items = _read_cached(('get_items_by_seller', seller_id), (('seller', seller_id),),
+                             lambda: _gather(load, key=_by_item_id))
+        return items, "Items retrieved successfully"
+    except Error as e:
+        return [], f"Error retrieving items: {e}"
+
+@instrumented
+def get_items_by_seller_page(seller_id, after_id=None, limit=PAGE_SIZE):
+    """
+    Get one page of a seller's items, ordered by ID, starting after `after_id`
+    """
+    def load():
+        with db_cursor(dictionary=True, readonly=True) as cursor:
+            cursor.execute(SELLER_ITEMS_PAGE_QUERY, (seller_id, after_id or 0, limit))
+            return cursor.fetchall()
+
+    try:
+        items = _read_cached(('get_items_by_seller_page', seller_id, after_id, limit), (('seller', seller_id),),
+                             lambda: _gather(load, key=_by_item_id, limit=limit))
         return items, "Items retrieved successfully"
     except Error as e:
         return [], f"Error retrieving items: {e}"
-    finally:
-        if connection.is_connected():
-            cursor.close()
-            connection.close()
 
+@instrumented
 def get_item_bids_by_seller(seller_id):
     """
     Get all bids placed on items listed by a specific seller
     """
-    connection = create_connection()
-    if connection is None:
-        return [], "Database connection failed"
-    
-    try:
-        cursor = connection.cursor(dictionary=True)
-        query = """
-        SELECT b.*, i.item_name, u.name as buyer_name
-        FROM bids b
-        JOIN items i ON b.item_id = i.item_id
-        JOIN users u ON b.buyer_id = u.user_id
-        WHERE i.seller_id = %s
-        ORDER BY b.bid_time DESC
-        """
-        cursor.execute(query, (seller_id,))
-        bids = cursor.fetchall()
+    def load():
+        with db_cursor(dictionary=True, readonly=True) as cursor:
+            query = """
+            SELECT b.*, i.item_name, u.name as buyer_name
+            FROM bids b
+            JOIN items i ON b.item_id = i.item_id
+            JOIN users u ON b.buyer_id = u.user_id
+            WHERE b.seller_id = %s
+            ORDER BY b.bid_time DESC
+            """
+            cursor.execute(query, (seller_id,))
+            bids = cursor.fetchall()
+        return _with_archived(bids, 'seller_id', seller_id, BID_COLUMNS + ('item_name', 'buyer_name'), _newest_first)
+
+    try:
+        bids = _read_cached(('get_item_bids_by_seller', seller_id), (('seller', seller_id),),
+                            lambda: _gather(load, key=_newest_first, reverse=True))
+        return bids, "Bids retrieved successfully"
+    except (Error, OSError) as e:
+        return [], f"Error retrieving bids: {e}"
+
+@instrumented
+def get_item_bids_by_seller_page(seller_id, after_time=None, after_id=None, limit=PAGE_SIZE):
+    """
+    Get one page of bids on a seller's items, newest first.
+    Pass the bid_time and bid_id of the last row of the previous page
+    as `after_time`/`after_id` to fetch the next page.
+    """
+    def load():
+        with db_cursor(dictionary=True, readonly=True) as cursor:
+            params = [seller_id]
+            keyset = ""
+            if after_time is not None:
+                keyset = KEYSET_AFTER_BID
+                params += [after_time, after_time, after_id]
+            cursor.execute(SELLER_BIDS_PAGE_QUERY.format(keyset=keyset), (*params, limit))
+            return cursor.fetchall()
+
+    try:
+        bids = _read_cached(('get_item_bids_by_seller_page', seller_id, after_time, after_id, limit), (('seller', seller_id),),
+                            lambda: _gather(load, key=_newest_first, reverse=True, limit=limit))
         return bids, "Bids retrieved successfully"
     except Error as e:
         return [], f"Error retrieving bids: {e}"
-    finally:
-        if connection.is_connected():
-            cursor.close()
-            connection.close()
 
+def _feed_filter(item_ids, seller_id):
+    # BID_FEED_QUERY filter and its parameters
+    if item_ids is not None:
+        return f"AND b.item_id IN ({', '.join(['%s'] * len(item_ids))})", list(item_ids)
+    if seller_id is not None:
+        return "AND b.seller_id = %s", [seller_id]
+    return "", []
+
+def _bids_since(cursor, feed_filter, filter_params, limit):
+    # get_bids_since on the current shard: (bids, next_cursor)
+    with db_cursor(dictionary=True, readonly=True) as db:
+        db.execute(BID_FEED_QUERY.format(filter=feed_filter), (cursor, *filter_params, limit))
+        bids = db.fetchall()
+
+    next_cursor = bids[-1]['bid_id'] if bids else cursor
+    settle = BID_FEED_CONFIG['settle'] if get_backend().name == 'mysql' else 0  # SQLite commits in id order
+    if bids and settle:
+        # Stop before the first recent bid; a missing id below it may still commit
+        recent = max(bid['bid_time'] for bid in bids) - timedelta(seconds=settle)
+        next_cursor = cursor
+        for bid in bids:
+            if bid['bid_time'] > recent:
+                break
+            next_cursor = bid['bid_id']
+    return bids, next_cursor
+
+def _shard_cursors(cursor):
+    """
+    A feed cursor as {shard: bid_id}, plus the shard map 'version' it was
+    made under. Each shard numbers its bids from shard * SHARD_ID_SPAN; a
+    plain number (0 to start from the beginning) applies to every shard.
+    """
+    if isinstance(cursor, dict):
+        cursors = {shard: cursor.get(shard, shard * SHARD_ID_SPAN) for shard in shard_ids()}
+    else:
+        cursors = {shard: max(cursor or 0, shard * SHARD_ID_SPAN) for shard in shard_ids()}
+    cursors['version'] = shard_map.version
+    return cursors
+
+@instrumented
+def get_bids_since(cursor=0, item_ids=None, seller_id=None, limit=None):
+    """
+    Bids with a bid_id above `cursor`, oldest first, optionally only on
+    `item_ids` or on one seller's items. Returns (bids, next_cursor, message);
+    pass next_cursor to the following call.
+    On MySQL a bid is numbered when inserted but seen only once committed,
+    so a lower id can appear after a higher one. There the cursor trails the
+    newest bids by BID_FEED_SETTLE seconds, and the next call may return
+    some of them again; callers skip bid_ids they already have.
+    With several shards the cursor is a {shard: bid_id} dict (see
+    bid_feed_cursor), bids come in bid_time order and each shard returns up
+    to `limit` of them. Moving a bucket renumbers its bids on the new shard,
+    so a cursor made before the shard map last changed could return them
+    again as new bids; instead, next_cursor comes back None and the caller
+    should reread the bids it shows and make a new cursor.
+    """
+    limit = limit or BID_FEED_CONFIG['limit']
+    if item_ids is not None and not item_ids:
+        return [], cursor, "Bids retrieved successfully"
+    feed_filter, filter_params = _feed_filter(item_ids, seller_id)
+
+    try:
+        if not is_sharded():
+            bids, next_cursor = _bids_since(cursor, feed_filter, filter_params, limit)
+            return bids, next_cursor, "Bids retrieved successfully"
+        refresh_shard_map()
+        if isinstance(cursor, dict) and cursor.get('version') != shard_map.version:
+            return [], None, "Items moved between shards, the bid feed must restart"
+        cursors = _shard_cursors(cursor)
+        shards = sorted({item_shard(item_id) for item_id in item_ids}) if item_ids is not None else None
+        results = _fan_out(lambda: _bids_since(cursors[current_shard()], feed_filter, filter_params, limit), shards)
+    except Error as e:
+        return [], cursor, f"Error retrieving bids: {e}"
+
+    bids = []
+    for shard, (shard_bids, next_cursor) in results:
+        bids += _owned(shard, shard_bids)
+        cursors[shard] = next_cursor
+    bids.sort(key=lambda bid: (bid['bid_time'], bid['bid_id']))
+    return bids, cursors, "Bids retrieved successfully"
+
+@instrumented
+def bid_feed_cursor(bids, item_ids=None, seller_id=None):
+    """
+    The get_bids_since cursor that follows `bids`, a page read just before
+    with the same filter: its highest bid_id, or with several shards the
+    highest per shard, and each other shard's newest matching bid.
+    Returns (cursor, message); if the newest bids cannot be read, the cursor
+    starts those shards from their first bid.
+    """
+    if not is_sharded():
+        return max((bid['bid_id'] for bid in bids), default=0), "Cursor created successfully"
+    refresh_shard_map()
+    cursors = {}
+    for bid in bids:
+        shard = bid['bid_id'] // SHARD_ID_SPAN
+        cursors[shard] = max(cursors.get(shard, 0), bid['bid_id'])
+    feed_filter, filter_params = _feed_filter(item_ids, seller_id)
+
+    def newest():
+        with db_cursor(readonly=True) as cursor:
+            cursor.execute(f"SELECT MAX(b.bid_id) FROM bids b WHERE 1 = 1 {feed_filter}", filter_params)
+            return cursor.fetchone()[0]
+
+    missing = [shard for shard in shard_ids() if shard not in cursors]
+    if missing and (item_ids is None or item_ids):
+        try:
+            for shard, bid_id in _fan_out(newest, missing):
+                cursors[shard] = bid_id or shard * SHARD_ID_SPAN
+        except Error as e:
+            return _shard_cursors(cursors), f"Error reading the newest bids, the feed starts from the first: {e}"
+    return _shard_cursors(cursors), "Cursor created successfully"
+
+@instrumented
+def get_seller_summary(seller_id):
+    """
+    Items listed, bids received, gross high-bid value and last bid time for
+    a seller, read from the trigger-maintained seller_stats row
+    """
+    def load_one():
+        with db_cursor(dictionary=True, readonly=True) as cursor:
+            query = """
+            SELECT items_listed, bids_received, gross_high_bid, last_bid_time
+            FROM seller_stats
+            WHERE seller_id = %s
+            """
+            cursor.execute(query, (seller_id,))
+            return cursor.fetchone()
+
+    def load():
+        rows = [row for shard, row in _fan_out(load_one) if row is not None]
+        if not rows:
+            # Sellers who have not listed anything yet have no row
+            return {'items_listed': 0, 'bids_received': 0, 'gross_high_bid': 0.0, 'last_bid_time': None}
+        summary = rows[0]
+        for row in rows[1:]:
+            # Each shard counts the seller's items it holds
+            summary['items_listed'] += row['items_listed']
+            summary['bids_received'] += row['bids_received']
+            summary['gross_high_bid'] += row['gross_high_bid']
+            if row['last_bid_time'] is not None:
+                summary['last_bid_time'] = max(summary['last_bid_time'] or row['last_bid_time'], row['last_bid_time'])
+        return summary
+
+    try:
+        summary = _read_cached(('get_seller_summary', seller_id), (('seller', seller_id),), load)
+        return summary, "Summary retrieved successfully"
+    except Error as e:
+        return None, f"Error retrieving summary: {e}"
+
+# seller_stats rows recomputed from scratch; {sellers} limits them to some sellers
+SELLER_STATS_REBUILD_QUERY = """
+INSERT INTO seller_stats (seller_id, items_listed, bids_received, gross_high_bid, last_bid_time)
+SELECT i.seller_id, COUNT(*), COALESCE(SUM(b.bid_count), 0), COALESCE(SUM(i.current_high_bid), 0), MAX(b.last_bid_time)
+FROM items i
+LEFT JOIN (
+    SELECT item_id, SUM(bid_count) AS bid_count, MAX(last_bid_time) AS last_bid_time
+    FROM (
+        SELECT item_id, COUNT(*) AS bid_count, MAX(bid_time) AS last_bid_time
+        FROM bids
+        GROUP BY item_id
+        UNION ALL
+        SELECT item_id, bid_count, last_bid_time
+        FROM bid_archive_index
+    ) all_bids
+    GROUP BY item_id
+) b ON b.item_id = i.item_id
+WHERE i.seller_id IS NOT NULL {sellers}
+GROUP BY i.seller_id
+"""
+
+def _rebuild_seller_stats(cursor, sellers=None):
+    # All seller_stats rows of the cursor's database, or only those of `sellers`
+    if sellers is None:
+        cursor.execute("DELETE FROM seller_stats")
+        cursor.execute(SELLER_STATS_REBUILD_QUERY.format(sellers=""))
+        return
+    sellers = sorted(sellers)
+    if not sellers:
+        return
+    placeholders = ", ".join(["%s"] * len(sellers))
+    cursor.execute(f"DELETE FROM seller_stats WHERE seller_id IN ({placeholders})", sellers)
+    cursor.execute(SELLER_STATS_REBUILD_QUERY.format(sellers=f"AND i.seller_id IN ({placeholders})"), sellers)
+
+@instrumented
+def rebuild_seller_stats():
+    """
+    Recompute seller_stats from items, bids and the bid archive index, e.g.
+    after loading data with the triggers disabled
+    """
+    try:
+        for shard in shard_ids():
+            with on_shard(shard), db_cursor(commit=True) as cursor:
+                _rebuild_seller_stats(cursor)
+        read_cache.clear()
+        return True, "Seller statistics rebuilt"
+    except Error as e:
+        return False, f"Error rebuilding seller statistics: {e}"
+
+@instrumented
 def highest_bids():
     """
-    Get the highest bid for each item
-    """
-    connection = create_connection()
-    if connection is None:
-        return [], "Database connection failed"
-    
-    try:
-        cursor = connection.cursor(dictionary=True)
-        query = """
-        SELECT i.item_name, i.item_id, u.name as buyer_name, b.bid_amount, b.bid_time
-        FROM items i
-        LEFT JOIN (
-            SELECT item_id, MAX(bid_amount) as max_bid
-            FROM bids
-            GROUP BY item_id
-        ) max_bids ON i.item_id = max_bids.item_id
-        LEFT JOIN bids b ON i.item_id = b.item_id AND b.bid_amount = max_bids.max_bid
-        LEFT JOIN users u ON b.buyer_id = u.user_id
-        ORDER BY b.bid_amount DESC
-        """
-        cursor.execute(query)
-        highest_bids = cursor.fetchall()
+    Get the highest bid for each item, served from the high-bid cache
+    """
+    def load():
+        _ensure_high_bid_cache()
+        rows = [
+            {key: entry[key] for key in ('item_name', 'item_id', 'buyer_name', 'bid_amount', 'bid_time')}
+            for entry in high_bid_cache.all()
+        ]
+        # Items without bids last, like ORDER BY ... DESC puts NULLs
+        rows.sort(key=lambda row: (row['bid_amount'] is None, -(row['bid_amount'] or 0), row['item_id']))
+        return rows
+
+    try:
+        # Built from the in-process high-bid cache, never from a replica
+        highest_bids = read_cache.get_or_load(('highest_bids',), ('items', 'bids'), load, settle=0)
         return highest_bids, "Highest bids retrieved successfully"
     except Error as e:
         return [], f"Error retrieving highest bids: {e}"
-    finally:
-        if connection.is_connected():
-            cursor.close()
-            connection.close()
 
+@instrumented
+def close_due_auctions(now=None, batch_size=None):
+    """
+    Close every open auction whose end time has passed, settling up to
+    `batch_size` auctions per transaction: the high bidder wins at their
+    bid, and an auction without bids settles with no winner.
+    Returns (settlements, message); on an error, the batches already
+    committed are still returned.
+    """
+    now = now or datetime.now()
+    batch_size = batch_size or AUCTION_CONFIG['close_batch_size']
+    settled = []
+    message = "No auctions were due"
+    try:
+        for shard in shard_ids():
+            while True:
+                with on_shard(shard), db_cursor(dictionary=True, commit=True) as cursor:
+                    # Locked rows make a concurrent bid either land first or see the auction closed
+                    cursor.execute(f"{ENDING_AUCTIONS_QUERY} FOR UPDATE", (now, batch_size))
+                    due = cursor.fetchall()
+                    batch = [
+                        {'item_id': row['item_id'], 'seller_id': row['seller_id'], 'winner_id': row['current_high_bidder_id'],
+                         'final_price': row['current_high_bid'], 'ends_at': row['ends_at'], 'closed_at': now}
+                        for row in _owned(shard, due)
+                    ]
+                    if batch:
+                        columns = ('item_id', 'seller_id', 'winner_id', 'final_price', 'ends_at', 'closed_at')
+                        placeholders = ", ".join(["(%s, %s, %s, %s, %s, %s)"] * len(batch))
+                        cursor.execute(
+                            f"INSERT INTO settlements ({', '.join(columns)}) VALUES {placeholders}",
+                            [row[column] for row in batch for column in columns]
+                        )
+                        placeholders = ", ".join(["%s"] * len(batch))
+                        cursor.execute(
+                            f"UPDATE items SET status = 'closed' WHERE item_id IN ({placeholders})",
+                            [row['item_id'] for row in batch]
+                        )
+                settled.extend(batch)
+                # Stray copies of moved items are left to `python shard_map.py move`
+                if len(due) < batch_size or not batch:
+                    break
+        if settled:
+            message = f"Closed {len(settled)} auctions"
+    except Error as e:
+        message = f"Error closing auctions: {e}"
+
+    if settled:
+        proxy_engine.drop(*(row['item_id'] for row in settled))
+        read_cache.bump(
+            'items', 'settlements',
+            *{('item', row['item_id']) for row in settled},
+            *{('seller', row['seller_id']) for row in settled}
+        )
+    return settled, message
+
+@instrumented
+def get_upcoming_closings(until, limit):
+    """
+    (item_id, ends_at) of open auctions ending by `until`, soonest first
+    """
+    def load():
+        with db_cursor(dictionary=True) as cursor:
+            cursor.execute(ENDING_AUCTIONS_QUERY, (until, limit))
+            return cursor.fetchall()
+
+    try:
+        rows = _gather(load, key=lambda row: row['ends_at'], limit=limit)
+        closings = [(row['item_id'], row['ends_at']) for row in rows]
+        return closings, "Closings retrieved successfully"
+    except Error as e:
+        return [], f"Error retrieving closings: {e}"
+
+def _latest_closed(result):
+    return result['closed_at'], result['item_id']
+
+@instrumented
+def get_auction_results(limit=PAGE_SIZE):
+    """
+    Most recently closed auctions with their winner and final price
+    """
+    def load():
+        with db_cursor(dictionary=True, readonly=True) as cursor:
+            cursor.execute(AUCTION_RESULTS_QUERY.format(where=""), (limit,))
+            return cursor.fetchall()
+
+    try:
+        results = _read_cached(('get_auction_results', limit), ('settlements',),
+                               lambda: _gather(load, key=_latest_closed, reverse=True, limit=limit))
+        return results, "Auction results retrieved successfully"
+    except Error as e:
+        return [], f"Error retrieving auction results: {e}"
+
+@instrumented
+def get_won_auctions(buyer_id, limit=PAGE_SIZE):
+    """
+    Closed auctions won by a buyer, most recent first
+    """
+    def load():
+        with db_cursor(dictionary=True, readonly=True) as cursor:
+            cursor.execute(AUCTION_RESULTS_QUERY.format(where="WHERE s.winner_id = %s"), (buyer_id, limit))
+            return cursor.fetchall()
+
+    try:
+        results = _read_cached(('get_won_auctions', buyer_id, limit), ('settlements',),
+                               lambda: _gather(load, key=_latest_closed, reverse=True, limit=limit))
+        return results, "Won auctions retrieved successfully"
+    except Error as e:
+        return [], f"Error retrieving won auctions: {e}"
+
+@instrumented
 def get_user_by_id(user_id):
     """
     Get user details by ID
     """
-    connection = create_connection()
-    if connection is None:
-        return None, "Database connection failed"
-    
     try:
-        cursor = connection.cursor(dictionary=True)
-        query = "SELECT user_id, name, email, role FROM users WHERE user_id = %s"
-        cursor.execute(query, (user_id,))
-        user = cursor.fetchone()
+        with db_cursor(dictionary=True, readonly=True) as cursor:
+            query = "SELECT user_id, name, email, role FROM users WHERE user_id = %s"
+            cursor.execute(query, (user_id,))
+            user = cursor.fetchone()
         return user, "User retrieved successfully"
     except Error as e:
         return None, f"Error retrieving user: {e}"
+
+@instrumented
+def archive_bid_history(now=None, batch_size=None):
+    """
+    Move the bids of auctions settled more than BID_ARCHIVE_AFTER_DAYS
+    before `now` into compressed archive files, `batch_size` auctions per
+    file. Each batch's file is written first, then one transaction indexes
+    it, deletes the live rows and marks the settlements archived; a failed
+    batch leaves no trace. Returns (bids archived, message).
+    """
+    now = now or datetime.now()
+    batch_size = batch_size or BID_ARCHIVE_CONFIG['batch_size']
+    cutoff = now - timedelta(days=BID_ARCHIVE_CONFIG['after_days'])
+    archived = 0
+    auctions = 0
+    message = "No bids were due for archiving"
+    try:
+        for shard in shard_ids():
+            while True:
+                path = None
+                committed = False
+                try:
+                    with on_shard(shard), db_cursor(commit=True) as cursor:
+                        # Locked rows keep concurrent archivers off the same auctions
+                        cursor.execute(f"{ARCHIVE_DUE_QUERY} FOR UPDATE", (cutoff, batch_size))
+                        due = [row[0] for row in cursor.fetchall()]
+                        item_ids = _owned(shard, due, item_id=lambda item_id: item_id)
+                        if not item_ids:
+                            break
+                        placeholders = ", ".join(["%s"] * len(item_ids))
+                        cursor.execute(ARCHIVE_BIDS_QUERY.format(placeholders=placeholders), item_ids)
+                        rows = cursor.fetchall()
+
+                        index = {}
+                        if rows:
+                            path = write_archive(rows, now)
+                            cursor.execute(
+                                "INSERT INTO bid_archives (path, bid_count, first_bid_time, last_bid_time, created_at) "
+                                "VALUES (%s, %s, %s, %s, %s)",
+                                (path, len(rows), min(row[7] for row in rows), max(row[7] for row in rows), now)
+                            )
+                            archive_id = cursor.lastrowid
+                            for bid_id, item_id, _, buyer_id, _, seller_id, _, bid_time in rows:
+                                entry = index.setdefault((item_id, buyer_id), [seller_id, 0, bid_time])
+                                entry[1] += 1
+                                entry[2] = max(entry[2], bid_time)
+                            entries = [(archive_id, item_id, buyer_id, *entry) for (item_id, buyer_id), entry in index.items()]
+                            for start in range(0, len(entries), BULK_INSERT_BATCH_SIZE):
+                                batch = entries[start:start + BULK_INSERT_BATCH_SIZE]
+                                cursor.execute(
+                                    "INSERT INTO bid_archive_index (archive_id, item_id, buyer_id, seller_id, bid_count, last_bid_time) "
+                                    f"VALUES {', '.join(['(%s, %s, %s, %s, %s, %s)'] * len(batch))}",
+                                    [value for entry in batch for value in entry]
+                                )
+                            cursor.execute(f"DELETE FROM bids WHERE item_id IN ({placeholders})", item_ids)
+                        cursor.execute(f"UPDATE settlements SET archived_at = %s WHERE item_id IN ({placeholders})", (now, *item_ids))
+                    committed = True
+                finally:
+                    if path is not None and not committed:
+                        remove_archive(path)
+
+                archived += len(rows)
+                auctions += len(item_ids)
+                if rows:
+                    read_cache.bump(
+                        'bids',
+                        *{('item', item_id) for item_id, _ in index},
+                        *{('buyer', buyer_id) for _, buyer_id in index},
+                        *{('seller', entry[0]) for entry in index.values()}
+                    )
+                if len(due) < batch_size:
+                    break
+        if auctions:
+            message = f"Archived {archived} bids of {auctions} auctions"
+    except (Error, OSError) as e:
+        message = f"Error archiving bids: {e}"
+        if auctions:
+            message += f" (after archiving {archived} bids of {auctions} auctions)"
+    return archived, message
+
+def _month_start(moment, months=0):
+    month = moment.year * 12 + moment.month - 1 + months
+    return datetime(month // 12, month % 12 + 1, 1)
+
+@instrumented
+def maintain_bid_partitions(now=None):
+    """
+    MySQL: split monthly partitions off bids' p_future up to
+    BID_PARTITION_MONTHS_AHEAD months past `now`, and drop partitions that
+    end before the archive cutoff and have been emptied by archiving.
+    Returns (changes made, message).
+    """
+    now = now or datetime.now()
+    if get_backend().name != 'mysql':
+        return [], "Bids are not partitioned on this backend"
+    changes = []
+    unpartitioned = []
+    try:
+        for shard in shard_ids():
+            prefix = f"shard {shard}: " if is_sharded() else ""
+            with on_shard(shard), db_cursor(dictionary=True, commit=True) as cursor:
+                cursor.execute(
+                    "SELECT PARTITION_NAME AS name, PARTITION_DESCRIPTION AS bound FROM information_schema.PARTITIONS "
+                    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'bids' ORDER BY PARTITION_ORDINAL_POSITION"
+                )
+                partitions = cursor.fetchall()
+                if not partitions or partitions[0]['name'] is None:
+                    # Shards done before this one keep their changes; go on to the rest
+                    unpartitioned.append(shard)
+                    continue
+
+                bounds = [int(partition['bound']) for partition in partitions if partition['bound'] != 'MAXVALUE']
+                month = _month_start(now)
+                if bounds:
+                    cursor.execute("SELECT FROM_UNIXTIME(%s) AS covered", (max(bounds),))
+                    month = _month_start(cursor.fetchone()['covered'])
+                last = _month_start(now, BID_ARCHIVE_CONFIG['partition_months_ahead'])
+                added = []
+                while month <= last:
+                    end = _month_start(month, 1)
+                    added.append(f"PARTITION p{month:%Y%m} VALUES LESS THAN (UNIX_TIMESTAMP('{end:%Y-%m-%d %H:%M:%S}'))")
+                    changes.append(f"{prefix}added partition p{month:%Y%m}")
+                    month = end
+                if added:
+                    cursor.execute(
+                        f"ALTER TABLE bids REORGANIZE PARTITION p_future INTO "
+                        f"({', '.join(added)}, PARTITION p_future VALUES LESS THAN MAXVALUE)"
+                    )
+
+                cutoff = now - timedelta(days=BID_ARCHIVE_CONFIG['after_days'])
+                cursor.execute("SELECT UNIX_TIMESTAMP(%s) AS cutoff", (cutoff,))
+                cutoff = int(cursor.fetchone()['cutoff'])
+                for partition in partitions:
+                    if partition['bound'] == 'MAXVALUE' or int(partition['bound']) > cutoff:
+                        continue
+                    cursor.execute(f"SELECT 1 FROM bids PARTITION ({partition['name']}) LIMIT 1")
+                    if cursor.fetchone() is None:
+                        # Unlike deleting rows, dropping a partition returns its space to the file system
+                        cursor.execute(f"ALTER TABLE bids DROP PARTITION {partition['name']}")
+                        changes.append(f"{prefix}dropped empty partition {partition['name']}")
+        message = f"Bid partitions maintained ({len(changes)} changes)"
+        if unpartitioned and is_sharded():
+            message += f"; bids are not partitioned on shard(s) {', '.join(map(str, unpartitioned))}, apply migration 009"
+        elif unpartitioned:
+            message = "Bids are not partitioned; apply migration 009"
+        return changes, message
+    except Error as e:
+        return changes, f"Error maintaining bid partitions: {e}"
+
+def _archive_referenced(path):
+    # Whether any shard still indexes bids in an archive file
+    if not is_sharded():
+        return False
+
+    def referenced():
+        with db_cursor() as cursor:
+            cursor.execute("SELECT 1 FROM bid_archives WHERE path = %s", (path,))
+            return cursor.fetchone() is not None
+
+    return any(found for shard, found in _fan_out(referenced))
+
+@instrumented
+def restore_archived_bids():
+    """
+    Move every archived bid back into the bids table, one archive file per
+    transaction, e.g. before reverting migration 009. With several shards,
+    each shard restores the bids of the items it indexes under new bid_ids
+    from its own range, and a file is removed once no shard indexes it.
+    Returns (bids restored, message).
+    """
+    restored = 0
+    archives = []
+    # Renumbered when sharded: a file written before a move holds ids of the old shard's range
+    columns = BID_COLUMNS[1:] if is_sharded() else BID_COLUMNS
+    try:
+        for shard in shard_ids():
+            with on_shard(shard), db_cursor() as cursor:
+                cursor.execute("SELECT archive_id, path FROM bid_archives ORDER BY archive_id")
+                shard_archives = cursor.fetchall()
+            archives += shard_archives
+            for archive_id, path in shard_archives:
+                with on_shard(shard), db_cursor(commit=True) as cursor:
+                    bids = list(read_archive(path))
+                    if is_sharded():
+                        cursor.execute("SELECT DISTINCT item_id FROM bid_archive_index WHERE archive_id = %s", (archive_id,))
+                        indexed = {row[0] for row in cursor.fetchall()}
+                        bids = [bid for bid in bids if bid['item_id'] in indexed]
+                    for start in range(0, len(bids), BULK_INSERT_BATCH_SIZE):
+                        batch = bids[start:start + BULK_INSERT_BATCH_SIZE]
+                        cursor.execute(
+                            f"INSERT INTO bids ({', '.join(columns)}) "
+                            f"VALUES {', '.join(['(' + ', '.join(['%s'] * len(columns)) + ')'] * len(batch))}",
+                            [bid[column] for bid in batch for column in columns]
+                        )
+                    item_ids = sorted({bid['item_id'] for bid in bids})
+                    if item_ids:
+                        placeholders = ", ".join(["%s"] * len(item_ids))
+                        cursor.execute(f"UPDATE settlements SET archived_at = NULL WHERE item_id IN ({placeholders})", item_ids)
+                    cursor.execute("DELETE FROM bid_archive_index WHERE archive_id = %s", (archive_id,))
+                    cursor.execute("DELETE FROM bid_archives WHERE archive_id = %s", (archive_id,))
+                if not _archive_referenced(path):
+                    remove_archive(path)
+                restored += len(bids)
+    except (Error, OSError) as e:
+        return restored, f"Error restoring archived bids: {e}"
     finally:
-        if connection.is_connected():
-            cursor.close()
-            connection.close()
\ No newline at end of file
+        if restored:
+            # The bids insert trigger counted the restored bids again
+            rebuild_seller_stats()
+    return restored, f"Restored {restored} bids from {len(archives)} archive files"
+
+@instrumented
+def bid_archive_status():
+    """
+    Live and archived bid counts, and bids' partitions on MySQL
+    (name, estimated rows, upper bound)
+    """
+    def load():
+        with db_cursor(dictionary=True) as cursor:
+            cursor.execute("SELECT COUNT(*) AS live_bids FROM bids")
+            status = cursor.fetchone()
+            cursor.execute("SELECT COUNT(*) AS archives, COALESCE(SUM(bid_count), 0) AS archived_bids FROM bid_archives")
+            status.update(cursor.fetchone())
+            status['partitions'] = []
+            if get_backend().name == 'mysql':
+                cursor.execute(
+                    "SELECT PARTITION_NAME AS name, TABLE_ROWS AS `rows`, "
+                    "IF(PARTITION_DESCRIPTION = 'MAXVALUE', 'MAXVALUE', FROM_UNIXTIME(PARTITION_DESCRIPTION)) AS bound "
+                    "FROM information_schema.PARTITIONS WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'bids' "
+                    "AND PARTITION_NAME IS NOT NULL ORDER BY PARTITION_ORDINAL_POSITION"
+                )
+                status['partitions'] = cursor.fetchall()
+        return status
+
+    try:
+        results = _fan_out(load)
+        status = results[0][1]
+        for shard, shard_status in results:
+            for partition in shard_status['partitions']:
+                partition['shard'] = shard
+            if shard:
+                # A file written before a move is counted by every shard that indexes part of it
+                for column in ('live_bids', 'archives', 'archived_bids'):
+                    status[column] += shard_status[column]
+                status['partitions'] += shard_status['partitions']
+        return status, "Archive status retrieved successfully"
+    except Error as e:
+        return None, f"Error retrieving archive status: {e}"
+
+def _owned_stream(shard, rows, item_column):
+    # The rows of one shard's stream whose item (column `item_column`) the shard owns
+    for row in rows:
+        if shard_map.shard_for(row[item_column]) == shard:
+            yield row
+
+def stream_csv(query, params=(), chunk_size=EXPORT_CHUNK_SIZE, compress=False, merge=None, key=None, item_column=None):
+    """
+    Yield the rows of `query` as CSV-encoded bytes, one chunk at a time.
+    Rows are read from an unbuffered cursor with fetchmany(), so memory use
+    is bounded by `chunk_size` whatever the size of the result. With
+    `compress` the output is a gzip stream. `merge`, if given, is called once
+    the query has run and returns more rows, sorted like the query by
+    descending `key`, to interleave with it (an iterator, to keep memory
+    bounded); a row whose first column
+    repeats the previous row's is written once. Given the position of the
+    item_id column, `item_column`, the query runs on every shard and their
+    rows are interleaved by `key` as well.
+    """
+    compressor = zlib.compressobj(wbits=31) if compress else None  # wbits=31 writes a gzip header
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        data = buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+        return compressor.compress(data) if compressor else data
+
+    def fetch(cursor):
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                return
+            yield from rows
+
+    sharded = is_sharded() and item_column is not None
+    if sharded:
+        refresh_shard_map()
+    with ExitStack() as stack:
+        streams = []
+        for shard in (shard_ids() if sharded else [current_shard()]):
+            with on_shard(shard):
+                cursor = stack.enter_context(db_cursor(readonly=True))
+                cursor.execute(query, params)
+            streams.append(_owned_stream(shard, fetch(cursor), item_column) if sharded else fetch(cursor))
+        writer.writerow(column[0] for column in cursor.description)
+        if merge is not None:
+            streams.append(merge())
+        rows = heapq.merge(*streams, key=key, reverse=True) if len(streams) > 1 else streams[0]
+        previous = None
+        written = 0
+        for row in rows:
+            if merge is not None:
+                if row[0] == previous:
+                    continue
+                previous = row[0]
+            writer.writerow(row)
+            written += 1
+            if written % chunk_size == 0:
+                chunk = flush()
+                if chunk:
+                    yield chunk
+
+    chunk = flush()
+    if compressor:
+        chunk += compressor.flush()
+    if chunk:
+        yield chunk
+
+def _archived_rows(column, value, columns):
+    """
+    Archived bids as tuples of `columns`, newest first, for
+    stream_csv(merge=...). The files are read as the merge consumes them,
+    holding one bid per file at a time.
+    """
+    sharded = is_sharded()
+    streams = []
+    for shard in (shard_ids() if sharded else [current_shard()]):
+        with on_shard(shard), db_cursor(readonly=True) as cursor:
+            cursor.execute(ARCHIVE_FILES_QUERY.format(column=column), (value,))
+            paths = [row[1] for row in cursor.fetchall()]
+        for path in paths:
+            bids = read_archive(path, column, value)
+            # A file written before its items' bucket moved is indexed on both shards
+            streams.append(_owned_stream(shard, bids, 'item_id') if sharded else bids)
+    for bid in heapq.merge(*streams, key=_newest_first, reverse=True):
+        yield tuple(bid[name] for name in columns)
+
+def export_bids_by_user_csv(user_id, compress=False):
+    """
+    Stream every bid placed by a user as CSV bytes, newest first, archived
+    bids included
+    """
+    query = """
+    SELECT b.bid_id, b.item_id, i.item_name, b.bid_amount, b.bid_time
+    FROM bids b
+    JOIN items i ON b.item_id = i.item_id
+    WHERE b.buyer_id = %s
+    ORDER BY b.bid_time DESC, b.bid_id DESC
+    """
+    columns = ('bid_id', 'item_id', 'item_name', 'bid_amount', 'bid_time')
+    return stream_csv(query, (user_id,), compress=compress, merge=lambda: _archived_rows('buyer_id', user_id, columns),
+                      key=lambda row: (row[4], row[0]), item_column=1)
+
+def export_item_bids_by_seller_csv(seller_id, compress=False):
+    """
+    Stream every bid placed on a seller's items as CSV bytes, newest first,
+    archived bids included
+    """
+    query = """
+    SELECT b.bid_id, b.item_id, i.item_name, b.buyer_id, u.name AS buyer_name, b.bid_amount, b.bid_time
+    FROM bids b
+    JOIN items i ON b.item_id = i.item_id
+    JOIN users u ON b.buyer_id = u.user_id
+    WHERE b.seller_id = %s
+    ORDER BY b.bid_time DESC, b.bid_id DESC
+    """
+    columns = ('bid_id', 'item_id', 'item_name', 'buyer_id', 'buyer_name', 'bid_amount', 'bid_time')
+    return stream_csv(query, (seller_id,), compress=compress, merge=lambda: _archived_rows('seller_id', seller_id, columns),
+                      key=lambda row: (row[6], row[0]), item_column=1)
+
+# Sharding administration, run through `python shard_map.py`
+
+# Upsert of a user's copy on another shard. Copies carry no password: only
+# the directory logs users in.
+USER_COPY_QUERY = {
+    'mysql': (
+        "INSERT INTO users (user_id, name, email, password, role) VALUES {values} "
+        "ON DUPLICATE KEY UPDATE name = VALUES(name), email = VALUES(email), role = VALUES(role)"
+    ),
+    'sqlite': (
+        "INSERT INTO users (user_id, name, email, password, role) VALUES {values} "
+        "ON CONFLICT (user_id) DO UPDATE SET name = excluded.name, email = excluded.email, role = excluded.role"
+    )
+}
+
+# An item's bucket, computed by the database
+BUCKET_EXPRESSION = {
+    'mysql': "MOD(item_id, %s)",
+    'sqlite': "item_id % %s"
+}
+
+def _new_item_ids(count):
+    """
+    Reserve `count` consecutive item ids from the directory's sequence
+    """
+    with on_shard(0), db_cursor(commit=True) as cursor:
+        cursor.execute("UPDATE id_sequences SET next_id = next_id + %s WHERE name = 'items'", (count,))
+        if cursor.rowcount == 0:
+            raise Error(msg="The item id sequence is missing; run `python shard_map.py init`")
+        cursor.execute("SELECT next_id FROM id_sequences WHERE name = 'items'")
+        next_id = cursor.fetchone()[0]
+    return range(next_id - count, next_id)
+
+def _copy_users(users, shards=None):
+    """
+    Upsert (user_id, name, email, role) rows into every shard but the
+    directory, or into `shards`
+    """
+    for shard in shards or shard_ids()[1:]:
+        with on_shard(shard), db_cursor(commit=True) as cursor:
+            for start in range(0, len(users), BULK_INSERT_BATCH_SIZE):
+                batch = users[start:start + BULK_INSERT_BATCH_SIZE]
+                values = ", ".join(["(%s, %s, %s, '', %s)"] * len(batch))
+                cursor.execute(USER_COPY_QUERY[get_backend().name].format(values=values),
+                               [value for user in batch for value in user])
+
+@instrumented
+def sync_users():
+    """
+    Copy every user from the directory to the other shards, e.g. after
+    adding a shard. Returns (users copied, message).
+    """
+    if not is_sharded():
+        return 0, "Only one database is configured"
+    copied = 0
+    last_id = 0
+    try:
+        while True:
+            with on_shard(0), db_cursor() as cursor:
+                cursor.execute(
+                    "SELECT user_id, name, email, role FROM users WHERE user_id > %s ORDER BY user_id LIMIT %s",
+                    (last_id, BULK_INSERT_BATCH_SIZE)
+                )
+                users = [tuple(user) for user in cursor.fetchall()]
+            if not users:
+                break
+            _copy_users(users)
+            copied += len(users)
+            last_id = users[-1][0]
+        return copied, f"Copied {copied} users to {len(shard_ids()) - 1} shard(s)"
+    except Error as e:
+        return copied, f"Error copying users: {e}"
+
+def _start_bid_ids(cursor, shard):
+    # Make the shard number its next bids from its own block of SHARD_ID_SPAN ids
+    cursor.execute("SELECT COALESCE(MAX(bid_id), 0) FROM bids")
+    start = max(cursor.fetchone()[0], shard * SHARD_ID_SPAN)
+    if get_backend().name == 'mysql':
+        cursor.execute(f"ALTER TABLE bids AUTO_INCREMENT = {int(start) + 1}")
+        return
+    cursor.execute("UPDATE sqlite_sequence SET seq = MAX(seq, %s) WHERE name = 'bids'", (start,))
+    if cursor.rowcount == 0:
+        cursor.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('bids', %s)", (start,))
+
+@instrumented
+def init_shards():
+    """
+    Prepare the shards for use: start the directory's item id sequence
+    above every item id in use, have each shard number its bids from its
+    own range, and copy the users. Safe to run again, e.g. after adding a
+    shard. Returns (success, message).
+    """
+    if not is_sharded():
+        return False, "Only one database is configured; set DB_SHARDS or SQLITE_SHARDS first"
+
+    def top_item_id():
+        with db_cursor() as cursor:
+            cursor.execute("SELECT COALESCE(MAX(item_id), 0) FROM items")
+            return cursor.fetchone()[0]
+
+    try:
+        top = max(item_id for shard, item_id in _fan_out(top_item_id))
+        with on_shard(0), db_cursor(commit=True) as cursor:
+            cursor.execute("SELECT next_id FROM id_sequences WHERE name = 'items'")
+            row = cursor.fetchone()
+            if row is None:
+                cursor.execute("INSERT INTO id_sequences (name, next_id) VALUES ('items', %s)", (top + 1,))
+            elif row[0] <= top:
+                cursor.execute("UPDATE id_sequences SET next_id = %s WHERE name = 'items'", (top + 1,))
+        for shard in shard_ids()[1:]:
+            with on_shard(shard), db_cursor(commit=True) as cursor:
+                _start_bid_ids(cursor, shard)
+    except Error as e:
+        return False, f"Error preparing shards: {e}"
+    copied, message = sync_users()
+    if message.startswith("Error"):
+        return False, message
+    return True, f"Prepared {len(shard_ids())} shards; item ids continue from {top + 1}; {message}"
+
+@instrumented
+def shard_status():
+    """
+    Buckets, items, bids and users per shard, and stray items: copies on a
+    shard that does not own their bucket, left by an interrupted move
+    """
+    def load():
+        shard = current_shard()
+        with db_cursor() as cursor:
+            counts = {'shard': shard, 'buckets': buckets.get(shard, 0)}
+            for table in ('items', 'bids', 'users'):
+                cursor.execute(f"SELECT COUNT(*) FROM {table}")
+                counts[table] = cursor.fetchone()[0]
+            expression = BUCKET_EXPRESSION[get_backend().name]
+            cursor.execute(f"SELECT {expression} AS bucket, COUNT(*) FROM items GROUP BY bucket", (shard_map.buckets,))
+            counts['stray_items'] = sum(
+                count for bucket, count in cursor.fetchall() if shard_map.owner_of_bucket(bucket) != shard
+            )
+        return counts
+
+    try:
+        refresh_shard_map(force=True)
+        buckets = shard_map.bucket_counts(shard_ids())
+        status = {'version': shard_map.version, 'shards': [counts for shard, counts in _fan_out(load)]}
+        return status, "Shard status retrieved successfully"
+    except Error as e:
+        return None, f"Error retrieving shard status: {e}"
+
+def _chunks(ids):
+    for start in range(0, len(ids), BULK_INSERT_BATCH_SIZE):
+        chunk = ids[start:start + BULK_INSERT_BATCH_SIZE]
+        yield chunk, ", ".join(["%s"] * len(chunk))
+
+def _select_items(cursor, table, ids, lock=False):
+    # Every row of `table` for the items `ids`
+    rows = []
+    for chunk, placeholders in _chunks(ids):
+        order = "ORDER BY bid_id" if table == 'bids' else ""
+        cursor.execute(f"SELECT * FROM {table} WHERE item_id IN ({placeholders}) {order}{' FOR UPDATE' if lock else ''}", chunk)
+        rows += cursor.fetchall()
+    return rows
+
+def _insert_rows(cursor, table, rows, skip=()):
+    # Multi-row INSERTs of dict rows, leaving out the `skip` columns
+    if not rows:
+        return
+    columns = [column for column in rows[0] if column not in skip]
+    row_placeholders = f"({', '.join(['%s'] * len(columns))})"
+    for start in range(0, len(rows), BULK_INSERT_BATCH_SIZE):
+        batch = rows[start:start + BULK_INSERT_BATCH_SIZE]
+        cursor.execute(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES {', '.join([row_placeholders] * len(batch))}",
+            [row[column] for row in batch for column in columns]
+        )
+
+def _purge_items(cursor, ids):
+    """
+    Delete items and everything hanging off them from the shard of a
+    dictionary cursor. Archive files are kept: the shard the items moved
+    to indexes their bids in them.
+    """
+    archive_ids = set()
+    for chunk, placeholders in _chunks(ids):
+        cursor.execute(
+            f"SELECT archive_id, SUM(bid_count) AS bid_count FROM bid_archive_index "
+            f"WHERE item_id IN ({placeholders}) GROUP BY archive_id",
+            chunk
+        )
+        for row in cursor.fetchall():
+            archive_ids.add(row['archive_id'])
+            cursor.execute("UPDATE bid_archives SET bid_count = bid_count - %s WHERE archive_id = %s",
+                           (row['bid_count'], row['archive_id']))
+        cursor.execute(f"DELETE FROM bid_archive_index WHERE item_id IN ({placeholders})", chunk)
+        for table in ('proxy_bids', 'bids', 'settlements', 'items'):
+            cursor.execute(f"DELETE FROM {table} WHERE item_id IN ({placeholders})", chunk)
+    for chunk, placeholders in _chunks(sorted(archive_ids)):
+        cursor.execute(f"DELETE FROM bid_archives WHERE archive_id IN ({placeholders}) AND bid_count <= 0", chunk)
+
+def _bucket_item_ids(bucket):
+    """
+    Ids of the items in a bucket on the current shard, looked up by primary
+    key so nothing outside the bucket is read
+    """
+    with db_cursor() as cursor:
+        cursor.execute("SELECT COALESCE(MAX(item_id), 0) FROM items")
+        candidates = list(range(bucket, cursor.fetchone()[0] + 1, shard_map.buckets))
+        ids = []
+        for chunk, placeholders in _chunks(candidates):
+            cursor.execute(f"SELECT item_id FROM items WHERE item_id IN ({placeholders})", chunk)
+            ids += [row[0] for row in cursor.fetchall()]
+    return sorted(ids)
+
+def _switch_bucket(bucket, shard):
+    # Point the directory's map at the bucket's new shard
+    with on_shard(0), db_cursor(commit=True) as cursor:
+        cursor.execute("SELECT COALESCE(MAX(version), 0) + 1 FROM shard_buckets")
+        version = cursor.fetchone()[0]
+        cursor.execute("DELETE FROM shard_buckets WHERE bucket = %s", (bucket,))
+        cursor.execute(
+            "INSERT INTO shard_buckets (bucket, shard, version, moved_at) VALUES (%s, %s, %s, %s)",
+            (bucket, shard, version, datetime.now())
+        )
+    refresh_shard_map(force=True)
+
+def _move_bucket(bucket, source, target, switch=True):
+    """
+    Move one bucket's items with their bids, proxy bids, settlements and
+    archive index rows from `source` to `target`, and with `switch` point
+    the map at `target`. The source rows stay locked from the first read
+    until they are deleted, so a concurrent bid either lands before the copy
+    or finds the item gone and is retried on `target`. Bids get new ids
+    from the target's range (an AUTO_INCREMENT counter cannot be moved back
+    below an id copied in), which the map version change tells bid feed
+    cursors about; see get_bids_since. Returns the number of items moved.
+    """
+    with on_shard(source):
+        ids = _bucket_item_ids(bucket)
+    if not ids and not switch:
+        return 0
+    with on_shard(source), db_cursor(dictionary=True, commit=True) as src:
+        items = _select_items(src, 'items', ids, lock=True)
+        ids = [item['item_id'] for item in items]
+        bids = _select_items(src, 'bids', ids)
+        proxies = _select_items(src, 'proxy_bids', ids)
+        settlements = _select_items(src, 'settlements', ids)
+        index = _select_items(src, 'bid_archive_index', ids)
+        archives = {}
+        for entry in index:
+            archives[entry['archive_id']] = archives.get(entry['archive_id'], 0) + entry['bid_count']
+        archive_rows = []
+        for chunk, placeholders in _chunks(sorted(archives)):
+            src.execute(f"SELECT * FROM bid_archives WHERE archive_id IN ({placeholders})", chunk)
+            archive_rows += src.fetchall()
+
+        user_ids = sorted((
+            {item[column] for item in items for column in ('seller_id', 'current_high_bidder_id')}
+            | {row['buyer_id'] for row in bids + proxies + index}
+            | {row['winner_id'] for row in settlements}
+            | {row['seller_id'] for row in bids + settlements + index}
+        ) - {None})
+        if target != 0 and user_ids:
+            users = []
+            with on_shard(0), db_cursor() as cursor:
+                for chunk, placeholders in _chunks(user_ids):
+                    cursor.execute(f"SELECT user_id, name, email, role FROM users WHERE user_id IN ({placeholders})", chunk)
+                    users += [tuple(user) for user in cursor.fetchall()]
+            _copy_users(users, [target])
+
+        sellers = {item['seller_id'] for item in items} - {None}
+        with on_shard(target), db_cursor(dictionary=True, commit=True) as dst:
+            _purge_items(dst, ids)  # left by an interrupted move
+            # A new proxy_version makes every process reload the item's proxies
+            _insert_rows(dst, 'items', [dict(item, proxy_version=item['proxy_version'] + 1) for item in items])
+            _insert_rows(dst, 'bids', bids, skip=('bid_id',))
+            _insert_rows(dst, 'proxy_bids', proxies, skip=('proxy_id',))
+            _insert_rows(dst, 'settlements', settlements)
+            archive_ids = {}
+            for archive in archive_rows:
+                dst.execute("SELECT archive_id FROM bid_archives WHERE path = %s", (archive['path'],))
+                row = dst.fetchone()
+                if row is not None:
+                    archive_ids[archive['archive_id']] = row['archive_id']
+                    dst.execute("UPDATE bid_archives SET bid_count = bid_count + %s WHERE archive_id = %s",
+                                (archives[archive['archive_id']], row['archive_id']))
+                else:
+                    _insert_rows(dst, 'bid_archives', [dict(archive, bid_count=archives[archive['archive_id']])],
+                                 skip=('archive_id',))
+                    archive_ids[archive['archive_id']] = dst.lastrowid
+            _insert_rows(dst, 'bid_archive_index', [dict(entry, archive_id=archive_ids[entry['archive_id']]) for entry in index])
+            _rebuild_seller_stats(dst, sellers)
+
+        if switch:
+            _switch_bucket(bucket, target)
+        _purge_items(src, ids)
+        _rebuild_seller_stats(src, sellers)
+
+    proxy_engine.drop(*ids)
+    read_cache.clear()
+    return len(ids)
+
+@instrumented
+def move_buckets(buckets, target):
+    """
+    Move buckets to shard `target` one at a time while the site stays up.
+    Once all are moved, and every process has had time to reread the map,
+    items that processes with an older map added to the old shards are moved
+    too. Only one mover may run at a time. Returns (moves, message), each
+    move being (bucket, from shard, to shard, items moved).
+    """
+    if target not in shard_ids():
+        return [], f"Error: shard {target} is not configured"
+    for bucket in buckets:
+        if not 0 <= bucket < shard_map.buckets:
+            return [], f"Error: bucket {bucket} is not between 0 and {shard_map.buckets - 1}"
+    moved = []
+    try:
+        refresh_shard_map(force=True)
+        for bucket in buckets:
+            source = shard_map.owner_of_bucket(bucket)
+            if source != target:
+                moved.append((bucket, source, target, _move_bucket(bucket, source, target)))
+        if moved:
+            time.sleep(shard_map.refresh_seconds + shard_map.move_grace_seconds)
+            moved = [
+                (bucket, source, target, count + _move_bucket(bucket, source, target, switch=False))
+                for bucket, source, target, count in moved
+            ]
+    except Error as e:
+        return moved, f"Error moving buckets: {e}"
+    return moved, f"Moved {len(moved)} bucket(s) to shard {target}"
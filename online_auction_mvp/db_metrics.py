@@ -0,0 +1,437 @@
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import bisect
+import inspect
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+METRICS_CONFIG = {
+    'slow_query_ms': float(os.getenv('SLOW_QUERY_MS', 200)),
+    'explain_slow_queries': os.getenv('SLOW_QUERY_EXPLAIN', 'false').lower() in ('1', 'true', 'yes'),
+    'slow_query_history': int(os.getenv('SLOW_QUERY_HISTORY', 100)),  # Recent slow queries kept for slow_queries()
+    'port': int(os.getenv('METRICS_PORT', 0))  # 0 disables the /metrics endpoint
+}
+
+# Upper bounds in seconds; row counts use ROW_BUCKETS
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+ROW_BUCKETS = (0, 1, 10, 50, 100, 500, 1000, 10000, 100000)
+
+slow_query_log = logging.getLogger('auction.slow_query')
+
+class Histogram:
+    """
+    Cumulative-bucket histogram in the Prometheus style
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class MetricsRegistry:
+    """
+    In-process histograms and counters keyed by metric name and label value
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}  # (name, label_name, label_value) -> Histogram
+        self._counters = {}  # (name, label_name, label_value) -> int
+        self._help = {}
+        self._collectors = []
+
+    def observe(self, name, label_name, label_value, value, buckets=LATENCY_BUCKETS, help_text=''):
+        with self._lock:
+            key = (name, label_name, label_value)
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+                self._help.setdefault(name, help_text)
+            histogram.observe(value)
+
+    def increment(self, name, label_name, label_value, amount=1, help_text=''):
+        with self._lock:
+            key = (name, label_name, label_value)
+            self._counters[key] = self._counters.get(key, 0) + amount
+            self._help.setdefault(name, help_text)
+
+    def add_collector(self, prefix, collect):
+        """
+        Register `collect()` returning {name: number}; exported as gauges named prefix_name
+        """
+        with self._lock:
+            self._collectors.append((prefix, collect))
+
+    def snapshot(self):
+        """
+        Per-metric summary: count, sum and mean for histograms, value for counters
+        """
+        with self._lock:
+            result = {}
+            for (name, label_name, label_value), histogram in self._histograms.items():
+                result.setdefault(name, {})[label_value] = {
+                    'count': histogram.count,
+                    'sum': histogram.sum,
+                    'mean': histogram.sum / histogram.count if histogram.count else 0.0
+                }
+            for (name, label_name, label_value), value in self._counters.items():
+                result.setdefault(name, {})[label_value] = value
+            return result
+
+    def render_prometheus(self):
+        """
+        Text exposition format (version 0.0.4)
+        """
+        lines = []
+        with self._lock:
+            for name in sorted({key[0] for key in self._histograms}):
+                lines.append(f"# HELP {name} {self._help.get(name, '')}")
+                lines.append(f"# TYPE {name} histogram")
+                for (metric, label_name, label_value), histogram in sorted(self._histograms.items()):
+                    if metric != name:
+                        continue
+                    label = f'{label_name}="{_escape(label_value)}"'
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{{label},le="{bound}"}} {cumulative}')
+                    lines.append(f'{name}_bucket{{{label},le="+Inf"}} {histogram.count}')
+                    lines.append(f"{name}_sum{{{label}}} {histogram.sum}")
+                    lines.append(f"{name}_count{{{label}}} {histogram.count}")
+            for name in sorted({key[0] for key in self._counters}):
+                lines.append(f"# HELP {name} {self._help.get(name, '')}")
+                lines.append(f"# TYPE {name} counter")
+                for (metric, label_name, label_value), value in sorted(self._counters.items()):
+                    if metric == name:
+                        lines.append(f'{name}{{{label_name}="{_escape(label_value)}"}} {value}')
+            collectors = list(self._collectors)
+
+        for prefix, collect in collectors:
+            try:
+                values = collect()
+            except Exception:
+                continue
+            for key, value in sorted(values.items()):
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                name = f"{prefix}_{re.sub(r'[^a-zA-Z0-9_]', '_', key)}"
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+metrics = MetricsRegistry()
+
+class _Call:
+    __slots__ = ('operation', 'error', 'slow')
+
+    def __init__(self, operation):
+        self.operation = operation
+        self.error = False
+        self.slow = []
+
+_current_call = ContextVar('current_db_call', default=None)
+
+def current_operation():
+    call = _current_call.get()
+    return call.operation if call is not None else 'other'
+
+def instrumented(fn=None, *, operation=None):
+    """
+    Record total latency and errors of a data-access function under its name
+    (or `operation`). Errors are counted even when the function turns them
+    into a message. Coroutine functions are timed until they complete and
+    recorded as async_<name>.
+    """
+    if fn is None:
+        return lambda fn: instrumented(fn, operation=operation)
+
+    if inspect.iscoroutinefunction(fn):
+        operation = operation or f"async_{fn.__name__}"
+
+        @wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            # Each task runs in its own context, so concurrent calls keep separate _Calls
+            call = _Call(operation)
+            token = _current_call.set(call)
+            started = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            except Exception:
+                call.error = True
+                raise
+            finally:
+                _current_call.reset(token)
+                _record_call(call, time.perf_counter() - started)
+        return async_wrapper
+
+    operation = operation or fn.__name__
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        call = _Call(operation)
+        token = _current_call.set(call)
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        except Exception:
+            call.error = True
+            raise
+        finally:
+            _current_call.reset(token)
+            _record_call(call, time.perf_counter() - started)
+    return wrapper
+
+def _record_call(call, seconds):
+    operation = call.operation
+    metrics.observe('db_operation_seconds', 'operation', operation, seconds,
+                    help_text='Total time spent in a db_config function')
+    metrics.increment('db_operation_calls_total', 'operation', operation,
+                      help_text='Calls to a db_config function')
+    if call.error:
+        metrics.increment('db_operation_errors_total', 'operation', operation,
+                          help_text='Calls that hit a database error')
+    for statement, params, elapsed, shard in call.slow:
+        _log_slow_query(operation, statement, params, elapsed, shard)
+
+def record_acquire(seconds):
+    metrics.observe('db_acquire_seconds', 'operation', current_operation(), seconds,
+                    help_text='Time to obtain a connection and cursor')
+
+def _mark_error():
+    call = _current_call.get()
+    if call is not None:
+        call.error = True
+
+def record_error():
+    """
+    Count a database error against the current call, or as 'other'
+    """
+    call = _current_call.get()
+    if call is not None:
+        call.error = True
+    else:
+        metrics.increment('db_operation_errors_total', 'operation', 'other')
+
+class InstrumentedCursor:
+    """
+    Cursor proxy timing execute and fetch calls and counting fetched rows.
+    A statement's duration is its execute time plus the fetches that follow
+    it; statements slower than SLOW_QUERY_MS are logged once the enclosing
+    data-access call returns, with the `shard` the cursor is on, if any.
+    """
+
+    def __init__(self, cursor, shard=None):
+        self._cursor = cursor
+        self._shard = shard
+        self._statement = None
+        self._params = None
+        self._elapsed = 0.0
+        self._rows = 0
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def finish(self):
+        """
+        Close out timing of the last statement; called when the cursor is released
+        """
+        self._finish_statement()
+
+    def _finish_statement(self):
+        if self._statement is None:
+            return
+        operation = current_operation()
+        metrics.observe('db_rows_fetched', 'operation', operation, self._rows, buckets=ROW_BUCKETS,
+                        help_text='Rows fetched per statement')
+        if self._elapsed * 1000 >= METRICS_CONFIG['slow_query_ms']:
+            metrics.increment('db_slow_queries_total', 'operation', operation,
+                              help_text='Statements slower than SLOW_QUERY_MS')
+            call = _current_call.get()
+            entry = (self._statement, self._params, self._elapsed, self._shard)
+            if call is not None:
+                call.slow.append(entry)
+            else:
+                _log_slow_query(operation, *entry)
+        self._statement = None
+
+    def _timed(self, metric, method, *args):
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        except Exception:
+            _mark_error()
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            self._elapsed += elapsed
+            metrics.observe(metric, 'operation', current_operation(), elapsed,
+                            help_text=f"Time spent in cursor.{method.__name__}")
+
+    def execute(self, query, params=()):
+        self._finish_statement()
+        self._statement, self._params, self._elapsed, self._rows = query, params, 0.0, 0
+        return self._timed('db_execute_seconds', self._cursor.execute, query, params)
+
+    def executemany(self, query, seq_of_params):
+        self._finish_statement()
+        self._statement, self._params, self._elapsed, self._rows = query, None, 0.0, 0
+        return self._timed('db_execute_seconds', self._cursor.executemany, query, seq_of_params)
+
+    def fetchone(self):
+        row = self._timed('db_fetch_seconds', self._cursor.fetchone)
+        self._rows += row is not None
+        return row
+
+    def fetchmany(self, size):
+        rows = self._timed('db_fetch_seconds', self._cursor.fetchmany, size)
+        self._rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._timed('db_fetch_seconds', self._cursor.fetchall)
+        self._rows += len(rows)
+        return rows
+
+    def close(self):
+        self._finish_statement()
+        return self._cursor.close()
+
+class AsyncInstrumentedCursor(InstrumentedCursor):
+    """
+    InstrumentedCursor for the async backends, whose execute and fetch
+    methods are coroutines. Timings include waiting for the event loop.
+    """
+
+    async def _timed(self, metric, method, *args):
+        started = time.perf_counter()
+        try:
+            return await method(*args)
+        except Exception:
+            _mark_error()
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            self._elapsed += elapsed
+            metrics.observe(metric, 'operation', current_operation(), elapsed,
+                            help_text=f"Time spent in cursor.{method.__name__}")
+
+    async def execute(self, query, params=()):
+        self._finish_statement()
+        self._statement, self._params, self._elapsed, self._rows = query, params, 0.0, 0
+        return await self._timed('db_execute_seconds', self._cursor.execute, query, params)
+
+    async def executemany(self, query, seq_of_params):
+        self._finish_statement()
+        self._statement, self._params, self._elapsed, self._rows = query, None, 0.0, 0
+        return await self._timed('db_execute_seconds', self._cursor.executemany, query, seq_of_params)
+
+    async def fetchone(self):
+        row = await self._timed('db_fetch_seconds', self._cursor.fetchone)
+        self._rows += row is not None
+        return row
+
+    async def fetchmany(self, size):
+        rows = await self._timed('db_fetch_seconds', self._cursor.fetchmany, size)
+        self._rows += len(rows)
+        return rows
+
+    async def fetchall(self):
+        rows = await self._timed('db_fetch_seconds', self._cursor.fetchall)
+        self._rows += len(rows)
+        return rows
+
+    async def close(self):
+        self._finish_statement()
+        return await self._cursor.close()
+
+_slow_queries = deque(maxlen=METRICS_CONFIG['slow_query_history'])
+_explain = None  # set by db_config: explain(statement, params, shard) -> list of plan rows
+
+def set_explainer(explain):
+    global _explain
+    _explain = explain
+
+def _log_slow_query(operation, statement, params, seconds, shard=None):
+    entry = {
+        'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'operation': operation,
+        'ms': round(seconds * 1000, 2),
+        'statement': ' '.join(statement.split()),
+        'params': [str(value) for value in params] if params else None
+    }
+    if shard is not None:
+        entry['shard'] = shard
+    if METRICS_CONFIG['explain_slow_queries'] and _explain is not None and statement.lstrip().upper().startswith('SELECT'):
+        try:
+            # Logged after the call returns, so the plan comes from the shard recorded with the statement
+            entry['plan'] = [[str(value) for value in row] for row in _explain(statement, params, shard)]
+        except Exception as e:
+            entry['plan_error'] = str(e)
+    _slow_queries.append(entry)
+    slow_query_log.warning(json.dumps(entry))
+
+def slow_queries():
+    """
+    Most recent slow statements, oldest first
+    """
+    return list(_slow_queries)
+
+@contextmanager
+def page_timer(page):
+    """
+    Time one Streamlit rerun of a page
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.observe('page_render_seconds', 'page', page, time.perf_counter() - started,
+                        help_text='Time to render a Streamlit page')
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = metrics.render_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+_server = None
+_server_lock = threading.Lock()
+
+def start_metrics_server(port=None, host='127.0.0.1'):
+    """
+    Serve /metrics on a background thread; safe to call on every rerun
+    """
+    global _server
+    port = METRICS_CONFIG['port'] if port is None else port
+    if not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            threading.Thread(target=_server.serve_forever, name='metrics-server', daemon=True).start()
+    return _server
@@ -0,0 +1,266 @@
+"""
+Versioned schema migrations.
+
+Scripts live in migrations/<backend>/ as NNN_name.up.sql and
+NNN_name.down.sql, and applied versions are recorded in schema_migrations.
+Statements that fail only because their change is already in place (or
+already undone) are skipped, so a migration that stopped halfway can simply
+be run again. schema.sql and schema_sqlite.sql always describe the latest
+version and record every migration they include. With several shards
+(see shard_map.py) every command runs on each shard in turn.
+
+    python migrate.py status
+    python migrate.py up [--to VERSION]
+    python migrate.py down [--to VERSION]
+    python migrate.py check
+"""
+import argparse
+import os
+import re
+import sqlite3
+import sys
+
+from db_backends import Error
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+# Errors meaning the statement's change is already applied or already undone
+ALREADY_DONE_ERRNOS = {
+    1050,  # ER_TABLE_EXISTS_ERROR
+    1051,  # ER_BAD_TABLE_ERROR
+    1060,  # ER_DUP_FIELDNAME
+    1061,  # ER_DUP_KEYNAME
+    1091,  # ER_CANT_DROP_FIELD_OR_KEY
+    1359,  # ER_TRG_ALREADY_EXISTS
+    1360,  # ER_TRG_DOES_NOT_EXIST
+    1505,  # ER_PARTITION_MGMT_ON_NONPARTITIONED
+    1826   # ER_FK_DUP_NAME
+}
+
+TRACKING_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INT PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+def load_migrations(backend_name):
+    """
+    Migrations for a backend, ordered by version, as dicts with
+    version, name, up and down (script paths)
+    """
+    directory = os.path.join(MIGRATIONS_DIR, backend_name)
+    migrations = {}
+    for file_name in sorted(os.listdir(directory)):
+        match = re.fullmatch(r'(\d+)_(\w+)\.(up|down)\.sql', file_name)
+        if match:
+            version = int(match.group(1))
+            migration = migrations.setdefault(version, {'version': version, 'name': match.group(2), 'up': None, 'down': None})
+            migration[match.group(3)] = os.path.join(directory, file_name)
+    return [migrations[version] for version in sorted(migrations)]
+
+def split_statements(script, backend_name):
+    """
+    Split a script into statements, dropping comment-only lines.
+    SQLite trigger bodies contain semicolons, so there a statement ends only
+    where sqlite3 considers it complete.
+    """
+    statements = []
+    buffer = []
+    for line in script.splitlines():
+        if not buffer and (not line.strip() or line.lstrip().startswith('--')):
+            continue
+        buffer.append(line)
+        text = "\n".join(buffer)
+        if line.rstrip().endswith(';') and (backend_name != 'sqlite' or sqlite3.complete_statement(text)):
+            statements.append(text.rstrip().rstrip(';'))
+            buffer = []
+    if "\n".join(buffer).strip():
+        statements.append("\n".join(buffer))
+    return statements
+
+def run_script(cursor, path, backend_name, log=print):
+    """
+    Execute every statement in a script; returns the number skipped as already done
+    """
+    with open(path) as f:
+        statements = split_statements(f.read(), backend_name)
+    skipped = 0
+    for statement in statements:
+        try:
+            cursor.execute(statement)
+        except Error as e:
+            if e.errno not in ALREADY_DONE_ERRNOS:
+                raise
+            skipped += 1
+            if log:
+                log(f"  skipped (already done): {' '.join(statement.split())[:80]} [{e.errno}]")
+    return skipped
+
+def applied_versions(cursor):
+    cursor.execute(TRACKING_TABLE)
+    cursor.execute("SELECT version FROM schema_migrations ORDER BY version")
+    return [row[0] for row in cursor.fetchall()]
+
+def upgrade(transaction, backend_name, target=None, log=print):
+    """
+    Apply pending migrations up to `target` (default: all), oldest first.
+    `transaction()` must return a context manager yielding a cursor that
+    commits on exit; each migration runs and is recorded in its own.
+    Returns the versions applied.
+    """
+    with transaction() as cursor:
+        applied = set(applied_versions(cursor))
+    done = []
+    for migration in load_migrations(backend_name):
+        if migration['version'] in applied or (target is not None and migration['version'] > target):
+            continue
+        if log:
+            log(f"Applying {migration['version']:03d}_{migration['name']}")
+        with transaction() as cursor:
+            run_script(cursor, migration['up'], backend_name, log)
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                (migration['version'], migration['name'])
+            )
+        done.append(migration['version'])
+    return done
+
+def downgrade(transaction, backend_name, target, log=print):
+    """
+    Revert applied migrations newer than `target`, newest first.
+    Returns the versions reverted.
+    """
+    with transaction() as cursor:
+        applied = set(applied_versions(cursor))
+    done = []
+    for migration in reversed(load_migrations(backend_name)):
+        if migration['version'] not in applied or migration['version'] <= target:
+            continue
+        if migration['down'] is None:
+            raise ValueError(f"Migration {migration['version']:03d}_{migration['name']} has no down script")
+        if log:
+            log(f"Reverting {migration['version']:03d}_{migration['name']}")
+        with transaction() as cursor:
+            run_script(cursor, migration['down'], backend_name, log)
+            cursor.execute("DELETE FROM schema_migrations WHERE version = %s", (migration['version'],))
+        done.append(migration['version'])
+    return done
+
+def index_checks(backend_name):
+    """
+    (label, query, params, table alias, expected index, ordered) for each hot
+    db_config query. `ordered` queries must also be returned in index order,
+    without a filesort / temporary B-tree.
+    """
+    from db_config import (
+        ARCHIVE_DUE_QUERY, ARCHIVE_FILES_QUERY, BID_FEED_QUERY, ENDING_AUCTIONS_QUERY, ITEM_BIDS_QUERY, ITEM_DETAIL_QUERY,
+        ITEM_LOOKUP_QUERY, PROXY_BIDS_QUERY, SELLER_BIDS_PAGE_QUERY, SELLER_ITEMS_PAGE_QUERY, USER_BIDS_PAGE_QUERY,
+        KEYSET_AFTER_BID, _search_statement
+    )
+    checks = []
+    if backend_name == 'mysql':
+        # MATCH() only uses a FULLTEXT index whose columns it lists exactly;
+        # on SQLite the FTS5 table is the index
+        search, search_params = _search_statement('mysql', ('lamp',), None, None, "", 'relevance', 50)
+        checks.append(('search_items', search, search_params, 'i', 'ft_items_name_description', False))
+    return checks + [
+        ('get_bids_for_item', ITEM_BIDS_QUERY, (1,), 'b', 'idx_bids_item_amount', True),
+        ('get_bids_by_user_page', USER_BIDS_PAGE_QUERY.format(keyset=""), (1, 50), 'b', 'idx_bids_buyer_time', True),
+        ('get_bids_by_user_page (next page)', USER_BIDS_PAGE_QUERY.format(keyset=KEYSET_AFTER_BID),
+         (1, '2038-01-01 00:00:00', '2038-01-01 00:00:00', 1, 50), 'b', 'idx_bids_buyer_time', True),
+        ('get_item_bids_by_seller_page', SELLER_BIDS_PAGE_QUERY.format(keyset=""), (1, 50), 'b', 'idx_bids_seller_time', True),
+        ('get_item_bids_by_seller_page (next page)', SELLER_BIDS_PAGE_QUERY.format(keyset=KEYSET_AFTER_BID),
+         (1, '2038-01-01 00:00:00', '2038-01-01 00:00:00', 1, 50), 'b', 'idx_bids_seller_time', True),
+        ('get_items_by_seller_page', SELLER_ITEMS_PAGE_QUERY, (1, 0, 50), 'i', 'idx_items_seller_id', True),
+        ('get_item_detail (recent bids)', ITEM_DETAIL_QUERY, (1, 5, 1), 'bids', 'idx_bids_item_id', False),
+        ('lookup_items', ITEM_LOOKUP_QUERY, ('a%', 20), 'items', 'idx_items_status_item_name', True),
+        ('get_bids_since (item)', BID_FEED_QUERY.format(filter="AND b.item_id IN (%s)"), (0, 1, 50), 'b', 'idx_bids_item_id', True),
+        ('get_bids_since (seller)', BID_FEED_QUERY.format(filter="AND b.seller_id = %s"), (0, 1, 50), 'b', 'idx_bids_seller_id', True),
+        ('close_due_auctions', ENDING_AUCTIONS_QUERY, ('2038-01-01 00:00:00', 1000), 'items', 'idx_items_status_ends_at', True),
+        ('proxy bids of an item', PROXY_BIDS_QUERY, (1, 10), 'proxy_bids', 'idx_proxy_bids_item_max', False),
+        ('archive_bid_history', ARCHIVE_DUE_QUERY, ('2038-01-01 00:00:00', 500), 'settlements', 'idx_settlements_archived_closed', True),
+        ('archived bids of a buyer', ARCHIVE_FILES_QUERY.format(column='buyer_id'), (1,), 'x', 'idx_bid_archive_index_buyer', False),
+        ('archived bids of a seller', ARCHIVE_FILES_QUERY.format(column='seller_id'), (1,), 'x', 'idx_bid_archive_index_seller', False)
+    ]
+
+def _plan_problems(backend_name, plan, alias, index, ordered):
+    if backend_name == 'sqlite':
+        # EXPLAIN QUERY PLAN rows: (id, parent, notused, detail)
+        details = [row['detail'] for row in plan]
+        if not any(re.match(rf"(SEARCH|SCAN) {alias}\b.*\bINDEX {index}\b", detail) for detail in details):
+            yield f"{alias} does not use {index}"
+        if ordered and any('TEMP B-TREE' in detail for detail in details):
+            yield "sorts with a temporary B-tree"
+    else:
+        rows = [row for row in plan if row['table'] == alias]
+        if not rows or rows[0]['key'] != index:
+            yield f"{alias} uses {rows[0]['key'] if rows else None} instead of {index}"
+        if ordered and any('filesort' in (row['Extra'] or '') or 'temporary' in (row['Extra'] or '') for row in plan):
+            yield "sorts with a filesort or temporary table"
+
+def check(log=print):
+    """
+    EXPLAIN each hot query and report any that no longer uses its intended
+    index in order. Returns the number of failing queries.
+    """
+    from db_config import db_cursor, get_backend
+
+    backend = get_backend()
+    failures = 0
+    with db_cursor(dictionary=True) as cursor:
+        for label, query, params, alias, index, ordered in index_checks(backend.name):
+            cursor.execute(f"{backend.explain_prefix} {query}", params)
+            problems = list(_plan_problems(backend.name, cursor.fetchall(), alias, index, ordered))
+            failures += bool(problems)
+            log(f"{'FAIL' if problems else 'ok  '} {label}" + (f": {'; '.join(problems)}" if problems else ""))
+    return failures
+
+def _run(args, db_cursor, backend_name):
+    # One command against the database db_cursor currently opens
+    if args.command == 'check':
+        return 1 if check() else 0
+
+    transaction = lambda: db_cursor(commit=True)
+    if args.command == 'status':
+        with transaction() as cursor:
+            applied = set(applied_versions(cursor))
+        for migration in load_migrations(backend_name):
+            state = 'applied' if migration['version'] in applied else 'pending'
+            print(f"{migration['version']:03d}_{migration['name']:<40}{state}")
+    elif args.command == 'up':
+        done = upgrade(transaction, backend_name, args.to)
+        print(f"Applied {len(done)} migration(s)")
+    else:
+        with transaction() as cursor:
+            applied = applied_versions(cursor)
+        target = args.to if args.to is not None else (applied[-2] if len(applied) > 1 else 0)
+        done = downgrade(transaction, backend_name, target)
+        print(f"Reverted {len(done)} migration(s)")
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python migrate.py", description="Apply, revert and verify schema migrations")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('status', help="list migrations and whether each is applied")
+    up = commands.add_parser('up', help="apply pending migrations")
+    up.add_argument('--to', type=int, metavar='VERSION', help="stop after this version")
+    down = commands.add_parser('down', help="revert migrations (default: the latest one)")
+    down.add_argument('--to', type=int, metavar='VERSION', help="revert everything newer than this version")
+    commands.add_parser('check', help="fail if a hot query stops using its intended index")
+    args = parser.parse_args(argv)
+
+    from db_config import db_cursor, get_backend, on_shard, shard_ids
+
+    # Every shard has the full schema; see shard_map.py
+    status = 0
+    for shard in shard_ids():
+        if len(shard_ids()) > 1:
+            print(f"Shard {shard}:")
+        with on_shard(shard):
+            status |= _run(args, db_cursor, get_backend().name)
+    return status
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,5 @@
+ALTER TABLE items DROP FOREIGN KEY fk_items_current_high_bidder;
+
+ALTER TABLE items DROP COLUMN current_high_bidder_id;
+
+ALTER TABLE items DROP COLUMN current_high_bid;
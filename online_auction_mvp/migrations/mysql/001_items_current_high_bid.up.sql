@@ -0,0 +1,19 @@
+-- Adds the denormalized current high bid to items and backfills it
+-- from existing bids.
+
+
+ALTER TABLE items
+    ADD COLUMN current_high_bid FLOAT NULL,
+    ADD COLUMN current_high_bidder_id INT NULL,
+    ADD CONSTRAINT fk_items_current_high_bidder FOREIGN KEY (current_high_bidder_id) REFERENCES users(user_id);
+
+
+-- Earliest bid wins a tie, matching the strictly-higher rule in place_bid
+UPDATE items i
+JOIN (
+    SELECT item_id, bid_amount, buyer_id,
+           ROW_NUMBER() OVER (PARTITION BY item_id ORDER BY bid_amount DESC, bid_id ASC) AS rn
+    FROM bids
+) top_bids ON top_bids.item_id = i.item_id AND top_bids.rn = 1
+SET i.current_high_bid = top_bids.bid_amount,
+    i.current_high_bidder_id = top_bids.buyer_id;
@@ -0,0 +1 @@
+DROP INDEX idx_items_item_name ON items;
@@ -0,0 +1,5 @@
+-- Index for the prefix search behind the Place Bid item selector
+-- (lookup_items).
+
+
+CREATE INDEX idx_items_item_name ON items(item_name);
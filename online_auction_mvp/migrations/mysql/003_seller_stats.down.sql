@@ -0,0 +1,7 @@
+DROP TRIGGER IF EXISTS trg_bids_seller_stats_insert;
+
+DROP TRIGGER IF EXISTS trg_items_seller_stats_high_bid;
+
+DROP TRIGGER IF EXISTS trg_items_seller_stats_insert;
+
+DROP TABLE IF EXISTS seller_stats;
@@ -0,0 +1,45 @@
+-- Adds the seller_stats summary table and the triggers that maintain it,
+-- then fills it from existing items and bids. Apply while the app is
+-- stopped so no bids land between creating the triggers and the backfill.
+
+
+CREATE TABLE IF NOT EXISTS seller_stats (
+    seller_id INT PRIMARY KEY,
+    items_listed INT NOT NULL DEFAULT 0,
+    bids_received INT NOT NULL DEFAULT 0,
+    gross_high_bid DOUBLE NOT NULL DEFAULT 0,
+    last_bid_time TIMESTAMP NULL,
+    FOREIGN KEY (seller_id) REFERENCES users(user_id)
+);
+
+
+CREATE TRIGGER trg_items_seller_stats_insert AFTER INSERT ON items FOR EACH ROW
+    INSERT INTO seller_stats (seller_id, items_listed)
+    SELECT NEW.seller_id, 1 FROM DUAL WHERE NEW.seller_id IS NOT NULL
+    ON DUPLICATE KEY UPDATE items_listed = items_listed + 1;
+
+CREATE TRIGGER trg_items_seller_stats_high_bid AFTER UPDATE ON items FOR EACH ROW
+    UPDATE seller_stats
+    SET gross_high_bid = gross_high_bid + COALESCE(NEW.current_high_bid, 0) - COALESCE(OLD.current_high_bid, 0)
+    WHERE seller_id = NEW.seller_id AND NOT (NEW.current_high_bid <=> OLD.current_high_bid);
+
+CREATE TRIGGER trg_bids_seller_stats_insert AFTER INSERT ON bids FOR EACH ROW
+    UPDATE seller_stats s
+    JOIN items i ON i.seller_id = s.seller_id
+    SET s.bids_received = s.bids_received + 1,
+        s.last_bid_time = GREATEST(COALESCE(s.last_bid_time, NEW.bid_time), NEW.bid_time)
+    WHERE i.item_id = NEW.item_id;
+
+
+-- Same statement as db_config.rebuild_seller_stats()
+DELETE FROM seller_stats;
+INSERT INTO seller_stats (seller_id, items_listed, bids_received, gross_high_bid, last_bid_time)
+SELECT i.seller_id, COUNT(*), COALESCE(SUM(b.bid_count), 0), COALESCE(SUM(i.current_high_bid), 0), MAX(b.last_bid_time)
+FROM items i
+LEFT JOIN (
+    SELECT item_id, COUNT(*) AS bid_count, MAX(bid_time) AS last_bid_time
+    FROM bids
+    GROUP BY item_id
+) b ON b.item_id = i.item_id
+WHERE i.seller_id IS NOT NULL
+GROUP BY i.seller_id;
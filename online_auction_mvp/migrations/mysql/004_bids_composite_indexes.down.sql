@@ -0,0 +1,11 @@
+CREATE INDEX idx_bids_buyer_id ON bids(buyer_id);
+
+DROP INDEX idx_bids_seller_time ON bids;
+
+DROP INDEX idx_bids_buyer_time ON bids;
+
+DROP INDEX idx_bids_item_amount ON bids;
+
+DROP TRIGGER IF EXISTS trg_bids_seller_id;
+
+ALTER TABLE bids DROP COLUMN seller_id;
@@ -0,0 +1,3 @@
+DROP INDEX idx_items_base_price ON items;
+
+DROP INDEX ft_items_name_description ON items;
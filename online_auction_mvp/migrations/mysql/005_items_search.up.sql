@@ -0,0 +1,6 @@
+-- Full-text index behind search_items (Browse Items search), plus an index
+-- for its price filter and sort.
+
+CREATE FULLTEXT INDEX ft_items_name_description ON items(item_name, description);
+
+CREATE INDEX idx_items_base_price ON items(base_price);
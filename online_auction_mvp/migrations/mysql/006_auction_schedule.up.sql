@@ -0,0 +1,32 @@
+-- Auction start and end times, the index the scheduler reads upcoming
+-- closings from, and one settlement row per closed auction. Items without
+-- an end time stay open, as before.
+
+ALTER TABLE items ADD COLUMN starts_at DATETIME NULL;
+
+ALTER TABLE items ADD COLUMN ends_at DATETIME NULL;
+
+ALTER TABLE items ADD COLUMN status ENUM('open', 'closed') NOT NULL DEFAULT 'open';
+
+CREATE INDEX idx_items_status_ends_at ON items(status, ends_at);
+
+-- lookup_items only offers open items
+CREATE INDEX idx_items_status_item_name ON items(status, item_name);
+
+DROP INDEX idx_items_item_name ON items;
+
+CREATE TABLE IF NOT EXISTS settlements (
+    item_id INT PRIMARY KEY,
+    seller_id INT,
+    winner_id INT NULL,
+    final_price FLOAT NULL,
+    ends_at DATETIME NOT NULL,
+    closed_at DATETIME NOT NULL,
+    FOREIGN KEY (item_id) REFERENCES items(item_id),
+    FOREIGN KEY (seller_id) REFERENCES users(user_id),
+    FOREIGN KEY (winner_id) REFERENCES users(user_id)
+);
+
+CREATE INDEX idx_settlements_winner_id ON settlements(winner_id);
+
+CREATE INDEX idx_settlements_closed_at ON settlements(closed_at);
@@ -0,0 +1 @@
+DROP INDEX idx_bids_seller_id ON bids;
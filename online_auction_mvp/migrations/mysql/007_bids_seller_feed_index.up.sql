@@ -0,0 +1,4 @@
+-- Index for the seller change feed (get_bids_since): secondary indexes end
+-- with the primary key, so this reads a seller's bids in bid_id order.
+
+CREATE INDEX idx_bids_seller_id ON bids(seller_id);
@@ -0,0 +1,22 @@
+-- Proxy (automatic) bids: one maximum per buyer and item. items.proxy_max
+-- is the highest maximum that can still answer a bid (NULL when none), so
+-- place_bid's conditional UPDATE only defers to the proxy engine when a
+-- proxy could respond; proxy_version changes whenever an item's proxies do.
+
+ALTER TABLE items ADD COLUMN proxy_max FLOAT NULL;
+
+ALTER TABLE items ADD COLUMN proxy_version INT NOT NULL DEFAULT 0;
+
+CREATE TABLE IF NOT EXISTS proxy_bids (
+    proxy_id INT AUTO_INCREMENT PRIMARY KEY,
+    item_id INT NOT NULL,
+    buyer_id INT NOT NULL,
+    max_amount FLOAT NOT NULL,
+    created_at DATETIME NOT NULL,
+    updated_at DATETIME NOT NULL,
+    UNIQUE KEY uq_proxy_bids_buyer_item (buyer_id, item_id),
+    FOREIGN KEY (item_id) REFERENCES items(item_id),
+    FOREIGN KEY (buyer_id) REFERENCES users(user_id)
+);
+
+CREATE INDEX idx_proxy_bids_item_max ON proxy_bids(item_id, max_amount);
@@ -0,0 +1,17 @@
+-- Archived bids stay in their files; run `python bid_archive.py restore` first to bring them back
+
+DROP TABLE IF EXISTS bid_archive_index;
+
+DROP TABLE IF EXISTS bid_archives;
+
+DROP INDEX idx_settlements_archived_closed ON settlements;
+
+ALTER TABLE settlements DROP COLUMN archived_at;
+
+ALTER TABLE bids REMOVE PARTITIONING;
+
+ALTER TABLE bids DROP PRIMARY KEY, ADD PRIMARY KEY (bid_id);
+
+ALTER TABLE bids ADD CONSTRAINT bids_ibfk_1 FOREIGN KEY (item_id) REFERENCES items(item_id);
+
+ALTER TABLE bids ADD CONSTRAINT bids_ibfk_2 FOREIGN KEY (buyer_id) REFERENCES users(user_id);
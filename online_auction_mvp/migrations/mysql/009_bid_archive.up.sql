@@ -0,0 +1,55 @@
+-- Time-partitioned bids and the index of archived bid files.
+--
+-- bids is split into RANGE partitions on bid_time, so the archiver
+-- (bid_archive.py) can drop a month it has emptied instead of deleting it
+-- row by row, and time-bounded scans skip older months. Every unique key
+-- of a partitioned table must include the partitioning column, and InnoDB
+-- does not allow foreign keys on partitioned tables, so the primary key
+-- becomes (bid_id, bid_time) and the bids foreign keys are dropped; rows are
+-- only ever inserted by place_bid and the bid intake, which check both ids.
+-- Monthly partitions are split off p_future ahead of time by the archiver.
+
+ALTER TABLE bids DROP FOREIGN KEY bids_ibfk_1;
+
+ALTER TABLE bids DROP FOREIGN KEY bids_ibfk_2;
+
+ALTER TABLE bids MODIFY bid_time TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    DROP PRIMARY KEY, ADD PRIMARY KEY (bid_id, bid_time);
+
+ALTER TABLE bids PARTITION BY RANGE (UNIX_TIMESTAMP(bid_time)) (
+    PARTITION p_history VALUES LESS THAN (UNIX_TIMESTAMP('2026-01-01 00:00:00')),
+    PARTITION p_future VALUES LESS THAN MAXVALUE
+);
+
+-- Settled auctions whose bids have been archived
+ALTER TABLE settlements ADD COLUMN archived_at DATETIME NULL;
+
+CREATE INDEX idx_settlements_archived_closed ON settlements(archived_at, closed_at);
+
+-- One row per archive file (a gzip CSV under BID_ARCHIVE_DIR)...
+CREATE TABLE IF NOT EXISTS bid_archives (
+    archive_id INT AUTO_INCREMENT PRIMARY KEY,
+    path VARCHAR(255) NOT NULL,
+    bid_count INT NOT NULL,
+    first_bid_time DATETIME NULL,
+    last_bid_time DATETIME NULL,
+    created_at DATETIME NOT NULL
+);
+
+-- ...and one per item and buyer in it, so a history lookup opens only the files it needs
+CREATE TABLE IF NOT EXISTS bid_archive_index (
+    archive_id INT NOT NULL,
+    item_id INT NOT NULL,
+    buyer_id INT NOT NULL,
+    seller_id INT NULL,
+    bid_count INT NOT NULL,
+    last_bid_time DATETIME NULL,
+    PRIMARY KEY (archive_id, item_id, buyer_id),
+    FOREIGN KEY (archive_id) REFERENCES bid_archives(archive_id)
+);
+
+CREATE INDEX idx_bid_archive_index_buyer ON bid_archive_index(buyer_id);
+
+CREATE INDEX idx_bid_archive_index_seller ON bid_archive_index(seller_id);
+
+CREATE INDEX idx_bid_archive_index_item ON bid_archive_index(item_id);
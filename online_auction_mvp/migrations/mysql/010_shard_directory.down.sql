@@ -0,0 +1,7 @@
+-- Fails if a shard has numbered bids beyond INT's range; only revert a single-database deployment
+
+ALTER TABLE bids MODIFY bid_id INT NOT NULL AUTO_INCREMENT;
+
+DROP TABLE IF EXISTS id_sequences;
+
+DROP TABLE IF EXISTS shard_buckets;
@@ -0,0 +1,22 @@
+-- Item-id sharding (shard_map.py). Applied to every shard, though only the
+-- directory (shard 0) fills these tables: shard_buckets assigns buckets
+-- (item_id % SHARD_BUCKETS) to shards, each move bumping the version so
+-- processes notice the change with one indexed MAX(), and id_sequences
+-- hands out item ids that are unique across shards.
+
+CREATE TABLE IF NOT EXISTS shard_buckets (
+    bucket INT PRIMARY KEY,
+    shard INT NOT NULL,
+    version INT NOT NULL,
+    moved_at DATETIME NULL
+);
+
+CREATE INDEX idx_shard_buckets_version ON shard_buckets(version);
+
+CREATE TABLE IF NOT EXISTS id_sequences (
+    name VARCHAR(64) PRIMARY KEY,
+    next_id BIGINT NOT NULL
+);
+
+-- Each shard numbers bids from its own block of 10^12 ids
+ALTER TABLE bids MODIFY bid_id BIGINT NOT NULL AUTO_INCREMENT;
@@ -0,0 +1,11 @@
+CREATE INDEX IF NOT EXISTS idx_bids_buyer_id ON bids(buyer_id);
+
+DROP INDEX IF EXISTS idx_bids_seller_time;
+
+DROP INDEX IF EXISTS idx_bids_buyer_time;
+
+DROP INDEX IF EXISTS idx_bids_item_amount;
+
+DROP TRIGGER IF EXISTS trg_bids_seller_id;
+
+ALTER TABLE bids DROP COLUMN seller_id;
@@ -0,0 +1,26 @@
+-- SQLite version of mysql/004_bids_composite_indexes.up.sql. SQLite
+-- triggers cannot assign NEW columns, so seller_id is filled in right
+-- after each insert instead.
+
+
+ALTER TABLE bids ADD COLUMN seller_id INTEGER NULL;
+
+CREATE TRIGGER IF NOT EXISTS trg_bids_seller_id AFTER INSERT ON bids
+WHEN NEW.seller_id IS NULL
+BEGIN
+    UPDATE bids SET seller_id = (SELECT seller_id FROM items WHERE item_id = NEW.item_id)
+    WHERE bid_id = NEW.bid_id;
+END;
+
+UPDATE bids
+SET seller_id = (SELECT seller_id FROM items WHERE items.item_id = bids.item_id)
+WHERE seller_id IS NULL;
+
+
+CREATE INDEX IF NOT EXISTS idx_bids_item_amount ON bids(item_id, bid_amount);
+
+CREATE INDEX IF NOT EXISTS idx_bids_buyer_time ON bids(buyer_id, bid_time);
+
+CREATE INDEX IF NOT EXISTS idx_bids_seller_time ON bids(seller_id, bid_time);
+
+DROP INDEX IF EXISTS idx_bids_buyer_id;
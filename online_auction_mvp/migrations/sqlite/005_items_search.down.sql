@@ -0,0 +1,9 @@
+DROP INDEX IF EXISTS idx_items_base_price;
+
+DROP TRIGGER IF EXISTS trg_items_fts_update;
+
+DROP TRIGGER IF EXISTS trg_items_fts_delete;
+
+DROP TRIGGER IF EXISTS trg_items_fts_insert;
+
+DROP TABLE IF EXISTS items_fts;
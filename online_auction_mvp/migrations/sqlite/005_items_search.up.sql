@@ -0,0 +1,27 @@
+-- SQLite version of mysql/005_items_search.up.sql. The full-text index is
+-- an FTS5 table over items, kept in step by triggers.
+
+CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(
+    item_name, description,
+    content='items', content_rowid='item_id', tokenize='unicode61 remove_diacritics 2'
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_items_fts_insert AFTER INSERT ON items
+BEGIN
+    INSERT INTO items_fts (rowid, item_name, description) VALUES (NEW.item_id, NEW.item_name, NEW.description);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_items_fts_delete AFTER DELETE ON items
+BEGIN
+    INSERT INTO items_fts (items_fts, rowid, item_name, description) VALUES ('delete', OLD.item_id, OLD.item_name, OLD.description);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_items_fts_update AFTER UPDATE OF item_name, description ON items
+BEGIN
+    INSERT INTO items_fts (items_fts, rowid, item_name, description) VALUES ('delete', OLD.item_id, OLD.item_name, OLD.description);
+    INSERT INTO items_fts (rowid, item_name, description) VALUES (NEW.item_id, NEW.item_name, NEW.description);
+END;
+
+INSERT INTO items_fts (items_fts) VALUES ('rebuild');
+
+CREATE INDEX IF NOT EXISTS idx_items_base_price ON items(base_price);
@@ -0,0 +1,13 @@
+DROP TABLE IF EXISTS settlements;
+
+CREATE INDEX IF NOT EXISTS idx_items_item_name ON items(item_name);
+
+DROP INDEX IF EXISTS idx_items_status_item_name;
+
+DROP INDEX IF EXISTS idx_items_status_ends_at;
+
+ALTER TABLE items DROP COLUMN status;
+
+ALTER TABLE items DROP COLUMN ends_at;
+
+ALTER TABLE items DROP COLUMN starts_at;
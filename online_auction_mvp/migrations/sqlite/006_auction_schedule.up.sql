@@ -0,0 +1,29 @@
+-- SQLite version of mysql/006_auction_schedule.up.sql
+
+ALTER TABLE items ADD COLUMN starts_at TIMESTAMP NULL;
+
+ALTER TABLE items ADD COLUMN ends_at TIMESTAMP NULL;
+
+ALTER TABLE items ADD COLUMN status TEXT NOT NULL DEFAULT 'open' CHECK (status IN ('open', 'closed'));
+
+CREATE INDEX IF NOT EXISTS idx_items_status_ends_at ON items(status, ends_at);
+
+CREATE INDEX IF NOT EXISTS idx_items_status_item_name ON items(status, item_name);
+
+DROP INDEX IF EXISTS idx_items_item_name;
+
+CREATE TABLE IF NOT EXISTS settlements (
+    item_id INTEGER PRIMARY KEY,
+    seller_id INTEGER,
+    winner_id INTEGER NULL,
+    final_price REAL NULL,
+    ends_at TIMESTAMP NOT NULL,
+    closed_at TIMESTAMP NOT NULL,
+    FOREIGN KEY (item_id) REFERENCES items(item_id),
+    FOREIGN KEY (seller_id) REFERENCES users(user_id),
+    FOREIGN KEY (winner_id) REFERENCES users(user_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_settlements_winner_id ON settlements(winner_id);
+
+CREATE INDEX IF NOT EXISTS idx_settlements_closed_at ON settlements(closed_at);
@@ -0,0 +1 @@
+DROP INDEX IF EXISTS idx_bids_seller_id;
@@ -0,0 +1,4 @@
+-- SQLite version of mysql/007_bids_seller_feed_index.up.sql; index entries
+-- end with the rowid, which is bid_id.
+
+CREATE INDEX IF NOT EXISTS idx_bids_seller_id ON bids(seller_id);
@@ -0,0 +1,5 @@
+DROP TABLE IF EXISTS proxy_bids;
+
+ALTER TABLE items DROP COLUMN proxy_version;
+
+ALTER TABLE items DROP COLUMN proxy_max;
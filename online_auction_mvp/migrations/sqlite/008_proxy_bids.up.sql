@@ -0,0 +1,19 @@
+-- SQLite version of mysql/008_proxy_bids.up.sql
+
+ALTER TABLE items ADD COLUMN proxy_max REAL NULL;
+
+ALTER TABLE items ADD COLUMN proxy_version INTEGER NOT NULL DEFAULT 0;
+
+CREATE TABLE IF NOT EXISTS proxy_bids (
+    proxy_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    item_id INTEGER NOT NULL,
+    buyer_id INTEGER NOT NULL,
+    max_amount REAL NOT NULL,
+    created_at TIMESTAMP NOT NULL,
+    updated_at TIMESTAMP NOT NULL,
+    UNIQUE (buyer_id, item_id),
+    FOREIGN KEY (item_id) REFERENCES items(item_id),
+    FOREIGN KEY (buyer_id) REFERENCES users(user_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_proxy_bids_item_max ON proxy_bids(item_id, max_amount);
@@ -0,0 +1,7 @@
+DROP TABLE IF EXISTS bid_archive_index;
+
+DROP TABLE IF EXISTS bid_archives;
+
+DROP INDEX IF EXISTS idx_settlements_archived_closed;
+
+ALTER TABLE settlements DROP COLUMN archived_at;
@@ -0,0 +1,32 @@
+-- SQLite version of mysql/009_bid_archive.up.sql. SQLite has no table
+-- partitioning, so bids stays one table; the archiver keeps it small.
+
+ALTER TABLE settlements ADD COLUMN archived_at TIMESTAMP NULL;
+
+CREATE INDEX IF NOT EXISTS idx_settlements_archived_closed ON settlements(archived_at, closed_at);
+
+CREATE TABLE IF NOT EXISTS bid_archives (
+    archive_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    path VARCHAR(255) NOT NULL,
+    bid_count INTEGER NOT NULL,
+    first_bid_time TIMESTAMP NULL,
+    last_bid_time TIMESTAMP NULL,
+    created_at TIMESTAMP NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS bid_archive_index (
+    archive_id INTEGER NOT NULL,
+    item_id INTEGER NOT NULL,
+    buyer_id INTEGER NOT NULL,
+    seller_id INTEGER NULL,
+    bid_count INTEGER NOT NULL,
+    last_bid_time TIMESTAMP NULL,
+    PRIMARY KEY (archive_id, item_id, buyer_id),
+    FOREIGN KEY (archive_id) REFERENCES bid_archives(archive_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_bid_archive_index_buyer ON bid_archive_index(buyer_id);
+
+CREATE INDEX IF NOT EXISTS idx_bid_archive_index_seller ON bid_archive_index(seller_id);
+
+CREATE INDEX IF NOT EXISTS idx_bid_archive_index_item ON bid_archive_index(item_id);
@@ -0,0 +1,3 @@
+DROP TABLE IF EXISTS id_sequences;
+
+DROP TABLE IF EXISTS shard_buckets;
@@ -0,0 +1,16 @@
+-- SQLite version of mysql/010_shard_directory.up.sql. INTEGER ids are
+-- already 64-bit, so bids needs no change.
+
+CREATE TABLE IF NOT EXISTS shard_buckets (
+    bucket INTEGER PRIMARY KEY,
+    shard INTEGER NOT NULL,
+    version INTEGER NOT NULL,
+    moved_at TIMESTAMP NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_shard_buckets_version ON shard_buckets(version);
+
+CREATE TABLE IF NOT EXISTS id_sequences (
+    name VARCHAR(64) PRIMARY KEY,
+    next_id INTEGER NOT NULL
+);
@@ -0,0 +1,104 @@
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+import os
+import threading
+
+import bcrypt
+
+HASHING_CONFIG = {
+    'rounds': int(os.getenv('BCRYPT_ROUNDS', 12)),  # bcrypt work factor for new hashes
+    'workers': int(os.getenv('HASH_WORKERS', min(os.cpu_count() or 1, 4))),  # 0 hashes on the calling thread
+    'max_pending': int(os.getenv('HASH_MAX_PENDING', 32)),  # Queued + running hashes before callers are turned away
+    'timeout': float(os.getenv('HASH_TIMEOUT', 10))
+}
+
+class HashingBusyError(Exception):
+    """
+    Raised when the hashing queue is full or a hash did not finish in time
+    """
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+def _check(password, hashed):
+    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+
+def hash_cost(hashed):
+    """
+    Work factor of a bcrypt hash such as '$2b$12$...'
+    """
+    try:
+        return int(hashed.split('$')[2])
+    except (IndexError, ValueError):
+        return None
+
+class PasswordHasher:
+    """
+    Runs bcrypt in a bounded process pool so hashing neither holds the GIL
+    nor piles up unboundedly behind a burst of logins.
+    """
+
+    def __init__(self, rounds, workers, max_pending, timeout):
+        self.rounds = rounds
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # spawn, not fork: the app process is multi-threaded
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+            return self._executor
+
+    def _run(self, fn, *args):
+        if self.workers <= 0:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusyError("Too many logins in progress, please try again")
+        try:
+            executor = self._get_executor()
+            future = executor.submit(fn, *args)
+        except BrokenProcessPool:
+            with self._lock:
+                self._executor = None
+            self._slots.release()
+            raise HashingBusyError("Password worker pool restarted, please try again")
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(self.timeout)
+        except FutureTimeoutError:
+            raise HashingBusyError("Password check timed out, please try again")
+        except BrokenProcessPool:
+            with self._lock:
+                self._executor = None
+            raise HashingBusyError("Password worker pool restarted, please try again")
+
+    def hash_password(self, password):
+        """
+        Hash a password at the configured work factor
+        """
+        return self._run(_hash, password, self.rounds)
+
+    def check_password(self, password, hashed):
+        return self._run(_check, password, hashed)
+
+    def needs_rehash(self, hashed):
+        """
+        True when a stored hash was made with a different work factor
+        """
+        return hash_cost(hashed) != self.rounds
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+password_hasher = PasswordHasher(**HASHING_CONFIG)
@@ -0,0 +1,154 @@
+import heapq
+import threading
+
+
+class ItemProxies:
+    """
+    Proxy bids on one item: a max-heap of (max_amount, proxy_id, buyer_id),
+    highest maximum first and the earliest proxy first among equals, with
+    one live entry per buyer. Replaced entries stay in the heap until they
+    surface and are skipped. `version` is the item's proxy_version the
+    entries were loaded at.
+    """
+
+    def __init__(self, version, rows=()):
+        self.version = version
+        self._live = {}  # buyer_id -> (max_amount, proxy_id)
+        for proxy_id, buyer_id, max_amount in rows:
+            self._live[buyer_id] = (max_amount, proxy_id)
+        self._rebuild()
+
+    def _rebuild(self):
+        self._heap = [(-max_amount, proxy_id, buyer_id) for buyer_id, (max_amount, proxy_id) in self._live.items()]
+        heapq.heapify(self._heap)
+
+    def __len__(self):
+        return len(self._live)
+
+    def max_of(self, buyer_id):
+        """
+        The buyer's maximum on this item, or None
+        """
+        entry = self._live.get(buyer_id)
+        return entry[0] if entry is not None else None
+
+    def set(self, buyer_id, max_amount, proxy_id):
+        """
+        Add or replace the buyer's proxy
+        """
+        self._live[buyer_id] = (max_amount, proxy_id)
+        heapq.heappush(self._heap, (-max_amount, proxy_id, buyer_id))
+        if len(self._heap) > 2 * len(self._live) + 16:
+            self._rebuild()
+
+    def top(self, count, exclude=()):
+        """
+        Up to `count` highest proxies of buyers not in `exclude`, as
+        (max_amount, proxy_id, buyer_id) in priority order
+        """
+        found = []
+        popped = []
+        while self._heap and len(found) < count:
+            entry = heapq.heappop(self._heap)
+            if self._live.get(entry[2]) != (-entry[0], entry[1]):
+                continue  # replaced; dropped for good
+            popped.append(entry)
+            if entry[2] not in exclude:
+                found.append((-entry[0], entry[1], entry[2]))
+        for entry in popped:
+            heapq.heappush(self._heap, entry)
+        return found
+
+def settle(proxies, price, leader_id, base_price, increment, bid=None):
+    """
+    Resolve a manual `bid` (buyer_id, amount), or a change to `proxies`,
+    against an item's standing high bid of `price` by `leader_id` (both
+    None before the first bid). Returns the new high bid as
+    (buyer_id, amount), or None if the standing bid holds.
+
+    The highest maximum wins; ties go to the standing bidder, then to the
+    earliest proxy, and a manual bid comes last. A winning proxy pays one
+    increment over the runner-up, capped at its maximum; a manual bid pays
+    what it says. Only the leader's proxy can still be above the price
+    after a settlement, so the two best other proxies are all it looks at.
+    """
+    bidder = bid[0] if bid is not None else None
+    floor = price if price is not None else base_price
+    contenders = []  # (maximum, rank, buyer_id, is_proxy); lower rank wins ties
+
+    for maximum, proxy_id, buyer_id in proxies.top(2, exclude={leader_id, bidder}):
+        if maximum > floor:
+            contenders.append((maximum, proxy_id, buyer_id, True))
+    if leader_id is not None and leader_id != bidder:
+        own = proxies.max_of(leader_id)
+        if own is not None and own > price:
+            contenders.append((own, -1, leader_id, True))
+        else:
+            contenders.append((price, -1, leader_id, False))
+    if bid is not None:
+        contenders.append((bid[1], -1 if bidder == leader_id else float('inf'), bidder, False))
+    if not contenders:
+        return None
+
+    contenders.sort(key=lambda contender: (-contender[0], contender[1]))
+    maximum, _, buyer_id, is_proxy = contenders[0]
+    if not is_proxy:
+        amount = maximum
+    elif len(contenders) > 1:
+        amount = min(maximum, round(contenders[1][0] + increment, 2))
+    elif price is None:
+        amount = min(maximum, round(base_price + increment, 2))
+    else:
+        amount = price  # the leader's proxy, unopposed
+    if (buyer_id, amount) == (leader_id, price):
+        return None
+    return buyer_id, amount
+
+class ProxyEngine:
+    """
+    In-process map of item_id -> ItemProxies for items whose bids went
+    through proxy resolution. An entry is only used while its version
+    matches the item row's proxy_version, so proxies registered through
+    another process force a reload. Callers hold the item's row lock while
+    they read or change its entry.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._items = {}
+
+    def get(self, item_id, version):
+        """
+        The item's proxies if they were loaded at `version`, else None
+        """
+        with self._lock:
+            proxies = self._items.get(item_id)
+            return proxies if proxies is not None and proxies.version == version else None
+
+    def load(self, item_id, version, rows):
+        """
+        Replace the item's proxies with (proxy_id, buyer_id, max_amount) rows
+        """
+        proxies = ItemProxies(version, rows)
+        with self._lock:
+            self._items[item_id] = proxies
+        return proxies
+
+    def drop(self, *item_ids):
+        """
+        Forget items, e.g. after their auctions closed
+        """
+        with self._lock:
+            for item_id in item_ids:
+                self._items.pop(item_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._items = {}
+
+    def stats(self):
+        with self._lock:
+            return {
+                'items': len(self._items),
+                'proxies': sum(len(proxies) for proxies in self._items.values())
+            }
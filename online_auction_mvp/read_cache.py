@@ -0,0 +1,124 @@
+from collections import OrderedDict
+import threading
+import time
+
+
+class ReadCache:
+    """
+    TTL cache for read-only query results with version-based invalidation.
+    Each entry remembers the version of every dependency (a table name such
+    as 'items', or an entity such as ('seller', 7)) it was loaded under;
+    writes bump those versions so dependent entries miss right away instead
+    of waiting for the TTL. With `settle` > 0, results are not cached while
+    any dependency was bumped less than `settle` seconds ago, since a lagging
+    replica may have served them from before that write.
+    """
+
+    def __init__(self, ttl, max_entries, settle=0):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.settle = settle
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (value, expires_at, {dependency: version})
+        self._versions = {}
+        self._bumped_at = {}  # dependency -> monotonic time of its last bump
+        self._hits = 0
+        self._misses = 0
+        self._stale = 0
+        self._expired = 0
+
+    def get_or_load(self, key, depends_on, loader, fresh=False, settle=None):
+        """
+        Return the cached value for `key`, calling `loader()` on a miss.
+        Exceptions from the loader propagate and nothing is cached.
+        `fresh` skips the lookup (the loader reads the primary) but still
+        stores the result; `settle` overrides the cache-wide setting.
+        """
+        if self.ttl <= 0:
+            return loader()
+        hit, value, pending = self._lookup(key, depends_on, fresh, settle)
+        if hit:
+            return value
+        value = loader()
+        self._store(key, value, pending)
+        return value
+
+    async def get_or_load_async(self, key, depends_on, loader, fresh=False, settle=None):
+        """
+        get_or_load for a coroutine function `loader`
+        """
+        if self.ttl <= 0:
+            return await loader()
+        hit, value, pending = self._lookup(key, depends_on, fresh, settle)
+        if hit:
+            return value
+        value = await loader()
+        self._store(key, value, pending)
+        return value
+
+    def _lookup(self, key, depends_on, fresh, settle):
+        """
+        (True, value, None) on a hit; on a miss (False, None, versions), where
+        versions is None if the loaded value must not be cached
+        """
+        settle = self.settle if settle is None else settle
+        now = time.monotonic()
+        with self._lock:
+            entry = None if fresh else self._entries.get(key)
+            if entry is not None:
+                value, expires_at, versions = entry
+                if expires_at <= now:
+                    self._expired += 1
+                    del self._entries[key]
+                elif any(self._versions.get(dep, 0) != version for dep, version in versions.items()):
+                    self._stale += 1
+                    del self._entries[key]
+                else:
+                    self._hits += 1
+                    self._entries.move_to_end(key)
+                    return True, value, None
+            self._misses += 1
+            # Snapshot before loading so a write racing the load invalidates the result
+            versions = {dep: self._versions.get(dep, 0) for dep in depends_on}
+            settling = not fresh and settle > 0 and any(
+                now - self._bumped_at.get(dep, float('-inf')) < settle for dep in depends_on
+            )
+        return False, None, None if settling else versions
+
+    def _store(self, key, value, versions):
+        if versions is None:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl, versions)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def bump(self, *dependencies):
+        """
+        Record a write to each dependency, invalidating entries that read it
+        """
+        with self._lock:
+            now = time.monotonic()
+            for dep in dependencies:
+                self._versions[dep] = self._versions.get(dep, 0) + 1
+                self._bumped_at[dep] = now
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Snapshot of hit/miss counters
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'hits': self._hits,
+                'misses': self._misses,
+                'stale_evictions': self._stale,
+                'expirations': self._expired,
+                'hit_rate': self._hits / lookups if lookups else 0.0
+            }
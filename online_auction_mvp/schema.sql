@@ -20,22 +20,176 @@ CREATE TABLE IF NOT EXISTS items (
     description TEXT,
     base_price FLOAT NOT NULL,
     seller_id INT,
-    FOREIGN KEY (seller_id) REFERENCES users(user_id)
+    -- Denormalized from bids so a bid is accepted with one conditional update
+    current_high_bid FLOAT NULL,
+    current_high_bidder_id INT NULL,
+    -- Bids are accepted from starts_at (NULL: on listing) until ends_at (NULL: never closes)
+    starts_at DATETIME NULL,
+    ends_at DATETIME NULL,
+    status ENUM('open', 'closed') NOT NULL DEFAULT 'open',
+    -- Highest proxy maximum that can still answer a bid, and a counter bumped when the item's proxies change
+    proxy_max FLOAT NULL,
+    proxy_version INT NOT NULL DEFAULT 0,
+    FOREIGN KEY (seller_id) REFERENCES users(user_id),
+    CONSTRAINT fk_items_current_high_bidder FOREIGN KEY (current_high_bidder_id) REFERENCES users(user_id)
 );
 
 
+-- Partitioned by month of bid_time; bid_archive.py adds months ahead and drops
+-- the ones it has archived. Partitioned InnoDB tables cannot have foreign
+-- keys, and the partitioning column must be part of the primary key.
 CREATE TABLE IF NOT EXISTS bids (
-    bid_id INT AUTO_INCREMENT PRIMARY KEY,
+    bid_id BIGINT AUTO_INCREMENT,  -- shard k numbers its bids from k * 10^12
     item_id INT,
     buyer_id INT,
     bid_amount FLOAT NOT NULL,
-    bid_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (item_id) REFERENCES items(item_id),
-    FOREIGN KEY (buyer_id) REFERENCES users(user_id)
+    bid_time TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    seller_id INT NULL,  -- copied from the item by trg_bids_seller_id
+    PRIMARY KEY (bid_id, bid_time)
+)
+PARTITION BY RANGE (UNIX_TIMESTAMP(bid_time)) (
+    PARTITION p_history VALUES LESS THAN (UNIX_TIMESTAMP('2026-01-01 00:00:00')),
+    PARTITION p_future VALUES LESS THAN MAXVALUE
 );
 
 
 CREATE INDEX idx_items_seller_id ON items(seller_id);
+CREATE INDEX idx_items_status_item_name ON items(status, item_name);
+CREATE INDEX idx_items_base_price ON items(base_price);
+CREATE INDEX idx_items_status_ends_at ON items(status, ends_at);
 CREATE INDEX idx_bids_item_id ON bids(item_id);
-CREATE INDEX idx_bids_buyer_id ON bids(buyer_id);
-CREATE INDEX idx_bids_bid_time ON bids(bid_time);
\ No newline at end of file
+CREATE INDEX idx_bids_item_amount ON bids(item_id, bid_amount);
+CREATE INDEX idx_bids_buyer_time ON bids(buyer_id, bid_time);
+CREATE INDEX idx_bids_seller_time ON bids(seller_id, bid_time);
+CREATE INDEX idx_bids_seller_id ON bids(seller_id);
+CREATE INDEX idx_bids_bid_time ON bids(bid_time);
+
+-- Browse Items search (search_items)
+CREATE FULLTEXT INDEX ft_items_name_description ON items(item_name, description);
+
+
+CREATE TRIGGER trg_bids_seller_id BEFORE INSERT ON bids FOR EACH ROW
+    SET NEW.seller_id = (SELECT seller_id FROM items WHERE item_id = NEW.item_id);
+
+
+-- Per-seller dashboard totals, kept current by the triggers below
+CREATE TABLE IF NOT EXISTS seller_stats (
+    seller_id INT PRIMARY KEY,
+    items_listed INT NOT NULL DEFAULT 0,
+    bids_received INT NOT NULL DEFAULT 0,
+    gross_high_bid DOUBLE NOT NULL DEFAULT 0,  -- sum of current_high_bid over the seller's items
+    last_bid_time TIMESTAMP NULL,
+    FOREIGN KEY (seller_id) REFERENCES users(user_id)
+);
+
+
+CREATE TRIGGER trg_items_seller_stats_insert AFTER INSERT ON items FOR EACH ROW
+    INSERT INTO seller_stats (seller_id, items_listed)
+    SELECT NEW.seller_id, 1 FROM DUAL WHERE NEW.seller_id IS NOT NULL
+    ON DUPLICATE KEY UPDATE items_listed = items_listed + 1;
+
+CREATE TRIGGER trg_items_seller_stats_high_bid AFTER UPDATE ON items FOR EACH ROW
+    UPDATE seller_stats
+    SET gross_high_bid = gross_high_bid + COALESCE(NEW.current_high_bid, 0) - COALESCE(OLD.current_high_bid, 0)
+    WHERE seller_id = NEW.seller_id AND NOT (NEW.current_high_bid <=> OLD.current_high_bid);
+
+CREATE TRIGGER trg_bids_seller_stats_insert AFTER INSERT ON bids FOR EACH ROW
+    UPDATE seller_stats s
+    JOIN items i ON i.seller_id = s.seller_id
+    SET s.bids_received = s.bids_received + 1,
+        s.last_bid_time = GREATEST(COALESCE(s.last_bid_time, NEW.bid_time), NEW.bid_time)
+    WHERE i.item_id = NEW.item_id;
+
+
+-- Outcome of each closed auction, written by close_due_auctions
+CREATE TABLE IF NOT EXISTS settlements (
+    item_id INT PRIMARY KEY,
+    seller_id INT,
+    winner_id INT NULL,  -- NULL when the auction closed without bids
+    final_price FLOAT NULL,
+    ends_at DATETIME NOT NULL,
+    closed_at DATETIME NOT NULL,
+    archived_at DATETIME NULL,  -- when bid_archive.py moved the auction's bids to an archive file
+    FOREIGN KEY (item_id) REFERENCES items(item_id),
+    FOREIGN KEY (seller_id) REFERENCES users(user_id),
+    FOREIGN KEY (winner_id) REFERENCES users(user_id)
+);
+
+CREATE INDEX idx_settlements_winner_id ON settlements(winner_id);
+CREATE INDEX idx_settlements_closed_at ON settlements(closed_at);
+CREATE INDEX idx_settlements_archived_closed ON settlements(archived_at, closed_at);
+
+-- Archived bid files (bid_archive.py) and, per item and buyer, which file holds their bids
+CREATE TABLE IF NOT EXISTS bid_archives (
+    archive_id INT AUTO_INCREMENT PRIMARY KEY,
+    path VARCHAR(255) NOT NULL,  -- relative to BID_ARCHIVE_DIR
+    bid_count INT NOT NULL,
+    first_bid_time DATETIME NULL,
+    last_bid_time DATETIME NULL,
+    created_at DATETIME NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS bid_archive_index (
+    archive_id INT NOT NULL,
+    item_id INT NOT NULL,
+    buyer_id INT NOT NULL,
+    seller_id INT NULL,
+    bid_count INT NOT NULL,
+    last_bid_time DATETIME NULL,
+    PRIMARY KEY (archive_id, item_id, buyer_id),
+    FOREIGN KEY (archive_id) REFERENCES bid_archives(archive_id)
+);
+
+CREATE INDEX idx_bid_archive_index_buyer ON bid_archive_index(buyer_id);
+CREATE INDEX idx_bid_archive_index_seller ON bid_archive_index(seller_id);
+CREATE INDEX idx_bid_archive_index_item ON bid_archive_index(item_id);
+
+-- Proxy (automatic) bids: the system bids for the buyer up to max_amount
+CREATE TABLE IF NOT EXISTS proxy_bids (
+    proxy_id INT AUTO_INCREMENT PRIMARY KEY,
+    item_id INT NOT NULL,
+    buyer_id INT NOT NULL,
+    max_amount FLOAT NOT NULL,
+    created_at DATETIME NOT NULL,
+    updated_at DATETIME NOT NULL,
+    UNIQUE KEY uq_proxy_bids_buyer_item (buyer_id, item_id),
+    FOREIGN KEY (item_id) REFERENCES items(item_id),
+    FOREIGN KEY (buyer_id) REFERENCES users(user_id)
+);
+
+CREATE INDEX idx_proxy_bids_item_max ON proxy_bids(item_id, max_amount);
+
+-- Item-id sharding (shard_map.py): bucket -> shard map and the item id
+-- sequence. Every shard has the tables; only the directory (shard 0) fills them.
+CREATE TABLE IF NOT EXISTS shard_buckets (
+    bucket INT PRIMARY KEY,
+    shard INT NOT NULL,
+    version INT NOT NULL,
+    moved_at DATETIME NULL
+);
+
+CREATE INDEX idx_shard_buckets_version ON shard_buckets(version);
+
+CREATE TABLE IF NOT EXISTS id_sequences (
+    name VARCHAR(64) PRIMARY KEY,
+    next_id BIGINT NOT NULL
+);
+
+-- Migrations already included above; see migrate.py
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INT PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT IGNORE INTO schema_migrations (version, name) VALUES
+    (1, 'items_current_high_bid'),
+    (2, 'items_item_name_index'),
+    (3, 'seller_stats'),
+    (4, 'bids_composite_indexes'),
+    (5, 'items_search'),
+    (6, 'auction_schedule'),
+    (7, 'bids_seller_feed_index'),
+    (8, 'proxy_bids'),
+    (9, 'bid_archive'),
+    (10, 'shard_directory');
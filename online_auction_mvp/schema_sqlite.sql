@@ -0,0 +1,216 @@
+-- SQLite equivalent of schema.sql for the embedded backend (DB_BACKEND=sqlite).
+-- Applied automatically when the backend starts; every statement is idempotent.
+
+
+CREATE TABLE IF NOT EXISTS users (
+    user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name VARCHAR(100) NOT NULL,
+    email VARCHAR(100) UNIQUE NOT NULL,
+    password VARCHAR(100) NOT NULL,
+    role TEXT NOT NULL CHECK (role IN ('buyer', 'seller'))
+);
+
+
+CREATE TABLE IF NOT EXISTS items (
+    item_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    item_name VARCHAR(100) NOT NULL,
+    description TEXT,
+    base_price REAL NOT NULL,
+    seller_id INTEGER,
+    -- Denormalized from bids so a bid is accepted with one conditional update
+    current_high_bid REAL NULL,
+    current_high_bidder_id INTEGER NULL,
+    -- Bids are accepted from starts_at (NULL: on listing) until ends_at (NULL: never closes)
+    starts_at TIMESTAMP NULL,
+    ends_at TIMESTAMP NULL,
+    status TEXT NOT NULL DEFAULT 'open' CHECK (status IN ('open', 'closed')),
+    -- Highest proxy maximum that can still answer a bid, and a counter bumped when the item's proxies change
+    proxy_max REAL NULL,
+    proxy_version INTEGER NOT NULL DEFAULT 0,
+    FOREIGN KEY (seller_id) REFERENCES users(user_id),
+    FOREIGN KEY (current_high_bidder_id) REFERENCES users(user_id)
+);
+
+
+-- bid_time uses local time, like MySQL's CURRENT_TIMESTAMP in the server time zone
+CREATE TABLE IF NOT EXISTS bids (
+    bid_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    item_id INTEGER,
+    buyer_id INTEGER,
+    bid_amount REAL NOT NULL,
+    bid_time TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+    seller_id INTEGER NULL,  -- copied from the item by trg_bids_seller_id
+    FOREIGN KEY (item_id) REFERENCES items(item_id),
+    FOREIGN KEY (buyer_id) REFERENCES users(user_id)
+);
+
+
+CREATE INDEX IF NOT EXISTS idx_items_seller_id ON items(seller_id);
+CREATE INDEX IF NOT EXISTS idx_items_status_item_name ON items(status, item_name);
+CREATE INDEX IF NOT EXISTS idx_items_base_price ON items(base_price);
+CREATE INDEX IF NOT EXISTS idx_items_status_ends_at ON items(status, ends_at);
+CREATE INDEX IF NOT EXISTS idx_bids_item_id ON bids(item_id);
+CREATE INDEX IF NOT EXISTS idx_bids_item_amount ON bids(item_id, bid_amount);
+CREATE INDEX IF NOT EXISTS idx_bids_buyer_time ON bids(buyer_id, bid_time);
+CREATE INDEX IF NOT EXISTS idx_bids_seller_time ON bids(seller_id, bid_time);
+CREATE INDEX IF NOT EXISTS idx_bids_seller_id ON bids(seller_id);
+CREATE INDEX IF NOT EXISTS idx_bids_bid_time ON bids(bid_time);
+
+
+CREATE TRIGGER IF NOT EXISTS trg_bids_seller_id AFTER INSERT ON bids
+WHEN NEW.seller_id IS NULL
+BEGIN
+    UPDATE bids SET seller_id = (SELECT seller_id FROM items WHERE item_id = NEW.item_id)
+    WHERE bid_id = NEW.bid_id;
+END;
+
+
+-- Per-seller dashboard totals, kept current by the triggers below
+CREATE TABLE IF NOT EXISTS seller_stats (
+    seller_id INTEGER PRIMARY KEY,
+    items_listed INTEGER NOT NULL DEFAULT 0,
+    bids_received INTEGER NOT NULL DEFAULT 0,
+    gross_high_bid REAL NOT NULL DEFAULT 0,  -- sum of current_high_bid over the seller's items
+    last_bid_time TIMESTAMP NULL,
+    FOREIGN KEY (seller_id) REFERENCES users(user_id)
+);
+
+
+CREATE TRIGGER IF NOT EXISTS trg_items_seller_stats_insert AFTER INSERT ON items
+WHEN NEW.seller_id IS NOT NULL
+BEGIN
+    INSERT INTO seller_stats (seller_id, items_listed) VALUES (NEW.seller_id, 1)
+    ON CONFLICT (seller_id) DO UPDATE SET items_listed = items_listed + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_items_seller_stats_high_bid AFTER UPDATE OF current_high_bid ON items
+WHEN NEW.current_high_bid IS NOT OLD.current_high_bid
+BEGIN
+    UPDATE seller_stats
+    SET gross_high_bid = gross_high_bid + COALESCE(NEW.current_high_bid, 0) - COALESCE(OLD.current_high_bid, 0)
+    WHERE seller_id = NEW.seller_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_bids_seller_stats_insert AFTER INSERT ON bids
+BEGIN
+    UPDATE seller_stats
+    SET bids_received = bids_received + 1,
+        last_bid_time = MAX(COALESCE(last_bid_time, NEW.bid_time), NEW.bid_time)
+    WHERE seller_id = (SELECT seller_id FROM items WHERE item_id = NEW.item_id);
+END;
+
+
+-- Outcome of each closed auction, written by close_due_auctions
+CREATE TABLE IF NOT EXISTS settlements (
+    item_id INTEGER PRIMARY KEY,
+    seller_id INTEGER,
+    winner_id INTEGER NULL,  -- NULL when the auction closed without bids
+    final_price REAL NULL,
+    ends_at TIMESTAMP NOT NULL,
+    closed_at TIMESTAMP NOT NULL,
+    archived_at TIMESTAMP NULL,  -- when bid_archive.py moved the auction's bids to an archive file
+    FOREIGN KEY (item_id) REFERENCES items(item_id),
+    FOREIGN KEY (seller_id) REFERENCES users(user_id),
+    FOREIGN KEY (winner_id) REFERENCES users(user_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_settlements_winner_id ON settlements(winner_id);
+CREATE INDEX IF NOT EXISTS idx_settlements_closed_at ON settlements(closed_at);
+CREATE INDEX IF NOT EXISTS idx_settlements_archived_closed ON settlements(archived_at, closed_at);
+
+-- Archived bid files (bid_archive.py) and, per item and buyer, which file holds their bids
+CREATE TABLE IF NOT EXISTS bid_archives (
+    archive_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    path VARCHAR(255) NOT NULL,  -- relative to BID_ARCHIVE_DIR
+    bid_count INTEGER NOT NULL,
+    first_bid_time TIMESTAMP NULL,
+    last_bid_time TIMESTAMP NULL,
+    created_at TIMESTAMP NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS bid_archive_index (
+    archive_id INTEGER NOT NULL,
+    item_id INTEGER NOT NULL,
+    buyer_id INTEGER NOT NULL,
+    seller_id INTEGER NULL,
+    bid_count INTEGER NOT NULL,
+    last_bid_time TIMESTAMP NULL,
+    PRIMARY KEY (archive_id, item_id, buyer_id),
+    FOREIGN KEY (archive_id) REFERENCES bid_archives(archive_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_bid_archive_index_buyer ON bid_archive_index(buyer_id);
+CREATE INDEX IF NOT EXISTS idx_bid_archive_index_seller ON bid_archive_index(seller_id);
+CREATE INDEX IF NOT EXISTS idx_bid_archive_index_item ON bid_archive_index(item_id);
+
+-- Proxy (automatic) bids: the system bids for the buyer up to max_amount
+CREATE TABLE IF NOT EXISTS proxy_bids (
+    proxy_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    item_id INTEGER NOT NULL,
+    buyer_id INTEGER NOT NULL,
+    max_amount REAL NOT NULL,
+    created_at TIMESTAMP NOT NULL,
+    updated_at TIMESTAMP NOT NULL,
+    UNIQUE (buyer_id, item_id),
+    FOREIGN KEY (item_id) REFERENCES items(item_id),
+    FOREIGN KEY (buyer_id) REFERENCES users(user_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_proxy_bids_item_max ON proxy_bids(item_id, max_amount);
+
+-- Item-id sharding (shard_map.py): bucket -> shard map and the item id
+-- sequence. Every shard has the tables; only the directory (shard 0) fills them.
+CREATE TABLE IF NOT EXISTS shard_buckets (
+    bucket INTEGER PRIMARY KEY,
+    shard INTEGER NOT NULL,
+    version INTEGER NOT NULL,
+    moved_at TIMESTAMP NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_shard_buckets_version ON shard_buckets(version);
+
+CREATE TABLE IF NOT EXISTS id_sequences (
+    name VARCHAR(64) PRIMARY KEY,
+    next_id INTEGER NOT NULL
+);
+
+
+-- Browse Items search (search_items): FTS5 index over items, kept in step by triggers
+CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(
+    item_name, description,
+    content='items', content_rowid='item_id', tokenize='unicode61 remove_diacritics 2'
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_items_fts_insert AFTER INSERT ON items
+BEGIN
+    INSERT INTO items_fts (rowid, item_name, description) VALUES (NEW.item_id, NEW.item_name, NEW.description);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_items_fts_delete AFTER DELETE ON items
+BEGIN
+    INSERT INTO items_fts (items_fts, rowid, item_name, description) VALUES ('delete', OLD.item_id, OLD.item_name, OLD.description);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_items_fts_update AFTER UPDATE OF item_name, description ON items
+BEGIN
+    INSERT INTO items_fts (items_fts, rowid, item_name, description) VALUES ('delete', OLD.item_id, OLD.item_name, OLD.description);
+    INSERT INTO items_fts (rowid, item_name, description) VALUES (NEW.item_id, NEW.item_name, NEW.description);
+END;
+
+
+-- Migrations already included above; see migrate.py. Existing databases
+-- are upgraded by the backend before this file is applied.
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INT PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT OR IGNORE INTO schema_migrations (version, name) VALUES
+    (4, 'bids_composite_indexes'),
+    (5, 'items_search'),
+    (6, 'auction_schedule'),
+    (7, 'bids_seller_feed_index'),
+    (8, 'proxy_bids'),
+    (9, 'bid_archive'),
+    (10, 'shard_directory');
@@ -0,0 +1,177 @@
+"""
+Item-id sharding: which database holds an item.
+
+Items, with their bids, proxy bids, settlements and bid archive index
+rows, live on one of several databases (shards). item_id modulo
+SHARD_BUCKETS picks one of a fixed number of virtual buckets, and the shard
+map assigns each bucket to a shard, so rebalancing moves whole buckets and
+never renumbers an item. Shard 0 is also the directory: it holds every
+user, the map (shard_buckets) and the item id sequence, and owns every
+bucket the map does not mention, so a single database is simply a
+one-shard deployment. The other shards keep copies of the users, which
+their joins and foreign keys need.
+
+Each shard numbers its bids from its own block of SHARD_ID_SPAN ids, so
+bid_ids stay unique across shards. Processes cache the map and reread it
+every SHARD_MAP_REFRESH seconds, or at once when an item is not where the
+map said it was.
+
+    python shard_map.py status               buckets, items and stray rows per shard
+    python shard_map.py init                 prepare the shards (run after adding one)
+    python shard_map.py move BUCKET SHARD    move one bucket's items to a shard, online
+    python shard_map.py rebalance            move buckets until the shards hold even shares
+    python shard_map.py sync-users           copy every user from the directory to the shards
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+SHARD_MAP_CONFIG = {
+    'buckets': int(os.getenv('SHARD_BUCKETS', 1024)),  # Fixed for the life of the data; a bucket is the unit of moves
+    'refresh_seconds': float(os.getenv('SHARD_MAP_REFRESH', 5)),  # How stale a process's copy of the map may get
+    'move_grace_seconds': float(os.getenv('SHARD_MOVE_GRACE', 1))  # Extra wait before a move sweeps up stragglers
+}
+
+# Bids of shard k are numbered from k * SHARD_ID_SPAN
+SHARD_ID_SPAN = 10 ** 12
+
+class ShardMap:
+    """
+    This process's copy of the bucket -> shard map. Readers never block;
+    a reload swaps in a whole new dict.
+    """
+
+    def __init__(self, buckets, refresh_seconds, move_grace_seconds=0):
+        self.buckets = buckets
+        self.refresh_seconds = refresh_seconds
+        self.move_grace_seconds = move_grace_seconds
+        self._owners = {}  # bucket -> shard, for buckets the directory lists
+        self._checked = float('-inf')
+        self.version = 0
+        self.reloads = 0
+        self.lock = threading.Lock()  # held by whoever is rereading the map
+
+    def bucket(self, item_id):
+        return item_id % self.buckets
+
+    def shard_for(self, item_id):
+        return self._owners.get(item_id % self.buckets, 0)
+
+    def owner_of_bucket(self, bucket):
+        return self._owners.get(bucket, 0)
+
+    def due(self):
+        return time.monotonic() - self._checked >= self.refresh_seconds
+
+    def checked(self):
+        self._checked = time.monotonic()
+
+    def load(self, rows, version):
+        """
+        Replace the map with (bucket, shard) rows read at `version`
+        """
+        self._owners = {bucket: shard for bucket, shard in rows if shard}
+        self.version = version
+        self.reloads += 1
+        self.checked()
+
+    def bucket_counts(self, shards):
+        counts = {shard: 0 for shard in shards}
+        for bucket in range(self.buckets):
+            owner = self.owner_of_bucket(bucket)
+            counts[owner] = counts.get(owner, 0) + 1
+        return counts
+
+    def rebalance_plan(self, shards):
+        """
+        (bucket, from shard, to shard) moves that leave every shard in
+        `shards` with an even share of the buckets, moving as few as possible
+        """
+        shards = sorted(shards)
+        share, extra = divmod(self.buckets, len(shards))
+        target = {shard: share + (index < extra) for index, shard in enumerate(shards)}
+        owned = {shard: [] for shard in shards}
+        spare = []
+        for bucket in range(self.buckets):
+            owner = self.owner_of_bucket(bucket)
+            if owner in owned:
+                owned[owner].append(bucket)
+            else:
+                spare.append((bucket, owner))  # on a shard that is being retired
+        for shard in shards:
+            while len(owned[shard]) > target[shard]:
+                spare.append((owned[shard].pop(), shard))
+        moves = []
+        for shard in shards:
+            while len(owned[shard]) < target[shard] and spare:
+                bucket, source = spare.pop()
+                owned[shard].append(bucket)
+                moves.append((bucket, source, shard))
+        return sorted(moves)
+
+    def stats(self):
+        return {'version': self.version, 'buckets': self.buckets, 'mapped': len(self._owners), 'reloads': self.reloads}
+
+shard_map = ShardMap(**SHARD_MAP_CONFIG)
+
+def _print_moves(moved, message):
+    for bucket, source, target, items in moved:
+        print(f"  bucket {bucket}: shard {source} -> {target} ({items} items)")
+    print(message)
+    return 1 if message.startswith("Error") else 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python shard_map.py", description="Inspect and rebalance item-id shards")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('status', help="show buckets, items and stray rows per shard")
+    commands.add_parser('init', help="set up the item id sequence and bid id ranges, and copy users to every shard")
+    move = commands.add_parser('move', help="move one bucket's items to another shard while the site stays up")
+    move.add_argument('bucket', type=int)
+    move.add_argument('shard', type=int)
+    rebalance = commands.add_parser('rebalance', help="move buckets until every shard holds an even share")
+    rebalance.add_argument('--dry-run', action='store_true', help="only print the planned moves")
+    commands.add_parser('sync-users', help="copy every user from the directory to the other shards")
+    args = parser.parse_args(argv)
+
+    from db_config import init_shards, move_buckets, refresh_shard_map, shard_ids, shard_status, sync_users
+
+    if args.command == 'init':
+        success, message = init_shards()
+        print(message)
+        return 0 if success else 1
+    if args.command == 'sync-users':
+        copied, message = sync_users()
+        print(message)
+        return 1 if message.startswith("Error") else 0
+    if args.command == 'move':
+        return _print_moves(*move_buckets([args.bucket], args.shard))
+    if args.command == 'rebalance':
+        refresh_shard_map(force=True)
+        plan = shard_map.rebalance_plan(shard_ids())
+        if args.dry_run or not plan:
+            for bucket, source, target in plan:
+                print(f"  bucket {bucket}: shard {source} -> {target}")
+            print(f"{len(plan)} bucket move(s) planned")
+            return 0
+        by_target = {}
+        for bucket, _, target in plan:
+            by_target.setdefault(target, []).append(bucket)
+        status = 0
+        for target, buckets in sorted(by_target.items()):
+            status |= _print_moves(*move_buckets(buckets, target))
+        return status
+
+    status, message = shard_status()
+    if status is None:
+        print(message)
+        return 1
+    print(f"Shard map version {status['version']}, {shard_map.buckets} buckets")
+    for shard in status['shards']:
+        print(f"  shard {shard['shard']}: {shard['buckets']:>5} buckets {shard['items']:>10} items "
+              f"{shard['bids']:>12} bids {shard['users']:>8} users {shard['stray_items']:>6} stray items")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""
+Shared fixtures. A test that takes `db` runs once per backend, each time
+against a fresh database: SQLite in a temporary file, and MySQL when a
+server answers at the DB_* settings (the TEST_DB_NAME database is dropped
+and recreated from schema.sql, so never point it at real data).
+"""
+from contextlib import contextmanager
+from functools import lru_cache
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Cheap hashes on the calling thread, and no rate limits between test writes
+os.environ.setdefault('BCRYPT_ROUNDS', '4')
+os.environ.setdefault('HASH_WORKERS', '0')
+os.environ.setdefault('WRITE_USER_RATE', '0')
+os.environ.setdefault('WRITE_ITEM_RATE', '0')
+
+import pytest
+
+import db_config
+from migrate import split_statements
+from shard_map import shard_map
+
+TEST_DB_NAME = os.getenv('TEST_DB_NAME', 'auction_test')
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'schema.sql')
+
+def _server_config():
+    return {key: value for key, value in db_config.DB_CONFIG.items() if key != 'database'}
+
+@lru_cache(maxsize=1)
+def mysql_available():
+    try:
+        import mysql.connector
+        mysql.connector.connect(connection_timeout=2, **_server_config()).close()
+        return True
+    except Exception:
+        return False
+
+def create_mysql_database(name):
+    """
+    Drop `name` and load schema.sql into it afresh
+    """
+    import mysql.connector
+    with open(SCHEMA_PATH) as f:
+        script = f.read().replace('auction_db', name)
+    connection = mysql.connector.connect(**_server_config())
+    try:
+        cursor = connection.cursor()
+        cursor.execute(f"DROP DATABASE IF EXISTS {name}")
+        for statement in split_statements(script, 'mysql'):
+            cursor.execute(statement)
+        connection.commit()
+        cursor.close()
+    finally:
+        connection.close()
+
+def reset_state():
+    """
+    Close every backend and forget what the module-level caches hold
+    """
+    for backend in db_config._backends.values():
+        backend.close()
+    db_config._backends.clear()
+    db_config.read_cache.clear()
+    db_config.high_bid_cache.__init__()
+    db_config.proxy_engine.clear()
+    shard_map.load([], 0)
+
+@pytest.fixture(params=['sqlite', 'mysql'])
+def db(request, tmp_path, monkeypatch):
+    """
+    The backend name; db_config talks to a fresh, empty database of that kind
+    """
+    backend = request.param
+    monkeypatch.setitem(db_config.SHARD_CONFIG, 'hosts', [])
+    monkeypatch.setitem(db_config.SHARD_CONFIG, 'sqlite_paths', [])
+    monkeypatch.setitem(db_config.REPLICA_CONFIG, 'hosts', [])
+    monkeypatch.setattr(db_config, 'DB_BACKEND', backend)
+    if backend == 'sqlite':
+        monkeypatch.setitem(db_config.SQLITE_CONFIG, 'path', str(tmp_path / 'auction.db'))
+    else:
+        if not mysql_available():
+            pytest.skip("no MySQL server at DB_HOST/DB_PORT")
+        create_mysql_database(TEST_DB_NAME)
+        monkeypatch.setitem(db_config.DB_CONFIG, 'database', TEST_DB_NAME)
+    reset_state()
+    yield backend
+    reset_state()
+
+@pytest.fixture
+def sqlite_db(tmp_path, monkeypatch):
+    """
+    Like `db`, for tests that only run on the embedded backend
+    """
+    monkeypatch.setitem(db_config.SHARD_CONFIG, 'sqlite_paths', [])
+    monkeypatch.setitem(db_config.REPLICA_CONFIG, 'hosts', [])
+    monkeypatch.setattr(db_config, 'DB_BACKEND', 'sqlite')
+    monkeypatch.setitem(db_config.SQLITE_CONFIG, 'path', str(tmp_path / 'auction.db'))
+    reset_state()
+    yield 'sqlite'
+    reset_state()
+
+@contextmanager
+def _own_writes():
+    # Inside the caller's session, or a fresh one, so the read-back sees the write
+    state = db_config._session.get()
+    with db_config.session_scope({} if state is None else state):
+        yield
+
+def add_user(name, role='buyer', password='secret'):
+    """
+    Register a user and return their user_id
+    """
+    email = f"{name}@example.com"
+    with _own_writes():
+        success, message = db_config.register_user(name, email, password, role)
+        assert success, message
+        user, message = db_config.login_user(email, password)
+    assert user is not None, message
+    return user['user_id']
+
+def add_item(seller_id, name='Lamp', base_price=10, **kwargs):
+    """
+    List an item and return its item_id
+    """
+    description = kwargs.pop('description', f"A {name.lower()}")
+    with _own_writes():
+        success, message = db_config.add_item(name, description, base_price, seller_id, **kwargs)
+        assert success, message
+        items, _ = db_config.get_items_by_seller_page(seller_id, limit=1000)
+    return max(item['item_id'] for item in items if item['item_name'] == name)
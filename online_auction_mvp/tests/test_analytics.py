@@ -0,0 +1,135 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import db_config
+from analytics import ANALYTICS_CONFIG, AuctionAnalytics
+from bid_archive import BID_ARCHIVE_CONFIG
+from conftest import add_item, add_user
+from shard_map import shard_map
+
+def _analytics(fetch_size=2):
+    # A small fetch size makes a refresh read the bids in several chunks
+    return AuctionAnalytics(**dict(ANALYTICS_CONFIG, fetch_size=fetch_size, refresh_seconds=0))
+
+def _reports(analytics):
+    report = analytics.marketplace(0)
+    return [
+        report['sellers'].sort_index(), report['velocity'], report['active_bidders'], report['price_curve'],
+        analytics._items.sort_index()
+    ]
+
+def _assert_matches_full_recompute(analytics):
+    full = _analytics(fetch_size=1000)
+    full.refresh(force=True)
+    assert analytics.bids_processed == full.bids_processed
+    for ours, recomputed in zip(_reports(analytics), _reports(full)):
+        pd.testing.assert_frame_equal(ours, recomputed, check_dtype=False)
+
+def test_add_items_keeps_prices_with_their_ids():
+    analytics = _analytics()
+    analytics._add_items(np.array([10, 30], dtype=np.int64), np.array([1.0, 3.0]))
+    # Interleaved ids from another shard, one already known
+    analytics._add_items(np.array([5, 20, 30, 40], dtype=np.int64), np.array([0.5, 2.0, 3.0, 4.0]))
+    analytics._add_items(np.array([15], dtype=np.int64), np.array([1.5]))
+    assert analytics._item_ids.tolist() == [5, 10, 15, 20, 30, 40]
+    assert analytics._base_prices.tolist() == [0.5, 1.0, 1.5, 2.0, 3.0, 4.0]
+
+def test_refreshes_match_a_full_recompute(db, tmp_path, monkeypatch):
+    monkeypatch.setitem(BID_ARCHIVE_CONFIG, 'dir', str(tmp_path / 'archive'))
+    now = datetime.now().replace(microsecond=0)
+    sam, kim = add_user('sam', role='seller'), add_user('kim', role='seller')
+    alice, bob = add_user('alice'), add_user('bob')
+    lamp = add_item(sam, 'Lamp', 10, ends_at=now + timedelta(hours=1))
+    chair = add_item(kim, 'Chair', 20, ends_at=now + timedelta(hours=1))
+    analytics = _analytics()
+
+    for item_id, buyer_id, amount in ((lamp, alice, 11), (lamp, bob, 12), (chair, alice, 25)):
+        assert db_config.place_bid(item_id, buyer_id, amount)[0]
+    assert analytics.refresh(force=True)
+    _assert_matches_full_recompute(analytics)
+
+    # New bids only: a later listing too, whose base price has to be found
+    rug = add_item(sam, 'Rug', 5, ends_at=now + timedelta(days=60))
+    for item_id, buyer_id, amount in ((lamp, alice, 13), (rug, bob, 6), (rug, alice, 7)):
+        assert db_config.place_bid(item_id, buyer_id, amount)[0]
+    processed = analytics.bids_processed
+    analytics.refresh(force=True)
+    assert analytics.bids_processed == processed + 3
+    _assert_matches_full_recompute(analytics)
+
+    # Settlements, read again within the lookback without counting twice
+    closed_at = now + timedelta(hours=2)
+    assert len(db_config.close_due_auctions(now=closed_at)[0]) == 2
+    analytics.refresh(force=True)
+    analytics.refresh(force=True)
+    sellers = analytics.marketplace(0)['sellers']
+    assert sellers.loc[sam, ['closed', 'sold', 'revenue']].tolist() == [1, 1, 13]
+    assert sellers.loc[kim, ['closed', 'sold', 'revenue']].tolist() == [1, 1, 25]
+    _assert_matches_full_recompute(analytics)
+
+    # Archiving moves counted bids into files: they are not counted again
+    archived, message = db_config.archive_bid_history(now=closed_at + timedelta(days=BID_ARCHIVE_CONFIG['after_days'] + 1))
+    assert archived == 4, message
+    processed = analytics.bids_processed
+    analytics.refresh(force=True)
+    assert analytics.bids_processed == processed
+    _assert_matches_full_recompute(analytics)
+    assert analytics.marketplace(0)['sellers'].loc[sam, 'bids'] == 5
+
+def test_bids_archived_before_the_first_refresh_are_read_from_the_files(db, tmp_path, monkeypatch):
+    monkeypatch.setitem(BID_ARCHIVE_CONFIG, 'dir', str(tmp_path / 'archive'))
+    now = datetime.now().replace(microsecond=0)
+    sam, alice = add_user('sam', role='seller'), add_user('alice')
+    lamp = add_item(sam, 'Lamp', 10, ends_at=now + timedelta(hours=1))
+    assert db_config.place_bid(lamp, alice, 11)[0]
+    closed_at = now + timedelta(hours=2)
+    assert len(db_config.close_due_auctions(now=closed_at)[0]) == 1
+    assert db_config.archive_bid_history(now=closed_at + timedelta(days=BID_ARCHIVE_CONFIG['after_days'] + 1))[0] == 1
+    chair = add_item(sam, 'Chair', 10)
+    assert db_config.place_bid(chair, alice, 12)[0]
+
+    analytics = _analytics()
+    analytics.refresh(force=True)
+    assert analytics.bids_processed == 2
+    assert sorted(analytics._items.index) == sorted([lamp, chair])
+    analytics.refresh(force=True)
+    assert analytics.bids_processed == 2
+
+@pytest.fixture
+def sharded(sqlite_db, tmp_path, monkeypatch):
+    monkeypatch.setitem(db_config.SHARD_CONFIG, 'sqlite_paths', [str(tmp_path / 'shard1.db')])
+    monkeypatch.setattr(shard_map, 'refresh_seconds', 0)
+    monkeypatch.setattr(shard_map, 'move_grace_seconds', 0)
+    success, message = db_config.init_shards()
+    assert success, message
+    return 1
+
+def test_per_shard_high_water_marks_and_reset_on_a_move(sharded):
+    sam, alice, bob = add_user('sam', role='seller'), add_user('alice'), add_user('bob')
+    lamp = add_item(sam, 'Lamp', 10)
+    chair = add_item(sam, 'Chair', 10)
+    assert db_config.move_buckets([chair % shard_map.buckets], sharded)[0]
+    analytics = _analytics()
+
+    for item_id, buyer_id, amount in ((lamp, alice, 11), (chair, bob, 11), (chair, alice, 12)):
+        assert db_config.place_bid(item_id, buyer_id, amount)[0]
+    analytics.refresh(force=True)
+    assert set(analytics._bid_high_water) == {0, sharded}
+    assert analytics._bid_high_water[sharded] > sharded * db_config.SHARD_ID_SPAN
+    _assert_matches_full_recompute(analytics)
+
+    # Shard 0's bids have lower ids than shard 1's; each shard is read above its own mark
+    assert db_config.place_bid(lamp, bob, 12)[0]
+    analytics.refresh(force=True)
+    assert analytics.bids_processed == 4
+    _assert_matches_full_recompute(analytics)
+
+    # Moving the lamp renumbers its bids on shard 1: the next refresh starts over
+    assert db_config.move_buckets([lamp % shard_map.buckets], sharded)[0]
+    analytics.refresh(force=True)
+    assert analytics.bids_processed == 4
+    assert analytics._bid_high_water[0] == 0  # shard 0 has no bids left
+    _assert_matches_full_recompute(analytics)
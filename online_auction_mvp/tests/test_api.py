@@ -0,0 +1,182 @@
+import asyncio
+import threading
+
+from aiohttp.test_utils import TestClient, TestServer
+import pytest
+
+import api
+import async_db
+from api import API_CONFIG, AdmissionControl, make_app
+from conftest import add_item, add_user
+
+@pytest.fixture
+def api_db(sqlite_db, monkeypatch):
+    # async_db picks its pool from the DB_BACKEND it imported
+    monkeypatch.setattr(async_db, 'DB_BACKEND', 'sqlite')
+    return sqlite_db
+
+def _run(scenario, **config):
+    # Serve a fresh app on a test server for the length of `scenario(client)`
+    async def main():
+        async with TestClient(TestServer(make_app(dict(API_CONFIG, **config)))) as client:
+            return await scenario(client)
+
+    return asyncio.run(main())
+
+async def _login(client, name):
+    response = await client.post('/api/login', json={'email': f"{name}@example.com", 'password': 'secret'})
+    assert response.status == 200
+    body = await response.json()
+    return {'Authorization': f"Bearer {body['token']}"}
+
+def test_login(api_db):
+    add_user('bob')
+
+    async def scenario(client):
+        response = await client.post('/api/login', json={'email': 'bob@example.com', 'password': 'secret'})
+        body = await response.json()
+        assert response.status == 200 and body['user']['name'] == 'bob'
+        assert api.read_token(body['token'])['name'] == 'bob'
+
+        response = await client.post('/api/login', json={'email': 'bob@example.com', 'password': 'wrong'})
+        assert (response.status, await response.json()) == (401, {'error': "Invalid email or password"})
+        response = await client.post('/api/login', data="not json")
+        assert response.status == 400
+
+    _run(scenario)
+
+def test_list_and_read_items(api_db):
+    seller_id = add_user('sam', role='seller')
+    lamp = add_item(seller_id, 'Lamp', 10, description="A brass desk lamp")
+    chair = add_item(seller_id, 'Chair', 20, description="An oak chair")
+
+    async def scenario(client):
+        response = await client.get('/api/items', params={'limit': 1})
+        body = await response.json()
+        assert [item['item_id'] for item in body['items']] == [lamp]
+        assert body['next_after_id'] == lamp
+        body = await (await client.get('/api/items', params={'after_id': lamp})).json()
+        assert [item['item_id'] for item in body['items']] == [chair] and body['next_after_id'] is None
+
+        body = await (await client.get('/api/items', params={'q': 'brass'})).json()
+        assert [item['item_name'] for item in body['items']] == ['Lamp']
+        assert (await client.get('/api/items', params={'sort': 'nonsense'})).status == 400
+
+        body = await (await client.get(f'/api/items/{chair}')).json()
+        assert body['item']['item_name'] == 'Chair'
+        assert (await client.get('/api/items/999999')).status == 404
+        assert (await client.get('/api/items/lamp')).status == 400
+
+    _run(scenario)
+
+def test_place_bid_and_read_my_bids(api_db):
+    seller_id = add_user('sam', role='seller')
+    add_user('bob')
+    lamp = add_item(seller_id, 'Lamp', 10)
+
+    async def scenario(client):
+        bob = await _login(client, 'bob')
+        assert (await client.post(f'/api/items/{lamp}/bids', json={'amount': 11})).status == 401
+        sam = await _login(client, 'sam')
+        assert (await client.post(f'/api/items/{lamp}/bids', json={'amount': 11}, headers=sam)).status == 403
+
+        response = await client.post(f'/api/items/{lamp}/bids', json={'amount': '11.50'}, headers=bob)
+        assert response.status == 201
+        assert (await response.json())['amount'] == '11.50'
+        response = await client.post(f'/api/items/{lamp}/bids', json={'amount': 11}, headers=bob)
+        assert response.status == 409
+        assert (await response.json())['error'].startswith("Bid must be higher than current highest bid")
+        assert (await client.post(f'/api/items/{lamp}/bids', json={'amount': -1}, headers=bob)).status == 400
+        assert (await client.post('/api/items/999999/bids', json={'amount': 11}, headers=bob)).status == 404
+        assert (await client.post(f'/api/items/{lamp}/bids', json={'amount': 12}, headers=bob)).status == 201
+
+        bids = (await (await client.get(f'/api/items/{lamp}/bids')).json())['bids']
+        assert [float(bid['bid_amount']) for bid in bids] == [12, 11.5]
+
+        assert (await client.get('/api/me/bids')).status == 401
+        body = await (await client.get('/api/me/bids', params={'limit': 1}, headers=bob)).json()
+        assert [float(bid['bid_amount']) for bid in body['bids']] == [12]
+        page = await (await client.get('/api/me/bids', params=dict(body['next'], limit=1), headers=bob)).json()
+        assert [float(bid['bid_amount']) for bid in page['bids']] == [11.5]
+        assert (await client.get('/api/me/bids', params={'after_time': 'yesterday', 'after_id': 1}, headers=bob)).status == 400
+
+    _run(scenario)
+
+def test_proxy_bid(api_db):
+    seller_id = add_user('sam', role='seller')
+    add_user('alice')
+    add_user('carol')
+    lamp = add_item(seller_id, 'Lamp', 10)
+
+    async def scenario(client):
+        alice, carol = await _login(client, 'alice'), await _login(client, 'carol')
+        response = await client.put(f'/api/items/{lamp}/proxy', json={'max_amount': 50}, headers=alice)
+        assert response.status == 200
+        assert (await response.json())['message'].startswith("Automatic bid set up to 50")
+        assert (await client.put(f'/api/items/{lamp}/proxy', json={}, headers=alice)).status == 400
+
+        # A manual bid below Alice's maximum is answered by her proxy
+        response = await client.post(f'/api/items/{lamp}/bids', json={'amount': 20}, headers=carol)
+        assert response.status == 201
+        assert (await response.json())['message'].startswith("Bid placed, but an automatic bid outbid it")
+        item = (await (await client.get(f'/api/items/{lamp}')).json())['item']
+        assert float(item['current_high_bid']) == 21
+
+    _run(scenario)
+
+def test_admission_turns_away_requests_beyond_the_queue():
+    async def scenario():
+        admission = AdmissionControl(max_concurrency=1, max_queue=1, timeout=5)
+        release = asyncio.Event()
+
+        async def handler(request):
+            await release.wait()
+            return api.json_response({'ok': True})
+
+        request = type('Request', (), {'method': 'GET'})()
+        first = asyncio.create_task(admission.handle(request, handler))
+        second = asyncio.create_task(admission.handle(request, handler))
+        await asyncio.sleep(0.01)
+        assert (admission.in_flight, admission.waiting) == (1, 1)
+
+        response = await admission.handle(request, handler)
+        assert response.status == 503 and response.headers['Retry-After'] == '1'
+        assert admission.rejected == 1
+
+        release.set()
+        assert [response.status for response in await asyncio.gather(first, second)] == [200, 200]
+        assert admission.stats() == {'in_flight': 0, 'waiting': 0, 'rejected': 1, 'timed_out': 0}
+
+    asyncio.run(scenario())
+
+def test_slow_requests_time_out(api_db, monkeypatch):
+    seller_id = add_user('sam', role='seller')
+    add_user('alice')
+    lamp = add_item(seller_id, 'Lamp', 10)
+    release = threading.Event()
+
+    def slow_proxy(item_id, buyer_id, max_amount):
+        release.wait(5)
+        return True, "Automatic bid set up"
+
+    async def slow_list(after_id, limit):
+        await asyncio.sleep(5)
+
+    monkeypatch.setattr(api, 'set_proxy_bid', slow_proxy)
+    monkeypatch.setattr(api.async_db, 'view_items_page', slow_list)
+
+    async def scenario(client):
+        alice = await _login(client, 'alice')
+        client.app['admission'].timeout = 0.2
+        try:
+            # A timed-out write may still apply; the client is told so
+            response = await client.put(f'/api/items/{lamp}/proxy', json={'max_amount': 50}, headers=alice)
+            assert (response.status, await response.json()) == (
+                504, {'error': "Request timed out; it may still have taken effect"})
+        finally:
+            release.set()
+        response = await client.get('/api/items')
+        assert (response.status, await response.json()) == (504, {'error': "Request timed out"})
+        assert client.app['admission'].timed_out == 2
+
+    _run(scenario)
@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta
+
+import db_config
+from auction_scheduler import AuctionScheduler
+from conftest import add_item, add_user
+
+def _scheduler(max_tracked=100):
+    return AuctionScheduler(lookahead=3 * 3600, max_tracked=max_tracked, refresh_interval=30)
+
+def _status(item_id):
+    return db_config.get_item_by_id(item_id)[0]['status']
+
+def test_due_auctions_are_settled_once(db):
+    now = datetime.now().replace(microsecond=0)
+    seller_id = add_user('sam', role='seller')
+    buyer_id = add_user('bob')
+    lamp = add_item(seller_id, 'Lamp', 10, ends_at=now + timedelta(hours=1))
+    chair = add_item(seller_id, 'Chair', 10, ends_at=now + timedelta(hours=2))
+    assert db_config.place_bid(lamp, buyer_id, 11)[0]
+    scheduler = _scheduler()
+
+    assert scheduler.run_once(now) == []
+    assert sorted(item_id for _, item_id in scheduler._heap) == [lamp, chair]
+    assert scheduler._horizon == now + timedelta(hours=3)
+    # A refresh does not track a closing twice
+    scheduler.run_once(now)
+    assert len(scheduler._heap) == 2
+
+    settled = scheduler.run_once(now + timedelta(hours=1, seconds=1))
+    assert [(row['item_id'], row['winner_id'], float(row['final_price'])) for row in settled] == [(lamp, buyer_id, 11)]
+    assert scheduler.run_once(now + timedelta(hours=1, seconds=2)) == []
+    assert [item_id for _, item_id in scheduler._heap] == [chair]
+
+    assert len(scheduler.run_once(now + timedelta(hours=3))) == 1
+    assert scheduler.run_once(now + timedelta(hours=3)) == []
+    assert scheduler.stats() == {'tracked': 0, 'runs': 6, 'closed': 2, 'errors': 0}
+    with db_config.db_cursor() as cursor:
+        cursor.execute("SELECT item_id FROM settlements ORDER BY item_id")
+        assert [row[0] for row in cursor.fetchall()] == [lamp, chair]
+
+def test_horizon_stops_at_max_tracked(db):
+    now = datetime.now().replace(microsecond=0)
+    seller_id = add_user('sam', role='seller')
+    ends = [now + timedelta(minutes=minutes) for minutes in (10, 20, 30)]
+    items = [add_item(seller_id, f"Item {n}", 10, ends_at=ends_at) for n, ends_at in enumerate(ends)]
+    scheduler = _scheduler(max_tracked=2)
+
+    scheduler.run_once(now)
+    assert sorted(scheduler._heap) == [(ends[0], items[0]), (ends[1], items[1])]
+    assert scheduler._horizon == ends[1]
+
+    # Closings made in this process are only tracked up to the horizon
+    scheduler.schedule(99, ends[1] + timedelta(minutes=1))
+    scheduler.schedule(98, ends[0] + timedelta(minutes=1))
+    assert len(scheduler._heap) == 3 and (ends[0] + timedelta(minutes=1), 98) in scheduler._heap
+
+    # Once the tracked ones are done the next closings are loaded
+    assert len(scheduler.run_once(ends[1] + timedelta(seconds=1))) == 2
+    assert scheduler._heap == [(ends[2], items[2])]
+    assert scheduler._horizon == ends[1] + timedelta(seconds=1) + scheduler.lookahead
+
+def test_anti_snipe_extension_is_not_closed_early(db, monkeypatch):
+    monkeypatch.setitem(db_config.AUCTION_CONFIG, 'anti_snipe_window', 600)
+    monkeypatch.setitem(db_config.AUCTION_CONFIG, 'anti_snipe_extension', 600)
+    now = datetime.now().replace(microsecond=0)
+    seller_id = add_user('sam', role='seller')
+    buyer_id = add_user('bob')
+    lamp = add_item(seller_id, 'Lamp', 10, ends_at=now + timedelta(seconds=60))
+    scheduler = _scheduler()
+    scheduler.run_once(now)
+    assert scheduler._heap == [(now + timedelta(seconds=60), lamp)]
+
+    # A late bid pushes the end out; the heap entry for the old end is now stale
+    assert db_config.place_bid(lamp, buyer_id, 11)[0]
+    extended = db_config.get_item_by_id(lamp)[0]['ends_at']
+    assert extended >= now + timedelta(seconds=600)
+
+    assert scheduler.run_once(now + timedelta(seconds=61)) == []
+    assert _status(lamp) == 'open'
+    assert scheduler._heap == [(extended, lamp)]
+
+    assert len(scheduler.run_once(extended + timedelta(seconds=1))) == 1
+    assert _status(lamp) != 'open'
+    assert scheduler.run_once(extended + timedelta(seconds=2)) == []
@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+
+import db_config
+from bid_archive import BID_ARCHIVE_CONFIG, read_archive
+from conftest import add_item, add_user
+
+def _set_bid_times(item_id, times):
+    with db_config.db_cursor(commit=True) as cursor:
+        cursor.execute("SELECT bid_id FROM bids WHERE item_id = %s ORDER BY bid_id", (item_id,))
+        for (bid_id,), bid_time in zip(cursor.fetchall(), times):
+            cursor.execute("UPDATE bids SET bid_time = %s WHERE bid_id = %s", (bid_time, bid_id))
+
+def test_archive_round_trip_across_a_month_boundary(db, tmp_path, monkeypatch):
+    monkeypatch.setitem(BID_ARCHIVE_CONFIG, 'dir', str(tmp_path / 'archive'))
+    now = datetime.now().replace(microsecond=0)
+    month_start = db_config._month_start(now)
+    bid_times = [month_start - timedelta(minutes=1), month_start - timedelta(seconds=1), month_start + timedelta(seconds=30)]
+
+    seller_id = add_user('sam', role='seller')
+    buyer_id = add_user('bob')
+    item_id = add_item(seller_id, 'Lamp', 10, ends_at=now + timedelta(hours=1))
+    for amount in (11, 12, 13):
+        assert db_config.place_bid(item_id, buyer_id, amount)[0]
+    _set_bid_times(item_id, bid_times)
+    live, _ = db_config.get_bids_by_user(buyer_id)
+
+    closed_at = now + timedelta(hours=2)
+    assert len(db_config.close_due_auctions(now=closed_at)[0]) == 1
+    archived, message = db_config.archive_bid_history(now=closed_at + timedelta(days=BID_ARCHIVE_CONFIG['after_days'] + 1))
+    assert (archived, message) == (3, "Archived 3 bids of 1 auctions")
+
+    with db_config.db_cursor() as cursor:
+        cursor.execute("SELECT COUNT(*) FROM bids")
+        assert cursor.fetchone()[0] == 0
+        cursor.execute("SELECT path, bid_count, first_bid_time, last_bid_time FROM bid_archives")
+        path, bid_count, first_bid_time, last_bid_time = cursor.fetchone()
+    assert (bid_count, first_bid_time, last_bid_time) == (3, bid_times[0], bid_times[-1])
+
+    rows = list(read_archive(path))
+    # Newest first, ready to merge with other files
+    assert [row['bid_time'] for row in rows] == bid_times[::-1]
+    assert [row['bid_amount'] for row in rows] == [13, 12, 11]
+    assert {(row['item_id'], row['item_name'], row['buyer_id'], row['buyer_name'], row['seller_id']) for row in rows} == {
+        (item_id, 'Lamp', buyer_id, 'bob', seller_id)}
+    assert list(read_archive(path, 'buyer_id', buyer_id)) == rows
+    assert list(read_archive(path, 'buyer_id', buyer_id + 1)) == []
+
+    # The history functions merge the archive back in, in the same order as before
+    history, _ = db_config.get_bids_by_user(buyer_id)
+    assert [(bid['bid_id'], bid['bid_time'], float(bid['bid_amount'])) for bid in history] == [
+        (bid['bid_id'], bid['bid_time'], float(bid['bid_amount'])) for bid in live]
+
+    restored, message = db_config.restore_archived_bids()
+    assert restored == 3, message
+    with db_config.db_cursor() as cursor:
+        cursor.execute("SELECT bid_time, bid_amount FROM bids WHERE item_id = %s ORDER BY bid_time", (item_id,))
+        assert [(bid_time, float(amount)) for bid_time, amount in cursor.fetchall()] == list(zip(bid_times, [11, 12, 13]))
+
+def test_export_streams_archived_bids_in_order(db, tmp_path, monkeypatch):
+    monkeypatch.setitem(BID_ARCHIVE_CONFIG, 'dir', str(tmp_path / 'archive'))
+    now = datetime.now().replace(microsecond=0)
+    seller_id = add_user('sam', role='seller')
+    buyer_id = add_user('bob')
+    lamp = add_item(seller_id, 'Lamp', 10, ends_at=now + timedelta(hours=1))
+    chair = add_item(seller_id, 'Chair', 10, ends_at=now + timedelta(hours=1))
+    for item_id, amounts in ((lamp, (11, 12)), (chair, (20, 21))):
+        for amount in amounts:
+            assert db_config.place_bid(item_id, buyer_id, amount)[0]
+    # The two auctions' bids interleave in time
+    _set_bid_times(lamp, [now - timedelta(minutes=4), now - timedelta(minutes=2)])
+    _set_bid_times(chair, [now - timedelta(minutes=3), now - timedelta(minutes=1)])
+
+    closed_at = now + timedelta(hours=2)
+    assert len(db_config.close_due_auctions(now=closed_at)[0]) == 2
+    archive_at = closed_at + timedelta(days=BID_ARCHIVE_CONFIG['after_days'] + 1)
+    assert db_config.archive_bid_history(now=archive_at, batch_size=1)[0] == 4  # one file per auction
+    live_item = add_item(seller_id, 'Rug', 10)
+    assert db_config.place_bid(live_item, buyer_id, 30)[0]
+
+    columns = ('bid_id', 'item_id', 'item_name', 'bid_amount', 'bid_time')
+    archived = db_config._archived_rows('buyer_id', buyer_id, columns)
+    assert not isinstance(archived, list)
+    assert [float(row[3]) for row in archived] == [21, 12, 20, 11]
+
+    lines = b"".join(db_config.export_bids_by_user_csv(buyer_id)).decode().splitlines()
+    assert lines[0] == ",".join(columns)
+    assert [float(line.split(",")[3]) for line in lines[1:]] == [30, 21, 12, 20, 11]
@@ -0,0 +1,94 @@
+import random
+import threading
+
+from bid_cache import HighBidCache
+
+def _row(item_id, bid_amount=None, buyer_id=None):
+    return {
+        'item_id': item_id, 'item_name': f"Item {item_id}", 'seller_id': 1, 'base_price': 10,
+        'buyer_id': buyer_id, 'buyer_name': buyer_id and f"user {buyer_id}", 'bid_amount': bid_amount, 'bid_time': None
+    }
+
+def test_load_keeps_writes_made_during_it():
+    cache = HighBidCache()
+    cache.begin_load()
+    rows = [_row(1)]  # read before the writes below
+    cache.add_item(2, 'Item 2', 1, 10)
+    assert cache.record_bid(1, 7, 'user 7', 15, None) is False  # nothing cached yet
+    cache.load(rows)
+
+    assert cache.get(1)['bid_amount'] == 15
+    assert cache.get(2)['bid_amount'] is None
+
+def test_overlapping_loads_keep_writes_made_during_either():
+    cache = HighBidCache()
+    cache.begin_load()
+    first_rows = [_row(1)]
+    cache.begin_load()
+    cache.add_item(2, 'Item 2', 1, 10)
+    second_rows = [_row(1), _row(2)]
+    cache.record_bid(1, 7, 'user 7', 15, None)
+
+    cache.load(first_rows)
+    assert cache.get(1)['bid_amount'] == 15
+    assert cache.get(2) is not None
+
+    cache.record_bid(2, 8, 'user 8', 20, None)
+    cache.load(second_rows)  # older than both bids
+    assert cache.get(1)['bid_amount'] == 15
+    assert cache.get(2)['bid_amount'] == 20
+
+    # Once no load is in flight, writes are no longer queued for replay
+    cache.record_bid(1, 7, 'user 7', 16, None)
+    assert cache._pending == []
+
+def test_aborted_load_drops_queued_writes():
+    cache = HighBidCache()
+    cache.begin_load()
+    cache.add_item(1, 'Item 1', 1, 10)
+    cache.abort_load()
+    assert cache._pending == [] and not cache.loaded
+
+def test_concurrent_loads_and_writes_converge():
+    # A stand-in database: writers commit a bid, then tell the cache, like
+    # place_bid; loaders snapshot it after begin_load(), like _reload_high_bid_cache
+    cache = HighBidCache()
+    database = {item_id: _row(item_id) for item_id in range(5)}
+    database_lock = threading.Lock()
+    cache.load([dict(row) for row in database.values()])
+    next_item = iter(range(5, 1000))
+
+    def writer(seed):
+        rng = random.Random(seed)
+        for _ in range(300):
+            with database_lock:
+                if rng.random() < 0.1:
+                    item_id = next(next_item)
+                    database[item_id] = _row(item_id)
+                    bid = None
+                else:
+                    item_id = rng.randrange(5)
+                    row = database[item_id]
+                    bid = (row['bid_amount'] or 10) + 1
+                    row.update(bid_amount=bid, buyer_id=seed, buyer_name=f"user {seed}")
+            if bid is None:
+                cache.add_item(item_id, f"Item {item_id}", 1, 10)
+            else:
+                cache.record_bid(item_id, seed, f"user {seed}", bid, None)
+
+    def loader():
+        for _ in range(50):
+            cache.begin_load()
+            with database_lock:
+                rows = [dict(row) for row in database.values()]
+            cache.load(rows)
+
+    threads = [threading.Thread(target=writer, args=(seed,)) for seed in range(4)]
+    threads += [threading.Thread(target=loader) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    cached = {entry['item_id']: entry['bid_amount'] for entry in cache.all()}
+    assert cached == {item_id: row['bid_amount'] for item_id, row in database.items()}
@@ -0,0 +1,106 @@
+from contextlib import contextmanager
+import logging
+import threading
+
+import pytest
+
+import bid_intake
+import db_config
+from bid_intake import BidIntake
+from conftest import add_item, add_user
+
+@pytest.fixture
+def intake():
+    intake = BidIntake(batch_size=10, batch_wait_ms=1, max_queue=100)
+    yield intake
+    intake.stop(timeout=5)
+
+def _committed_bids(item_id):
+    with db_config.db_cursor() as cursor:
+        cursor.execute("SELECT bid_amount FROM bids WHERE item_id = %s ORDER BY bid_id", (item_id,))
+        return [float(row[0]) for row in cursor.fetchall()]
+
+def test_batch_accepts_and_rejects_in_order(db, intake):
+    seller_id = add_user('sam', role='seller')
+    buyer_id = add_user('bob')
+    item_id = add_item(seller_id, 'Lamp', 10)
+
+    futures = [intake.submit(item_id, buyer_id, amount) for amount in (11, 12, 13)]
+    assert [future.result(5) for future in futures] == [(True, "Bid placed successfully")] * 3
+    assert intake.submit(item_id, buyer_id, 12).result(5)[0] is False
+    assert _committed_bids(item_id) == [11, 12, 13]
+    assert db_config.get_high_bid(item_id)[0]['bid_amount'] == 13
+
+def test_bids_are_rechecked_against_locked_rows(db, intake):
+    seller_id = add_user('sam', role='seller')
+    buyer_id = add_user('bob')
+    item_id = add_item(seller_id, 'Lamp', 10)
+    assert db_config.get_high_bid(item_id)[0]['bid_amount'] is None  # warm the cache
+
+    # Another process outbids behind this one's cache
+    with db_config.db_cursor(commit=True) as cursor:
+        cursor.execute("UPDATE items SET current_high_bid = 50, current_high_bidder_id = %s WHERE item_id = %s",
+                       (buyer_id, item_id))
+    assert db_config.get_high_bid(item_id)[0]['bid_amount'] is None
+
+    success, message = intake.submit(item_id, buyer_id, 30).result(5)
+    assert not success
+    assert message.startswith("Bid must be higher than current highest bid of 50")
+    assert _committed_bids(item_id) == []
+
+def test_futures_resolve_after_commit(db, intake, monkeypatch):
+    seller_id = add_user('sam', role='seller')
+    buyer_id = add_user('bob')
+    item_id = add_item(seller_id, 'Lamp', 10)
+
+    in_transaction = threading.Event()
+    release = threading.Event()
+    real_db_cursor = bid_intake.db_cursor
+
+    @contextmanager
+    def held_db_cursor(*args, **kwargs):
+        # Keep the writer's transaction open until the test lets it commit
+        with real_db_cursor(*args, **kwargs) as cursor:
+            yield cursor
+            in_transaction.set()
+            assert release.wait(5)
+
+    monkeypatch.setattr(bid_intake, 'db_cursor', held_db_cursor)
+    seen_at_resolution = []
+    resolved = threading.Event()
+
+    def on_resolved(future):
+        # Runs on the writer thread as the future resolves
+        seen_at_resolution.append(_committed_bids(item_id))
+        resolved.set()
+
+    future = intake.submit(item_id, buyer_id, 11)
+    future.add_done_callback(on_resolved)
+
+    assert in_transaction.wait(5)
+    assert not future.done()
+    assert _committed_bids(item_id) == []
+    release.set()
+
+    assert future.result(5) == (True, "Bid placed successfully")
+    assert resolved.wait(5)
+    assert seen_at_resolution == [[11]]
+
+def test_writer_survives_an_unexpected_error(db, intake, monkeypatch, caplog):
+    seller_id = add_user('sam', role='seller')
+    buyer_id = add_user('bob')
+    item_id = add_item(seller_id, 'Lamp', 10)
+    real_commit = BidIntake._commit
+
+    def broken_commit(self, batch):
+        raise RuntimeError("cache is broken")
+
+    monkeypatch.setattr(BidIntake, '_commit', broken_commit)
+    with caplog.at_level(logging.ERROR, logger='auction.bid_intake'):
+        assert intake.submit(item_id, buyer_id, 11).result(5) == (False, "Error placing bid: cache is broken")
+    assert "Bid intake batch failed" in caplog.text
+    assert intake.stats()['errors'] == 1
+
+    monkeypatch.setattr(BidIntake, '_commit', real_commit)
+    assert intake.submit(item_id, buyer_id, 11).result(5) == (True, "Bid placed successfully")
+    assert _committed_bids(item_id) == [11]
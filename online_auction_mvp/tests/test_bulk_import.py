@@ -0,0 +1,70 @@
+import pytest
+
+import db_config
+from conftest import add_user
+from shard_map import shard_map
+
+def _item_names(shard=None):
+    with db_config.on_shard(db_config.current_shard() if shard is None else shard), db_config.db_cursor() as cursor:
+        cursor.execute("SELECT item_name FROM items ORDER BY item_id")
+        return [row[0] for row in cursor.fetchall()]
+
+def test_import_skips_invalid_rows(db):
+    seller_id = add_user('sam', role='seller')
+    rows = [
+        {'item_name': 'Lamp', 'description': "A lamp", 'base_price': 10},
+        {'item_name': ' ', 'description': "No name", 'base_price': 10},
+        {'item_name': 'Chair', 'description': "A chair", 'base_price': 'cheap'},
+        {'item_name': 'Rug', 'description': "A rug", 'base_price': 0},
+        {'item_name': ' Vase ', 'description': None, 'base_price': '7.5'}
+    ]
+    # A generator, consumed two rows at a time
+    inserted, errors, message = db_config.bulk_add_items((row for row in rows), seller_id, batch_size=2)
+    assert (inserted, message) == (2, "Imported 2 items, skipped 3 invalid rows")
+    assert errors == [(2, "Item name is required"), (3, "Invalid base price: 'cheap'"), (4, "Base price must be greater than 0")]
+    assert _item_names() == ['Lamp', 'Vase']
+    assert [item['item_name'] for item in db_config.get_items_by_seller_page(seller_id)[0]] == ['Lamp', 'Vase']
+
+@pytest.fixture
+def sharded(sqlite_db, tmp_path, monkeypatch):
+    monkeypatch.setitem(db_config.SHARD_CONFIG, 'sqlite_paths', [str(tmp_path / 'shard1.db')])
+    monkeypatch.setattr(shard_map, 'refresh_seconds', 0)
+    monkeypatch.setattr(shard_map, 'move_grace_seconds', 0)
+    success, message = db_config.init_shards()
+    assert success, message
+    return 1
+
+def _next_item_id():
+    with db_config.on_shard(0), db_config.db_cursor() as cursor:
+        cursor.execute("SELECT next_id FROM id_sequences WHERE name = 'items'")
+        return cursor.fetchone()[0]
+
+def test_import_spans_shards_and_rolls_back_on_every_one(sharded):
+    seller_id = add_user('sam', role='seller')
+    # The first imported item lands on shard 1, the next ones on the directory
+    first = _next_item_id()
+    assert db_config.move_buckets([first % shard_map.buckets], sharded)[0]
+    with db_config.on_shard(0), db_config.db_cursor(commit=True) as cursor:
+        cursor.execute(
+            "CREATE TRIGGER reject_boom BEFORE INSERT ON items WHEN NEW.item_name = 'Boom' "
+            "BEGIN SELECT RAISE(ABORT, 'Boom is not for sale'); END"
+        )
+
+    rows = [
+        {'item_name': 'Lamp', 'description': "A lamp", 'base_price': 10},
+        {'item_name': '', 'description': "No name", 'base_price': 10},
+        {'item_name': 'Chair', 'description': "A chair", 'base_price': 20},
+        {'item_name': 'Boom', 'description': "Rejected by the database", 'base_price': 5}
+    ]
+    inserted, errors, message = db_config.bulk_add_items(rows, seller_id, batch_size=1)
+    assert inserted == 0 and errors == [(2, "Item name is required")]
+    assert message.startswith("Error importing items, nothing was added")
+    # Lamp was written on shard 1 and Chair on the directory before Boom failed
+    assert _item_names(sharded) == [] and _item_names(0) == []
+
+    # Without the failing row, each shard keeps its part (the failed import used up its ids)
+    assert db_config.move_buckets([_next_item_id() % shard_map.buckets], sharded)[0]
+    inserted, errors, message = db_config.bulk_add_items(rows[:3], seller_id, batch_size=1)
+    assert (inserted, len(errors)) == (2, 1), message
+    assert _item_names(sharded) == ['Lamp'] and _item_names(0) == ['Chair']
+    assert sorted(item['item_name'] for item in db_config.get_items_by_seller_page(seller_id)[0]) == ['Chair', 'Lamp']
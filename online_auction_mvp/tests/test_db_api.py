@@ -0,0 +1,128 @@
+from datetime import datetime, timedelta
+import csv
+import gzip
+import io
+
+import db_config
+from conftest import add_item, add_user
+
+def test_register_and_login(db):
+    user_id = add_user('alice', role='seller')
+
+    user, message = db_config.login_user('alice@example.com', 'secret')
+    assert message == "Login successful"
+    assert user == {'user_id': user_id, 'name': 'alice', 'email': 'alice@example.com', 'role': 'seller'}
+
+def test_register_rejects_duplicate_email(db):
+    add_user('alice')
+    assert db_config.register_user('alice2', 'alice@example.com', 'other', 'buyer') == (False, "Email already exists")
+
+def test_login_failures(db):
+    add_user('alice')
+    assert db_config.login_user('alice@example.com', 'wrong') == (None, "Incorrect password")
+    assert db_config.login_user('nobody@example.com', 'secret') == (None, "User not found")
+
+def test_add_item(db):
+    seller_id = add_user('sam', role='seller')
+    item_id = add_item(seller_id, 'Lamp', 12.5)
+
+    item, _ = db_config.get_item_by_id(item_id)
+    assert item['item_name'] == 'Lamp'
+    assert float(item['base_price']) == 12.5
+    assert item['seller_id'] == seller_id
+
+def test_add_item_rejects_past_end(db):
+    seller_id = add_user('sam', role='seller')
+    success, message = db_config.add_item('Lamp', 'old', 10, seller_id, ends_at=datetime.now() - timedelta(minutes=1))
+    assert (success, message) == (False, "End time must be in the future")
+
+def test_place_bid_accepts_higher_bids(db):
+    seller_id = add_user('sam', role='seller')
+    buyer_id = add_user('bob')
+    item_id = add_item(seller_id, 'Lamp', 10)
+
+    assert db_config.place_bid(item_id, buyer_id, 11) == (True, "Bid placed successfully")
+    assert db_config.place_bid(item_id, buyer_id, 15) == (True, "Bid placed successfully")
+
+    high_bid, _ = db_config.get_high_bid(item_id)
+    assert float(high_bid['bid_amount']) == 15
+    bids, _ = db_config.get_bids_for_item(item_id)
+    assert [float(bid['bid_amount']) for bid in bids] == [15, 11]
+
+def test_place_bid_rejects_low_bids(db):
+    seller_id = add_user('sam', role='seller')
+    buyer_id = add_user('bob')
+    item_id = add_item(seller_id, 'Lamp', 10)
+
+    success, message = db_config.place_bid(item_id, buyer_id, 10)
+    assert not success and "higher than base price" in message
+    assert db_config.place_bid(item_id, buyer_id, 20)[0]
+    success, message = db_config.place_bid(item_id, buyer_id, 20)
+    assert not success and "higher than current highest bid" in message
+
+    bids, _ = db_config.get_bids_for_item(item_id)
+    assert len(bids) == 1
+
+def test_place_bid_on_missing_item(db):
+    buyer_id = add_user('bob')
+    assert db_config.place_bid(12345, buyer_id, 20) == (False, "Item does not exist")
+
+def test_view_items_page(db):
+    seller_id = add_user('sam', role='seller')
+    item_ids = [add_item(seller_id, f"Item {n}") for n in range(5)]
+
+    first, _ = db_config.view_items_page(limit=2)
+    second, _ = db_config.view_items_page(after_id=first[-1]['item_id'], limit=2)
+    last, _ = db_config.view_items_page(after_id=second[-1]['item_id'], limit=2)
+    assert [item['item_id'] for item in first + second + last] == item_ids
+    assert len(last) == 1
+
+def test_get_bids_by_user_page(db):
+    seller_id = add_user('sam', role='seller')
+    buyer_id = add_user('bob')
+    item_id = add_item(seller_id, 'Lamp', 10)
+    for amount in range(11, 16):
+        assert db_config.place_bid(item_id, buyer_id, amount)[0]
+
+    pages = []
+    after_time = after_id = None
+    while True:
+        page, _ = db_config.get_bids_by_user_page(buyer_id, after_time, after_id, limit=2)
+        if not page:
+            break
+        pages.append([float(bid['bid_amount']) for bid in page])
+        after_time, after_id = page[-1]['bid_time'], page[-1]['bid_id']
+    assert pages == [[15, 14], [13, 12], [11]]
+
+def _csv_rows(data):
+    return list(csv.reader(io.StringIO(data.decode('utf-8'))))
+
+def test_export_bids_by_user_csv(db):
+    seller_id = add_user('sam', role='seller')
+    buyer_id = add_user('bob')
+    item_id = add_item(seller_id, 'Lamp', 10)
+    for amount in (11, 12, 13):
+        assert db_config.place_bid(item_id, buyer_id, amount)[0]
+
+    rows = _csv_rows(b"".join(db_config.export_bids_by_user_csv(buyer_id)))
+    assert rows[0] == ['bid_id', 'item_id', 'item_name', 'bid_amount', 'bid_time']
+    assert [float(row[3]) for row in rows[1:]] == [13, 12, 11]
+    assert {row[2] for row in rows[1:]} == {'Lamp'}
+
+    compressed = b"".join(db_config.export_bids_by_user_csv(buyer_id, compress=True))
+    assert _csv_rows(gzip.decompress(compressed)) == rows
+
+def test_bid_feed_follows_new_bids(db):
+    seller_id = add_user('sam', role='seller')
+    buyer_id = add_user('bob')
+    item_id = add_item(seller_id, 'Lamp', 10)
+    assert db_config.place_bid(item_id, buyer_id, 11)[0]
+
+    bids, _ = db_config.get_bids_for_item(item_id)
+    cursor, message = db_config.bid_feed_cursor(bids, item_ids=[item_id])
+    assert message == "Cursor created successfully"
+    assert db_config.get_bids_since(cursor, item_ids=[item_id])[0] == []
+
+    assert db_config.place_bid(item_id, buyer_id, 12)[0]
+    new_bids, cursor, _ = db_config.get_bids_since(cursor, item_ids=[item_id])
+    assert [float(bid['bid_amount']) for bid in new_bids] == [12]
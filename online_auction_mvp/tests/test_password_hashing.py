@@ -0,0 +1,59 @@
+import logging
+
+import pytest
+
+import db_config
+from conftest import add_user
+from password_hashing import HashingBusyError, PasswordHasher, hash_cost
+
+def _stored_hash(email):
+    with db_config.db_cursor() as cursor:
+        cursor.execute("SELECT password FROM users WHERE email = %s", (email,))
+        return cursor.fetchone()[0]
+
+def test_needs_rehash():
+    hasher = PasswordHasher(rounds=4, workers=0, max_pending=1, timeout=10)
+    current = hasher.hash_password('secret')
+    assert hash_cost(current) == 4
+    assert not hasher.needs_rehash(current)
+    assert PasswordHasher(rounds=5, workers=0, max_pending=1, timeout=10).needs_rehash(current)
+    assert hasher.needs_rehash('not a bcrypt hash')
+
+def test_login_rehashes_at_the_new_work_factor(db, monkeypatch):
+    add_user('alice')
+    old_hash = _stored_hash('alice@example.com')
+    monkeypatch.setattr(db_config.password_hasher, 'rounds', hash_cost(old_hash) + 1)
+
+    user, message = db_config.login_user('alice@example.com', 'secret')
+    assert message == "Login successful"
+    new_hash = _stored_hash('alice@example.com')
+    assert hash_cost(new_hash) == hash_cost(old_hash) + 1
+    assert db_config.password_hasher.check_password('secret', new_hash)
+    assert db_config.login_user('alice@example.com', 'secret')[0] == user
+
+def test_failed_rehash_keeps_the_old_hash(db, monkeypatch, caplog):
+    add_user('alice')
+    old_hash = _stored_hash('alice@example.com')
+    monkeypatch.setattr(db_config.password_hasher, 'rounds', hash_cost(old_hash) + 1)
+
+    def busy(password):
+        raise HashingBusyError("Too many logins in progress, please try again")
+
+    monkeypatch.setattr(db_config.password_hasher, 'hash_password', busy)
+    with caplog.at_level(logging.WARNING, logger='auction.db'):
+        user, message = db_config.login_user('alice@example.com', 'secret')
+    assert message == "Login successful"
+    assert _stored_hash('alice@example.com') == old_hash
+    assert "Could not rehash password" in caplog.text
+
+def test_busy_hasher_turns_callers_away(db, monkeypatch):
+    add_user('alice')
+    busy = PasswordHasher(rounds=4, workers=1, max_pending=0, timeout=10)
+    with pytest.raises(HashingBusyError):
+        busy.hash_password('secret')
+
+    monkeypatch.setattr(db_config, 'password_hasher', busy)
+    assert db_config.login_user('alice@example.com', 'secret') == (None, "Too many logins in progress, please try again")
+    assert db_config.register_user('bob', 'bob@example.com', 'secret', 'buyer') == (
+        False, "Too many logins in progress, please try again")
+    assert busy._executor is None  # turned away before any worker started
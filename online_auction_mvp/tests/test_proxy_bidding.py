@@ -0,0 +1,94 @@
+import db_config
+from conftest import add_item, add_user
+from proxy_bidding import ItemProxies, ProxyEngine, settle
+
+ALICE, BOB, CAROL = 1, 2, 3
+
+def test_higher_proxy_pays_one_increment_over_the_other():
+    proxies = ItemProxies(0, [(1, ALICE, 50), (2, BOB, 30)])
+    assert settle(proxies, None, None, 10, 1) == (ALICE, 31)
+    # Raising the loser's maximum only raises the price
+    proxies.set(BOB, 45, 2)
+    assert settle(proxies, 31, ALICE, 10, 1) == (ALICE, 46)
+    # Capped at the winner's maximum
+    proxies.set(BOB, 49.5, 2)
+    assert settle(proxies, 46, ALICE, 10, 1) == (ALICE, 50)
+
+def test_tie_goes_to_the_earlier_proxy():
+    assert settle(ItemProxies(0, [(1, ALICE, 40), (2, BOB, 40)]), None, None, 10, 1) == (ALICE, 40)
+    assert settle(ItemProxies(0, [(2, ALICE, 40), (1, BOB, 40)]), None, None, 10, 1) == (BOB, 40)
+
+def test_tie_goes_to_the_standing_bidder():
+    # Bob already leads through a proxy; Alice's earlier proxy id does not take the lead away
+    proxies = ItemProxies(0, [(1, ALICE, 40), (2, BOB, 40)])
+    assert settle(proxies, 20, BOB, 10, 1) == (BOB, 40)
+    # A manual bid equal to a proxy's maximum loses to it
+    assert settle(ItemProxies(0, [(1, ALICE, 40)]), 20, ALICE, 10, 1, bid=(CAROL, 40)) == (ALICE, 40)
+
+def test_proxy_below_the_current_bid_does_nothing():
+    proxies = ItemProxies(0, [(1, ALICE, 50)])
+    assert settle(proxies, 60, CAROL, 10, 1) is None
+    assert settle(proxies, 50, CAROL, 10, 1) is None
+
+def test_manual_bid_against_a_proxy():
+    proxies = ItemProxies(0, [(1, ALICE, 50)])
+    assert settle(proxies, 15, ALICE, 10, 1, bid=(CAROL, 20)) == (ALICE, 21)
+    assert settle(proxies, 15, ALICE, 10, 1, bid=(CAROL, 55)) == (CAROL, 55)
+
+def test_replaced_proxies_are_skipped():
+    proxies = ItemProxies(0, [(1, ALICE, 50), (2, BOB, 30)])
+    proxies.set(ALICE, 20, 1)
+    assert proxies.top(2) == [(30, 2, BOB), (20, 1, ALICE)]
+    assert proxies.max_of(ALICE) == 20 and len(proxies) == 2
+
+def test_engine_reloads_on_a_new_version():
+    engine = ProxyEngine()
+    engine.load(7, 3, [(1, ALICE, 50)])
+    assert engine.get(7, 3).max_of(ALICE) == 50
+    assert engine.get(7, 4) is None
+    engine.drop(7)
+    assert engine.get(7, 3) is None
+
+def _price(item_id):
+    entry, _ = db_config.get_high_bid(item_id)
+    return entry['buyer_id'], float(entry['bid_amount'])
+
+def test_competing_proxies_through_the_database(db):
+    seller_id = add_user('sam', role='seller')
+    alice, bob, carol = add_user('alice'), add_user('bob'), add_user('carol')
+    item_id = add_item(seller_id, 'Lamp', 10)
+
+    success, message = db_config.set_proxy_bid(item_id, alice, 50)
+    assert success and message.startswith("Automatic bid set up to 50")
+    assert _price(item_id) == (alice, 11)
+
+    success, message = db_config.set_proxy_bid(item_id, bob, 30)
+    assert success and "outbids it" in message
+    assert _price(item_id) == (alice, 31)
+
+    # Same maximum as Alice, set later: Alice keeps the lead at that maximum
+    success, message = db_config.set_proxy_bid(item_id, carol, 50)
+    assert success and "earlier automatic bid outbids it" in message
+    assert _price(item_id) == (alice, 50)
+
+    # A maximum below the current bid is refused outright
+    success, message = db_config.set_proxy_bid(item_id, bob, 40)
+    assert not success and message.startswith("Maximum bid must be higher than current highest bid of 50")
+    assert _price(item_id) == (alice, 50)
+
+    # Each settlement writes only the new high bid
+    bids, _ = db_config.get_bids_for_item(item_id)
+    assert [(bid['buyer_id'], float(bid['bid_amount'])) for bid in bids] == [(alice, 50), (alice, 31), (alice, 11)]
+
+def test_manual_bid_answered_by_a_proxy(db):
+    seller_id = add_user('sam', role='seller')
+    alice, carol = add_user('alice'), add_user('carol')
+    item_id = add_item(seller_id, 'Lamp', 10)
+    assert db_config.set_proxy_bid(item_id, alice, 50)[0]
+
+    success, message = db_config.place_bid(item_id, carol, 20)
+    assert success and message.startswith("Bid placed, but an automatic bid outbid it")
+    assert _price(item_id) == (alice, 21)
+
+    assert db_config.place_bid(item_id, carol, 60) == (True, "Bid placed successfully")
+    assert _price(item_id) == (carol, 60)
@@ -0,0 +1,113 @@
+from contextlib import contextmanager
+import sqlite3
+
+import pytest
+
+import db_config
+from conftest import add_item, add_user
+from db_backends import SQLiteBackend
+
+class PrimaryReplicaBackend:
+    """
+    Two SQLite files standing in for a MySQL primary and one replica:
+    readonly blocks go to the replica, like MySQLBackend._acquire, and the
+    replica only changes when sync() copies the primary over
+    """
+    name = 'sqlite'
+    explain_prefix = 'EXPLAIN QUERY PLAN'
+
+    def __init__(self, primary_path, replica_path):
+        config = dict(db_config.SQLITE_CONFIG)
+        self.primary_path = primary_path
+        self.replica_path = replica_path
+        self.primary = SQLiteBackend(**dict(config, path=primary_path))
+        self.sync()
+        self.replica = SQLiteBackend(**dict(config, path=replica_path))
+        self.reads = {'primary': 0, 'replica': 0}
+
+    def sync(self):
+        source, target = sqlite3.connect(self.primary_path), sqlite3.connect(self.replica_path)
+        try:
+            source.backup(target)
+        finally:
+            source.close()
+            target.close()
+
+    @contextmanager
+    def cursor(self, dictionary=False, commit=False, readonly=False):
+        backend = self.replica if readonly else self.primary
+        if readonly:
+            self.reads['replica'] += 1
+        elif not commit:
+            self.reads['primary'] += 1
+        with backend.cursor(dictionary=dictionary, commit=commit) as cursor:
+            yield cursor
+
+    def stats(self):
+        return {'backend': self.name}
+
+    def close(self):
+        self.primary.close()
+        self.replica.close()
+
+@pytest.fixture
+def replicated(sqlite_db, tmp_path, monkeypatch):
+    monkeypatch.setattr(db_config.read_cache, 'ttl', 0)
+    monkeypatch.setitem(db_config.REPLICA_CONFIG, 'staleness_window', 60)
+    backend = PrimaryReplicaBackend(str(tmp_path / 'primary.db'), str(tmp_path / 'replica.db'))
+    db_config._backends[0] = backend
+    return backend
+
+def _bid_amounts(buyer_id):
+    bids, _ = db_config.get_bids_by_user_page(buyer_id)
+    return [float(bid['bid_amount']) for bid in bids]
+
+def test_session_reads_its_own_writes_from_the_primary(replicated):
+    seller_id = add_user('sam', role='seller')
+    buyer_id = add_user('bob')
+    item_id = add_item(seller_id, 'Lamp', 10)
+    replicated.sync()
+
+    writer, reader = {}, {}
+    with db_config.session_scope(writer):
+        assert db_config.place_bid(item_id, buyer_id, 11)[0]
+        assert 'db_last_write' in writer
+        replica_reads = replicated.reads['replica']
+        assert _bid_amounts(buyer_id) == [11]
+        assert replicated.reads['replica'] == replica_reads
+
+    # The replica has not caught up: other sessions, and code outside any session, still read it
+    with db_config.session_scope(reader):
+        assert _bid_amounts(buyer_id) == []
+    assert _bid_amounts(buyer_id) == []
+    assert replicated.reads['replica'] > replica_reads
+
+def test_session_returns_to_the_replica_after_the_window(replicated, monkeypatch):
+    seller_id = add_user('sam', role='seller')
+    buyer_id = add_user('bob')
+    item_id = add_item(seller_id, 'Lamp', 10)
+    replicated.sync()
+
+    session = {}
+    with db_config.session_scope(session):
+        assert db_config.place_bid(item_id, buyer_id, 11)[0]
+        assert db_config.reads_own_writes()
+        monkeypatch.setitem(db_config.REPLICA_CONFIG, 'staleness_window', 0)
+        assert not db_config.reads_own_writes()
+        assert _bid_amounts(buyer_id) == []
+
+        replicated.sync()
+        assert _bid_amounts(buyer_id) == [11]
+
+def test_fresh_reads_skip_the_read_cache(replicated, monkeypatch):
+    monkeypatch.setattr(db_config.read_cache, 'ttl', 30)
+    seller_id = add_user('sam', role='seller')
+    add_item(seller_id, 'Lamp', 10)
+    replicated.sync()
+
+    reader, writer = {}, {}
+    with db_config.session_scope(reader):
+        assert len(db_config.view_items_page()[0]) == 1  # cached from the replica
+    with db_config.session_scope(writer):
+        add_item(seller_id, 'Chair', 10)
+        assert [item['item_name'] for item in db_config.view_items_page()[0]] == ['Lamp', 'Chair']
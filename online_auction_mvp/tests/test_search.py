@@ -0,0 +1,77 @@
+import os
+import re
+
+import db_config
+import migrate
+from conftest import add_item, add_user
+
+def _names(items):
+    return [item['item_name'] for item in items]
+
+def test_search_ranks_closer_matches_first(db):
+    seller_id = add_user('sam', role='seller')
+    add_item(seller_id, 'Oak chair', 20, description="Sits well next to a lamp")
+    add_item(seller_id, 'Brass lamp', 30, description="A brass desk lamp with a lamp shade")
+    add_item(seller_id, 'Rug', 40, description="Wool")
+
+    items, message = db_config.search_items('lamp')
+    assert message == "Items retrieved successfully"
+    assert _names(items) == ['Brass lamp', 'Oak chair']
+    assert items[0]['relevance'] > items[1]['relevance']
+
+    # Every word must match, prefixes included
+    assert _names(db_config.search_items('brass lam')[0]) == ['Brass lamp']
+
+def test_search_filters_and_sorts(db):
+    sam = add_user('sam', role='seller')
+    pat = add_user('pat', role='seller')
+    add_item(sam, 'Desk lamp', 20)
+    add_item(pat, 'Floor lamp', 30)
+    add_item(sam, 'Wall lamp', 40)
+
+    assert _names(db_config.search_items('lamp', min_price=25, sort='price_asc')[0]) == ['Floor lamp', 'Wall lamp']
+    assert _names(db_config.search_items('lamp', max_price=35, sort='price_desc')[0]) == ['Floor lamp', 'Desk lamp']
+    assert _names(db_config.search_items('lamp', seller='Sa', sort='newest')[0]) == ['Wall lamp', 'Desk lamp']
+    assert _names(db_config.search_items('', sort='newest')[0]) == ['Wall lamp', 'Floor lamp', 'Desk lamp']
+    assert db_config.search_items('lamp', sort='cheapest') == ([], "Error searching items: unknown sort 'cheapest'")
+
+def test_search_stops_at_the_limit(db, monkeypatch):
+    monkeypatch.setattr(db_config, 'SEARCH_LIMIT', 3)
+    seller_id = add_user('sam', role='seller')
+    item_ids = [add_item(seller_id, f"Lamp {n}", 10 + n) for n in range(5)]
+
+    items, _ = db_config.search_items('lamp', sort='newest', limit=db_config.SEARCH_LIMIT)
+    assert [item['item_id'] for item in items] == item_ids[::-1][:3]
+    assert len(db_config.search_items('lamp', limit=db_config.SEARCH_LIMIT)[0]) == 3
+
+def test_short_words_fall_back_to_a_name_prefix(db):
+    seller_id = add_user('sam', role='seller')
+    add_item(seller_id, 'TV stand', 10)
+    add_item(seller_id, 'Old TV', 10)
+    # InnoDB does not index two-letter words; FTS5 does
+    expected = ['TV stand'] if db == 'mysql' else ['Old TV', 'TV stand']
+    assert sorted(_names(db_config.search_items('tv')[0])) == expected
+
+def _columns(text):
+    return [column.strip().split('.')[-1] for column in text.split(',')]
+
+def test_mysql_match_uses_the_fulltext_columns():
+    # MySQL can only run MATCH() through a FULLTEXT index with exactly its columns
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    index = re.compile(r"CREATE FULLTEXT INDEX ft_items_name_description ON items\(([^)]*)\)")
+    for path in ('schema.sql', os.path.join('migrations', 'mysql', '005_items_search.up.sql')):
+        with open(os.path.join(root, path)) as f:
+            indexed = _columns(index.search(f.read()).group(1))
+        for expression in db_config.SEARCH_MATCH['mysql'][::2]:
+            assert _columns(re.search(r"MATCH\(([^)]*)\)", expression).group(1)) == indexed, path
+
+def test_query_plans_use_their_indexes(db):
+    lines = []
+    failures = migrate.check(log=lines.append)
+    search = [line for line in lines if line.split(':')[0].endswith('search_items')]
+    if db == 'mysql':
+        # The other plans depend on table statistics an empty database lacks
+        assert search == ['ok   search_items']
+    else:
+        assert failures == 0, lines
+        assert search == []
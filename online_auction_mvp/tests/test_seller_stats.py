@@ -0,0 +1,65 @@
+from datetime import datetime
+
+import db_config
+from conftest import add_item, add_user
+
+def _stats():
+    with db_config.db_cursor() as cursor:
+        cursor.execute(
+            "SELECT seller_id, items_listed, bids_received, gross_high_bid, last_bid_time FROM seller_stats ORDER BY seller_id"
+        )
+        return [(row[0], row[1], row[2], float(row[3]), row[4]) for row in cursor.fetchall()]
+
+def _recomputed():
+    # The same totals counted from the items and bids themselves
+    with db_config.db_cursor() as cursor:
+        cursor.execute("""
+        SELECT i.seller_id, COUNT(*),
+               COALESCE(SUM((SELECT COUNT(*) FROM bids b WHERE b.item_id = i.item_id)), 0),
+               COALESCE(SUM(i.current_high_bid), 0),
+               MAX((SELECT MAX(b.bid_time) FROM bids b WHERE b.item_id = i.item_id))
+        FROM items i
+        GROUP BY i.seller_id
+        ORDER BY i.seller_id
+        """)
+        # SQLite returns a computed MAX of timestamps as text
+        return [(row[0], row[1], row[2], float(row[3]), datetime.fromisoformat(row[4]) if isinstance(row[4], str) else row[4])
+                for row in cursor.fetchall()]
+
+def _assert_parity():
+    stats = _stats()
+    assert stats == _recomputed()
+    # A rebuild from scratch agrees with what the triggers kept up
+    assert db_config.rebuild_seller_stats()[0]
+    assert _stats() == stats
+
+def test_triggers_keep_seller_stats_current(db):
+    sam, kim = add_user('sam', role='seller'), add_user('kim', role='seller')
+    alice, bob = add_user('alice'), add_user('bob')
+    lamp = add_item(sam, 'Lamp', 10)
+    chair = add_item(sam, 'Chair', 20)
+    rug = add_item(kim, 'Rug', 5)
+    assert _stats() == [(sam, 2, 0, 0.0, None), (kim, 1, 0, 0.0, None)]
+
+    for item_id, buyer_id, amount in ((lamp, alice, 11), (lamp, bob, 12), (rug, alice, 6)):
+        assert db_config.place_bid(item_id, buyer_id, amount)[0]
+    stats = _stats()
+    assert [row[:4] for row in stats] == [(sam, 2, 2, 12.0), (kim, 1, 1, 6.0)]
+    _assert_parity()
+
+    # A proxy bid and the automatic reply to a manual bid
+    assert db_config.set_proxy_bid(chair, alice, 50)[0]
+    success, message = db_config.place_bid(chair, bob, 30)
+    assert success and message.startswith("Bid placed, but an automatic bid outbid it")
+    assert _stats()[0][:4] == (sam, 2, 5, 43.0)  # the opening proxy bid, the manual bid and the reply
+    _assert_parity()
+
+    inserted, errors, message = db_config.bulk_add_items(
+        [{'item_name': 'Vase', 'description': "A vase", 'base_price': 8},
+         {'item_name': '', 'description': "No name", 'base_price': 8},
+         {'item_name': 'Mirror', 'description': "A mirror", 'base_price': 15}],
+        kim
+    )
+    assert (inserted, len(errors)) == (2, 1), message
+    assert _stats()[1][:4] == (kim, 3, 1, 6.0)
+    _assert_parity()
@@ -0,0 +1,139 @@
+from collections import deque
+import logging
+
+import pytest
+
+import db_config
+import db_metrics
+from conftest import add_item, add_user
+from shard_map import shard_map
+
+@pytest.fixture
+def sharded(sqlite_db, tmp_path, monkeypatch):
+    """
+    The directory plus one more SQLite shard, prepared with init_shards()
+    """
+    monkeypatch.setitem(db_config.SHARD_CONFIG, 'sqlite_paths', [str(tmp_path / 'shard1.db')])
+    monkeypatch.setattr(shard_map, 'refresh_seconds', 0)
+    monkeypatch.setattr(shard_map, 'move_grace_seconds', 0)
+    success, message = db_config.init_shards()
+    assert success, message
+    return 1
+
+def _rows_on(shard, query, params=()):
+    with db_config.on_shard(shard), db_config.db_cursor() as cursor:
+        cursor.execute(query, params)
+        return [row[0] for row in cursor.fetchall()]
+
+def _bucket(item_id):
+    return item_id % shard_map.buckets
+
+def test_moved_bucket_reads_back_from_the_new_shard(sharded):
+    seller_id = add_user('sam', role='seller')
+    buyer_id = add_user('bob')
+    lamp = add_item(seller_id, 'Lamp', 10)
+    chair = add_item(seller_id, 'Chair', 10)
+    assert db_config.place_bid(lamp, buyer_id, 11)[0]
+    assert db_config.place_bid(lamp, buyer_id, 12)[0]
+    assert db_config.place_bid(chair, buyer_id, 15)[0]
+    assert db_config.item_shard(lamp) == db_config.item_shard(chair) == 0
+
+    moves, message = db_config.move_buckets([_bucket(lamp)], sharded)
+    assert moves == [(_bucket(lamp), 0, sharded, 1)], message
+    assert db_config.item_shard(lamp) == sharded and db_config.item_shard(chair) == 0
+    assert _rows_on(0, "SELECT item_id FROM items") == [chair]
+    assert _rows_on(sharded, "SELECT item_id FROM items") == [lamp]
+
+    item, _ = db_config.get_item_by_id(lamp)
+    assert item['item_name'] == 'Lamp' and float(item['current_high_bid']) == 12
+    bids, _ = db_config.get_bids_for_item(lamp)
+    assert [float(bid['bid_amount']) for bid in bids] == [12, 11]
+    # Renumbered from the new shard's range
+    assert all(bid['bid_id'] > sharded * db_config.SHARD_ID_SPAN for bid in bids)
+    assert sorted(item['item_name'] for item in db_config.view_items_page()[0]) == ['Chair', 'Lamp']
+    user_bids, _ = db_config.get_bids_by_user(buyer_id)
+    assert sorted(float(bid['bid_amount']) for bid in user_bids) == [11, 12, 15]
+
+    # Bidding carries on where the item now lives
+    assert db_config.place_bid(lamp, buyer_id, 13)[0]
+    assert _rows_on(sharded, "SELECT bid_amount FROM bids WHERE item_id = %s ORDER BY bid_id", (lamp,)) == [11, 12, 13]
+
+def test_feed_cursor_from_before_a_move_restarts(sharded):
+    seller_id = add_user('sam', role='seller')
+    buyer_id = add_user('bob')
+    lamp = add_item(seller_id, 'Lamp', 10)
+    assert db_config.place_bid(lamp, buyer_id, 11)[0]
+
+    cursor, message = db_config.bid_feed_cursor(db_config.get_bids_for_item(lamp)[0])
+    assert message == "Cursor created successfully"
+    assert db_config.get_bids_since(cursor)[1] is not None
+
+    assert db_config.move_buckets([_bucket(lamp)], sharded)[0]
+    new_bids, next_cursor, message = db_config.get_bids_since(cursor)
+    assert new_bids == [] and next_cursor is None
+    assert not message.startswith("Error")
+
+    # A cursor made after the move only sees later bids, once each
+    cursor, _ = db_config.bid_feed_cursor(db_config.get_bids_for_item(lamp)[0])
+    assert db_config.place_bid(lamp, buyer_id, 12)[0]
+    new_bids, cursor, _ = db_config.get_bids_since(cursor)
+    assert [float(bid['bid_amount']) for bid in new_bids] == [12]
+    assert db_config.get_bids_since(cursor)[0] == []
+
+def test_item_without_bids_is_not_taken_for_a_moved_one(sharded, monkeypatch):
+    seller_id = add_user('sam', role='seller')
+    lamp = add_item(seller_id, 'Lamp', 10)
+    forced = []
+    real_refresh = db_config.refresh_shard_map
+
+    def refresh(force=False):
+        forced.append(force)
+        return real_refresh(force)
+
+    monkeypatch.setattr(db_config, 'refresh_shard_map', refresh)
+    assert db_config.get_bids_for_item(lamp) == ([], "Bids retrieved successfully")
+    assert True not in forced
+
+    # A bucket moved behind this process's map: the empty result is retried on the new shard
+    assert db_config.move_buckets([_bucket(lamp)], sharded)[0]
+    shard_map.load([], shard_map.version - 1)
+    monkeypatch.setattr(shard_map, 'refresh_seconds', 3600)
+    assert db_config.get_bids_for_item(lamp) == ([], "Bids retrieved successfully")
+    assert True in forced
+
+def test_users_are_copied_to_every_shard(sharded):
+    alice = add_user('alice')
+    assert _rows_on(sharded, "SELECT user_id FROM users") == [alice]
+
+    # A user the shard missed, e.g. because it was added later
+    with db_config.on_shard(sharded), db_config.db_cursor(commit=True) as cursor:
+        cursor.execute("DELETE FROM users")
+    assert db_config.sync_users() == (1, "Copied 1 users to 1 shard(s)")
+    assert _rows_on(sharded, "SELECT user_id FROM users") == [alice]
+
+def test_failed_user_copy_is_logged(sharded, monkeypatch, caplog):
+    def unreachable(users, shards=None):
+        raise db_config.Error(msg="shard 1 is down")
+
+    monkeypatch.setattr(db_config, '_copy_users', unreachable)
+    with caplog.at_level(logging.WARNING, logger='auction.db'):
+        success, message = db_config.register_user('bob', 'bob@example.com', 'secret', 'buyer')
+    assert success, message
+    assert "Could not copy user" in caplog.text and "sync-users" in caplog.text
+
+def test_slow_query_plans_come_from_the_shard_that_ran_them(sharded, monkeypatch):
+    alice = add_user('alice')
+    # Only the directory can use the index, so the two shards' plans differ
+    with db_config.on_shard(sharded), db_config.db_cursor(commit=True) as cursor:
+        cursor.execute("DROP INDEX idx_bids_buyer_time")
+    monkeypatch.setitem(db_metrics.METRICS_CONFIG, 'slow_query_ms', 0)
+    monkeypatch.setitem(db_metrics.METRICS_CONFIG, 'explain_slow_queries', True)
+    monkeypatch.setattr(db_metrics, '_slow_queries', deque())
+
+    assert db_config.get_bids_by_user_page(alice)[1] == "Bids retrieved successfully"
+    plans = {
+        entry['shard']: ' '.join(' '.join(row) for row in entry['plan'])
+        for entry in db_metrics.slow_queries() if 'b.buyer_id' in entry['statement']
+    }
+    assert set(plans) == {0, sharded}
+    assert 'idx_bids_buyer_time' in plans[0] and 'idx_bids_buyer_time' not in plans[sharded]
@@ -0,0 +1,117 @@
+import threading
+
+import pytest
+
+from write_admission import BUSY, TokenBuckets, WriteAdmission, WriteRejected
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def _admission(clock, **overrides):
+    config = dict(user_rate=1, user_burst=2, item_rate=10, item_burst=3, max_concurrency=2, max_queue=1,
+                  queue_timeout=0.05, max_buckets=100)
+    config.update(overrides)
+    return WriteAdmission(clock=clock, **config)
+
+def test_user_bucket_allows_a_burst_then_refills():
+    clock = Clock()
+    admission = _admission(clock)
+    admission.throttle(1)
+    admission.throttle(1)
+    with pytest.raises(WriteRejected) as rejected:
+        admission.throttle(1)
+    assert rejected.value.retry_after == pytest.approx(1.0)
+    assert str(rejected.value) == "Too many requests, please retry in 1 s"
+
+    # Other users have their own buckets
+    admission.throttle(2)
+
+    clock.now += 0.5
+    assert admission.retry_after(1) == pytest.approx(0.5)
+    clock.now += 0.5
+    admission.throttle(1)
+    # Refills stop at the burst size
+    clock.now += 60
+    admission.throttle(1)
+    admission.throttle(1)
+    with pytest.raises(WriteRejected):
+        admission.throttle(1)
+    assert admission.stats()['throttled'] == 2
+
+def test_item_bucket_limits_bids_from_many_users():
+    clock = Clock()
+    admission = _admission(clock)
+    for user_id in range(3):
+        admission.throttle(user_id, item_id=7)
+    with pytest.raises(WriteRejected) as rejected:
+        admission.throttle(99, item_id=7)
+    assert rejected.value.retry_after == pytest.approx(0.1)
+    admission.throttle(99, item_id=8)
+    clock.now += 0.1
+    admission.throttle(99, item_id=7)
+
+def test_rejected_write_takes_no_tokens():
+    clock = Clock()
+    admission = _admission(clock, item_burst=1)
+    admission.throttle(1, item_id=7)
+    with pytest.raises(WriteRejected):
+        admission.throttle(2, item_id=7)  # the item is out; user 2 keeps both tokens
+    admission.throttle(2)
+    admission.throttle(2)
+
+def test_zero_rate_disables_a_limit():
+    clock = Clock()
+    admission = _admission(clock, user_rate=0, item_rate=0)
+    for _ in range(100):
+        admission.throttle(1, item_id=7)
+    assert admission.stats()['user_buckets'] == admission.stats()['item_buckets'] == 0
+
+def test_least_recently_used_buckets_are_evicted():
+    buckets = TokenBuckets(rate=1, burst=2, max_buckets=2)
+    buckets.take('a', 0)
+    buckets.take('b', 0)
+    buckets.take('a', 0)
+    buckets.take('c', 0)  # 'b' is the least recently used
+    assert len(buckets) == 2 and buckets.evicted == 1
+    assert buckets.wait('a', 0) == pytest.approx(1.0)
+    # An evicted bucket counts as full again
+    assert buckets.wait('b', 0) == 0.0
+    buckets.take('b', 0)
+    buckets.take('b', 0)
+    assert buckets.wait('b', 0) == pytest.approx(1.0)
+    assert buckets.evicted == 2
+
+def test_eviction_through_admission():
+    clock = Clock()
+    admission = _admission(clock, max_buckets=3)
+    for user_id in range(5):
+        admission.throttle(user_id)
+    stats = admission.stats()
+    assert (stats['user_buckets'], stats['evicted']) == (3, 2)
+
+def test_turns_queue_then_reject():
+    admission = _admission(Clock(), max_concurrency=1, max_queue=1)
+    entered = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        with admission.turn():
+            entered.set()
+            release.wait(5)
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    assert entered.wait(5)
+    with pytest.raises(WriteRejected) as rejected:
+        with admission.turn():
+            pass
+    assert str(rejected.value) == BUSY
+    release.set()
+    holder.join(5)
+    with admission.turn():
+        assert admission.stats()['running'] == 1
+    assert admission.stats()['running'] == 0
@@ -0,0 +1,243 @@
+"""
+Admission control in front of the write functions.
+
+A write first takes a token from its user's bucket and, for bids, from the
+item's bucket, so one aggressive client or one hot item cannot take the
+database for itself. It then waits for one of `max_concurrency` write
+turns, behind at most `max_queue` others and for at most `queue_timeout`
+seconds. Writes that fail either check are turned away at once with a
+retry-after hint, before they run a single query.
+"""
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+import asyncio
+import math
+import os
+import threading
+import time
+
+WRITE_ADMISSION_CONFIG = {
+    'user_rate': float(os.getenv('WRITE_USER_RATE', 5)),  # Writes per second a user can keep up; 0 disables
+    'user_burst': float(os.getenv('WRITE_USER_BURST', 10)),  # ...and can make at once after a pause
+    'item_rate': float(os.getenv('WRITE_ITEM_RATE', 50)),  # Bids per second on one item; 0 disables
+    'item_burst': float(os.getenv('WRITE_ITEM_BURST', 100)),
+    'max_concurrency': int(os.getenv('WRITE_MAX_CONCURRENCY', 16)),  # Writes running at once...
+    'max_queue': int(os.getenv('WRITE_MAX_QUEUE', 64)),  # ...and waiting for a turn; beyond that they are turned away
+    'queue_timeout': float(os.getenv('WRITE_QUEUE_TIMEOUT', 2)),  # Seconds a write waits for a turn
+    'max_buckets': int(os.getenv('WRITE_MAX_BUCKETS', 10000))  # Buckets kept per kind, least recently used evicted
+}
+
+THROTTLED = "Too many requests"
+BUSY = "Server busy, please retry"
+
+class WriteRejected(Exception):
+    """
+    Raised when a write is throttled or no write turn is free; `retry_after`
+    is a hint in seconds
+    """
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class TokenBuckets:
+    """
+    Token buckets by key, refilled at `rate` tokens a second up to `burst`.
+    Only the `max_buckets` most recently used are kept: the least recently
+    used bucket has been idle longest, so it is the closest to full, and a
+    missing bucket counts as full. Callers hold a lock around every call.
+    """
+
+    def __init__(self, rate, burst, max_buckets):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.max_buckets = max_buckets
+        self._buckets = OrderedDict()  # key -> (tokens, clock time they were counted)
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def _tokens(self, key, now):
+        tokens, counted = self._buckets.get(key, (self.burst, now))
+        return min(self.burst, tokens + (now - counted) * self.rate)
+
+    def wait(self, key, now):
+        """
+        Seconds until `key` has a token; 0 when it has one now
+        """
+        if not self.rate:
+            return 0.0
+        return max(0.0, (1 - self._tokens(key, now)) / self.rate)
+
+    def take(self, key, now):
+        if not self.rate:
+            return
+        self._buckets[key] = (self._tokens(key, now) - 1, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_buckets:
+            self._buckets.popitem(last=False)
+            self.evicted += 1
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+class WriteAdmission:
+    """
+    Per-user and per-item token buckets plus a fixed number of write turns,
+    shared by threads and asyncio tasks. A finished write hands its turn
+    straight to the oldest waiter, so waiters are served in arrival order.
+    `clock` gives the time buckets refill by, in seconds.
+    """
+
+    def __init__(self, user_rate, user_burst, item_rate, item_burst, max_concurrency, max_queue, queue_timeout, max_buckets,
+                 clock=time.monotonic):
+        self.clock = clock
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._lock = threading.Lock()
+        self._users = TokenBuckets(user_rate, user_burst, max_buckets)
+        self._items = TokenBuckets(item_rate, item_burst, max_buckets)
+        self._running = 0
+        self._waiters = deque()  # wake-up callbacks, oldest first
+        self.admitted = 0
+        self.throttled = 0
+        self.queued = 0
+        self.rejected = 0
+
+    def _wait(self, user_id, item_id, now):
+        return max(
+            self._users.wait(user_id, now) if user_id is not None else 0.0,
+            self._items.wait(item_id, now) if item_id is not None else 0.0
+        )
+
+    def throttle(self, user_id, item_id=None):
+        """
+        Take a token from the user's bucket and the item's, or raise
+        WriteRejected if either is empty
+        """
+        now = self.clock()
+        with self._lock:
+            wait = self._wait(user_id, item_id, now)
+            if wait > 0:
+                self.throttled += 1
+                raise WriteRejected(f"{THROTTLED}, please retry in {math.ceil(wait)} s", wait)
+            if user_id is not None:
+                self._users.take(user_id, now)
+            if item_id is not None:
+                self._items.take(item_id, now)
+
+    def retry_after(self, user_id, item_id=None):
+        """
+        Seconds until the user and item both have a token again
+        """
+        with self._lock:
+            return self._wait(user_id, item_id, self.clock())
+
+    def _enter(self, wake, bounded):
+        # True: the turn is ours now; False: `wake` is queued and called when it is
+        with self._lock:
+            if self._running < self.max_concurrency and not self._waiters:
+                self._running += 1
+                self.admitted += 1
+                return True
+            if bounded and len(self._waiters) >= self.max_queue:
+                self.rejected += 1
+                raise WriteRejected(BUSY, 1.0)
+            self._waiters.append(wake)
+            self.queued += 1
+            return False
+
+    def _leave_queue(self, wake):
+        # False if the turn was handed over just as the waiter gave up
+        with self._lock:
+            try:
+                self._waiters.remove(wake)
+            except ValueError:
+                return False
+            self.rejected += 1
+            return True
+
+    def _exit(self):
+        with self._lock:
+            if not self._waiters:
+                self._running -= 1
+                return
+            wake = self._waiters.popleft()
+            self.admitted += 1
+        wake()
+
+    @contextmanager
+    def turn(self, bounded=True):
+        """
+        Hold a write turn for the block. Unbounded callers (the bid intake
+        writer) skip the queue limit and wait as long as it takes.
+        """
+        event = threading.Event()
+        wake = event.set
+        if not self._enter(wake, bounded):
+            if not event.wait(self.queue_timeout if bounded else None) and self._leave_queue(wake):
+                raise WriteRejected(BUSY, 1.0)
+        try:
+            yield
+        finally:
+            self._exit()
+
+    @asynccontextmanager
+    async def turn_async(self):
+        """
+        turn() for asyncio tasks; waiting does not block the event loop
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(_resolve, future)
+
+        if not self._enter(wake, True):
+            try:
+                await asyncio.wait_for(asyncio.shield(future), self.queue_timeout)
+            except asyncio.TimeoutError:
+                if self._leave_queue(wake):
+                    raise WriteRejected(BUSY, 1.0)
+            except asyncio.CancelledError:
+                if not self._leave_queue(wake):
+                    self._exit()
+                raise
+        try:
+            yield
+        finally:
+            self._exit()
+
+    @contextmanager
+    def admit(self, user_id, item_id=None):
+        """
+        throttle() then turn(): the usual way in for a write
+        """
+        self.throttle(user_id, item_id)
+        with self.turn():
+            yield
+
+    @asynccontextmanager
+    async def admit_async(self, user_id, item_id=None):
+        self.throttle(user_id, item_id)
+        async with self.turn_async():
+            yield
+
+    def stats(self):
+        with self._lock:
+            return {
+                'admitted': self.admitted,
+                'throttled': self.throttled,
+                'queued': self.queued,
+                'rejected': self.rejected,
+                'running': self._running,
+                'waiting': len(self._waiters),
+                'user_buckets': len(self._users),
+                'item_buckets': len(self._items),
+                'evicted': self._users.evicted + self._items.evicted
+            }
+
+write_admission = WriteAdmission(**WRITE_ADMISSION_CONFIG)